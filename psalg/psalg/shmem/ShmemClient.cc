@@ -281,6 +281,20 @@ void* ShmemClient::get(int& index, int& size)
 ** --
 */
 
+int ShmemClient::ready(int timeout_ms)
+{
+  if (::poll(_pfd, _nfd, timeout_ms) <= 0)
+    return 0;
+  return ((_pfd[0].revents | _pfd[1].revents) & POLLIN) ? 1 : 0;
+}
+
+/*
+** ++
+**
+**
+** --
+*/
+
 int ShmemClient::connect(const char* tag, int tr_index) {
   int error = 0;
   char* qname             = new char[128];
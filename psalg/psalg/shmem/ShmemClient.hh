@@ -28,6 +28,11 @@ namespace psalg {
       int connect(const char* tag, int tr_index=0);
       void* get(int& index,int& size);
       void free(int index, int size);
+      //
+      //  returns 1 if get() would not block, waiting up to timeout_ms
+      //  (0 returns immediately, -1 waits forever)
+      //
+      int ready(int timeout_ms=0);
     
     private:
       int _myTrFd;
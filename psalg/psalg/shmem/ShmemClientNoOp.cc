@@ -25,6 +25,11 @@ void* ShmemClient::get(int& index, int& size)
   return 0;
 }
 
+int ShmemClient::ready(int timeout_ms)
+{
+  return 0;
+}
+
 int ShmemClient::connect(const char* tag, int tr_index)
 {
   return 1;
@@ -1,6 +1,5 @@
 from .datasource import DataSource
 #from .smalldata import SmallData
-from psana.psexp.prometheus_manager import PrometheusManager
-import time
-g_ts = PrometheusManager.get_metric('psana_timestamp')
-g_ts.labels('psana_init').set(time.time())
+# psana_init timestamp (startup_timer.t0) is sent to prometheus by DataSource,
+# prometheus_client is not imported until then.
+from psana.psexp.tools import startup_timer
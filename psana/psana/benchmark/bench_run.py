@@ -0,0 +1,125 @@
+""" Reads one (synthetic) run and writes its throughput as json.
+
+Run by run_benchmarks.py, either directly (serial, singlefile) or under
+mpirun (parallel). Per-stage times come from the prometheus histograms and
+counters of every rank, summed on rank 0.
+
+Example:
+    PS_SMD_NODES=2 mpirun -n 6 python -m psana.benchmark.bench_run \\
+            -m parallel -d /tmp/bench -o result.json
+    PS_PARALLEL=legion legion_python bench_run.py -ll:py 4 \\
+            -m legion -d /tmp/bench -o result.json
+"""
+import os
+import sys
+import time
+import json
+import argparse
+
+# (histogram with time spent, counter and unit of the amount processed)
+STAGES = {
+    'smd0_read' : ('psana_smd0_read_secs', 'psana_smd0_read_total', 'MB'),
+    'eb_build'  : ('psana_eb_build_secs',  'psana_eb_sent_total',   'evts'),
+    'bd_read'   : ('psana_bd_read_secs',   'psana_bd_read_total',   'MB'),
+    'analysis'  : ('psana_bd_ana_secs',    None,                    None),
+}
+
+def _sum(values, sample_name, **labels):
+    total = 0.
+    for (name, sample_labels), value in values.items():
+        if name != sample_name: continue
+        sample_labels = dict(sample_labels)
+        if all(sample_labels.get(k) == v for k, v in labels.items()):
+            total += value
+    return total
+
+def stage_summary(values):
+    """ Returns time, calls and throughput per stage (and per MPI wait
+    endpoint) from summed prometheus sample values."""
+    stages = {}
+    for stage, (hist, counter, unit) in STAGES.items():
+        secs = _sum(values, hist + '_sum')
+        calls = _sum(values, hist + '_count')
+        if calls == 0: continue
+        stages[stage] = {'seconds': secs, 'calls': calls}
+        if counter is not None:
+            amount = _sum(values, counter, unit=unit)
+            stages[stage][unit] = amount
+            stages[stage][unit + '_per_sec'] = amount / secs if secs > 0 else None
+    endpoints = set(dict(labels).get('endpoint') for name, labels in values \
+            if name == 'psana_mpi_wait_secs_count')
+    for endpoint in sorted(endpoints):
+        stages['mpi_wait_' + endpoint] = {
+                'seconds': _sum(values, 'psana_mpi_wait_secs_sum', endpoint=endpoint),
+                'calls': _sum(values, 'psana_mpi_wait_secs_count', endpoint=endpoint)}
+    return stages
+
+def _count_event(evt, det):
+    pass
+
+def read_run(mode, xtc_dir, runnum, max_events):
+    """ Loops over all events, returns (n_events, secs to first event, secs)."""
+    from psana import DataSource
+    st = time.time()
+    if mode == 'legion':
+        # events are analyzed by legion tasks, analyze() returns their count
+        ds = DataSource(exp='xpptut15', run=runnum, dir=xtc_dir, max_events=max_events)
+        n_events = 0
+        for run in ds.runs():
+            n_events += run.analyze(event_fn=_count_event).get()
+        return n_events, None, time.time() - st
+
+    if mode == 'singlefile':
+        fname = os.path.join(xtc_dir, 'data-r%s-s00.xtc2'%(str(runnum).zfill(4)))
+        ds = DataSource(files=fname, max_events=max_events)
+    else:
+        ds = DataSource(exp='xpptut15', run=runnum, dir=xtc_dir, max_events=max_events)
+    n_events = 0
+    t_first = None
+    for run in ds.runs():
+        for evt in run.events():
+            if t_first is None: t_first = time.time() - st
+            n_events += 1
+    return n_events, t_first, time.time() - st
+
+def main():
+    parser = argparse.ArgumentParser(description='Reads a run and reports throughput')
+    parser.add_argument('-m', '--mode', choices=('serial', 'singlefile', 'parallel', 'legion'), required=True)
+    parser.add_argument('-d', '--dir',  required=True, help='xtc directory')
+    parser.add_argument('-o', '--out',  required=True, help='output json file')
+    parser.add_argument('--run',        type=int, default=1)
+    parser.add_argument('--max-events', type=int, default=0)
+    args, _ = parser.parse_known_args() # legion_python passes its own flags
+
+    if args.mode == 'legion':
+        os.environ['PS_PARALLEL'] = 'legion'
+    elif args.mode != 'parallel':
+        os.environ['PS_PARALLEL'] = 'none'
+
+    n_events, t_first, secs = read_run(args.mode, args.dir, args.run, args.max_events)
+
+    from psana.psexp.prometheus_manager import registry, _snapshot
+    values, _ = _snapshot(registry)
+    result = {'n_events': n_events, 'first_event_secs': t_first, 'seconds': secs}
+
+    if args.mode == 'parallel':
+        from mpi4py import MPI
+        comm = MPI.COMM_WORLD
+        all_results = comm.gather((result, values), root=0)
+        if comm.Get_rank() != 0: return
+        values = {}
+        for rank_result, rank_values in all_results:
+            for key, value in rank_values.items():
+                values[key] = values.get(key, 0.) + value
+        firsts = [r['first_event_secs'] for r, _ in all_results if r['first_event_secs'] is not None]
+        result = {'n_events': sum(r['n_events'] for r, _ in all_results),
+                'first_event_secs': min(firsts) if firsts else None,
+                'seconds': max(r['seconds'] for r, _ in all_results),
+                'n_ranks': comm.Get_size()}
+
+    result['stages'] = stage_summary(values)
+    with open(args.out, 'w') as f:
+        json.dump(result, f)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+""" End-to-end psana throughput benchmarks.
+
+Writes a synthetic run (see synthetic.py), reads it with RunSerial,
+RunSingleFile and RunParallel (under mpirun, for each combination of
+PS_SMD_NODES and PS_SMD_N_EVENTS), optionally RunLegion (under
+legion_python, for each PS_SMD_N_EVENTS and PS_LEGION_INFLIGHT) and
+appends one json line per case to the results file. With --baseline, cases whose events/s dropped by more
+than --tolerance compared with the baseline results are reported and the
+exit status is 1.
+
+Example:
+    python -m psana.benchmark.run_benchmarks -o results.jsonl \\
+            --n-events 100000 --smd-nodes 1 2 --smd-n-events 1000 10000 -n 8
+    python -m psana.benchmark.run_benchmarks -o new.jsonl --baseline results.jsonl
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import subprocess
+
+from psana.benchmark.synthetic import write_synthetic_run
+
+def _git_rev():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=os.path.dirname(os.path.realpath(__file__)),
+                stderr=subprocess.DEVNULL).decode().strip()
+    except (subprocess.CalledProcessError, OSError):
+        return None
+
+def cases(args):
+    """ Yields (name, mode, env) of all benchmark cases."""
+    yield 'serial', 'serial', {}
+    yield 'singlefile', 'singlefile', {}
+    for smd_nodes in args.smd_nodes:
+        for smd_n_events in args.smd_n_events:
+            env = {'PS_SMD_NODES': str(smd_nodes), 'PS_SMD_N_EVENTS': str(smd_n_events)}
+            yield 'parallel_n%d_smd%d_b%d'%(args.n_ranks, smd_nodes, smd_n_events), 'parallel', env
+    if args.legion:
+        for smd_n_events in args.smd_n_events:
+            for inflight in args.legion_inflight:
+                env = {'PS_SMD_N_EVENTS': str(smd_n_events), 'PS_LEGION_INFLIGHT': str(inflight)}
+                yield 'legion_py%d_b%d_f%d'%(args.n_ranks, smd_n_events, inflight), 'legion', env
+
+def run_case(mode, env, xtc_dir, out, args):
+    cmd = [sys.executable, '-m', 'psana.benchmark.bench_run', '-m', mode, '-d', xtc_dir, '-o', out]
+    if mode == 'parallel':
+        cmd = [args.mpirun, '-n', str(args.n_ranks)] + cmd
+    elif mode == 'legion':
+        bench_run = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'bench_run.py')
+        cmd = [args.legion_python, bench_run, '-ll:py', str(args.n_ranks), '-m', mode, '-d', xtc_dir, '-o', out]
+    subprocess.check_call(cmd, env=dict(os.environ, **env))
+    with open(out, 'r') as f:
+        return json.load(f)
+
+def key(record):
+    return (record['case'], record['n_events_total'], record['event_bytes'], record['n_files'])
+
+def compare(results, baseline_file, tolerance):
+    """ Returns a list of messages for cases slower than the baseline."""
+    baseline = {}
+    with open(baseline_file, 'r') as f:
+        for line in f:
+            record = json.loads(line)
+            baseline[key(record)] = record # last record of a case wins
+    regressions = []
+    for record in results:
+        ref = baseline.get(key(record))
+        if ref is None: continue
+        if record['evts_per_sec'] < (1. - tolerance) * ref['evts_per_sec']:
+            regressions.append('%s: %.0f evts/s (baseline %.0f evts/s, %s)'%(record['case'],
+                record['evts_per_sec'], ref['evts_per_sec'], ref.get('git_rev')))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='psana end-to-end throughput benchmarks')
+    parser.add_argument('-o', '--out',        required=True, help='results file (json lines, appended)')
+    parser.add_argument('-d', '--dir',        help='xtc directory (default: temporary)')
+    parser.add_argument('--n-files',          type=int, default=2)
+    parser.add_argument('--n-steps',          type=int, default=1)
+    parser.add_argument('--n-events',         type=int, default=10000, help='L1Accepts per step')
+    parser.add_argument('--event-bytes',      type=int, default=1024)
+    parser.add_argument('--rates',            type=int, nargs='*', help='rate divider per stream')
+    parser.add_argument('--smd-nodes',        type=int, nargs='*', default=[1])
+    parser.add_argument('--smd-n-events',     type=int, nargs='*', default=[1000])
+    parser.add_argument('-n', '--n-ranks',    type=int, default=4, help='mpirun -n (legion_python -ll:py) for parallel (legion) cases')
+    parser.add_argument('--mpirun',           default='mpirun')
+    parser.add_argument('--no-parallel',      action='store_true')
+    parser.add_argument('--legion',           action='store_true', help='also run RunLegion cases')
+    parser.add_argument('--legion-python',    default='legion_python')
+    parser.add_argument('--legion-inflight',  type=int, nargs='*', default=[0], help='PS_LEGION_INFLIGHT (0: default)')
+    parser.add_argument('--baseline',         help='results file to compare with')
+    parser.add_argument('--tolerance',        type=float, default=0.1)
+    args = parser.parse_args()
+    if args.no_parallel:
+        args.smd_nodes = []
+
+    xtc_dir = args.dir if args.dir else tempfile.mkdtemp(prefix='psana_bench_')
+    desc = write_synthetic_run(xtc_dir, n_files=args.n_files, n_steps=args.n_steps,
+            n_events_per_step=args.n_events, rates=args.rates, event_bytes=args.event_bytes)
+    total_bytes = sum(s['xtc_bytes'] + s['smd_bytes'] for s in desc['streams'])
+
+    results = []
+    for name, mode, env in cases(args):
+        out = os.path.join(xtc_dir, 'result_%s.json'%name)
+        result = run_case(mode, env, xtc_dir, out, args)
+        # singlefile only reads the first stream (no smalldata)
+        n_bytes = desc['streams'][0]['xtc_bytes'] if mode == 'singlefile' else total_bytes
+        record = {'case': name, 'mode': mode, 'env': env,
+                'time': time.time(), 'host': socket.gethostname(), 'git_rev': _git_rev(),
+                'n_files': desc['n_files'], 'n_events_total': desc['n_events'],
+                'event_bytes': desc['event_bytes'], 'rates': [s['rate'] for s in desc['streams']]}
+        record.update(result)
+        record['evts_per_sec'] = result['n_events'] / result['seconds']
+        record['MB_per_sec'] = n_bytes / 1e6 / result['seconds']
+        results.append(record)
+        print('%-32s %10d evts %10.0f evts/s %8.1f MB/s'%(name, result['n_events'],
+            record['evts_per_sec'], record['MB_per_sec']))
+
+    regressions = []
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+
+    with open(args.out, 'a') as f:
+        for record in results:
+            f.write(json.dumps(record) + '\n')
+
+    for msg in regressions:
+        print('REGRESSION', msg)
+    if regressions:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
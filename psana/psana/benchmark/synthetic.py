@@ -0,0 +1,110 @@
+""" Writes synthetic xtc2 runs (bigdata + smalldata) for benchmarks.
+
+Each stream (file) holds one detector with a uint8 array of event_bytes
+per event. Streams can run at lower rates than the first one (rates[i]=k:
+stream i records every k-th L1Accept) to exercise event building.
+
+Example:
+    python -m psana.benchmark.synthetic -d /tmp/bench -n 4 -e 100000 -b 4096
+"""
+import os
+import argparse
+import subprocess
+import numpy as np
+import dgramCreate as dc
+
+# subset of TransitionId.hh
+_transitionId = {
+    'Configure'         : 2,
+    'BeginRun'          : 4,
+    'EndRun'            : 5,
+    'BeginStep'         : 6,
+    'EndStep'           : 7,
+    'Enable'            : 8,
+    'Disable'           : 9,
+    'L1Accept'          : 12,
+}
+
+def _transitions(n_steps, n_events_per_step):
+    """ Yields (timestamp, transition name, L1Accept no.) of a run, same for
+    all streams. Timestamps count up by one."""
+    ts = 0
+    def tr(name, i=-1):
+        nonlocal ts
+        ts += 1
+        return ts, name, i
+    yield tr('Configure')
+    yield tr('BeginRun')
+    i_evt = 0
+    for _ in range(n_steps):
+        yield tr('BeginStep')
+        yield tr('Enable')
+        for _ in range(n_events_per_step):
+            yield tr('L1Accept', i_evt)
+            i_evt += 1
+        yield tr('Disable')
+        yield tr('EndStep')
+    yield tr('EndRun')
+
+def write_stream(fname, i_stream, n_steps, n_events_per_step, rate, event_bytes):
+    """ Writes one xtc2 file. Returns no. of L1Accepts written."""
+    nameinfo = dc.nameinfo('bench%d'%i_stream, 'bench', 'serial%d'%i_stream, 0)
+    alg = dc.alg('raw', [0,0,1])
+    cydgram = dc.CyDgram()
+    payload = (np.arange(event_bytes) % 256).astype(np.uint8)
+    n_written = 0
+    with open(fname, 'wb') as f:
+        for ts, name, i_evt in _transitions(n_steps, n_events_per_step):
+            if name == 'L1Accept' and i_evt % rate: continue
+            cydgram.addDet(nameinfo, alg, {'array': payload})
+            if name == 'Configure':
+                xtc_bytes = cydgram.getSelect(ts, _transitionId[name], add_names=True, add_shapes_data=True)
+            elif name == 'L1Accept':
+                xtc_bytes = cydgram.getSelect(ts, _transitionId[name], add_names=False, add_shapes_data=True)
+                n_written += 1
+            else:
+                xtc_bytes = cydgram.getSelect(ts, _transitionId[name], add_names=False, add_shapes_data=False)
+            f.write(xtc_bytes)
+    return n_written
+
+def write_synthetic_run(xtc_dir, n_files=2, n_steps=1, n_events_per_step=1000,
+        rates=None, event_bytes=1024, runnum=1):
+    """ Writes data-rNNNN-sMM.xtc2 and their smalldata (smdwriter) to xtc_dir
+    and xtc_dir/smalldata. Returns a description of the run with the no.
+    of L1Accepts and bytes per stream."""
+    if rates is None: rates = [1] * n_files
+    assert len(rates) == n_files and rates[0] == 1, 'first stream must run at full rate'
+    smd_dir = os.path.join(xtc_dir, 'smalldata')
+    os.makedirs(smd_dir, exist_ok=True)
+
+    streams = []
+    for i in range(n_files):
+        fname = os.path.join(xtc_dir, 'data-r%s-s%s.xtc2'%(str(runnum).zfill(4), str(i).zfill(2)))
+        smd_fname = os.path.join(smd_dir, os.path.basename(fname).replace('.xtc2', '.smd.xtc2'))
+        n_events = write_stream(fname, i, n_steps, n_events_per_step, rates[i], event_bytes)
+        subprocess.check_call(['smdwriter', '-f', fname, '-o', smd_fname])
+        streams.append({'xtc': fname, 'smd': smd_fname, 'rate': rates[i],
+            'n_events': n_events, 'xtc_bytes': os.path.getsize(fname),
+            'smd_bytes': os.path.getsize(smd_fname)})
+
+    return {'dir': xtc_dir, 'runnum': runnum, 'n_files': n_files, 'n_steps': n_steps,
+            'n_events_per_step': n_events_per_step, 'event_bytes': event_bytes,
+            'n_events': n_steps * n_events_per_step, 'streams': streams}
+
+def main():
+    parser = argparse.ArgumentParser(description='Writes a synthetic xtc2 run')
+    parser.add_argument('-d', '--dir',       required=True, help='output xtc directory')
+    parser.add_argument('-n', '--n-files',   type=int, default=2)
+    parser.add_argument('-s', '--n-steps',   type=int, default=1)
+    parser.add_argument('-e', '--n-events',  type=int, default=1000, help='L1Accepts per step')
+    parser.add_argument('-b', '--event-bytes', type=int, default=1024)
+    parser.add_argument('-r', '--rates',     type=int, nargs='*', help='rate divider per stream')
+    parser.add_argument('--run',             type=int, default=1)
+    args = parser.parse_args()
+    desc = write_synthetic_run(args.dir, n_files=args.n_files, n_steps=args.n_steps,
+            n_events_per_step=args.n_events, rates=args.rates,
+            event_bytes=args.event_bytes, runnum=args.run)
+    print('Wrote %d events in %d files to %s'%(desc['n_events'], desc['n_files'], desc['dir']))
+
+if __name__ == "__main__":
+    main()
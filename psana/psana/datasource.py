@@ -1,11 +1,22 @@
 import os
-from psana.psexp.tools import mode
+from psana.psexp.tools import mode, startup_timer
+
+# MPI is initialized on the first DataSource call that needs it (exp or
+# shmem), so that serial reads of files do not pay for importing mpi4py.
+MPI = None
 world_size = 1
-if mode == 'mpi':
-    from mpi4py import MPI
+rank = 0
+os.environ['PS_PROMETHEUS_JOBID'] = str(os.getpid())
+
+def _init_mpi():
+    global MPI, world_size, rank
+    if MPI is not None: return
+    with startup_timer.phase('import mpi4py'):
+        from mpi4py import MPI as _MPI
+    MPI        = _MPI
     world_size = MPI.COMM_WORLD.Get_size()
     rank       = MPI.COMM_WORLD.Get_rank()
-    
+
     # set a unique jobid (rank 0 process id) for prometheus client
     if rank == 0:
         prometheus_jobid = os.getpid()
@@ -13,17 +24,10 @@ if mode == 'mpi':
         prometheus_jobid = None
     prometheus_jobid = MPI.COMM_WORLD.bcast(prometheus_jobid, root=0)
     os.environ['PS_PROMETHEUS_JOBID'] = str(prometheus_jobid)
-else:
-    os.environ['PS_PROMETHEUS_JOBID'] = str(os.getpid())
 
 
 class InvalidDataSource(Exception): pass
 
-from psana.psexp.serial_ds     import SerialDataSource
-from psana.psexp.singlefile_ds import SingleFileDataSource
-from psana.psexp.shmem_ds      import ShmemDataSource
-from psana.psexp.legion_ds     import LegionDataSource
-from psana.psexp.null_ds       import NullDataSource
 
 def DataSource(*args, **kwargs):
     args = tuple(map(str, args)) # Hack: workaround for unicode and str being different types in Python 2
@@ -31,6 +35,12 @@ def DataSource(*args, **kwargs):
     # ==== shared memory ====
     if 'shmem' in kwargs:
 
+        if mode == 'mpi': _init_mpi()
+
+        with startup_timer.phase('import datasource'):
+            from psana.psexp.shmem_ds import ShmemDataSource
+            from psana.psexp.null_ds  import NullDataSource
+
         if world_size > 1:
 
             PS_SRV_NODES = int(os.environ.get('PS_SRV_NODES', '0'))
@@ -60,18 +70,24 @@ def DataSource(*args, **kwargs):
     elif 'exp' in kwargs: # experiment string - assumed multiple files
 
         if mode == 'mpi':
+            _init_mpi()
             if world_size == 1:
+                with startup_timer.phase('import datasource'):
+                    from psana.psexp.serial_ds import SerialDataSource
                 return SerialDataSource(*args, **kwargs)
             else:
-               
+
                 # >> these lines are here to AVOID initializing node.comms
                 #    that class instance sets up the MPI environment, which
                 #    is global... and can interfere with other uses of MPI
                 #    (particularly shmem). Therefore we wish to isolate it
                 #    as much as possible.
-                from psana.psexp.node   import Communicators
-                from psana.psexp.mpi_ds import MPIDataSource
-                comms = Communicators()
+                with startup_timer.phase('import datasource'):
+                    from psana.psexp.node   import Communicators
+                    from psana.psexp.mpi_ds import MPIDataSource
+                    from psana.psexp.null_ds import NullDataSource
+                with startup_timer.phase('mpi communicators'):
+                    comms = Communicators()
 
                 smalldata_kwargs = {'server_group' : comms.srv_group(),
                                     'client_group' : comms.bd_group()}
@@ -83,20 +99,24 @@ def DataSource(*args, **kwargs):
                     return NullDataSource(*args, **kwargs)
 
         elif mode == 'legion':
+            with startup_timer.phase('import datasource'):
+                from psana.psexp.legion_ds import LegionDataSource
             return LegionDataSource(*args, **kwargs)
 
         elif mode == 'none':
+            with startup_timer.phase('import datasource'):
+                from psana.psexp.serial_ds import SerialDataSource
             return SerialDataSource(*args, **kwargs)
 
         else:
             raise InvalidDataSource("Incorrect mode. DataSource mode only supports either mpi, legion, or none (non parallel mode).")
-    
+
     # ==== from XTC file(s) ====
     elif 'files' in kwargs: # list of files
+        with startup_timer.phase('import datasource'):
+            from psana.psexp.singlefile_ds import SingleFileDataSource
         return SingleFileDataSource(*args, **kwargs)
 
 
     else:
         raise InvalidDataSource("Expected keyword(s) not found. DataSource requires exp, shmem, or files keywords.")
-
-
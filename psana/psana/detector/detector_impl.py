@@ -29,6 +29,12 @@ class DetectorImpl(object):
         self._sorted_segment_ids = configinfo.sorted_segment_ids
         self._uniqueid = configinfo.uniqueid
         self._dettype = configinfo.dettype
+        # precomputed [(dgram position, segment_id), ...] from Run._set_configinfo
+        segment_map = getattr(configinfo, 'segment_map', {})
+        self._segment_positions = segment_map.get(drp_class_name)
+        if self._segment_positions is not None and \
+                [seg for _, seg in self._segment_positions] != self._sorted_segment_ids:
+            self._segment_positions = None # fall back to looking up all segments in the event
         
         self._calibconst     = calibconst # only my calibconst (equivalent to det.calibconst['det_name'])
 
@@ -37,6 +43,20 @@ class DetectorImpl(object):
         Look in the event to find all the dgrams for our detector/drp_class
         e.g. (xppcspad,raw) or (xppcspad,fex)
         """
+        if self._segment_positions:
+            # dgram positions are known from Configure
+            segs = {}
+            dgrams = evt._dgrams
+            for pos, segment in self._segment_positions:
+                d = dgrams[pos]
+                if d is None: return None
+                det = getattr(d, self._det_name, None)
+                if det is None or segment not in det: return None
+                drp_class = getattr(det[segment], self._drp_class_name, None)
+                if drp_class is None: return None
+                segs[segment] = drp_class
+            return segs
+
         key = (self._det_name,self._drp_class_name)
         if key in evt._det_segments:
             # check that all promised segments have been received
@@ -1,4 +1,5 @@
 import numpy as np
+from collections import namedtuple
 from psana.detector.detector_impl import DetectorImpl
 from amitypes import Array1d
 
@@ -35,8 +36,7 @@ class ttdet_ttalg_0_0_1(DetectorImpl):
     
     def parsed_frame(self,evt):
         pFrame = timeToolParser()
-        p = self._segments(evt)[0].data.tobytes()
-        pFrame._parseData(p)
+        pFrame._parseData(self._segments(evt)[0].data)
 
         return pFrame
 
@@ -127,35 +127,134 @@ class eventBuilderParser():
     
 class timeToolParser(eventBuilderParser):
     def _parseData(self,frame_bytearray:bytearray):
-        self._parseArray(frame_bytearray)
-        
-        
-        try:
-            _timing_bus_idx           = [i[0] for i in enumerate(self._tdest) if i[1]==0][0] #timing bus always has _tdest of 0
-            self._timing_bus          = self._frame_list[_timing_bus_idx]  #frame_bytearray[16:32]
-        except IndexError:
-            self._timing_bus = None
-        
-        sub_frame_idx            = [i[0] for i in enumerate(self._tdest) if i[1]==1][0]
-        edge_pos_idx             = [i[0] for i in enumerate(self._sub_frames[sub_frame_idx]._tdest) if i[1]==0][0]
-        self.edge_position       = self._sub_frames[sub_frame_idx]._frame_list[edge_pos_idx][0] + self._sub_frames[sub_frame_idx]._frame_list[edge_pos_idx][1]*256
-        
-        try:
-            bkg_frame_idx            = [i[0] for i in enumerate(self._sub_frames[sub_frame_idx]._tdest) if i[1]==1][0]
-            self.background_frame    = self._sub_frames[sub_frame_idx]._frame_list[bkg_frame_idx]
-        except IndexError:    
-            self.background_frame    = None
-
-        try:
-            prescaled_frame_idx      = [i[0] for i in enumerate(self._tdest) if i[1]==2][0]
-            #self.prescaled_frame    = self._frame_list[prescaled_frame_idx] 
-            self.prescaled_frame     = np.frombuffer(self._frame_list[prescaled_frame_idx],dtype = np.int8)
-            
-        except IndexError:
-            self.prescaled_frame     = None
-            
-        
-        
-        
-    
+        frame  = _as_uint8(frame_bytearray)
+        layout = _tt_layout(memoryview(frame), len(frame))
+
+        self._frame_bytes    = len(frame)
+        self._main_header    = frame[0:16]
+        self._version        = frame[0] & 0xf
+        self._HEADER_WIDTH   = 2**((frame[0] >> 4) + 1)
+        self.sequence_count  = frame[1]
+
+        self._timing_bus      = _view(frame, layout.timing_bus)
+        self.background_frame = _view(frame, layout.background)
+        self.prescaled_frame  = _view(frame, layout.prescaled, np.int8)
+        self.edge_position    = None if layout.edge is None else int(frame[layout.edge[0]]) + int(frame[layout.edge[0]+1])*256
+
         return
+
+    def print_info(self):
+        for name in ('_frame_bytes', '_version', '_HEADER_WIDTH', 'sequence_count', 'edge_position'):
+            print(name," = ",getattr(self, name))
+        for name in ('_timing_bus', 'background_frame', 'prescaled_frame'):
+            value = getattr(self, name)
+            print(name," = ",None if value is None else '%d bytes' % len(value))
+
+# Vectorized parser of the FEX frames.
+# A frame is a 16 byte main header followed by sub-frames, each one followed by a
+# 16 byte tail with its size (bytes 0-1, little endian) and tdest (byte 4). Tails are
+# read from the end of the frame. A sub-frame starting with the same 2 bytes as the
+# main header is a frame itself (tdest 1 holds the edge position and background).
+
+_TAIL_BYTES = 16
+
+# (start, stop) of each sub-frame in the frame, None if missing
+TTLayout = namedtuple('TTLayout', ['timing_bus', 'edge', 'background', 'prescaled', 'signature'])
+
+# parse_frames results, one entry per frame
+TTFrames = namedtuple('TTFrames', [
+    'edge_position',    # numpy array of int32, -1 if missing
+    'sequence_count',   # numpy array of uint8
+    'timing_bus',       # list of uint8 views or None
+    'background_frame', # list of uint8 views or None
+    'prescaled_frame',  # list of int8 views or None
+])
+
+def _as_uint8(frame):
+    if isinstance(frame, np.ndarray):
+        return frame.view(np.uint8).reshape(-1) if frame.dtype != np.uint8 or frame.ndim != 1 else frame
+    return np.frombuffer(frame, dtype=np.uint8)
+
+def _view(frame, span, dtype=None):
+    if span is None: return None
+    v = frame[span[0]:span[1]]
+    return v if dtype is None else v.view(dtype)
+
+def _subframe_table(b, begin, end, signature):
+    """ Returns [(tdest, start, stop), ...] of the sub-frames of the frame b[begin:end],
+    last sub-frame first. Positions of the bytes read are appended to signature."""
+    header_width = 2**((b[begin] >> 4) + 1)
+    nbytes = end - begin
+    table = []
+    parsed = header_width
+    stop = end - _TAIL_BYTES
+    signature.append(begin)
+    while stop >= begin:
+        size = b[stop] | (b[stop+1] << 8)
+        start = stop - size
+        signature.extend((stop, stop+1, stop+4))
+        if start < begin: break
+        table.append((b[stop+4], start, stop))
+        parsed += size + header_width
+        if nbytes < parsed + header_width: break
+        stop = start - _TAIL_BYTES
+    return table
+
+def _find(table, tdest):
+    for t, start, stop in table:
+        if t == tdest: return (start, stop)
+    return None
+
+def _tt_layout(b, nbytes):
+    """ Returns the TTLayout of the frame in memoryview b."""
+    signature = [1]
+    top = _subframe_table(b, 0, nbytes, signature)
+    edge = background = None
+    sub = _find(top, 1)
+    signature.extend((sub[0], sub[0]+1) if sub is not None and sub[1]-sub[0] >= 2 else ())
+    if sub is not None and sub[1]-sub[0] >= 2 and b[sub[0]] == b[0] and b[sub[0]+1] == b[1]:
+        table = _subframe_table(b, sub[0], sub[1], signature)
+        edge, background = _find(table, 0), _find(table, 1)
+    return TTLayout(_find(top, 0), edge, background, _find(top, 2), signature)
+
+def parse_frames(frames):
+    """ Parses a batch of timetool FEX frames.
+
+    frames is a 2-d uint8 array (one frame per row) or a list of 1-d arrays or
+    bytes. The layout is decoded once per group of frames sharing the size and
+    the tail bytes, and edge positions are gathered for the whole group at once.
+    Sub-frames are returned as views into the input frames.
+    """
+    if isinstance(frames, np.ndarray) and frames.ndim == 2:
+        groups = {frames.shape[1]: (frames.view(np.uint8), np.arange(len(frames)))}
+        rows = frames.view(np.uint8)
+    else:
+        rows = [_as_uint8(f) for f in frames]
+        by_size = {}
+        for i, f in enumerate(rows): by_size.setdefault(len(f), []).append(i)
+        groups = {n: (np.stack([rows[i] for i in idx]) if len(idx) > 1 else rows[idx[0]][None,:], np.array(idx))\
+                  for n, idx in by_size.items()}
+
+    nframes = len(rows)
+    edge_position = np.full(nframes, -1, dtype=np.int32)
+    sequence_count = np.zeros(nframes, dtype=np.uint8)
+    timing_bus, background, prescaled = [None]*nframes, [None]*nframes, [None]*nframes
+
+    for nbytes, (block, idx) in groups.items():
+        sequence_count[idx] = block[:,1]
+        todo = np.arange(len(idx))
+        while todo.size:
+            layout = _tt_layout(memoryview(block[todo[0]]), nbytes)
+            sig = np.array(layout.signature)
+            same = todo[np.all(block[todo][:,sig] == block[todo[0],sig], axis=1)]
+            todo = np.setdiff1d(todo, same, assume_unique=True)
+            if layout.edge is not None:
+                e = layout.edge[0]
+                edge_position[idx[same]] = block[same,e].astype(np.int32) + block[same,e+1].astype(np.int32)*256
+            for i in same:
+                frame = rows[idx[i]]
+                timing_bus[idx[i]] = _view(frame, layout.timing_bus)
+                background[idx[i]] = _view(frame, layout.background)
+                prescaled[idx[i]]  = _view(frame, layout.prescaled, np.int8)
+
+    return TTFrames(edge_position, sequence_count, timing_bus, background, prescaled)
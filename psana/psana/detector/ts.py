@@ -36,6 +36,55 @@ def _unpack(data):
              _to_word(data[38:40]),     # mps_limit
              _to_word(data[40:48]))     # mps_power_class
 
+# little-endian layout of the 48-byte timing header, bit-fields are split in _decode_headers
+_ts_header_dtype = np.dtype([('pulseId',         '<u8'),
+                             ('timestamp',       '<u8'),
+                             ('rate_markers',    '<u2'),
+                             ('time_slot',       '<u2'),
+                             ('ebeam',           '<u2'),
+                             ('ebeam_charge',    '<u2'),
+                             ('ebeam_energy',    '<u2', (4,)),
+                             ('photon_wavelength','<u2', (2,)),
+                             ('reserved3',       '<u2'),
+                             ('mps_limit',       '<u2'),
+                             ('mps_power_class', '<u8')])
+
+def _decode_headers(raw):
+    """Decodes timing headers from a uint8 array of shape (nbytes,) or (nevents, nbytes)
+    in one pass. Returns tuple of numpy arrays in the order of ts_ts_1_2_3 fields."""
+    raw = np.ascontiguousarray(raw, dtype=np.uint8)
+    hdr = raw[...,:_ts_header_dtype.itemsize].view(_ts_header_dtype)[...,0]
+    rates = hdr['rate_markers']
+    slot  = hdr['time_slot']
+    beam  = hdr['ebeam']
+    zeros = np.zeros_like(rates)
+    return ( hdr['pulseId'],
+             hdr['timestamp'],
+             rates & 0x3ff,                 # fixed rate
+             rates >> 10,                   # ac rate
+             slot & 0x7,                    # timeslot
+             slot >> 3,                     # phase
+             (beam & 0x1)==1,               # beam_present
+             zeros,                         # reserved1
+             (beam >> 4) & 0xf,             # beam_destn
+             zeros,                         # reserved2
+             hdr['ebeam_charge'],
+             hdr['ebeam_energy'][...,0],
+             hdr['ebeam_energy'][...,1],
+             hdr['ebeam_energy'][...,2],
+             hdr['ebeam_energy'][...,3],
+             hdr['photon_wavelength'][...,0],
+             hdr['photon_wavelength'][...,1],
+             zeros,                         # reserved3
+             hdr['mps_limit'],
+             hdr['mps_power_class'])
+
+def _eventcode_bits(seq):
+    """Expands sequencer uint16 words (..., nwords) to event-code flags (..., nwords*16),
+    event code i is bit i%16 of word i//16."""
+    seq = np.ascontiguousarray(seq, dtype='<u2')
+    return np.unpackbits(seq.view(np.uint8), axis=-1, bitorder='little').astype(bool)
+
 class ts_ts_1_2_3(DetectorImpl):
     def __init__(self, *args):
         super(ts_ts_1_2_3, self).__init__(*args)
@@ -81,9 +130,33 @@ class ts_ts_1_2_3(DetectorImpl):
         # seems reasonable to assume that all TS data comes from one segment
         data = segments[0].data
         #unpacked = self.bitstructure.unpack(data.tobytes())
-        unpacked = _unpack(data)
+        unpacked = [v.item() for v in _decode_headers(data)]
         return self.TsData(*unpacked)
 
+    def info_batch(self,events):
+        """Column-oriented timing information for a sequence of events.
+        Returns dict of numpy arrays with one row per event: the fields of info(),
+        'sequencer' words and 'eventcodes' flags as 2-d arrays, and 'valid'
+        which is False for events without timing data (their rows are zeros)."""
+        datas = []
+        for evt in events:
+            segments = self._segments(evt)
+            datas.append(None if segments is None else segments[0].data)
+
+        valid = np.array([d is not None for d in datas], dtype=bool)
+        nbytes = max([d.size for d in datas if d is not None], default=self.total_bytes)
+        raw = np.zeros((len(datas), max(nbytes, self.total_bytes)), dtype=np.uint8)
+        for i, d in enumerate(datas):
+            if d is not None: raw[i,:d.size] = d
+
+        columns = dict(zip(self.TsData._fields, _decode_headers(raw)))
+        seq = raw[:,self.total_bytes:]
+        seq = seq[:,:seq.shape[1]//2*2].view('<u2')
+        columns['sequencer'] = seq
+        columns['eventcodes'] = _eventcode_bits(seq)
+        columns['valid'] = valid
+        return columns
+
     def sequencer_info(self,evt):
         # check for missing data
         segments = self._segments(evt)
@@ -95,6 +168,12 @@ class ts_ts_1_2_3(DetectorImpl):
         seq = tmp.view('uint16')
         return seq
 
+    def eventcodes(self,evt):
+        """Returns array of bool flags, one per sequencer event code."""
+        seq = self.sequencer_info(evt)
+        if seq is None: return None
+        return _eventcode_bits(seq)
+
 
 class ts_ts_0_0_1(DetectorImpl):
     def __init__(self, *args):
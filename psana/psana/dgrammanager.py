@@ -2,12 +2,14 @@ import sys, os
 import time
 import getopt
 import pprint
+from collections import deque
 
 from shmem import PyShmemClient
 from psana import dgram
 from psana.event import Event
 from psana.detector import detectors
 from psana.psexp.event_manager import TransitionId
+from psana.psexp.prometheus_manager import PrometheusManager
 import numpy as np
 
 def dumpDict(dict,indent):
@@ -35,6 +37,54 @@ def _dgSize(view):
     txSize = 3 * 4              # sizeof(XtcData::TransitionBase)
     return txSize + np.array(view, copy=False).view(dtype=np.uint32)[iExt]
 
+# Shmem consumption settings:
+# PS_SHMEM_BATCH_SIZE: max. no. of buffers dequeued from the server at once
+# PS_SHMEM_DROP:       'block'  - serve every event; the server waits for
+#                                 buffers to be released (back-pressure)
+#                      'latest' - serve only the newest PS_SHMEM_KEEP events
+#                                 of each batch and return the others to the
+#                                 server right away
+SHMEM_DROP_POLICIES = ('block', 'latest')
+
+class ShmemBatch(object):
+    """ Dgrams dequeued together from a shmem server.
+
+    L1Accept dgrams are views on the server buffers (no copy) and are only
+    returned to the server by release(). Do not use the dgrams (or any
+    arrays taken from them) after release. Transitions are copied at dequeue
+    time and stay valid.
+    """
+
+    def __init__(self, shmem_cli, dgrams, buffers, run=None):
+        self.shmem_cli = shmem_cli
+        self.dgrams = dgrams
+        self._buffers = buffers # (index, size) of unreleased L1Accepts
+        self._run = run
+
+    def __len__(self):
+        return len(self.dgrams)
+
+    def __iter__(self):
+        return iter(self.dgrams)
+
+    def events(self):
+        for d in self.dgrams:
+            yield Event([d], run=self._run)
+
+    def release(self):
+        for index, size in self._buffers:
+            self.shmem_cli.freeByIndex(index, size)
+        self._buffers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+    def __del__(self):
+        if self._buffers: self.release()
+
 class DgramManager():
 
     def __init__(self, xtc_files, configs=[], fds=[], tag=None, run=None):
@@ -47,6 +97,15 @@ class DgramManager():
         self.configs = []
         self._timestamps = [] # built when iterating
         self._run = run
+        self.shmem_batch_size = int(os.environ.get('PS_SHMEM_BATCH_SIZE', '1'))
+        self.shmem_drop = os.environ.get('PS_SHMEM_DROP', 'block')
+        self.shmem_keep = int(os.environ.get('PS_SHMEM_KEEP', '1'))
+        assert self.shmem_keep > 0, 'PS_SHMEM_KEEP must be at least 1'
+        assert self.shmem_drop in SHMEM_DROP_POLICIES, \
+                'PS_SHMEM_DROP must be one of %s' % (SHMEM_DROP_POLICIES,)
+        self.shmem_served = 0  # no. of L1Accepts handed out
+        self.shmem_dropped = 0 # no. of L1Accepts returned unseen
+        self._shmem_queue = deque()
 
         if isinstance(xtc_files, (str)):
             self.xtc_files = np.array([xtc_files], dtype='U%s'%FN_L)
@@ -101,23 +160,11 @@ class DgramManager():
     def __next__(self):
         """ only support sequential read - no event building"""
         if self.shmem_cli:
-            view = self.shmem_cli.get(self.shmem_kwargs)
-            if view:
-                # Release shmem buffer after copying Transition data
-                if _service(view) != TransitionId.L1Accept:
-                    barray = bytes(view[:_dgSize(view)])
-                    self.shmem_cli.freeByIndex(self.shmem_kwargs['index'], self.shmem_kwargs['size'])
-                    view = memoryview(barray)
-                # use the most recent configure datagram
-                config = self.configs[len(self.configs)-1]
-                d = dgram.Dgram(config=config,view=view, \
-                                shmem_index=self.shmem_kwargs['index'], \
-                                shmem_size=self.shmem_kwargs['size'], \
-                                shmem_cli_cptr=self.shmem_kwargs['cli_cptr'], \
-                                shmem_cli_pyobj=self.shmem_cli)
-                dgrams = [d]
-            else:
+            if not self._shmem_queue:
+                self._shmem_queue.extend(self._get_shmem_dgrams(auto_release=True))
+            if not self._shmem_queue:
                 raise StopIteration
+            dgrams = [self._shmem_queue.popleft()]
         else:
             dgrams = [dgram.Dgram(config=config) for config in self.configs]
 
@@ -125,6 +172,70 @@ class DgramManager():
         self._timestamps += [evt.timestamp]
         return evt
 
+    def _get_shmem_dgrams(self, auto_release):
+        """ Dequeues a batch of shmem buffers and returns them as dgrams.
+
+        Transitions are copied and their buffers freed right away. With
+        auto_release, L1Accept buffers are freed when their Dgram is
+        deallocated, otherwise by the caller (see ShmemBatch).
+        Returns (dgrams, [(index, size)] of L1Accepts kept).
+        """
+        buffers = self.shmem_cli.get_batch(self.shmem_batch_size)
+
+        n_l1 = sum(1 for view, _, _ in buffers if _service(view) == TransitionId.L1Accept)
+        n_drop = 0
+        if self.shmem_drop == 'latest':
+            n_drop = max(0, n_l1 - self.shmem_keep)
+
+        dgrams, kept = [], []
+        for view, index, size in buffers:
+            if _service(view) != TransitionId.L1Accept:
+                barray = bytes(view[:_dgSize(view)])
+                self.shmem_cli.freeByIndex(index, size)
+                view = memoryview(barray)
+            elif n_drop > 0:
+                self.shmem_cli.freeByIndex(index, size)
+                n_drop -= 1
+                self.shmem_dropped += 1
+                continue
+            else:
+                kept.append((index, size))
+                self.shmem_served += 1
+
+            # use the most recent configure datagram
+            config = self.configs[len(self.configs)-1]
+            if auto_release:
+                d = dgram.Dgram(config=config,view=view, \
+                                shmem_index=index, \
+                                shmem_size=size, \
+                                shmem_cli_cptr=self.shmem_cli.cptr, \
+                                shmem_cli_pyobj=self.shmem_cli)
+            else:
+                d = dgram.Dgram(config=config,view=view)
+            dgrams.append(d)
+
+        if buffers:
+            self._count_shmem(n_l1, len(kept))
+        if auto_release:
+            return dgrams
+        return dgrams, kept
+
+    def _count_shmem(self, n_l1, n_kept):
+        metric = PrometheusManager.get_metric('psana_shmem_evts')
+        metric.labels('evts', 'served').inc(n_kept)
+        metric.labels('evts', 'dropped').inc(n_l1 - n_kept)
+
+    def next_shmem_batch(self):
+        """ Returns the next ShmemBatch (up to PS_SHMEM_BATCH_SIZE dgrams,
+        zero-copy, released explicitly) or None when the server is gone."""
+        assert self.shmem_cli, 'next_shmem_batch is only available in shmem mode'
+        dgrams, kept = self._get_shmem_dgrams(auto_release=False)
+        if not dgrams:
+            return None
+        for d in dgrams:
+            self._timestamps += [d.timestamp()]
+        return ShmemBatch(self.shmem_cli, dgrams, kept, run=self.run())
+
     def jump(self, offsets, sizes):
         """ Jumps to the offset and reads out dgram on each xtc file.
         This is used in normal mode (multiple detectors with MPI).
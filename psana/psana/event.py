@@ -23,7 +23,7 @@ class Event():
     def __init__(self, dgrams, run=None):
         self._dgrams = dgrams
         self._size = len(dgrams)
-        self._complete()
+        self._det_segments_cache = None
         self._position = 0
         self._run = run
 
@@ -44,6 +44,7 @@ class Event():
     def _replace(self, pos, d):
         assert pos < self._size
         self._dgrams[pos] = d
+        self._det_segments_cache = None
 
     def _to_bytes(self):
         event_bytes = bytearray()
@@ -98,11 +99,20 @@ class Event():
     def run(self):
         return self._run
 
+    @property
+    def _det_segments(self):
+        """ Nested dict {(det_name, drp_class_name): {segment: drp_class}} of
+        all data in this event. Built on first access only - Detector interfaces
+        normally use the segment map precomputed in Run._set_configinfo."""
+        if self._det_segments_cache is None:
+            self._assign_det_segments()
+        return self._det_segments_cache
+
     def _assign_det_segments(self):
         """
         """
 
-        self._det_segments = {}
+        det_segments = self._det_segments_cache = {}
         for evt_dgram in self._dgrams:
 
             if evt_dgram: # dgram can be None (missing) in an event
@@ -117,9 +127,9 @@ class Event():
                         for drp_class_name, drp_class in det.__dict__.items():
                             class_identifier = (det_name,drp_class_name)
                         
-                            if class_identifier not in self._det_segments.keys():
-                                self._det_segments[class_identifier] = {}
-                            segs = self._det_segments[class_identifier]
+                            if class_identifier not in det_segments.keys():
+                                det_segments[class_identifier] = {}
+                            segs = det_segments[class_identifier]
 
                             if det_name not in ['runinfo','smdinfo'] :
                                 msg = f'Found duplicate segment: {segment} in {segs} for {class_identifier}'
@@ -131,7 +141,7 @@ class Event():
     # this routine is called when all the dgrams have been inserted into
     # the event (e.g. by the eventbuilder calling _replace())
     def _complete(self):
-        self._assign_det_segments()
+        self._det_segments_cache = None
 
     @property
     def _has_offset(self):
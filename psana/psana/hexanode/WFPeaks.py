@@ -28,16 +28,22 @@ Usage ::
     pkvals = peaks.peak_values(wfs, wts)
     pkinds = peaks.peak_indexes(wfs, wts)
 
+    # batch of events, wfs.shape=(nevents, nchannels, nsamples), wts.shape=(nchannels, nsamples) or as wfs,
+    # channels are processed concurrently in the thread pool, output arrays have shape (nevents, nchannels[, nhits])
+    nhits, pkinds, pkvals, pktsec = peaks.proc_waveforms_batch(wfs, wts, nthreads=None)
+
 Created on 2019-11-07 by Mikhail Dubrovin
 """
 
 import logging
 logger = logging.getLogger(__name__)
 
+import os
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 import psana.pyalgos.generic.Utils as gu
 from psana.pyalgos.generic.NDArrUtils import print_ndarr
-from ndarray import wfpkfinder_cfd # from psana.pycalgos
+from ndarray import wfpkfinder_cfd, wfpkfinder_cfd_nogil # from psana.pycalgos
 from psana.hexanode.WFUtils import peak_finder_v2, peak_finder_v3
 from psana.hexanode.PyCFD import PyCFD
 
@@ -56,6 +62,8 @@ class WFPeaks :
 
         self.tbins = None # need it in V4 to convert _pktsec to _pkinds and _pkvals
 
+        self._pool = None # thread pool for proc_waveforms_batch, created on demand
+
 #----------
 
     def set_wf_peak_finder_parameters(self, **kwargs) :
@@ -195,6 +203,88 @@ class WFPeaks :
 
         self._wfs_old = wfs
 
+#----------
+
+    def _thread_pool(self, nthreads=None) :
+        nthreads = nthreads if nthreads else min(self.NUM_CHANNELS, os.cpu_count() or 1)
+        if self._pool is None or self._pool._max_workers != nthreads :
+            if self._pool is not None : self._pool.shutdown()
+            self._pool = ThreadPoolExecutor(max_workers=nthreads)
+        return self._pool
+
+#----------
+
+    def _proc_channel_batch(self, ch, wfsprep, wtsprep, std, nhits, pkinds, pkvals, pktsec) :
+        """Processes waveforms of channel ch for all events of the batch, fills output arrays in place.
+           Heavy parts (find_edges, scipy filters, numpy) release the GIL.
+        """
+        for iev in range(wfsprep.shape[0]) :
+            wf = wfsprep[iev,ch,:]
+            wt = wtsprep[iev,ch,:]
+            _pkvals = pkvals[iev,ch,:]
+            _pkinds = pkinds[iev,ch,:]
+
+            if self.VERSION == 3 :
+                npeaks = peak_finder_v3(wf, self.SIGMABINS, self.BASEBINS, self.NSTDTHR, self.GAPBINS, self.DEADBINS,\
+                                        _pkvals, _pkinds)[0]
+            elif self.VERSION == 2 :
+                npeaks = peak_finder_v2(wf, self.SIGMABINS, self.NSTDTHR*std[iev,ch], self.DEADBINS,\
+                                        _pkvals, _pkinds)
+            elif self.VERSION == 4 :
+                t_arr = np.array(self.PyCFDs[ch].CFD(wf,wt), dtype=np.double)
+                npeaks = min(t_arr.size, self.NUM_HITS)
+                pktsec[iev,ch,:npeaks] = t_arr[:npeaks]
+                # sample index of the hit time, the same as HBins(list(wt)).bin_indexes for V4
+                inds = np.searchsorted(wt, t_arr[:npeaks], side='right') - 1
+                _pkinds[:npeaks] = np.clip(inds, 0, wt.size-2)
+                _pkvals[:npeaks] = wf[_pkinds[:npeaks]]
+            else : # self.VERSION == 1
+                npeaks = wfpkfinder_cfd_nogil(wf, self.BASE, self.THR, self.CFR, self.DEADTIME, self.LEADINGEDGE,\
+                                              _pkvals, _pkinds)
+
+            nhits[iev,ch] = min(npeaks, self.NUM_HITS)
+
+#----------
+
+    def proc_waveforms_batch(self, wfs, wts, nthreads=None) :
+        """Batched version of proc_waveforms for a block of events.
+           - wfs - waveforms, shape=(nevents, NUM_CHANNELS, nsamples)
+           - wts - sample times, shape=(NUM_CHANNELS, nsamples) common for all events or the same as wfs
+           - nthreads - number of threads processing channels concurrently, default min(NUM_CHANNELS, ncpu)
+           Returns packed arrays nhits[nevents, NUM_CHANNELS] and pkinds, pkvals, pktsec[nevents, NUM_CHANNELS, NUM_HITS],
+           hits beyond nhits are zeros.
+        """
+        assert (wfs.ndim==3 and self.NUM_CHANNELS==wfs.shape[1]),\
+               'expected waveforms array shape (nevents, %d, nsamples)' % self.NUM_CHANNELS
+
+        nev = wfs.shape[0]
+        wts = np.broadcast_to(wts, wfs.shape)
+
+        # offset and std evaluation for all events and channels at once
+        std = wfs[:,:,self.IOFFSETBEG:self.IOFFSETEND].std(axis=2) if self.VERSION == 2 else None
+        if self.VERSION == 4 :
+            wfsprep = np.ascontiguousarray(wfs[:,:,self.WFBINBEG:self.WFBINEND], dtype=np.double)
+        else :
+            offsets = wfs[:,:,self.IOFFSETBEG:self.IOFFSETEND].mean(axis=2)
+            wfsprep = np.ascontiguousarray(wfs[:,:,self.WFBINBEG:self.WFBINEND] - offsets[:,:,np.newaxis], dtype=np.double)
+        wtsprep = wts[:,:,self.WFBINBEG:self.WFBINEND]
+
+        nhits  = np.zeros((nev, self.NUM_CHANNELS), dtype=np.int32)
+        pkvals = np.zeros((nev, self.NUM_CHANNELS, self.NUM_HITS), dtype=np.double)
+        pkinds = np.zeros((nev, self.NUM_CHANNELS, self.NUM_HITS), dtype=np.uint32)
+        pktsec = np.zeros((nev, self.NUM_CHANNELS, self.NUM_HITS), dtype=np.double)
+
+        pool = self._thread_pool(nthreads)
+        futures = [pool.submit(self._proc_channel_batch, ch, wfsprep, wtsprep, std, nhits, pkinds, pkvals, pktsec)\
+                   for ch in range(self.NUM_CHANNELS)]
+        for f in futures : f.result() # re-raises exceptions of worker threads
+
+        if self.VERSION != 4 :
+            mask = np.arange(self.NUM_HITS) < nhits[:,:,np.newaxis]
+            pktsec[mask] = np.take_along_axis(wtsprep, pkinds.astype(np.intp), axis=2)[mask] #sec
+
+        return nhits, pkinds, pkvals, pktsec
+
 #----------
 
     def waveforms_preprocessed(self, wfs, wts) :
@@ -245,7 +335,7 @@ class WFPeaks :
 #----------
 
     def __del__(self) :
-        pass
+        if getattr(self, '_pool', None) is not None : self._pool.shutdown(wait=False)
 
 #----------
 #----------
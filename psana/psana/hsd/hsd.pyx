@@ -16,6 +16,7 @@ cimport numpy as cnp
 cnp.import_array()
 
 import sys # ref count
+from libc.string cimport memcpy
 from amitypes import HSDWaveforms, HSDPeaks, HSDAssemblies
 
 ################# High Speed Digitizer #################
@@ -76,11 +77,89 @@ cdef class PyChannelPython:
             self.peakList.append(peak)
             self.startPosList.append(startPos)
 
+# (channel number, attribute name) of all possible channels, used when
+# the configuration does not list the channel fields
+_ALL_CHAN_NAMES = [(chanNum, 'chan{num:02d}'.format(num=chanNum)) for chanNum in range(16)] # Maximum channels: 16
+
+def _pack_fex_peaks(list entries):
+    """
+    Packs all fex peaks of the given channels into flat arrays.
+    entries is a list of (event index, segment, channel number, eventHeader, chan).
+    Peaks are counted in a first pass, so that every output array
+    is allocated once, and then copied in a second pass.
+    """
+    cdef ChannelPython chanpy
+    cdef unsigned startPos = 0
+    cdef unsigned peakLen = 0
+    cdef si.uint16_t* peakPtr = <si.uint16_t*>0
+    cdef Py_ssize_t npeaks = 0
+    cdef Py_ssize_t nsamples = 0
+    cdef Py_ssize_t ipeak = 0
+    cdef Py_ssize_t isample = 0
+    cdef cnp.ndarray[evthdr_t, ndim=1, mode="c"] evtheader
+    cdef cnp.ndarray[chan_t, ndim=1, mode="c"] chan
+
+    for entry in entries:
+        evtheader = entry[3]
+        chan = entry[4]
+        chanpy = ChannelPython(&evtheader[0], &chan[0])
+        while True:
+            peakLen = chanpy.next_peak(startPos, &peakPtr)
+            if not peakLen: break
+            npeaks += 1
+            nsamples += peakLen
+
+    cdef cnp.ndarray[cnp.int32_t,  ndim=1] events   = np.empty(npeaks, dtype=np.int32)
+    cdef cnp.ndarray[cnp.int32_t,  ndim=1] segments = np.empty(npeaks, dtype=np.int32)
+    cdef cnp.ndarray[cnp.int32_t,  ndim=1] channels = np.empty(npeaks, dtype=np.int32)
+    cdef cnp.ndarray[cnp.uint32_t, ndim=1] starts   = np.empty(npeaks, dtype=np.uint32)
+    cdef cnp.ndarray[cnp.uint32_t, ndim=1] lengths  = np.empty(npeaks, dtype=np.uint32)
+    cdef cnp.ndarray[cnp.int64_t,  ndim=1] offsets  = np.empty(npeaks, dtype=np.int64)
+    cdef cnp.ndarray[cnp.uint16_t, ndim=1, mode="c"] samples = np.empty(nsamples, dtype=np.uint16)
+
+    for entry in entries:
+        evtheader = entry[3]
+        chan = entry[4]
+        chanpy = ChannelPython(&evtheader[0], &chan[0])
+        while True:
+            peakLen = chanpy.next_peak(startPos, &peakPtr)
+            if not peakLen: break
+            events[ipeak]   = entry[0]
+            segments[ipeak] = entry[1]
+            channels[ipeak] = entry[2]
+            starts[ipeak]   = startPos
+            lengths[ipeak]  = peakLen
+            offsets[ipeak]  = isample
+            memcpy(&samples[isample], peakPtr, peakLen*sizeof(si.uint16_t))
+            ipeak += 1
+            isample += peakLen
+
+    return {'event': events, 'segment': segments, 'channel': channels,
+            'start': starts, 'length': lengths, 'offset': offsets, 'samples': samples}
+
 class hsd_hsd_1_2_3(cyhsd_base_1_2_3, DetectorImpl):
 
     def __init__(self, *args):
         DetectorImpl.__init__(self, *args)
         cyhsd_base_1_2_3.__init__(self)
+        self._chanNames = self._config_chan_names()
+
+    def _config_chan_names(self):
+        """
+        returns a dictionary with segment numbers as the key, and a list
+        of (channel number, attribute name) for the channel fields
+        declared in the configuration.
+        """
+        chanNames = {}
+        for config in self._configs:
+            if not hasattr(config,'software'): continue
+            if not hasattr(config.software,self._det_name): continue
+            for seg,seg_config in getattr(config.software,self._det_name).items():
+                if not hasattr(seg_config,self._drp_class_name): continue
+                fields = vars(getattr(seg_config,self._drp_class_name))
+                chanNames[seg] = [(chanNum,chanName) for chanNum,chanName in _ALL_CHAN_NAMES if chanName in fields] \
+                                 or _ALL_CHAN_NAMES
+        return chanNames
 
     # this routine is used by ami/data.py
     def _seg_chans(self):
@@ -114,6 +193,33 @@ cdef class cyhsd_base_1_2_3:
         self._peaksDict = {}
         self._evt = None
         self._hsdsegments = None
+        self._chanNames = {}
+        self._timesCache = {} # time axis by number of samples, fixed by the configuration
+
+    def _times(self, nsamples):
+        # FIXME: this needs to be put in units of seconds
+        # perhaps both for 5GHz and 6GHz models
+        times = self._timesCache.get(nsamples)
+        if times is None:
+            times = np.arange(nsamples)
+            times.flags.writeable = False # shared by all events
+            self._timesCache[nsamples] = times
+        return times
+
+    def _evt_chans(self, evt, iev=0):
+        """
+        returns list of (event index, segment, channel number, eventHeader, chan)
+        for all non-empty channels of the event.
+        """
+        entries = []
+        segments = self._segments(evt)
+        if segments is None: return entries
+        for iseg,seg in segments.items():
+            for chanNum,chanName in self._chanNames.get(iseg, _ALL_CHAN_NAMES):
+                chan = getattr(seg, chanName, None)
+                if chan is not None and chan.size > 0:
+                    entries.append((iev, iseg, chanNum, seg.eventHeader, chan))
+        return entries
 
     def _isNewEvt(self, evt):
         if self._evt == None or not (evt._nanoseconds == self._evt._nanoseconds and evt._seconds == self._evt._seconds):
@@ -127,26 +233,18 @@ cdef class cyhsd_base_1_2_3:
         self._fexPeaks = []
         self._hsdsegments = self._segments(evt)
         self._evt = evt
-        seglist = []
-        for iseg in self._hsdsegments:
-            seglist.append(iseg)
-            for chanNum in xrange(16): # Maximum channels: 16
-                chanName = 'chan'+'{num:02d}'.format(num=chanNum) # e.g. chan16
-                if hasattr(self._hsdsegments[iseg], chanName):
-                    chan = eval('self._hsdsegments[iseg].'+chanName)
-                    if chan.size > 0:
-                        pychan = PyChannelPython(self._hsdsegments[iseg].eventHeader, chan, self._hsdsegments[iseg])
-                        if pychan.waveform is not None:
-                            if iseg not in self._wvDict.keys():
-                                self._wvDict[iseg] = {}
-                                # FIXME: this needs to be put in units of seconds
-                                # perhaps both for 5GHz and 6GHz models
-                                self._wvDict[iseg]["times"] = np.arange(len(pychan.waveform))
-                            self._wvDict[iseg][chanNum] = pychan.waveform
-                        if pychan.peakList is not None:
-                            if iseg not in self._peaksDict.keys():
-                                self._peaksDict[iseg]={}
-                            self._peaksDict[iseg][chanNum] = (pychan.startPosList,pychan.peakList)
+        if self._hsdsegments is None: return
+        for iev,iseg,chanNum,evtheader,chan in self._evt_chans(evt):
+            pychan = PyChannelPython(evtheader, chan, self._hsdsegments[iseg])
+            if pychan.waveform is not None:
+                if iseg not in self._wvDict.keys():
+                    self._wvDict[iseg] = {}
+                    self._wvDict[iseg]["times"] = self._times(len(pychan.waveform))
+                self._wvDict[iseg][chanNum] = pychan.waveform
+            if pychan.peakList is not None:
+                if iseg not in self._peaksDict.keys():
+                    self._peaksDict[iseg]={}
+                self._peaksDict[iseg][chanNum] = (pychan.startPosList,pychan.peakList)
         # maybe check that we have all segments in the event?
         # FIXME: also check that we have all the channels we expect?
         # unclear how to flag this.  maybe return None to the user
@@ -190,6 +288,28 @@ cdef class cyhsd_base_1_2_3:
         else: 
             return self._peaksDict
 
+    def peaks_packed(self, evt):
+        """Return all fex peaks of the event as a dictionary of flat arrays,
+        one entry per peak, without per-peak python objects.
+        segment, channel: where the peak was found
+        start:            beginning of the peak in the raw waveform
+        length:           number of samples in the peak
+        offset:           beginning of the peak in samples
+        samples:          peak intensities of all peaks, concatenated
+        event:            always 0 (see peaks_packed_batch)
+        The arrays are empty if there are no peaks.
+        """
+        return _pack_fex_peaks(self._evt_chans(evt))
+
+    def peaks_packed_batch(self, events):
+        """The same as peaks_packed for a list of events, event is the
+        index of the event in the list.
+        """
+        entries = []
+        for iev,evt in enumerate(events):
+            entries += self._evt_chans(evt, iev)
+        return _pack_fex_peaks(entries)
+
 class hsd_raw_2_0_0(hsd_hsd_1_2_3):
 
     def __init__(self, *args):
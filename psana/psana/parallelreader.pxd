@@ -16,6 +16,7 @@ cdef struct Buffer:
     uint64_t seen_offset 
     uint64_t n_seen_events             
     uint64_t timestamp                   # ts of the last dgram
+    uint64_t found_endrun                # set when EndRun transition has been read
     uint64_t ts_arr[0x100000]            # dgram timestamps 
     uint64_t next_offset_arr[0x100000]   # their offset + size of dgram and payload
 
@@ -27,6 +28,7 @@ cdef class ParallelReader:
     cdef Buffer     *bufs
     cdef Buffer     *step_bufs
     cdef unsigned   L1Accept
+    cdef unsigned   EndRun
     cdef uint64_t   got                  # summing the size of new reads used by prometheus
     cdef uint64_t   chunk_overflown
 
@@ -14,6 +14,7 @@ cdef class ParallelReader:
         self.chunksize          = chunksize
         self.nfiles             = self.file_descriptors.shape[0]
         self.L1Accept           = 12
+        self.EndRun             = 5
         self.bufs               = <Buffer *>malloc(sizeof(Buffer) * self.nfiles)
         self.step_bufs          = <Buffer *>malloc(sizeof(Buffer)*self.nfiles)
         self.got                = 0
@@ -51,6 +52,7 @@ cdef class ParallelReader:
             buf.seen_offset     = 0     # offset of the event seen (yielded) so far
             buf.n_seen_events   = 0     # no. of seen events
             buf.timestamp       = 0       
+            buf.found_endrun    = 0
     
     @cython.boundscheck(False)
     cdef void just_read(self):
@@ -120,6 +122,8 @@ cdef class ParallelReader:
 
                         # check if this a non L1
                         service = (d.env>>24)&0xf
+                        if service == self.EndRun:
+                            buf.found_endrun = 1
                         if service != self.L1Accept:
                             memcpy(step_buf.chunk + step_buf.ready_offset, d, sizeof(Dgram) + payload)
                             step_buf.ts_arr[step_buf.n_ready_events] = buf.ts_arr[buf.n_ready_events]
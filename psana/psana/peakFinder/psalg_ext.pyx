@@ -13,6 +13,7 @@
 #------------------------------
 
 from libcpp.vector cimport vector
+cimport cython
 #from libcpp cimport bool
 
 from libc.time cimport time_t, ctime
@@ -364,7 +365,7 @@ cdef extern from "psalg/peaks/PeakFinderAlgosLCLS1.hh" namespace "psalg1":
                                ,const size_t& rank
 	                       ,const double& r0
 	                       ,const double& dr
-	                       ,const double& nsigm)
+	                       ,const double& nsigm) nogil
 
          void peakFinderV4r3[T](const T *data
                                ,const mask_t *mask
@@ -375,7 +376,7 @@ cdef extern from "psalg/peaks/PeakFinderAlgosLCLS1.hh" namespace "psalg1":
                                ,const size_t& rank
 	                       ,const double& r0
 	                       ,const double& dr
-                               )
+                               ) nogil
  
          void printParameters();
 
@@ -385,7 +386,7 @@ cdef extern from "psalg/peaks/PeakFinderAlgosLCLS1.hh" namespace "psalg1":
 
          const vector[Peak]& vectorOfPeaks()
 
-         const vector[Peak]& vectorOfPeaksSelected()
+         const vector[Peak]& vectorOfPeaksSelected() nogil
 
          void localMaxima    (extrim_t *arr2d, const size_t& rows, const size_t& cols)
 
@@ -395,6 +396,34 @@ cdef extern from "psalg/peaks/PeakFinderAlgosLCLS1.hh" namespace "psalg1":
 
 #------------------------------
 
+# one record per peak, fields in the order of py_peak.parameters() preceded by the event index
+cdef packed struct peak_record :
+    int32_t evt
+    int32_t seg
+    float row
+    float col
+    float npix
+    float amp_max
+    float amp_tot
+    float row_cgrav
+    float col_cgrav
+    float row_sigma
+    float col_sigma
+    float row_min
+    float row_max
+    float col_min
+    float col_max
+    float bkgd
+    float noise
+    float son
+
+peak_dtype = np.dtype([('evt', np.int32), ('seg', np.int32)] +\
+                      [(name, np.float32) for name in ('row', 'col', 'npix', 'amp_max', 'amp_tot',\
+                       'row_cgrav', 'col_cgrav', 'row_sigma', 'col_sigma',\
+                       'row_min', 'row_max', 'col_min', 'col_max', 'bkgd', 'noise', 'son')])
+
+#------------------------------
+
 cdef class peak_finder_algos :
     """ Python wrapper for C++ class. 
     """
@@ -423,19 +452,30 @@ cdef class peak_finder_algos :
     def print_attributes(self) : self.cptr.printParameters()
 
 
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
     def peak_finder_v3r3_d2(self\
                            ,nptype2d data\
                            ,np.ndarray[mask_t, ndim=2, mode="c"] mask\
                            ,const size_t& rank\
                            ,const double& r0\
                            ,const double& dr\
-                           ,const double& nsigm) :
-        self.cptr.peakFinderV3r3(&data[0,0], &mask[0,0], data.shape[0], data.shape[1], rank, r0, dr, nsigm)
-        self.rows = data.shape[0]
-        self.cols = data.shape[1]
-        return self.list_of_peaks_selected()
-
-
+                           ,const double& nsigm\
+                           ,return_array=False) :
+        """Returns list of selected peaks or, if return_array, their structured array (see peaks_selected_array).
+           GIL is released while the algorithm runs.
+        """
+        cdef size_t rows = data.shape[0]
+        cdef size_t cols = data.shape[1]
+        with nogil :
+            self.cptr.peakFinderV3r3(&data[0,0], &mask[0,0], rows, cols, rank, r0, dr, nsigm)
+        self.rows = rows
+        self.cols = cols
+        return self.peaks_selected_array() if return_array else self.list_of_peaks_selected()
+
+
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
     def peak_finder_v4r3_d2(self\
                            ,nptype2d data\
                            ,np.ndarray[mask_t, ndim=2, mode="c"] mask\
@@ -443,11 +483,18 @@ cdef class peak_finder_algos :
                            ,const double& thr_high
                            ,const size_t& rank\
                            ,const double& r0\
-                           ,const double& dr) :
-        self.cptr.peakFinderV4r3(&data[0,0], &mask[0,0], data.shape[0], data.shape[1], thr_low, thr_high, rank, r0, dr)
-        self.rows = data.shape[0]
-        self.cols = data.shape[1]
-        return self.list_of_peaks_selected()
+                           ,const double& dr\
+                           ,return_array=False) :
+        """Returns list of selected peaks or, if return_array, their structured array (see peaks_selected_array).
+           GIL is released while the algorithm runs.
+        """
+        cdef size_t rows = data.shape[0]
+        cdef size_t cols = data.shape[1]
+        with nogil :
+            self.cptr.peakFinderV4r3(&data[0,0], &mask[0,0], rows, cols, thr_low, thr_high, rank, r0, dr)
+        self.rows = rows
+        self.cols = cols
+        return self.peaks_selected_array() if return_array else self.list_of_peaks_selected()
 
 
     def list_of_peaks_selected(self) :
@@ -455,6 +502,41 @@ cdef class peak_finder_algos :
         return [py_peak.factory(p) for p in peaks]
 
 
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    def peaks_selected_array(self, int evt=0) :
+        """Returns selected peaks as numpy array of dtype peak_dtype, with event index evt.
+        """
+        cdef const vector[Peak]* peaks = &self.cptr.vectorOfPeaksSelected()
+        cdef size_t n = peaks.size()
+        arr = np.empty(n, dtype=peak_dtype)
+        cdef peak_record[:] out = arr
+        cdef size_t i
+        cdef const Peak* p
+        with nogil :
+            for i in range(n) :
+                p = &peaks[0][i]
+                out[i].evt       = evt
+                out[i].seg       = <int32_t>p.seg
+                out[i].row       = p.row
+                out[i].col       = p.col
+                out[i].npix      = p.npix
+                out[i].amp_max   = p.amp_max
+                out[i].amp_tot   = p.amp_tot
+                out[i].row_cgrav = p.row_cgrav
+                out[i].col_cgrav = p.col_cgrav
+                out[i].row_sigma = p.row_sigma
+                out[i].col_sigma = p.col_sigma
+                out[i].row_min   = p.row_min
+                out[i].row_max   = p.row_max
+                out[i].col_min   = p.col_min
+                out[i].col_max   = p.col_max
+                out[i].bkgd      = p.bkgd
+                out[i].noise     = p.noise
+                out[i].son       = p.son
+        return arr
+
+
     def list_of_peaks(self) :
         cdef vector[Peak] peaks = self.cptr.vectorOfPeaks()	
         return [py_peak.factory(p) for p in peaks]
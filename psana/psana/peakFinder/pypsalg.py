@@ -69,11 +69,24 @@ Usage::
     # data and mask are N-d numpy arrays or list of 2-d numpy arrays of the same shape    
     peaks = peaks_droplet(data, mask=None, thr_low, thr_high, rank=5, r0=7.0, dr=2.0, npix_min=1, npix_max=None, amax_thr=0, atot_thr=0, son_min=8)
 
+    # BATCH PEAKFINDERS
+    # =================
+
+    from psana.peakFinder.pypsalg import peaks_adaptive_batch, peaks_droplet_batch
+
+    # data is (n_events, n_segments, rows, cols) numpy array, mask is (n_segments, rows, cols) or None
+    # returns one structured numpy array of dtype peak_dtype (fields evt, seg, row, col, npix, ..., son)
+    # segments are processed in nthreads threads with GIL released
+    peaks = peaks_adaptive_batch(data, mask, rank=5, r0=7.0, dr=2.0, nsigm=3, npix_min=1, npix_max=None, amax_thr=0, atot_thr=0, son_min=8, nthreads=8)
+    peaks = peaks_droplet_batch(data, mask, thr_low, thr_high, rank=5, r0=7.0, dr=2.0, npix_min=1, npix_max=None, amax_thr=0, atot_thr=0, son_min=8, nthreads=8)
+    hits = np.bincount(peaks['evt'], minlength=data.shape[0]) # number of peaks per event
+
     # convert peaks (list of peak objects) to somethong else:
     from psalgos.pypsalgos import list_of_peak_parameters, numpy_2d_arr_of_peak_parameters
 
     lst_peak_pars = list_of_peak_parameters(peaks)         # returns list of tuples, where tuple consists of float peak parameters 
     arr_peak_pars = numpy_2d_arr_of_peak_parameters(peaks) # returns 2d numpy array of float peak parameters
+    # both also accept the structured array of batch peakfinders
 
 Created: 2017-08-10 by Mikhail Dubrovin
          2020-03-05 adapted as lcls/2psana/psana/peakFinder/pypsalg.py
@@ -81,9 +94,14 @@ Created: 2017-08-10 by Mikhail Dubrovin
 
 #------------------------------
 #from psalg_ext import peak_finder_algos
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import psalg_ext as algos
 import numpy as np
 
+peak_dtype = algos.peak_dtype # structured array record of batch peakfinders
+
 #------------------------------
 
 def shape_as_2d(sh) :
@@ -354,9 +372,107 @@ def peaks_droplet(data, mask, thr_low, thr_high, rank=5, r0=7.0, dr=2.0,\
 
 #------------------------------
 
+# thread pool and per thread algorithm objects (one per segment) shared by batch peakfinders
+_pool = None
+_pool_nthreads = 0
+_pool_lock = threading.Lock()
+_thread_algos = threading.local()
+
+
+def _get_pool(nthreads) :
+    global _pool, _pool_nthreads
+    with _pool_lock :
+        if _pool is None or _pool_nthreads != nthreads :
+            if _pool is not None : _pool.shutdown(wait=True)
+            _pool = ThreadPoolExecutor(max_workers=nthreads, thread_name_prefix='pypsalg')
+            _pool_nthreads = nthreads
+        return _pool
+
+
+def _thread_algo(seg, selection_pars) :
+    """Returns algorithm object for segment seg owned by the calling thread.
+    """
+    d = getattr(_thread_algos, 'algos', None)
+    if d is None : d = _thread_algos.algos = {}
+    o = d.get(seg, None)
+    if o is None : o = d[seg] = algos.peak_finder_algos(seg, pbits=0)
+    o.set_peak_selection_parameters(*selection_pars)
+    return o
+
+
+def _peaks_batch(method, data, mask, pars, rank, npix_min, npix_max, amax_thr, atot_thr, son_min, nthreads) :
+    """Runs peakfinder method on all (event, segment) 2-d arrays of data in a thread pool.
+       data is (n_events, n_segments, rows, cols), (n_segments, rows, cols) or (rows, cols) numpy array,
+       mask is None or numpy array of shape (n_segments, rows, cols) or (rows, cols) for all segments.
+       Returns numpy array of dtype peak_dtype sorted by event and segment.
+    """
+    if not isinstance(data, np.ndarray) or data.ndim < 2 or data.ndim > 4 :
+        raise IOError('pypsalg._peaks_batch: expected (n_events, n_segments, rows, cols) numpy array, got %s'\
+                      % (str(data.shape) if isinstance(data, np.ndarray) else str(type(data))))
+    data = np.ascontiguousarray(data.reshape((1,)*(4-data.ndim) + data.shape))
+    nevts, nsegs, rows, cols = data.shape
+
+    if mask is None :
+        mask = np.ones((1, rows, cols), dtype=np.uint16)
+    else :
+        mask = np.ascontiguousarray(mask, dtype=np.uint16)
+        mask = mask.reshape((-1, rows, cols))
+        if mask.shape[0] not in (1, nsegs) :
+            raise IOError('pypsalg._peaks_batch: mask shape %s does not match data shape %s' % (str(mask.shape), str(data.shape)))
+
+    _npix_max = npix_max if npix_max is not None else (2*rank+1)*(2*rank+1)
+    selection_pars = (npix_min, _npix_max, amax_thr, atot_thr, son_min)
+
+    def process(chunk) :
+        out = []
+        for i in chunk :
+            evt, seg = divmod(int(i), nsegs)
+            o = _thread_algo(seg, selection_pars)
+            m = mask[seg if mask.shape[0] > 1 else 0]
+            peaks = getattr(o, method)(data[evt,seg], m, *pars, return_array=True)
+            peaks['evt'] = evt
+            out.append(peaks)
+        return out
+
+    nthreads = nthreads if nthreads else min(nevts*nsegs, os.cpu_count() or 1)
+    indexes = np.arange(nevts*nsegs)
+    if nthreads < 2 :
+        results = [process(indexes)]
+    else :
+        # several chunks per thread for load balancing, in order of (event, segment)
+        results = _get_pool(nthreads).map(process, np.array_split(indexes, min(indexes.size, 4*nthreads)))
+    arrs = [a for chunk in results for a in chunk]
+    return np.concatenate(arrs) if arrs else np.empty(0, dtype=peak_dtype)
+
+#------------------------------
+
+def peaks_adaptive_batch(data, mask, rank=5, r0=7.0, dr=2.0, nsigm=5,\
+                         npix_min=1, npix_max=None, amax_thr=0, atot_thr=0, son_min=8, nthreads=None) :
+    """Adaptive peak finder (peak_finder_v3r3_d2) for a batch of events,
+       data is (n_events, n_segments, rows, cols) numpy array, mask is (n_segments, rows, cols) numpy array or None.
+       Segments are processed in nthreads threads (default - number of cpus) with GIL released.
+       Returns numpy array of dtype peak_dtype with event and segment indexes of each peak.
+    """
+    return _peaks_batch('peak_finder_v3r3_d2', data, mask, (rank, r0, dr, nsigm),\
+                        rank, npix_min, npix_max, amax_thr, atot_thr, son_min, nthreads)
+
+#------------------------------
+
+def peaks_droplet_batch(data, mask, thr_low, thr_high, rank=5, r0=7.0, dr=2.0,\
+                        npix_min=1, npix_max=None, amax_thr=0, atot_thr=0, son_min=8, nthreads=None) :
+    """Droplet peak finder (peak_finder_v4r3_d2) for a batch of events, see peaks_adaptive_batch.
+    """
+    return _peaks_batch('peak_finder_v4r3_d2', data, mask, (thr_low, thr_high, rank, r0, dr),\
+                        rank, npix_min, npix_max, amax_thr, atot_thr, son_min, nthreads)
+
+#------------------------------
+
 def list_of_peak_parameters(peaks) :
-    """Converts list of peak objects to the (old style) list of peak parameters.
+    """Converts list of peak objects or structured array of batch peakfinders to the (old style) list of peak parameters.
     """    
+    if isinstance(peaks, np.ndarray) :
+        names = peaks.dtype.names[1:] # skip evt
+        return [tuple(float(p[name]) for name in names) for p in peaks]
     return [p.parameters() for p in peaks]
 
 #------------------------------
@@ -364,7 +480,9 @@ def list_of_peak_parameters(peaks) :
 def numpy_2d_arr_of_peak_parameters(peaks) :
     """Converts list of peak objects to the (old style) numpy array of peak parameters.
     """    
-    return np.array(list_of_peak_parameters(peaks), dtype=np.float)
+    if isinstance(peaks, np.ndarray) :
+        return np.array([peaks[name] for name in peaks.dtype.names[1:]], dtype=np.float64).T.copy()
+    return np.array(list_of_peak_parameters(peaks), dtype=np.float64)
 
 #------------------------------
 #------------------------------
@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 
 """ det_raw_dark_proc -e amox23616 -r 104 -d xtcav -o nda.expand -f <input-file.xtc2> -p
+    mpirun -n 8 det_raw_dark_proc -e amox23616 -r 104 -d xtcav -x <xtc-dir> -P
 """
 #----------
 
@@ -30,6 +31,7 @@ def argument_parser():
     d_runnum = 104
     d_dnames = 'xtcav' # 'CxiDs2.0:Cspad.0,xtcav' or list of names
     d_ifname = '/reg/g/psdm/detector/data2_test/xtc/data-amox23616-r0104-e000400-xtcav-v2.xtc2'
+    d_dirxtc = None
     d_ofname = 'nda-#exp-#run-#src-#evts-#type-#date-#time.txt' #-#sec-#nsec
     d_events = 1000
     d_evskip = 0
@@ -47,12 +49,14 @@ def argument_parser():
     d_plotim = 0      
     d_savebw = 0o377
     d_addcdb = False
+    d_parallel = False
     d_loglev = 'DEBUG'
    
     h_expnam='dataset name, default = %s' % d_expnam
     h_runnum='run number, default = %s' % d_runnum
     h_dnames='comma-separated detector names for processing, default = %s' % d_dnames
     h_ifname='input file name, default = %s' % d_ifname
+    h_dirxtc='directory with xtc2 files for parallel processing, default = %s' % d_dirxtc
     h_ofname='output file name template, default = %s' % d_ofname
     h_events='number of events to collect, default = %s' % d_events
     h_evskip='number of events to skip, default = %s' % d_evskip
@@ -70,6 +74,7 @@ def argument_parser():
     h_plotim='control bit-word to plot images, default = %s' % d_plotim
     h_savebw='control bit-word to save arrays, default = %s' % d_savebw
     h_addcdb='add constants to the calibration data base, default = %s' % d_addcdb
+    h_parallel='read run from experiment directory, in parallel under mpirun, default = %s' % d_parallel
     h_loglev='logging level name, one of %s, default = %s' % (STR_LEVEL_NAMES, str(d_loglev))
 
     parser = argparse.ArgumentParser(description=usage(1), usage=usage())
@@ -82,6 +87,7 @@ def argument_parser():
     parser.add_argument('-r', '--runnum', default=d_runnum, type=int,   help=h_runnum)
     parser.add_argument('-d', '--dnames', default=d_dnames, type=str,   help=h_dnames)
     parser.add_argument('-f', '--ifname', default=d_ifname, type=str,   help=h_ifname)
+    parser.add_argument('-x', '--dirxtc', default=d_dirxtc, type=str,   help=h_dirxtc)
     parser.add_argument('-o', '--ofname', default=d_ofname, type=str,   help=h_ofname)
     parser.add_argument('-n', '--events', default=d_events, type=int,   help=h_events)
     parser.add_argument('-m', '--evskip', default=d_evskip, type=int,   help=h_evskip)
@@ -99,6 +105,7 @@ def argument_parser():
     parser.add_argument('-p', '--plotim', default=d_plotim, type=int,   help=h_plotim)
     parser.add_argument('-S', '--savebw', default=d_savebw, type=int,   help=h_savebw)
     parser.add_argument('-A', '--addcdb', default=d_addcdb,             help=h_addcdb, action='store_true')
+    parser.add_argument('-P', '--parallel', default=d_parallel,         help=h_parallel, action='store_true')
     parser.add_argument('-l', '--loglev', default=d_loglev, type=str,   help=h_loglev)
  
     return parser
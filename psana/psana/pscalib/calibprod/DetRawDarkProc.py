@@ -100,7 +100,7 @@ def fname_template(orun, detname, ofname, nevts, tsec=None, tnsec=None):
 
 class DetRawDarkProc:
 
-    def __init__(self, orun, detname, args):
+    def __init__(self, orun, detname, args, nworkers=1):
 
         self.args    = args
         self.orun    = orun
@@ -124,7 +124,8 @@ class DetRawDarkProc:
         self.rmsnlo = args.rmsnlo
         self.rmsnhi = args.rmsnhi
 
-        self.evstg1 = max(self.events*0.05, 5)
+        self.nworkers = nworkers # number of BigData ranks sharing the events, 1 for serial processing
+        self.evstg1 = max(self.events*0.05/nworkers, 5)
         self.nsigma = args.nsigma
         self.addcdb = args.addcdb
 
@@ -135,6 +136,7 @@ class DetRawDarkProc:
         self.shape   = None
         self.counter = 0
         self.stage   = 0
+        self._shared_gates = None # stage-2 gates of parallel processing
 
         self.print_attrs()
         logger.info('Begin processing')
@@ -147,6 +149,7 @@ class DetRawDarkProc:
             + '\nnumber of events to collect     : %d'   % self.events\
             + '\nnumber of events to skip        : %d'   % self.evskip\
             + '\nnumber of events for stage 1    : %d'   % self.evstg1\
+            + '\nnumber of parallel workers      : %d'   % self.nworkers\
             + '\nnumber of sigma intensity range : %.3f' % self.nsigma\
             + '\ncontrol bit-word to plot images : %d'   % self.plotim\
             + '\ncontrol bit-word to save arrays : %d'   % self.savebw\
@@ -235,11 +238,14 @@ class DetRawDarkProc:
 
         self.gate_lo    = self.arr1 * self.int_lo
         self.gate_hi    = self.arr1 * self.int_hi
+        self.raw_dtype  = ndaraw.dtype
 
         if self.savebw & 16: self.arr_max = np.zeros(self.shape, dtype=ndaraw.dtype)
         if self.savebw & 32: self.arr_min = np.ones (self.shape, dtype=ndaraw.dtype) * 0xffff
 
         self.stage = 1
+        if self._shared_gates is not None: # stage 2 was started by the other ranks
+            self._set_stage2_gates(*self._shared_gates, dtype=ndaraw.dtype)
         
         return True
 
@@ -285,28 +291,41 @@ class DetRawDarkProc:
 
         if self.stage & 2: return
         if self.counter < self.evstg1: return
+        if self.nworkers > 1: return # gates are shared by init_stage2_shared
  
         t0_sec = time()
+        gate_lo, gate_hi = self._stage2_gates(self.arr_sum0, self.arr_sum1, self.arr_sum2, self.counter)
+        self._set_stage2_gates(gate_lo, gate_hi, ndaraw.dtype)
+        logger.info('Stage 2 initialization for %s consumes dt=%7.3f sec' % (self.detname, time()-t0_sec))
 
-        arr_av1 = divide_protected(self.arr_sum1, self.arr_sum0)
-        arr_av2 = divide_protected(self.arr_sum2, self.arr_sum0)
+
+    def _stage2_gates(self, arr_sum0, arr_sum1, arr_sum2, counter):
+        """Returns stage-2 intensity gates evaluated from stage-1 sums.
+        """
+        arr_av1 = divide_protected(arr_sum1, arr_sum0)
+        arr_av2 = divide_protected(arr_sum2, arr_sum0)
 
         arr_rms = np.sqrt(arr_av2 - np.square(arr_av1))
         rms_ave = arr_rms.mean()
 
         gate_half = self.nsigma*rms_ave
 
-        logger.info('%s\nBegin stage 2 for %s after %d events' % (80*'_', self.detname, self.counter))
+        logger.info('%s\nBegin stage 2 for %s after %d events' % (80*'_', self.detname, counter))
         logger.info('  mean rms=%.3f x %.1f = intensity gate= +/- %.3f around pixel average intensity' %\
                   (rms_ave, self.nsigma, gate_half))
 
         #print_ndarr(arr_av1, 'arr_av1')
 
-        self.gate_hi = np.minimum(arr_av1 + gate_half, self.arr1*self.int_hi)
-        self.gate_lo = np.maximum(arr_av1 - gate_half, self.arr1*self.int_lo)
+        arr1 = np.ones(arr_sum0.shape, dtype=np.int64)
+        gate_hi = np.minimum(arr_av1 + gate_half, arr1*self.int_hi)
+        gate_lo = np.maximum(arr_av1 - gate_half, arr1*self.int_lo)
+        return gate_lo, gate_hi
 
-        self.gate_hi = np.array(self.gate_hi, dtype=ndaraw.dtype)
-        self.gate_lo = np.array(self.gate_lo, dtype=ndaraw.dtype)
+
+    def _set_stage2_gates(self, gate_lo, gate_hi, dtype):
+
+        self.gate_hi = np.array(gate_hi, dtype=dtype)
+        self.gate_lo = np.array(gate_lo, dtype=dtype)
 
         self.arr_sum0 = np.zeros(self.shape, dtype=np.int64)
         self.arr_sum1 = np.zeros(self.shape, dtype=np.double)
@@ -314,7 +333,84 @@ class DetRawDarkProc:
 
         self.stage = 2
 
-        logger.info('Stage 2 initialization for %s consumes dt=%7.3f sec' % (self.detname, time()-t0_sec))
+
+    def stage1_done(self):
+        """Returns True when this process has collected its share of stage-1 events or is in stage 2.
+        """
+        return bool(self.stage & 2) or self.counter >= self.evstg1
+
+
+    def init_stage2_shared(self, comm):
+        """Collective over comm: sums stage-1 statistics of all ranks and switches every rank
+           to stage 2 with the same gates. Ranks which have not seen data yet apply the gates
+           when their first event arrives.
+        """
+        t0_sec = time()
+        sums = None if self.shape is None else (self.arr_sum0, self.arr_sum1, self.arr_sum2, self.counter)
+        sums = comm.allreduce(sums, op=merge_sums)
+        if sums is None: return # no data on any rank
+        self._shared_gates = self._stage2_gates(*sums)
+        if self.shape is not None:
+            self._set_stage2_gates(*self._shared_gates, dtype=self.raw_dtype)
+        logger.info('Shared stage 2 initialization for %s over %d ranks consumes dt=%7.3f sec' %\
+                    (self.detname, comm.Get_size(), time()-t0_sec))
+
+
+    def partial_stats(self):
+        """Returns dict of per-pixel partial statistics accumulated by this process for MPI reduction.
+           Stage-2 sums are converted to count/mean/M2 for the Welford/Chan combination in merge_stats.
+        """
+        if self.shape is None: return None
+        if not self.stage & 2:
+            raise RuntimeError('partial statistics of %s requested in stage %d, init_stage2_shared was not called'%\
+                               (self.detname, self.stage))
+        n    = self.arr_sum0
+        mean = divide_protected(self.arr_sum1, n)
+        m2   = np.maximum(self.arr_sum2 - n*np.square(mean), 0)
+        return {'shape'     : self.shape,
+                'counter'   : self.counter,
+                'ev1_time'  : (self.ev1_sec, self.ev1_nsec),
+                'n'         : n,
+                'mean'      : mean,
+                'm2'        : m2,
+                'sta_int_lo': self.sta_int_lo,
+                'sta_int_hi': self.sta_int_hi,
+                'arr_max'   : getattr(self, 'arr_max', None),
+                'arr_min'   : getattr(self, 'arr_min', None),
+               }
+
+
+    def set_partial_stats(self, d):
+        """Loads merged statistics returned by merge_stats, converting count/mean/M2 back to stage-2 sums.
+        """
+        if d is None: return
+        if self.shape is None:
+            self.shape = d['shape']
+            self.arr0  = np.zeros(self.shape, dtype=np.int64)
+            self.arr1  = np.ones (self.shape, dtype=np.int64)
+            self.stage = 2
+        self.counter = d['counter']
+        self.ev1_sec, self.ev1_nsec = d['ev1_time']
+        self.arr_sum0   = d['n']
+        self.arr_sum1   = d['mean']*d['n']
+        self.arr_sum2   = d['m2'] + d['n']*np.square(d['mean'])
+        self.sta_int_lo = d['sta_int_lo']
+        self.sta_int_hi = d['sta_int_hi']
+        if d['arr_max'] is not None: self.arr_max = d['arr_max']
+        if d['arr_min'] is not None: self.arr_min = d['arr_min']
+
+
+    def reduce_stats(self, comm, root=0):
+        """Merges partial statistics of all ranks in comm on the root rank.
+           Returns True on the root rank, which is expected to call summary.
+        """
+        t0_sec = time()
+        merged = comm.reduce(self.partial_stats(), op=merge_stats, root=root)
+        if comm.Get_rank() != root: return False
+        self.set_partial_stats(merged)
+        logger.info('MPI reduction of statistics for %s over %d ranks consumes dt=%7.3f sec'%\
+                    (self.detname, comm.Get_size(), time()-t0_sec))
+        return True
 
 
     def summary(self, evt):
@@ -437,6 +533,72 @@ class DetRawDarkProc:
 
 #----------
 
+def merge_stats(a, b):
+    """Combines two dicts of partial statistics from DetRawDarkProc.partial_stats
+       using the Chan et al. parallel variant of Welford's algorithm.
+       Either argument can be None for ranks which have not seen any data.
+    """
+    if a is None: return b
+    if b is None: return a
+
+    na, nb = a['n'], b['n']
+    n = na + nb
+    delta = b['mean'] - a['mean']
+    fb = divide_protected(np.array(nb, dtype=np.double), n)
+
+    arr_max = None if a['arr_max'] is None else np.maximum(a['arr_max'], b['arr_max'])
+    arr_min = None if a['arr_min'] is None else np.minimum(a['arr_min'], b['arr_min'])
+
+    return {'shape'     : a['shape'],
+            'counter'   : a['counter'] + b['counter'],
+            'ev1_time'  : min(a['ev1_time'], b['ev1_time']),
+            'n'         : n,
+            'mean'      : a['mean'] + delta*fb,
+            'm2'        : a['m2'] + b['m2'] + np.square(delta)*na*fb,
+            'sta_int_lo': a['sta_int_lo'] + b['sta_int_lo'],
+            'sta_int_hi': a['sta_int_hi'] + b['sta_int_hi'],
+            'arr_max'   : arr_max,
+            'arr_min'   : arr_min,
+           }
+
+def merge_sums(a, b):
+    """Adds two tuples of stage-1 sums (sum0, sum1, sum2, counter), either can be None.
+    """
+    if a is None: return b
+    if b is None: return a
+    return tuple(x + y for x, y in zip(a, b))
+
+#----------
+
+def skip_events(nskip):
+    """Returns a DataSource filter callback which rejects the first nskip L1Accept events,
+       as the serial loop skips them. Event builders each count their own events,
+       so the skip is global only with a single event builder core (PS_SMD_NODES=1).
+    """
+    from psana.psexp.TransitionId import TransitionId
+    count = [0]
+    def accept(evt):
+        if evt.service() != TransitionId.L1Accept: return True
+        count[0] += 1
+        return count[0] > nskip
+    return accept
+
+#----------
+
+def bd_worker_comm(run):
+    """Returns (comm, size) for BigData ranks of RunParallel, (None, 1) for serial runs.
+       Must be called by all psana ranks, comm is MPI.COMM_NULL on smd0/smd/srv ranks.
+    """
+    comms = getattr(run, 'comms', None)
+    if comms is None: return None, 1
+    from mpi4py import MPI
+    size = comms.bd_group().Get_size()
+    if comms.bd_main_comm == MPI.COMM_NULL: return MPI.COMM_NULL, size # smd0 and srv ranks
+    color = 0 if comms.node_type() == 'bd' else MPI.UNDEFINED
+    return comms.bd_main_comm.Split(color, comms.bd_main_rank), size
+
+#----------
+
 def detectors_dark_proc(parser):
 
     args = parser.parse_args()
@@ -449,7 +611,15 @@ def detectors_dark_proc(parser):
     logger.info('Raw data processing of exp: %s run: %d for detector(s): %s' % (args.expnam, args.runnum, args.dnames))
     logger.info('input file: %s' % (args.ifname))
 
-    ds = DataSource(files=args.ifname)
+    if args.parallel:
+        # RunParallel under mpirun, events are distributed over BigData ranks
+        if EVSKIP and int(os.environ.get('PS_SMD_NODES', 1)) > 1:
+            raise ValueError('skipping events in parallel mode requires PS_SMD_NODES=1')
+        kwa = {'filter': skip_events(EVSKIP)} if EVSKIP else {}
+        ds = DataSource(exp=args.expnam, run=args.runnum, dir=args.dirxtc, max_events=EVENTS, **kwa)
+        EVSKIP = 0 # skipped by the event builder
+    else:
+        ds = DataSource(files=args.ifname)
     run = next(ds.runs())
     logger.info('\t RunInfo expt: %s runnum: %d\n' % (run.expt, run.runnum))
 
@@ -461,12 +631,20 @@ def detectors_dark_proc(parser):
     #sys.exit('TEST EXIT')
     ###==================
 
-    lst_dpo = [DetRawDarkProc(run, dname, args) for dname in args.dnames.split(',')]
+    comm, nworkers = bd_worker_comm(run)
+    if comm is not None:
+        from mpi4py import MPI
+        if comm == MPI.COMM_NULL: comm = None
+        logger.info('Parallel processing on %d BigData ranks' % nworkers)
+
+    lst_dpo = [DetRawDarkProc(run, dname, args, nworkers) for dname in args.dnames.split(',')]
 
     #ecm = EventCodeManager(evcode, verbos)
            
     t0_sec = time()
     tdt = t0_sec
+    i, evt = 0, None
+    stage2 = False # parallel: stage-2 gates shared by all BigData ranks
 
     for i,evt in enumerate(run.events()):
         if i<EVSKIP: continue
@@ -474,13 +652,24 @@ def detectors_dark_proc(parser):
         #if not ecm.select(evt): continue 
 
         for dpo in lst_dpo: dpo.event(evt)
+        if comm is not None and not stage2 and all(dpo.stage1_done() for dpo in lst_dpo):
+            for dpo in lst_dpo: dpo.init_stage2_shared(comm)
+            stage2 = True
         if do_print(i):
             tsec = time()
             dt   = tsec - tdt
             tdt  = tsec
             logger.info('  Event: %4d,  time=%7.3f sec,  dt=%5.3f sec' % (i, time()-t0_sec, dt))
 
-    for dpo in lst_dpo: dpo.summary(evt)
+    if nworkers > 1:
+        if comm is None: return # smd0/smd/srv ranks do not hold statistics
+        if not stage2: # this rank ran out of events in stage 1
+            for dpo in lst_dpo: dpo.init_stage2_shared(comm)
+        for dpo in lst_dpo:
+            if dpo.reduce_stats(comm): dpo.summary(evt)
+        if comm.Get_rank() != 0: return
+    else:
+        for dpo in lst_dpo: dpo.summary(evt)
 
     logger.info('%s\n Processed %d events, consumed time = %f sec.' % (80*'_', i, time()-t0_sec))
 
@@ -1,20 +1,33 @@
 import weakref
 import os
-import glob
+import fnmatch
 import abc
 import numpy as np
 import pathlib
 
 from psana.dgrammanager import DgramManager
-from psana.smalldata import SmallData
 
 from psana.psexp.prometheus_manager import PrometheusManager
+from psana.psexp.tools import startup_timer
 import threading
 import logging
 
 class InvalidFileType(Exception): pass
 class XtcFileNotFound(Exception): pass
 
+
+def _list_dir(path):
+    """ Returns names of regular files in path (non-hidden, as glob would).
+    One listing per _setup_xtcs call replaces the per-run globs and isfile
+    calls, which are slow on shared file systems. Listings are not kept
+    between calls, so runs written since are found by later DataSources."""
+    try:
+        with os.scandir(path) as it:
+            return [entry.name for entry in it \
+                    if not entry.name.startswith('.') and entry.is_file()]
+    except FileNotFoundError:
+        return []
+
 class DataSourceBase(abc.ABC):
     filter      = 0         # callback that takes an evt and return True/False.
     batch_size  = 1         # length of batched offsets
@@ -58,13 +71,21 @@ class DataSourceBase(abc.ABC):
             if not self.live:
                 os.environ['PS_SMD_MAX_RETRIES'] = '0' # do not retry when not in live mode
             else:
-                os.environ['PS_SMD_MAX_RETRIES'] = '30'
+                # no. of PS_SMD_SLEEP_SECS intervals without new data before
+                # giving up - the run normally ends with the EndRun transition.
+                os.environ['PS_SMD_MAX_RETRIES'] = os.environ.get('PS_SMD_LIVE_MAX_RETRIES', '30')
 
         assert self.batch_size > 0
         
         self.prom_man = PrometheusManager(os.environ['PS_PROMETHEUS_JOBID'])
+        self.prom_man.get_metric('psana_timestamp').labels('psana_init').set(startup_timer.t0)
         
 
+    def startup_report(self):
+        """ Returns a text report with time spent in each startup phase
+        of this process."""
+        return startup_timer.report()
+
     def events(self):
         for run in self.runs():
             for evt in run.events(): yield evt
@@ -79,6 +100,10 @@ class DataSourceBase(abc.ABC):
     #    return
     
     def _setup_xtcs(self):
+        with startup_timer.phase('setup xtcs'):
+            return self._setup_xtcs_impl()
+
+    def _setup_xtcs_impl(self):
         exp = None
         run_dict = {} # stores list of runs with corresponding xtc_files, smd_files, and epic file
 
@@ -123,19 +148,25 @@ class DataSourceBase(abc.ABC):
                 xtc_dir = os.environ.get('SIT_PSDM_DATA', '/reg/d/psdm')
                 xtc_path = os.path.join(xtc_dir, self.exp[:3], self.exp, 'xtc')
 
+            smd_dir = os.path.join(xtc_path, 'smalldata')
+            with startup_timer.phase('list xtc dirs'):
+                xtc_names = _list_dir(xtc_path)
+                smd_names = _list_dir(smd_dir)
+
             # Get a list of runs (or just one run if user specifies it) then
             # setup corresponding xtc_files and smd_files for each run in run_dict
             run_list = []
             if self.run_num > -1:
                 run_list = [self.run_num]
             else:
-                run_list = [int(os.path.splitext(os.path.basename(_dummy))[0].split('-r')[1].split('-')[0]) \
-                        for _dummy in glob.glob(os.path.join(xtc_path, '*-r*.xtc2'))]
+                run_list = [int(os.path.splitext(_dummy)[0].split('-r')[1].split('-')[0]) \
+                        for _dummy in fnmatch.filter(xtc_names, '*-r*.xtc2')]
                 run_list.sort()
 
-            smd_dir = os.path.join(xtc_path, 'smalldata')
+            xtc_name_set = set(xtc_names)
             for r in run_list:
-                all_smd_files = glob.glob(os.path.join(smd_dir, '*r%s-s*.smd.xtc2'%(str(r).zfill(4))))
+                all_smd_files = [os.path.join(smd_dir, name) for name in \
+                        fnmatch.filter(smd_names, '*r%s-s*.smd.xtc2'%(str(r).zfill(4)))]
                 if self.detectors:
                     # Create a dgrammanager to access the configs. This will be
                     # done on only core 0.
@@ -149,9 +180,9 @@ class DataSourceBase(abc.ABC):
                 xtc_files = [os.path.join(xtc_path, \
                              os.path.basename(smd_file).split('.smd')[0] + '.xtc2') \
                              for smd_file in smd_files \
-                             if os.path.isfile(os.path.join(xtc_path, \
-                             os.path.basename(smd_file).split('.smd')[0] + '.xtc2'))]
-                all_files = glob.glob(os.path.join(xtc_path, '*r%s-*.xtc2'%(str(r).zfill(4))))
+                             if os.path.basename(smd_file).split('.smd')[0] + '.xtc2' in xtc_name_set]
+                all_files = [os.path.join(xtc_path, name) for name in \
+                        fnmatch.filter(xtc_names, '*r%s-*.xtc2'%(str(r).zfill(4)))]
                 other_files = [f for f in all_files if f not in xtc_files]
                 run_dict[r] = (xtc_files, smd_files, other_files)
         
@@ -159,17 +190,26 @@ class DataSourceBase(abc.ABC):
 
 
     def smalldata(self, **kwargs):
+        # h5py (and mpi4py) are only needed when smalldata is used
+        from psana.smalldata import SmallData
         return SmallData(**self.smalldata_kwargs, **kwargs)
 
-    def _start_prometheus_client(self, mpi_rank=0):
+    def _start_prometheus_client(self, mpi_rank=0, comm=None):
+        """ comm (all ranks that call this) is only used when metrics
+        are aggregated (PS_PROMETHEUS_MODE=aggregate)."""
         if not self.monitor:
             logging.debug('not monitoring performance with prometheus')
         else:
             logging.debug('START PROMETHEUS CLIENT (JOBID:%s RANK: %d)'%(self.prom_man.jobid, mpi_rank))
+            prom_comm = None
+            if self.prom_man.mode == 'aggregate' and comm is not None:
+                # own communicator so that metric messages never match
+                # receives posted by the data flow
+                prom_comm = comm.Dup()
             self.e = threading.Event()
             self.t = threading.Thread(name='PrometheusThread%s'%(mpi_rank),
                     target=self.prom_man.push_metrics,
-                    args=(self.e, mpi_rank),
+                    args=(self.e, mpi_rank, prom_comm),
                     daemon=True)
             self.t.start()
 
@@ -179,4 +219,7 @@ class DataSourceBase(abc.ABC):
 
         logging.debug('END PROMETHEUS CLIENT (JOBID:%s RANK: %d)'%(self.prom_man.jobid, mpi_rank))
         self.e.set()
+        if self.prom_man.mode != 'push':
+            # wait for the last deltas to be sent/written
+            self.t.join()
 
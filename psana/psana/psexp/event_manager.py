@@ -8,6 +8,7 @@ import logging
 from psana.psexp.prometheus_manager import PrometheusManager
 
 s_bd_disk = PrometheusManager.get_metric('psana_bd_wait_disk')
+h_bd_read = PrometheusManager.get_metric('psana_bd_read_secs').labels('None')
 
 class EventManager(object):
     """ Return an event from the received smalldata memoryview (view)
@@ -18,8 +19,11 @@ class EventManager(object):
         - w/o filter fn, fetch one big chunk of bigdata and
           replace smalldata view with the read out bigdata.
           Yield one bigdata event.
+
+    bigdata (from bigdata_chunk() of another EventManager with the same
+    view) skips the read of the chunk, e.g. when it was read by another task.
     """
-    def __init__(self, view, smd_configs, dm, filter_fn=0, prometheus_counter=None):
+    def __init__(self, view, smd_configs, dm, filter_fn=0, prometheus_counter=None, bigdata=None):
         if view:
             pf = PacketFooter(view=view)
             self.smd_events = pf.split_packets()
@@ -36,9 +40,19 @@ class EventManager(object):
         self.prometheus_counter = prometheus_counter
 
         if not self.filter_fn and len(self.dm.xtc_files) > 0:
-            self._read_bigdata_in_chunk()
+            if bigdata is not None:
+                self.bigdata, self.ofsz_batch = bigdata
+            else:
+                self._read_bigdata_in_chunk()
+
+    def bigdata_chunk(self):
+        """ Returns the bigdata chunk read for this batch and the offsets
+        and sizes of its events (None if events are read one by one)."""
+        if not hasattr(self, 'bigdata'): return None
+        return self.bigdata, self.ofsz_batch
 
     @s_bd_disk.time()
+    @h_bd_read.time()
     def _read_chunks_from_disk(self, fds, offsets, sizes):
         sum_read_nbytes = 0 # for prometheus counter
         for i in range(self.n_smd_files):
@@ -50,6 +64,7 @@ class EventManager(object):
         return 
     
     @s_bd_disk.time()
+    @h_bd_read.time()
     def _read_event_from_disk(self, offsets, sizes):
         logging.debug("EventManager: BigData core reads an event (%.5f MB) from disk"%(np.sum(sizes)/1e6))
         return self.dm.jump(offsets, sizes)
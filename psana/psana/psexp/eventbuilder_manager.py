@@ -2,6 +2,8 @@ from psana.eventbuilder import EventBuilder
 from psana.psexp.packet_footer import PacketFooter
 from psana.psexp.prometheus_manager import PrometheusManager
 
+h_eb_build = PrometheusManager.get_metric('psana_eb_build_secs').labels('None')
+
 class EventBuilderManager(object):
 
     def __init__(self, view, run): 
@@ -16,19 +18,19 @@ class EventBuilderManager(object):
         self.eb             = EventBuilder(views, self.configs)
         self.c_filter       = PrometheusManager.get_metric('psana_eb_filter')
 
-    def batches(self):
-        batch_dict, step_dict = self.eb.build(
+    @h_eb_build.time()
+    def _build(self):
+        return self.eb.build(
                 batch_size          = self.batch_size, 
                 filter_fn           = self.filter_fn, 
                 destination         = self.destination,
                 prometheus_counter  = self.c_filter)
+
+    def batches(self):
+        batch_dict, step_dict = self._build()
         while self.eb.nevents or self.eb.nsteps:
             self.min_ts = self.eb.min_ts
             self.max_ts = self.eb.max_ts
             yield batch_dict, step_dict
-            batch_dict, step_dict = self.eb.build(
-                    batch_size          = self.batch_size, 
-                    filter_fn           = self.filter_fn, 
-                    destination         = self.destination,
-                    prometheus_counter  = self.c_filter)
+            batch_dict, step_dict = self._build()
 
@@ -1,4 +1,12 @@
+import os, time
 from psana.psexp.event_manager import EventManager, TransitionId
+from psana.psexp.tools import startup_timer
+from psana.psexp.prometheus_manager import PrometheusManager
+
+s_live_latency = PrometheusManager.get_metric('psana_live_latency')
+
+# seconds between the unix epoch and the epics epoch (1990-01-01) used in dgram timestamps
+EPICS_EPOCH_OFFSET = 631152000
 
 class Events:
     def __init__(self, run, get_smd=0, dm=None):
@@ -11,6 +19,8 @@ class Events:
         self._batch_iter            = iter([])
         self.flag_empty_smd_batch   = False
         self.c_read = self.run.prom_man.get_metric('psana_bd_read')
+        self._live  = int(os.environ.get('PS_SMD_MAX_RETRIES', '0')) > 0
+        startup_timer.report_once() # startup is over when events are iterated
 
     def __iter__(self):
         return self
@@ -19,6 +29,9 @@ class Events:
         evt = next(self._evt_man)
         if evt.service() != TransitionId.L1Accept:
             self.run.esm.update_by_event(evt)
+        elif self._live:
+            s_live_latency.observe(time.time() - \
+                    (evt._seconds + EPICS_EPOCH_OFFSET + evt._nanoseconds*1e-9))
         return evt
 
     def __next__(self):
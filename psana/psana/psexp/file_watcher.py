@@ -0,0 +1,101 @@
+import os
+import time
+import select
+import ctypes
+import ctypes.util
+import logging
+
+# inotify(7) constants
+IN_MODIFY       = 0x00000002
+IN_CLOSE_WRITE  = 0x00000008
+IN_NONBLOCK     = 0o4000
+IN_CLOEXEC      = 0o2000000
+
+
+def _inotify_libc():
+    """ Returns libc with inotify functions or None if not available
+    (non-Linux or restricted environment)."""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class FileGrowthWatcher(object):
+    """ Waits for any of the given (open) files to grow.
+
+    Used by SmdReader in live mode. Uses inotify on the files behind the
+    file descriptors when available, otherwise polls their sizes every
+    poll_secs. Set PS_SMD_INOTIFY=0 to force polling (e.g. on file
+    systems where writes from other nodes do not raise inotify events).
+    """
+
+    def __init__(self, fds, poll_secs=None):
+        self.fds = [int(fd) for fd in fds]
+        self.poll_secs = poll_secs if poll_secs is not None else \
+                float(os.environ.get('PS_SMD_POLL_SECS', '0.01'))
+        self.sizes = self._sizes()
+        self.inotify_fd = -1
+        if os.environ.get('PS_SMD_INOTIFY', '1') == '1':
+            self._init_inotify()
+
+    def _init_inotify(self):
+        libc = _inotify_libc()
+        if libc is None: return
+        inotify_fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if inotify_fd < 0: return
+        try:
+            for fd in self.fds:
+                path = os.readlink('/proc/self/fd/%d' % fd)
+                wd = libc.inotify_add_watch(inotify_fd, os.fsencode(path), IN_MODIFY | IN_CLOSE_WRITE)
+                if wd < 0:
+                    raise OSError(ctypes.get_errno(), 'inotify_add_watch failed for %s' % path)
+        except OSError as e:
+            logging.debug('FileGrowthWatcher: inotify not available (%s), polling instead' % e)
+            os.close(inotify_fd)
+            return
+        self.inotify_fd = inotify_fd
+
+    @property
+    def uses_inotify(self):
+        return self.inotify_fd >= 0
+
+    def _sizes(self):
+        return [os.fstat(fd).st_size for fd in self.fds]
+
+    def _grown(self):
+        sizes = self._sizes()
+        grown = any(new > old for new, old in zip(sizes, self.sizes))
+        self.sizes = sizes
+        return grown
+
+    def wait(self, timeout):
+        """ Returns True as soon as any file has grown since the last call,
+        False after timeout seconds without growth."""
+        if self._grown(): return True
+
+        deadline = time.time() + timeout
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0: return False
+            if self.uses_inotify:
+                readable, _, _ = select.select([self.inotify_fd], [], [], remaining)
+                if readable:
+                    try:
+                        os.read(self.inotify_fd, 4096) # drain pending events
+                    except BlockingIOError:
+                        pass
+            else:
+                time.sleep(min(self.poll_secs, remaining))
+            if self._grown(): return True
+
+    def close(self):
+        if self.inotify_fd >= 0:
+            os.close(self.inotify_fd)
+            self.inotify_fd = -1
+
+    def __del__(self):
+        self.close()
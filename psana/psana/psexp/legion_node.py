@@ -1,3 +1,7 @@
+import os
+import threading
+from collections import deque
+
 from .tools import mode
 
 pygion = None
@@ -12,22 +16,70 @@ else:
         return fn
 
 from psana.psexp.eventbuilder_manager import EventBuilderManager
-from psana.psexp.event_manager import TransitionId
-from psana.psexp.events import Events
+from psana.psexp.event_manager import EventManager, TransitionId
+from psana.psexp.packet_footer import PacketFooter
+from psana.psexp.prometheus_manager import PrometheusManager
+
+# Pipeline of tasks (each stage runs as soon as its inputs are ready):
+#   run_smd0_task       reads smd chunks (one after the other) and launches
+#     run_smd_task      builds events of one chunk into batches
+#     read_bigdata_task reads bigdata of one batch
+#     run_bigdata_task  calls event_fn for events of one batch
+# Task granularity is set by PS_SMD_N_EVENTS (events per smd chunk) and
+# batch_size (events per bigdata batch). Only run_smd0_task waits for
+# futures: for the batches of the previous chunk (built while the next one
+# is read) and for the event counts of the oldest chunk once
+# PS_LEGION_INFLIGHT chunks have bigdata tasks in flight, i.e. how far
+# reading may run ahead of the analysis (default: 2 x no. of python procs).
+#
+# Transitions update the env store from the step dgrams of the smd chunks.
+# run_smd0_task collects them in order and each bigdata task gets those of
+# all chunks up to its own, which it adds to the env store of the run of
+# its process if not there yet. Env values are looked up by timestamp, so
+# steps of later chunks added by another task do not change the results.
+
+def _max_inflight():
+    n = int(os.environ.get('PS_LEGION_INFLIGHT', 0))
+    if n > 0: return n
+    return 2 * pygion.Tunable.select(pygion.Tunable.GLOBAL_PYS).get()
 
 def smd_chunks(run):
-    for smd_chunk, update_chunk in run.smdr_man.chunks():
-        yield smd_chunk
+    for smd_chunk, step_chunk in run.smdr_man.chunks():
+        yield smd_chunk, step_chunk
 
 @task(inner=True)
 def run_smd0_task(run):
-    global_procs = pygion.Tunable.select(pygion.Tunable.GLOBAL_PYS).get()
+    max_inflight = _max_inflight()
+    step_chunks = []    # step dgrams of the chunks read so far
+    building = deque()  # (future of the batches, step chunks) of a chunk
+    inflight = deque()  # futures of the no. of events of each batch of a chunk
+    n_events = 0
 
-    for i, smd_chunk in enumerate(smd_chunks(run)):
-        run_smd_task(smd_chunk, run, point=i)
+    def launch_bigdata():
+        batches, steps = building.popleft()
+        results = []
+        for i, smd_batch in enumerate(batches.get()):
+            bigdata = read_bigdata_task(smd_batch, run, point=i)
+            results.append(run_bigdata_task(smd_batch, bigdata, steps, run, point=i))
+        inflight.append(results)
+
+    for i, (smd_chunk, step_chunk) in enumerate(smd_chunks(run)):
+        if step_chunk:
+            step_chunks.append(step_chunk)
+        building.append((run_smd_task(smd_chunk, run, point=i), tuple(step_chunks)))
+        # bigdata tasks of the previous chunk are launched while this one is built
+        if len(building) > 1:
+            launch_bigdata()
+        while len(inflight) >= max_inflight:
+            n_events += sum(result.get() for result in inflight.popleft())
+    while building:
+        launch_bigdata()
+    while inflight:
+        n_events += sum(result.get() for result in inflight.popleft())
     # Block before returning so that the caller can use this task's future for synchronization
     pygion.execution_fence(block=True)
     run.close() # FIXME: Check with Elliott if this is a good place to close all open files
+    return n_events
 
 def smd_batches(smd_chunk, run):
     eb_man = EventBuilderManager(smd_chunk, run)
@@ -35,29 +87,52 @@ def smd_batches(smd_chunk, run):
         smd_batch, _ = smd_batch_dict[0]
         yield smd_batch
 
-@task(inner=True)
+@task
 def run_smd_task(smd_chunk, run):
-    for i, smd_batch in enumerate(smd_batches(smd_chunk, run)):
-        run_bigdata_task(smd_batch, run, point=i)
+    """ Returns the list of smd batches of the chunk."""
+    return list(smd_batches(smd_chunk, run))
 
-def batch_events(smd_batch, run):
-    batch_iter = iter([smd_batch, bytearray()])
-    def get_smd():
-        for this_batch in batch_iter:
-            return this_batch
+def _event_manager(smd_batch, run, bigdata=None):
+    return EventManager(smd_batch,
+            run.configs,
+            run.dm,
+            filter_fn           = run.filter_callback,
+            prometheus_counter  = PrometheusManager.get_metric('psana_bd_read'),
+            bigdata             = bigdata)
 
-    events = Events(run, get_smd=get_smd)
-    for evt in events:
+def batch_events(smd_batch, run, bigdata=None):
+    for evt in _event_manager(smd_batch, run, bigdata=bigdata):
         if evt.service() != TransitionId.L1Accept: continue
         yield evt
 
+_env_lock = threading.Lock()
+def update_env(run, step_chunks):
+    """ Adds the step chunks not in the env store of run yet, in order
+    (tasks of a process share the run)."""
+    with _env_lock:
+        n_steps = getattr(run, 'n_env_steps', 0)
+        for step_chunk in step_chunks[n_steps:]:
+            run.esm.update_by_views(PacketFooter(view=step_chunk).split_packets())
+        run.n_env_steps = max(n_steps, len(step_chunks))
+
 @task
-def run_bigdata_task(batch, run):
-    for evt in batch_events(batch, run):
+def read_bigdata_task(smd_batch, run):
+    """ Returns bigdata chunk of the batch (None when events are read one
+    by one in run_bigdata_task, i.e. with a filter callback)."""
+    return _event_manager(smd_batch, run).bigdata_chunk()
+
+@task
+def run_bigdata_task(batch, bigdata, step_chunks, run):
+    update_env(run, step_chunks)
+    n_events = 0
+    for evt in batch_events(batch, run, bigdata=bigdata):
         run.event_fn(evt, run.det)
+        n_events += 1
+    return n_events
 
 run_to_process = []
 def analyze(run, event_fn=None, start_run_fn=None, det=None):
+    """ Returns the future of the no. of events analyzed (script mode)."""
     run.event_fn = event_fn
     run.start_run_fn = start_run_fn
     run.det = det
@@ -72,7 +147,7 @@ def analyze(run, event_fn=None, start_run_fn=None, det=None):
         return run_smd0_task(run)
     else:
         run_to_process.append(run)
-    
+
 
 if pygion is not None and not pygion.is_script:
     @task(top_level=True)
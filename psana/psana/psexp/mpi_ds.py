@@ -3,7 +3,7 @@ import os
 import numpy as np
 from mpi4py import MPI
 
-from .tools import mode
+from .tools import mode, startup_timer
 from .ds_base import DataSourceBase
 from .run import Run
 
@@ -76,15 +76,16 @@ class RunParallel(Run):
             self.bcast_packets = None
         
         # Send configs without pickling
-        psana_comm.Bcast(nbytes, root=0) # no. of bytes is required for mpich
-        if rank > 0:
-            self.configs = [np.empty(nbyte, dtype='b') for nbyte in nbytes]
-       
-        for i in range(len(self.configs)):
-            psana_comm.Bcast([self.configs[i], nbytes[i], MPI.BYTE], root=0)
-        
-        # Send other small things using small-case bcast
-        self.bcast_packets = psana_comm.bcast(self.bcast_packets, root=0)
+        with startup_timer.phase('bcast configs'):
+            psana_comm.Bcast(nbytes, root=0) # no. of bytes is required for mpich
+            if rank > 0:
+                self.configs = [np.empty(nbyte, dtype='b') for nbyte in nbytes]
+           
+            for i in range(len(self.configs)):
+                psana_comm.Bcast([self.configs[i], nbytes[i], MPI.BYTE], root=0)
+            
+            # Send other small things using small-case bcast
+            self.bcast_packets = psana_comm.bcast(self.bcast_packets, root=0)
         if rank > 0:
             self.configs = [dgram.Dgram(view=config, offset=0) for config in self.configs]
             
@@ -116,6 +117,7 @@ class RunParallel(Run):
             en = time.time()
             self.c_ana.labels('seconds','None').inc(en-st)
             self.c_ana.labels('batches','None').inc()
+            self.h_ana.observe(en-st)
         self.close()
 
     def steps(self):
@@ -167,13 +169,14 @@ class MPIDataSource(DataSourceBase):
             if nsmds > 1:
                 raise(InvalidEventBuilderCores("Invalid no. of eventbuilder cores: %d. There must be only one eventbuilder core when destionation callback is set."%(nsmds)))
 
-        exp = comm.bcast(exp, root=0)
-        run_dict = comm.bcast(run_dict, root=0)
+        # File discovery is done once on rank 0 and shared with all ranks
+        with startup_timer.phase('bcast run_dict'):
+            exp, run_dict = comm.bcast((exp, run_dict), root=0)
 
         self.exp = exp
         self.run_dict = run_dict
         
-        super()._start_prometheus_client(mpi_rank=rank)
+        super()._start_prometheus_client(mpi_rank=rank, comm=self.comms.psana_comm)
 
 
     def runs(self):
@@ -15,6 +15,7 @@ from psana.psexp.prometheus_manager import PrometheusManager
 
 s_eb_wait_smd0 = PrometheusManager.get_metric('psana_eb_wait_smd0')
 s_bd_wait_eb = PrometheusManager.get_metric('psana_bd_wait_eb')
+h_mpi_wait = PrometheusManager.get_metric('psana_mpi_wait_secs')
 
 # Setting up group communications
 # Ex. PS_SMD_NODES=3 mpirun -n 13
@@ -277,6 +278,7 @@ class Smd0(object):
             st_req = time.time()
             self.run.comms.smd_comm.Recv(rankreq, source=MPI.ANY_SOURCE)
             en_req = time.time()
+            h_mpi_wait.labels('smd0_wait_eb').observe(en_req - st_req)
             
             # Check missing steps for the current client
             missing_step_views = self.step_hist.get_buffer(rankreq[0])
@@ -347,9 +349,11 @@ class SmdNode(object):
         self.run.comms.bd_comm.Recv(rankreq, source=MPI.ANY_SOURCE)
         en_req = time.time()
         self.c_sent.labels('seconds',rankreq[0]).inc(en_req-st_req)
+        h_mpi_wait.labels('eb_wait_bd').observe(en_req-st_req)
         logging.debug("node.py: EventBuilder %d got BigData %d (request took %.5f seconds)"%(self.run.comms.smd_rank, rankreq[0], (en_req-st_req)))
 
     @s_eb_wait_smd0.time()
+    @h_mpi_wait.labels('eb_wait_smd0').time()
     def _request_data(self, smd_comm):
         smd_comm.Send(np.array([self.run.comms.smd_rank], dtype='i'), dest=0)
         info = MPI.Status()
@@ -448,6 +452,7 @@ class BigDataNode(object):
     def run_mpi(self):
         
         @s_bd_wait_eb.time()
+        @h_mpi_wait.labels('bd_wait_eb').time()
         def get_smd():
             bd_comm = self.run.comms.bd_comm
             bd_rank = self.run.comms.bd_rank
@@ -1,9 +1,24 @@
+import os
 import time
-from prometheus_client import CollectorRegistry, Counter, push_to_gateway, Summary, Gauge
+import json
+from prometheus_client import CollectorRegistry, Counter, push_to_gateway, Summary, Gauge, Histogram
+from prometheus_client.core import Metric
 import logging
 
-PUSH_INTERVAL_SECS  = 5
-PUSH_GATEWAY        = 'psdm03:9091'
+PUSH_INTERVAL_SECS  = int(os.environ.get('PS_PROMETHEUS_INTERVAL', '5'))
+PUSH_GATEWAY        = os.environ.get('PS_PROMETHEUS_GATEWAY', 'psdm03:9091')
+
+# How metrics leave the job (PS_PROMETHEUS_MODE):
+# push      - every rank pushes its registry to PUSH_GATEWAY
+# aggregate - ranks send metric deltas over MPI to psana rank 0, which
+#             pushes the sum once per interval (or serves it on
+#             PS_PROMETHEUS_PORT if set)
+# file      - every rank appends its deltas as json lines to
+#             PS_PROMETHEUS_DIR (see load_metric_files)
+PROMETHEUS_MODES    = ('push', 'aggregate', 'file')
+
+# Bucket upper bounds (s) of the per-stage latency histograms
+LATENCY_BUCKETS     = (1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 5e-2, 0.1, 0.5, 1., 5., 10., 60.)
 
 registry = CollectorRegistry()
 metrics ={'psana_smd0_wait_disk': ('Summary', 'Time spent (s) reading smalldata'),
@@ -20,6 +35,16 @@ metrics ={'psana_smd0_wait_disk': ('Summary', 'Time spent (s) reading smalldata'
         'psana_bd_wait_eb'      : ('Summary', 'time spent (s) waiting for EventBuilder cores'),
         'psana_bd_ana'          : ('Counter', 'time spent (s) in analysis fn on                 \
                                     BigData core'),
+        'psana_live_latency'    : ('Summary', 'time (s) from event timestamp to yielding the  \
+                                    event in live mode'),
+        'psana_shmem_evts'      : ('Counter', 'Counting no. of events served/dropped by       \
+                                    the shmem client'),
+        'psana_smd0_read_secs'  : ('Histogram', 'time (s) per smalldata chunk read by Smd0'),
+        'psana_eb_build_secs'   : ('Histogram', 'time (s) per batch built by EventBuilder'),
+        'psana_bd_read_secs'    : ('Histogram', 'time (s) per bigdata read on BigData core'),
+        'psana_bd_ana_secs'     : ('Histogram', 'time (s) per event in analysis fn on BigData core'),
+        'psana_mpi_wait_secs'   : ('Histogram', 'time (s) waiting on MPI, labeled by endpoint      \
+                                    (e.g. eb_wait_smd0)'),
         'psana_timestamp'       : ('Gauge',   'Uses different labels (e.g. python_init,         \
                                     first_event) to set the timestamp of that stage'),
         }
@@ -31,17 +56,172 @@ for metric_name, (metric_type, desc) in metrics.items():
         registry.register(Summary(metric_name, desc))
     elif metric_type == 'Gauge':
         registry.register(Gauge(metric_name, desc, ['checkpoint']))
+    elif metric_type == 'Histogram':
+        registry.register(Histogram(metric_name, desc, ['endpoint'], buckets=LATENCY_BUCKETS))
+
+
+def _snapshot(reg):
+    """ Returns {(sample_name, labels): value} of all samples in reg and
+    {sample_name: (family_name, type, documentation)}. Sorted label tuples
+    are used so that keys are hashable and can be pickled/json'ed."""
+    values, families = {}, {}
+    for family in reg.collect():
+        for sample in family.samples:
+            if sample.name.endswith('_created'): continue # creation time, not additive
+            values[(sample.name, tuple(sorted(sample.labels.items())))] = sample.value
+            families[sample.name] = (family.name, family.type, family.documentation)
+    return values, families
+
+
+class MetricDeltas(object):
+    """ Tracks what changed in a registry since the last call to get().
+
+    Counter, summary and histogram samples only grow and are sent as
+    increments, gauges are sent as their current value.
+    """
+
+    def __init__(self, reg, families=None):
+        self.reg = reg
+        self.last = {}
+        self.families = {} if families is None else families
+
+    def get(self):
+        """ Returns (increments, gauges) as lists of (sample_name, labels, value)."""
+        values, families = _snapshot(self.reg)
+        self.families.update(families)
+        increments, gauges = [], []
+        for key, value in values.items():
+            last = self.last.get(key, 0.)
+            if value == last: continue
+            if families[key[0]][1] == 'gauge':
+                gauges.append((key[0], key[1], value))
+            else:
+                increments.append((key[0], key[1], value - last))
+        self.last = values
+        return increments, gauges
+
+
+class MetricAggregator(object):
+    """ Sums metric deltas from many ranks and exposes the totals as a
+    prometheus collector."""
+
+    def __init__(self, families):
+        self.families = families # sample_name -> (family_name, type, doc)
+        self.values = {}
+
+    def add(self, increments, gauges):
+        for name, labels, value in increments:
+            key = (name, tuple(map(tuple, labels)))
+            self.values[key] = self.values.get(key, 0.) + value
+        for name, labels, value in gauges:
+            self.values[(name, tuple(map(tuple, labels)))] = value
+
+    def collect(self):
+        metrics = {}
+        for (name, labels), value in sorted(self.values.items()):
+            if name not in self.families: continue
+            family_name, family_type, doc = self.families[name]
+            if family_name not in metrics:
+                metrics[family_name] = Metric(family_name, doc, family_type)
+            metrics[family_name].add_sample(name, dict(labels), value)
+        return list(metrics.values())
+
+
+def load_metric_files(paths):
+    """ Sums the deltas written by PS_PROMETHEUS_MODE=file.
+    Returns {(sample_name, labels): value}."""
+    agg = MetricAggregator({})
+    for path in paths:
+        with open(path, 'r') as f:
+            for line in f:
+                record = json.loads(line)
+                agg.add(record['increments'], record['gauges'])
+    return agg.values
+
 
 class PrometheusManager(object):
     def __init__(self, jobid):
         self.jobid = jobid
-        pass
+        self.mode = os.environ.get('PS_PROMETHEUS_MODE', 'push')
+        assert self.mode in PROMETHEUS_MODES, \
+                'PS_PROMETHEUS_MODE must be one of %s' % (PROMETHEUS_MODES,)
+
+    def push_metrics(self, e, from_whom='', comm=None):
+        if self.mode == 'aggregate' and comm is not None:
+            if comm.Get_rank() == 0:
+                self._export_aggregated(e, comm)
+            else:
+                self._send_deltas(e, comm)
+        elif self.mode == 'file':
+            self._write_deltas(e, from_whom)
+        else:
+            self._push(e, from_whom)
 
-    def push_metrics(self, e, from_whom=''):
+    def _push(self, e, from_whom):
         while not e.isSet():
             push_to_gateway(PUSH_GATEWAY, job='psana_pushgateway', grouping_key={'jobid': self.jobid, 'rank': from_whom}, registry=registry)
             logging.debug('TS: %s PUSHED JOBID: %s RANK: %s e.isSet():%s'%(time.time(), self.jobid, from_whom, e.isSet()))
-            time.sleep(PUSH_INTERVAL_SECS)
+            e.wait(PUSH_INTERVAL_SECS)
+
+    def _send_deltas(self, e, comm):
+        """ Sends deltas to the exporter (rank 0 of comm) every interval
+        and a last one (done=True) after e is set."""
+        deltas = MetricDeltas(registry)
+        done = False
+        while not done:
+            done = e.wait(PUSH_INTERVAL_SECS)
+            increments, gauges = deltas.get()
+            if increments or gauges or done:
+                comm.send((increments, gauges, done), dest=0)
+
+    def _export_aggregated(self, e, comm):
+        """ Sums deltas from all ranks of comm (including this one) and
+        pushes or serves the totals. Returns once e is set and all other
+        ranks have sent their last deltas."""
+        deltas = MetricDeltas(registry)
+        _, families = _snapshot(registry)
+        agg = MetricAggregator(families)
+        agg_registry = CollectorRegistry()
+        agg_registry.register(agg)
+
+        port = os.environ.get('PS_PROMETHEUS_PORT')
+        if port:
+            from prometheus_client import start_http_server
+            start_http_server(int(port), registry=agg_registry)
+
+        n_running = comm.Get_size() - 1
+        next_export = time.time() + PUSH_INTERVAL_SECS
+        while n_running > 0 or not e.is_set():
+            if comm.Iprobe():
+                increments, gauges, done = comm.recv()
+                agg.add(increments, gauges)
+                if done: n_running -= 1
+                continue
+            if time.time() >= next_export:
+                agg.add(*deltas.get())
+                if not port:
+                    push_to_gateway(PUSH_GATEWAY, job='psana_pushgateway', grouping_key={'jobid': self.jobid, 'rank': 'all'}, registry=agg_registry)
+                next_export = time.time() + PUSH_INTERVAL_SECS
+            else:
+                e.wait(0.01)
+        agg.add(*deltas.get())
+        if not port:
+            push_to_gateway(PUSH_GATEWAY, job='psana_pushgateway', grouping_key={'jobid': self.jobid, 'rank': 'all'}, registry=agg_registry)
+        logging.debug('TS: %s AGGREGATED METRICS OF %d RANKS JOBID: %s'%(time.time(), comm.Get_size(), self.jobid))
+
+    def _write_deltas(self, e, from_whom):
+        out_dir = os.environ.get('PS_PROMETHEUS_DIR', '.')
+        path = os.path.join(out_dir, 'psana_metrics_%s_r%s.jsonl'%(self.jobid, from_whom))
+        deltas = MetricDeltas(registry)
+        done = False
+        with open(path, 'a') as f:
+            while not done:
+                done = e.wait(PUSH_INTERVAL_SECS)
+                increments, gauges = deltas.get()
+                if increments or gauges:
+                    f.write(json.dumps({'ts': time.time(), 'rank': from_whom,
+                        'increments': increments, 'gauges': gauges}) + '\n')
+                    f.flush()
         
     @staticmethod
     def get_metric(metric_name):
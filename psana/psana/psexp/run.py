@@ -15,9 +15,8 @@ from psana.psexp.step import Step
 from psana.psexp.TransitionId import TransitionId
 from psana.psexp.events import Events
 from psana.psexp.ds_base import XtcFileNotFound
-import psana.pscalib.calib.MDBWebUtils as wu
 from psana.detector.detector_impl import MissingDet
-from psana.psexp.tools import mode
+from psana.psexp.tools import mode, startup_timer
 import time
 
 
@@ -76,6 +75,7 @@ class Run(object):
         self.destination        = destination
         self.prom_man           = prom_man
         self.c_ana              = self.prom_man.get_metric('psana_bd_ana')
+        self.h_ana              = self.prom_man.get_metric('psana_bd_ana_secs').labels('None')
         RunHelper(self)
 
     def close(self):
@@ -115,11 +115,23 @@ class Run(object):
           has segment_id as a key
         - dettype
         - uniqueid
+        - segment_map
+          has drp_class_name as a key and a list of (dgram position, segment_id)
+          sorted by segment_id. The layout of an event is fixed by Configure so
+          Detector interfaces locate their data in an event by indexing only.
         """
+        with startup_timer.phase('set configinfo'):
+            self._set_configinfo_impl()
+
+    def _set_configinfo_impl(self):
         self.configinfo_dict = {}
 
         for _, det_class in self.dm.det_classes.items(): # det_class is either normal or envstore
-            for (det_name, _), _ in det_class.items():
+            for (det_name, drp_class_name), _ in det_class.items():
+                if det_name in self.configinfo_dict:
+                    self.configinfo_dict[det_name].segment_map[drp_class_name] = \
+                            self._segment_positions(det_name, drp_class_name)
+                    continue
                 # Create a copy of list of configs for this detector
                 det_configs = [dgram.Dgram(view=config) for config in self.dm.configs \
                         if hasattr(config.software, det_name)]
@@ -146,7 +158,21 @@ class Run(object):
                         "sorted_segment_ids": sorted_segment_ids, \
                         "detid_dict": detid_dict, \
                         "dettype": dettype, \
-                        "uniqueid": uniqueid})
+                        "uniqueid": uniqueid, \
+                        "segment_map": {drp_class_name: \
+                                self._segment_positions(det_name, drp_class_name)}})
+
+    def _segment_positions(self, det_name, drp_class_name):
+        """ Returns list of (dgram position, segment_id) sorted by segment_id
+        for all segments of det_name that have drp_class_name in Configure."""
+        positions = []
+        for i, config in enumerate(self.dm.configs):
+            if not hasattr(config.software, det_name): continue
+            for segment, det in getattr(config.software, det_name).items():
+                if hasattr(det, drp_class_name):
+                    positions.append((i, segment))
+        positions.sort(key=lambda x: x[1])
+        return positions
 
     def Detector(self, name, accept_missing=False):
         if name not in self.configinfo_dict and self.esm.env_from_variable(name) is None:
@@ -218,7 +244,14 @@ class Run(object):
         return self.dm.xtc_info
 
     def _set_calibconst(self):
+        with startup_timer.phase('calibconst'):
+            self._set_calibconst_impl()
+
+    def _set_calibconst_impl(self):
         self.calibconst = {}
+        if self.expt:
+            # web utilities (requests, krb5) are only needed when constants are fetched
+            import psana.pscalib.calib.MDBWebUtils as wu
         for det_name, configinfo in self.configinfo_dict.items():
             if self.expt:
                 if self.expt == "cxid9114": # mona: hack for cctbx
@@ -288,6 +321,20 @@ class RunShmem(Run):
         for evt in events:
             if evt.service() == TransitionId.L1Accept:
                 yield evt
+
+    def event_batches(self):
+        """ Yields ShmemBatch of zero-copy dgrams (see PS_SHMEM_BATCH_SIZE
+        and PS_SHMEM_DROP). Buffers go back to the server when the batch is
+        released, at the latest when the next batch is requested. Transitions
+        in the batch update the env stores and are included in the batch."""
+        while True:
+            batch = self.dm.next_shmem_batch()
+            if batch is None: break
+            with batch:
+                for evt in batch.events():
+                    if evt.service() != TransitionId.L1Accept:
+                        self.esm.update_by_event(evt)
+                yield batch
     
     def steps(self):
         """ Generates events between steps. """
@@ -367,6 +414,7 @@ class RunSerial(Run):
                 en = time.time()
                 self.c_ana.labels('seconds','None').inc(en-st)
                 self.c_ana.labels('batches','None').inc()
+                self.h_ana.observe(en-st)
         self.close()
 
     
@@ -9,6 +9,7 @@ import logging
 from psana.psexp.prometheus_manager import PrometheusManager
 
 s_smd0_disk = PrometheusManager.get_metric('psana_smd0_wait_disk')
+h_smd0_read = PrometheusManager.get_metric('psana_smd0_read_secs').labels('None')
 
 
 class BatchIterator(object):
@@ -70,6 +71,7 @@ class SmdReaderManager(object):
         self.c_read = self.run.prom_man.get_metric('psana_smd0_read')
 
     @s_smd0_disk.time()
+    @h_smd0_read.time()
     def _get(self):
         self.smdr.get()
         logging.debug('SmdReaderManager: read %.5f MB'%(self.smdr.got/1e6))
@@ -1,10 +1,52 @@
 import weakref
 import os
+import sys
+import time
+from contextlib import contextmanager
 
 # mode can be 'mpi' or 'legion' or 'none' for non parallel 
 mode = os.environ.get('PS_PARALLEL', 'mpi')
 
 
+class StartupTimer(object):
+    """ Accumulates wall time spent in each startup phase (imports, MPI
+    initialization, file discovery, configs, calibration constants, ...).
+    
+    The report is printed once, when the first event iterator is created,
+    if PS_STARTUP_PROFILE=1 is set. It is also available from
+    DataSource.startup_report()."""
+
+    def __init__(self):
+        self.t0 = time.time()
+        self.phases = {} # phase name: seconds, in order of first appearance
+        self.enabled = os.environ.get('PS_STARTUP_PROFILE', '0') == '1'
+        self.reported = False
+
+    @contextmanager
+    def phase(self, name):
+        st = time.time()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.) + time.time() - st
+
+    def report(self):
+        total = time.time() - self.t0
+        lines = ['psana startup profile (pid %d):' % os.getpid()]
+        for name, secs in self.phases.items():
+            lines.append('  %-24s %8.3f s' % (name, secs))
+        lines.append('  %-24s %8.3f s' % ('total since import', total))
+        return '\n'.join(lines)
+
+    def report_once(self):
+        if self.enabled and not self.reported:
+            self.reported = True
+            print(self.report(), file=sys.stderr)
+            sys.stderr.flush()
+
+startup_timer = StartupTimer()
+
+
 class RunHelper(object):
 
     # Every Run is assigned an ID. This permits Run to be
@@ -22,6 +22,7 @@ cimport libc.stdint as si
 from libcpp.string cimport string
 from libcpp.vector cimport vector
 from libcpp cimport bool
+from libc.string cimport memcpy
 
 #----------
 
@@ -248,7 +249,7 @@ cdef extern from "psalg/peaks/WFAlgos.hh" namespace "psalg":
         double threshold,
         double fraction,
         double deadtime,
-        bool leading_edges) except +
+        bool leading_edges) nogil except +
 
 def wfpkfinder_cfd(wf, dtypesv baseline, dtypesv threshold, fraction, deadtime, leading_edges,\
                      dtypes1d pkvals,\
@@ -266,3 +267,27 @@ def wfpkfinder_cfd(wf, dtypesv baseline, dtypesv threshold, fraction, deadtime,
     return npeaks
 
 #----------
+
+def wfpkfinder_cfd_nogil(cnp.ndarray[cnp.float64_t, ndim=1, mode="c"] wf,\
+                         double baseline, double threshold, double fraction, double deadtime, bool leading_edges,\
+                         cnp.ndarray[cnp.float64_t, ndim=1, mode="c"] pkvals,\
+                         cnp.ndarray[cnp.uint32_t,  ndim=1, mode="c"] pkinds):
+    """The same as wfpkfinder_cfd for float64 waveform, but releases the GIL in find_edges,
+       so that a few channels can be processed concurrently in python threads.
+    """
+    cdef vector[cnp.float64_t] cwf
+    cdef index_t npkmax = pkinds.size
+    cdef index_t npeaks = 0
+    cdef cnp.float64_t* ppkvals
+    cdef index_t* ppkinds
+    cdef Py_ssize_t nsamples = wf.shape[0]
+    if nsamples == 0 or npkmax == 0: return 0
+    ppkvals = &pkvals[0]
+    ppkinds = <index_t*>&pkinds[0]
+    cwf.resize(nsamples)
+    memcpy(&cwf[0], &wf[0], nsamples*sizeof(cnp.float64_t))
+    with nogil:
+        npeaks = find_edges(npkmax, ppkvals, ppkinds, cwf, baseline, threshold, fraction, deadtime, leading_edges)
+    return npeaks
+
+#----------
@@ -4,6 +4,7 @@ cdef extern from "psalg/shmem/ShmemClient.hh" namespace "psalg::shmem":
         int connect(const char* tag, int tr_index)
         void *get(int& ev_index, int& buf_size)
         void free(int ev_index, int buf_size)
+        int ready(int timeout_ms)
 
 cdef class PyShmemClient:
     """ Python wrapper for C++ class.
@@ -42,6 +43,45 @@ cdef class PyShmemClient:
 
         return cview
 
+    def ready(self, timeout_ms=0):
+        """ Returns True if a buffer can be dequeued without blocking."""
+        return self.client.ready(timeout_ms) > 0
+
+    def get_batch(self, max_count):
+        """ Dequeues up to max_count buffers in one call.
+
+        Blocks for the first buffer only and then takes whatever the server
+        has already queued. The batch ends after a transition so that callers
+        can apply it before the events that follow. Returns a list of
+        (view, index, size); an empty list means the server went away.
+        """
+        cdef char* buf
+        cdef char[:] cview
+        cdef int ev_index
+        cdef int buf_size
+        cdef unsigned service
+        batch = []
+        while len(batch) < max_count:
+            if batch and self.client.ready(0) == 0:
+                break
+            ev_index = -1
+            buf_size = 0
+            buf = <char*>self.client.get(ev_index,buf_size)
+            if buf == NULL:
+                break
+            cview = <char[:buf_size]>buf
+            batch.append((cview, ev_index, buf_size))
+            # service field of XtcData::Dgram, see dgrammanager._service
+            service = ((<unsigned*>buf)[2] >> 24) & 0x0f
+            if service != 12: # TransitionId::L1Accept
+                break
+        return batch
+
+    @property
+    def cptr(self):
+        """ C++ client pointer as passed to Dgram(shmem_cli_cptr=...)"""
+        return self.pclient
+
     def free(self,dgram):
         self.client.free(dgram._shmem_index,dgram._shmem_size)
 
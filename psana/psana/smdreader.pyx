@@ -7,13 +7,16 @@ from parallelreader cimport Buffer, ParallelReader
 from libc.stdint cimport uint32_t, uint64_t
 from cpython cimport array
 import time, os
+from psana.psexp.file_watcher import FileGrowthWatcher
 cimport cython
 
 
 cdef class SmdReader:
     cdef ParallelReader prl_reader
     cdef int            winner, view_size
-    cdef int            max_retries, sleep_secs
+    cdef int            max_retries
+    cdef double         sleep_secs
+    cdef object         watcher
     cdef array.array    buf_offsets, stepbuf_offsets, buf_sizes, stepbuf_sizes
     cdef array.array    i_evts, founds
 
@@ -23,7 +26,9 @@ cdef class SmdReader:
         
         # max retries has no default value (set when creating datasource)
         self.max_retries        = int(os.environ['PS_SMD_MAX_RETRIES']) 
-        self.sleep_secs         = int(os.environ.get('PS_SMD_SLEEP_SECS', '1'))
+        self.sleep_secs         = float(os.environ.get('PS_SMD_SLEEP_SECS', '1'))
+        # live mode: wakes up as soon as any smd file grows
+        self.watcher            = FileGrowthWatcher(fds) if self.max_retries > 0 else None
         self.buf_offsets        = array.array('Q', [0]*fds.size)
         self.stepbuf_offsets    = array.array('Q', [0]*fds.size)
         self.buf_sizes          = array.array('Q', [0]*fds.size)
@@ -45,18 +50,36 @@ cdef class SmdReader:
         return is_complete
 
 
+    def found_endrun(self):
+        """ Checks that every buffer without unseen events has already
+        read the EndRun transition (no more data will come for this run).
+        """
+        cdef int i
+        for i in range(self.prl_reader.nfiles):
+            if self.prl_reader.bufs[i].n_ready_events - \
+                    self.prl_reader.bufs[i].n_seen_events == 0 and \
+                    not self.prl_reader.bufs[i].found_endrun:
+                return False
+        return True
+
     def get(self):
         self.prl_reader.just_read()
         
         if self.max_retries > 0:
+            # Live mode: wait for new data until all files have an event
+            # or the run has ended. max_retries is the number of sleep_secs
+            # intervals without any file growth before giving up.
             cn_retries = 0
-            while not self.is_complete():
-                time.sleep(self.sleep_secs)
-                print('waiting for an event...')
+            while not self.is_complete() and not self.found_endrun():
+                if not self.watcher.wait(self.sleep_secs):
+                    cn_retries += 1
+                    if cn_retries > self.max_retries:
+                        print('no new data after %.1f seconds, stop waiting for events' \
+                                %(self.max_retries*self.sleep_secs))
+                        break
+                    continue
+                cn_retries = 0
                 self.prl_reader.just_read()
-                cn_retries += 1
-                if cn_retries > self.max_retries:
-                    break
 
     @cython.boundscheck(False)
     def view(self, int batch_size=1000):
@@ -0,0 +1,27 @@
+# Run under legion_python with PS_PARALLEL=legion (see test_xtc.py)
+import os
+import pygion
+from psana import DataSource
+
+xtc_dir = os.path.join(os.environ.get('TEST_XTC_DIR', os.getcwd()),'.tmp')
+
+values = [] # (timestamp, epics value, scan value) of each event
+def event_fn(evt, det):
+    edet, sdet = det
+    values.append((evt.timestamp, edet(evt), sdet(evt)))
+
+ds = DataSource(exp='xpptut13', run=1, dir=xtc_dir)
+for run in ds.runs():
+    det = (run.Detector('HX2:DVD:GCC:01:PMON'), run.Detector('motor2'))
+    n_events = run.analyze(event_fn=event_fn, det=det)
+
+pygion.execution_fence(block=True)
+assert n_events.get() == 10
+assert len(values) == 10
+# env values as in a serial pass: once the epics value is seen, all later
+# events (in timestamp order) have it
+values.sort(key=lambda v: v[0])
+epics = [v for ts, v, s in values]
+assert set(epics) <= {None, 41.0} and 41.0 in epics
+assert all(v == 41.0 for v in epics[epics.index(41.0):])
+assert all(s == 42.0 for ts, v, s in values)
@@ -5,13 +5,14 @@ from psana import DataSource
 import numpy as np
 import vals
 
-def launch_client(pid):
+def launch_client(pid, batched=False):
     dg_count = 0
     ds = DataSource(shmem='shmem_test_'+pid)
     run = next(ds.runs())
     cspad = run.Detector('xppcspad')
     hsd = run.Detector('xpphsd')
-    for evt in run.events():
+    for evt in events(run, batched):
+        if evt.service() != 12: continue # L1Accept only
         assert(hsd.raw.calib(evt).shape==(5,))
         assert(hsd.fex.calib(evt).shape==(6,))
         padarray = vals.padarray
@@ -20,10 +21,17 @@ def launch_client(pid):
         dg_count += 1
     return dg_count  
 
+def events(run, batched):
+    if not batched:
+        yield from run.events()
+        return
+    for batch in run.event_batches():
+        yield from batch.events()
+
 #------------------------------
 
 def main() :
-    sys.exit(launch_client(sys.argv[1]))
+    sys.exit(launch_client(sys.argv[1], batched=len(sys.argv) > 2 and sys.argv[2] == 'batch'))
 
 #------------------------------
 
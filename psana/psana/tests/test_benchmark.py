@@ -0,0 +1,33 @@
+import os
+import sys
+import json
+import subprocess
+
+from psana.benchmark.bench_run import stage_summary
+
+def test_stage_summary():
+    values = {
+        ('psana_smd0_read_secs_sum',   (('endpoint', 'None'),)): 2.0,
+        ('psana_smd0_read_secs_count', (('endpoint', 'None'),)): 10.0,
+        ('psana_smd0_read_total',      (('endpoint', 'None'), ('unit', 'MB'))): 100.0,
+        ('psana_smd0_read_total',      (('endpoint', 'None'), ('unit', 'evts'))): 1e6,
+        ('psana_mpi_wait_secs_sum',    (('endpoint', 'bd_wait_eb'),)): 0.5,
+        ('psana_mpi_wait_secs_count',  (('endpoint', 'bd_wait_eb'),)): 5.0,
+    }
+    stages = stage_summary(values)
+    assert stages['smd0_read'] == {'seconds': 2.0, 'calls': 10.0, 'MB': 100.0, 'MB_per_sec': 50.0}
+    assert stages['mpi_wait_bd_wait_eb'] == {'seconds': 0.5, 'calls': 5.0}
+    assert 'eb_build' not in stages
+
+def test_serial_benchmark(tmp_path):
+    out = str(tmp_path / 'results.jsonl')
+    cmd = [sys.executable, '-m', 'psana.benchmark.run_benchmarks', '-o', out,
+            '-d', str(tmp_path), '--n-events', '20', '--rates', '1', '2', '--no-parallel']
+    subprocess.check_call(cmd)
+    # comparing with itself finds no regression
+    subprocess.check_call(cmd + ['--baseline', out, '--tolerance', '0.99'])
+    with open(out) as f:
+        records = [json.loads(line) for line in f]
+    assert [r['case'] for r in records] == ['serial', 'singlefile'] * 2
+    assert records[0]['n_events'] == 20
+    assert records[1]['n_events'] == 20
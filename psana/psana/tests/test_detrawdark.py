@@ -0,0 +1,42 @@
+import numpy as np
+from functools import reduce
+from psana.pscalib.calibprod.DetRawDarkProc import merge_stats, merge_sums
+
+def partial(block):
+    """partial_stats-like dict of a (nevents, ...) block of accepted pixel values"""
+    n = np.full(block.shape[1:], block.shape[0], dtype=np.int64)
+    mean = block.mean(axis=0)
+    return {'shape'     : block.shape[1:],
+            'counter'   : block.shape[0],
+            'ev1_time'  : (block.shape[0], 0),
+            'n'         : n,
+            'mean'      : mean,
+            'm2'        : np.square(block - mean).sum(axis=0),
+            'sta_int_lo': (block < 100).sum(axis=0),
+            'sta_int_hi': (block > 300).sum(axis=0),
+            'arr_max'   : block.max(axis=0),
+            'arr_min'   : block.min(axis=0),
+           }
+
+def test_merge_stats():
+    rng = np.random.RandomState(0)
+    data = rng.normal(200, 30, (1000, 4, 5))
+    data[:, 0, 0] += 1e6 # large offset, where sum-of-squares loses precision
+    parts = [partial(block) for block in np.split(data, [1, 150, 151, 600])]
+    merged = reduce(merge_stats, [None] + parts[:2] + [None] + parts[2:])
+    ref = partial(data)
+    assert merged['counter'] == 1000
+    assert merged['ev1_time'] == (1, 0)
+    assert np.array_equal(merged['n'], ref['n'])
+    assert np.allclose(merged['mean'], ref['mean'], rtol=1e-12)
+    assert np.allclose(merged['m2'], ref['m2'], rtol=1e-9)
+    for k in ('sta_int_lo', 'sta_int_hi', 'arr_max', 'arr_min'):
+        assert np.array_equal(merged[k], ref[k])
+
+def test_merge_sums():
+    a = (np.ones(3, dtype=np.int64), np.arange(3.), np.arange(3.)**2, 7)
+    b = (np.ones(3, dtype=np.int64), np.ones(3), np.ones(3), 5)
+    assert merge_sums(None, None) is None
+    assert merge_sums(a, None) is a
+    s = merge_sums(a, b)
+    assert s[0].tolist() == [2, 2, 2] and s[1].tolist() == [1, 2, 3] and s[3] == 12
@@ -0,0 +1,39 @@
+import os
+import time
+import threading
+
+from psana.psexp.file_watcher import FileGrowthWatcher
+
+def _check_wait(tmp_path, use_inotify):
+    fname = os.path.join(str(tmp_path), 'data-r0001-s00.smd.xtc2')
+    open(fname, 'wb').close()
+    fd = os.open(fname, os.O_RDONLY)
+    os.environ['PS_SMD_INOTIFY'] = '1' if use_inotify else '0'
+    try:
+        watcher = FileGrowthWatcher([fd])
+        assert not watcher.wait(0.05) # nothing written yet
+
+        def append():
+            time.sleep(0.1)
+            with open(fname, 'ab') as f: f.write(b'\0'*24)
+        t = threading.Thread(target=append)
+        t.start()
+        st = time.time()
+        assert watcher.wait(5)
+        assert time.time() - st < 1 # woke up on growth, not on timeout
+        t.join()
+        watcher.close()
+    finally:
+        del os.environ['PS_SMD_INOTIFY']
+        os.close(fd)
+
+def test_wait_inotify(tmp_path):
+    _check_wait(tmp_path, True)
+
+def test_wait_polling(tmp_path):
+    _check_wait(tmp_path, False)
+
+if __name__ == "__main__":
+    import tempfile
+    test_wait_inotify(tempfile.mkdtemp())
+    test_wait_polling(tempfile.mkdtemp())
@@ -19,6 +19,15 @@ def test_hsd():
         if not wfs: assert wfs is None
         if not fex: assert fex is None
 
+        # packed peaks are empty arrays if there are no entries, as for a batch
+        packed = det.hsd.peaks_packed(evt)
+        batch = det.hsd.peaks_packed_batch([evt])
+        assert sorted(packed) == sorted(batch)
+        for key in packed:
+            assert packed[key].dtype == batch[key].dtype
+            assert (packed[key] == batch[key]).all()
+        if not fex: assert packed['length'].size == 0 and packed['samples'].size == 0
+
         if wfs:
             for ndigi,(digitizer,wfsdata) in enumerate(wfs.items()):
                 times = wfsdata['times']
@@ -41,6 +50,16 @@ def test_hsd():
                             assert (peak==raw).all(), (peak, raw)
                 assert nfex == 0, nfex # enumerate counting from zero
             assert ndigi == 1, ndigi # enumerate counting from zero
+
+            # packed peaks must agree with the per-channel peaks
+            packed = det.hsd.peaks_packed(evt)
+            npeaks = sum([len(fexchan[0]) for fexdata in fex.values() for fexchan in fexdata.values()])
+            assert packed['length'].size == npeaks
+            for seg,chan,start,length,offset in zip(packed['segment'],packed['channel'],packed['start'],
+                                                    packed['length'],packed['offset']):
+                startpos,peaks = fex[seg][chan]
+                ipeak = startpos.index(start)
+                assert (packed['samples'][offset:offset+length]==peaks[ipeak]).all()
         if nevt == 20: break # stop early since this xtc file has incomplete dg
     assert(nevt>0) # make sure we received events
 
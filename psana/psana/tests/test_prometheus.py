@@ -0,0 +1,74 @@
+import os
+import glob
+import queue
+import threading
+
+import psana.psexp.prometheus_manager as pm
+from psana.psexp.prometheus_manager import PrometheusManager, load_metric_files
+
+class QueueComm(object):
+    """ Minimal stand-in for an mpi4py communicator where all ranks are
+    threads of this process sharing one queue for messages to rank 0."""
+    def __init__(self, rank, size, inbox):
+        self.rank, self.size, self.inbox = rank, size, inbox
+    def Get_rank(self): return self.rank
+    def Get_size(self): return self.size
+    def send(self, obj, dest=0): self.inbox.put(obj)
+    def Iprobe(self): return not self.inbox.empty()
+    def recv(self): return self.inbox.get()
+
+def _value(values, name, **labels):
+    return values[(name, tuple(sorted(labels.items())))]
+
+def test_deltas():
+    h = PrometheusManager.get_metric('psana_bd_read_secs').labels('None')
+    deltas = pm.MetricDeltas(pm.registry)
+    deltas.get()
+    h.observe(0.002)
+    h.observe(0.2)
+    increments, gauges = deltas.get()
+    inc = {(name, labels): value for name, labels, value in increments}
+    assert _value(inc, 'psana_bd_read_secs_count', endpoint='None') == 2
+    assert _value(inc, 'psana_bd_read_secs_bucket', endpoint='None', le='0.005') == 1
+    assert deltas.get() == ([], [])
+
+def test_aggregate(monkeypatch):
+    monkeypatch.setenv('PS_PROMETHEUS_MODE', 'aggregate')
+    pushed = []
+    def push_to_gateway(gateway, job, grouping_key, registry):
+        pushed.append(pm._snapshot(registry)[0])
+    monkeypatch.setattr(pm, 'push_to_gateway', push_to_gateway)
+
+    size = 4
+    c = PrometheusManager.get_metric('psana_bd_read')
+    before = c.labels('evts', 'None')._value.get()
+    inbox = queue.Queue()
+    e = threading.Event()
+    threads = [threading.Thread(target=PrometheusManager('test').push_metrics,
+        args=(e, rank, QueueComm(rank, size, inbox))) for rank in range(size)]
+    for t in threads: t.start()
+    c.labels('evts', 'None').inc(10)
+    e.set()
+    for t in threads: t.join(10)
+    assert not any(t.is_alive() for t in threads)
+    # all ranks share one registry here: each sends the same increment
+    total = _value(pushed[-1], 'psana_bd_read_total', unit='evts', endpoint='None')
+    assert total - size * before == size * 10
+
+def test_file(tmp_path, monkeypatch):
+    monkeypatch.setenv('PS_PROMETHEUS_MODE', 'file')
+    monkeypatch.setenv('PS_PROMETHEUS_DIR', str(tmp_path))
+    e = threading.Event()
+    t = threading.Thread(target=PrometheusManager('test').push_metrics, args=(e, 0))
+    t.start()
+    h = PrometheusManager.get_metric('psana_mpi_wait_secs')
+    h.labels('bd_wait_eb').observe(0.5)
+    h.labels('bd_wait_eb').observe(0.5)
+    e.set()
+    t.join(10)
+    values = load_metric_files(glob.glob(os.path.join(str(tmp_path), 'psana_metrics_test_r0.jsonl')))
+    assert _value(values, 'psana_mpi_wait_secs_count', endpoint='bd_wait_eb') == 2
+    assert _value(values, 'psana_mpi_wait_secs_sum', endpoint='bd_wait_eb') == 1.0
+
+if __name__ == "__main__":
+    test_deltas()
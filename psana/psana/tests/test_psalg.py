@@ -135,12 +135,40 @@ def test_peakFinder():
 
 #------------------------------
 
+def test_peaks_batch():
+    import numpy as np
+    from psana.peakFinder.pypsalg import peaks_adaptive, peaks_droplet, peaks_adaptive_batch, peaks_droplet_batch,\
+                                         list_of_peak_parameters, numpy_2d_arr_of_peak_parameters
+
+    nevts, sh = 3, (4,185,388)
+    np.random.seed(42)
+    data = np.array(200 + 25*np.random.standard_normal((nevts,)+sh), dtype=np.double)
+    data[:,:,50:53,60:63] += 1000 # one peak per segment
+    mask = np.ones(sh, dtype=np.uint16)
+
+    for nthreads in (1, 4):
+        peaks = peaks_adaptive_batch(data, mask, rank=5, r0=7.0, dr=2.0, nsigm=3, son_min=8, nthreads=nthreads)
+        assert len(peaks) >= nevts*sh[0]
+        assert np.all(np.diff(peaks['evt']*sh[0] + peaks['seg']) >= 0) # ordered by event and segment
+        for evt in range(nevts):
+            ref = peaks_adaptive(data[evt], mask, rank=5, r0=7.0, dr=2.0, nsigm=3, son_min=8)
+            assert list_of_peak_parameters(peaks[peaks['evt']==evt]) == list_of_peak_parameters(ref)
+
+        peaks = peaks_droplet_batch(data - 200, None, 50, 80, rank=5, son_min=5.5, nthreads=nthreads)
+        for evt in range(nevts):
+            ref = peaks_droplet(data[evt] - 200, mask, 50, 80, rank=5, son_min=5.5)
+            assert np.array_equal(numpy_2d_arr_of_peak_parameters(peaks[peaks['evt']==evt]),\
+                                  numpy_2d_arr_of_peak_parameters(ref))
+
+#------------------------------
+
 def usage(tname):
     s = 'Usage: python test_psalg <test-number>'
     if tname in ('0',)    : s+='\n 0 - test ALL (default)'
     if tname in ('0','1') : s+='\n 1 - test peakFinder'
     if tname in ('0','2') : s+='\n 2 - test cfd'
     if tname in ('0','3') : s+='\n 3 - test hexanode'
+    if tname in ('0','4') : s+='\n 4 - test peaks_batch'
     return s
 
 #------------------------------
@@ -153,6 +181,7 @@ if __name__ == '__main__':
     if tname in ('0','1') : test_peakFinder()
     if tname in ('0','2') : test_cfd()
     if tname in ('0','3') : test_hexanode()
+    if tname in ('0','4') : test_peaks_batch()
     print('%s' % usage(tname))
     sys.exit('END OF TEST %s' % tname)
 
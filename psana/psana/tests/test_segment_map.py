@@ -0,0 +1,72 @@
+import subprocess
+import numpy as np
+from psana import DataSource
+from setup_input_files import setup_input_files
+
+def walk(evt):
+    """ {(det_name, drp_class_name): {segment: drp_class}} looked up in all
+    the dgrams of the event, as Event did for every event """
+    det_segments = {}
+    for d in evt._dgrams:
+        if not d: continue
+        for det_name, segment_dict in d.__dict__.items():
+            if det_name.startswith('_'): continue
+            for segment, det in segment_dict.items():
+                for drp_class_name, drp_class in det.__dict__.items():
+                    det_segments.setdefault((det_name, drp_class_name), {})[segment] = drp_class
+    return det_segments
+
+def same_segments(segs, ref):
+    return segs.keys() == ref.keys() and all(segs[seg] is ref[seg] for seg in ref)
+
+def test_segment_map(tmp_path):
+    # xppcspad has segments 0,1 in the first file and 2,3 in the second one
+    setup_input_files(tmp_path, gen_run2=False)
+    ds = DataSource(exp='xpptut13', run=1, dir=str(tmp_path / '.tmp'))
+    run = next(ds.runs())
+    segment_map = run.configinfo_dict['xppcspad'].segment_map['raw']
+    assert [seg for _, seg in segment_map] == [0, 1, 2, 3]
+    assert len({pos for pos, _ in segment_map}) == 2
+    for pos, seg in segment_map:
+        assert seg in run.dm.configs[pos].software.xppcspad
+
+    det = run.Detector('xppcspad')
+    legacy = run.Detector('xppcspad')
+    legacy.raw._segment_positions = None # look up segments in the event
+    nevt = 0
+    for evt in run.events():
+        ref = walk(evt)
+        assert evt._det_segments.keys() == ref.keys()
+        for key in ref:
+            assert same_segments(evt._det_segments[key], ref[key])
+        segs = det.raw._segments(evt)
+        assert same_segments(segs, ref[('xppcspad', 'raw')])
+        assert same_segments(legacy.raw._segments(evt), segs)
+        assert np.array_equal(det.raw.calib(evt),
+                              np.stack([ref[('xppcspad', 'raw')][seg].arrayRaw for seg in range(4)]))
+        nevt += 1
+    assert nevt > 0
+
+    # a missing dgram: the detector is missing from the event
+    pos = segment_map[-1][0]
+    evt._replace(pos, None)
+    assert det.raw._segments(evt) is None
+    assert legacy.raw._segments(evt) is None
+    assert set(evt._det_segments[('xppcspad', 'raw')]) == {seg for p, seg in segment_map if p != pos}
+
+def test_segment_fields(tmp_path):
+    # fields made by _add_fields read the first segment
+    fname = str(tmp_path / 'data.xtc2')
+    subprocess.call(['xtcwriter', '-f', fname])
+    ds = DataSource(files=fname)
+    run = next(ds.runs())
+    det = run.Detector('xppcspad')
+    det.raw._add_fields()
+    nevt = 0
+    for evt in run.events():
+        ref = walk(evt)[('xppcspad', 'raw')]
+        assert sorted(ref) == [0, 1]
+        assert same_segments(det.raw._segments(evt), ref)
+        assert np.array_equal(det.raw.arrayRaw(evt), ref[0].arrayRaw)
+        nevt += 1
+    assert nevt > 0
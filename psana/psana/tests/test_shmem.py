@@ -15,10 +15,14 @@ class Test:
         cmd_args = ['shmemServer','-c',str(client_count),'-n','10','-f',tmp_file,'-p','shmem_test_'+pid,'-s','0x80000']
         return subprocess.Popen(cmd_args)
 
-    def launch_client(self,pid):
+    def launch_client(self,pid,batched=False):
         shmem_file = os.path.dirname(os.path.realpath(__file__))+'/shmem_client.py'  
         cmd_args = ['python',shmem_file,pid]
-        return subprocess.Popen(cmd_args)
+        env = dict(os.environ)
+        if batched:
+            cmd_args.append('batch')
+            env['PS_SHMEM_BATCH_SIZE'] = '8'
+        return subprocess.Popen(cmd_args, env=env)
                 
     @staticmethod
     def setup_input_files(tmp_path):
@@ -29,6 +33,12 @@ class Test:
         return tmp_file
         
     def test_shmem(self, tmp_path):
+        self.run_shmem(tmp_path, batched=False)
+
+    def test_shmem_batched(self, tmp_path):
+        self.run_shmem(tmp_path, batched=True)
+
+    def run_shmem(self, tmp_path, batched):
         cli = []
         pid = str(os.getpid())
         tmp_file = self.setup_input_files(tmp_path)
@@ -36,7 +46,7 @@ class Test:
         assert srv != None,"server launch failure"
         try:
             for i in range(client_count):
-              cli.append(self.launch_client(pid))
+              cli.append(self.launch_client(pid,batched))
               assert cli[i] != None,"client "+str(i)+ " launch failure"
         except:
             srv.kill()
@@ -4,6 +4,7 @@ import IPython
 
 from psana import DataSource
 from psana.pyalgos.generic.edgefinder import EdgeFinder
+from psana.detector.timetool import parse_frames
 import matplotlib.pyplot as plt
 
 def twos_complement(hexstr,bits):
@@ -25,6 +26,8 @@ def test_timetool():
 
     firmware_edges = []
     software_edges = []
+    images = []
+    parsed_frames = []
 
     dir_path = os.path.dirname(os.path.realpath(__file__))
     ds = DataSource(files=os.path.join(dir_path,'test_timetool.xtc2'))
@@ -38,6 +41,8 @@ def test_timetool():
         parsed_frame_object = tt_detector_object.ttalg.parsed_frame(evt)
 
         image = tt_detector_object.ttalg._image(evt)
+        images.append(image)
+        parsed_frames.append(parsed_frame_object)
 
         #known good length values that a raw frame can take
         assert image.shape == (2208,) or image.shape == (144,) or image.shape == (4272,)
@@ -57,6 +62,15 @@ def test_timetool():
             #validating that we're getting the correct number of pixels from the firmware
             assert len(parsed_frame_object.background_frame) == 2048
 
+    #batch parser gives the same results as the per event one
+    batch = parse_frames(images)
+    assert np.array_equal(batch.edge_position, [p.edge_position for p in parsed_frames])
+    for i, p in enumerate(parsed_frames):
+        assert (batch.prescaled_frame[i] is None) == (p.prescaled_frame is None)
+        assert (batch.background_frame[i] is None) == (p.background_frame is None)
+        if p.prescaled_frame is not None:
+            assert np.array_equal(batch.prescaled_frame[i], p.prescaled_frame)
+
     my_cov = np.cov(firmware_edges,software_edges)  #need to separate out clusters of outliers here.
     print("covariance  = ",my_cov[0,1]/my_cov[0,0])
     assert nevt==1324
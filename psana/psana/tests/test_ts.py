@@ -10,10 +10,20 @@ def test_ts():
     myrun = next(ds.runs())
     det = myrun.Detector('xppts')
 
+    events = []
     for nevt,evt in enumerate(myrun.events()):
         info = det.ts.info(evt)
         seqinfo = det.ts.sequencer_info(evt)
+        events.append((evt, info, seqinfo))
     assert nevt==1
 
+    batch = det.ts.info_batch([evt for evt, _, _ in events])
+    for i, (evt, info, seqinfo) in enumerate(events):
+        assert batch['valid'][i]
+        for name, value in info._asdict().items():
+            assert batch[name][i] == value
+        assert np.array_equal(batch['sequencer'][i], seqinfo)
+        assert np.array_equal(batch['eventcodes'][i], det.ts.eventcodes(evt))
+
 if __name__ == "__main__":
     test_ts()
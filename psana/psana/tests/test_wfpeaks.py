@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from psana.hexanode.WFPeaks import WFPeaks
+
+NCHS, NSAMPLES, DT = 5, 8000, 2.5e-10
+
+def waveforms(nevents, seed=0):
+    """Noisy baseline with a few negative gaussian pulses per channel"""
+    rng = np.random.RandomState(seed)
+    x = np.arange(NSAMPLES)
+    wfs = 0.05 + rng.normal(0, 0.002, (nevents, NCHS, NSAMPLES))
+    for iev in range(nevents):
+        for ch in range(NCHS):
+            for pos in rng.choice(np.arange(1000, 7500, 150), rng.randint(1, 8), replace=False):
+                wfs[iev,ch] -= rng.uniform(0.1, 0.4)*np.exp(-0.5*((x-pos-rng.uniform())/4)**2)
+    wts = np.tile(np.arange(NSAMPLES)*DT, (NCHS, 1))
+    return wfs, wts
+
+def peak_finder(version):
+    kwargs = {'numchs': NCHS, 'numhits': 16, 'version': version}
+    for p in ('cfd', 'pf2', 'pf3'):
+        kwargs.update({p+'_ioffsetbeg': 0, p+'_ioffsetend': 800, p+'_wfbinbeg': 800, p+'_wfbinend': NSAMPLES})
+    kwargs.update({'cfd_thr': -0.05, 'cfd_cfr': 0.85, 'cfd_deadtime': 10.0, 'cfd_leadingedge': True,
+                   'pf2_sigmabins': 3, 'pf2_nstdthr': -5, 'pf2_deadbins': 10,
+                   'pf3_sigmabins': 3, 'pf3_basebins': 100, 'pf3_nstdthr': 5, 'pf3_gapbins': 100, 'pf3_deadbins': 20})
+    kwargs['paramsCFD'] = [{'delay': 2e-9, 'fraction': 0.35, 'offset': 0.05, 'polarity': 'Negative',
+                            'sample_interval': DT, 'threshold': 0.05, 'walk': 0,
+                            'timerange_low': 1e-7, 'timerange_high': 1.9e-6} for ch in range(NCHS)]
+    return WFPeaks(**kwargs)
+
+@pytest.mark.parametrize('version', [1, 2, 3, 4])
+def test_proc_waveforms_batch(version):
+    wfs, wts = waveforms(4)
+    nhits, pkinds, pkvals, pktsec = peak_finder(version).proc_waveforms_batch(wfs, wts, nthreads=2)
+    assert nhits.shape == (4, NCHS) and pkinds.shape == (4, NCHS, 16)
+    assert nhits.sum() > 0
+
+    o = peak_finder(version)
+    for iev in range(wfs.shape[0]):
+        wf = wfs[iev].copy()
+        nh = o.number_of_hits(wf, wts).copy()
+        tsec = o.peak_times_sec(wf, wts)
+        inds, vals = o.peak_indexes_values(wf, wts)
+        assert np.array_equal(nhits[iev], nh)
+        for ch in range(NCHS):
+            n = nh[ch]
+            assert np.array_equal(pkinds[iev,ch,:n], inds[ch,:n])
+            assert np.allclose(pkvals[iev,ch,:n], vals[ch,:n])
+            assert np.allclose(pktsec[iev,ch,:n], tsec[ch,:n], rtol=0, atol=1e-15)
+            assert not pkinds[iev,ch,n:].any() and not pktsec[iev,ch,n:].any()
@@ -90,6 +90,23 @@ class Test:
         })
         subprocess.check_call(['legion_python', 'user_callbacks', '-ll:py', '1'], env=env)
 
+    @pytest.mark.legion
+    @pytest.mark.skipif(sys.platform == 'darwin', reason="psana with legion not supported on mac")
+    def test_legion_pipeline(self, tmp_path):
+        # several smd chunks, with their bigdata tasks, in flight on two
+        # python processors
+        setup_input_files(tmp_path)
+
+        pipeline = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'legion_pipeline.py')
+        for inflight in ['1', '4']:
+            env = dict(list(os.environ.items()) + [
+                ('PS_PARALLEL', 'legion'),
+                ('PS_SMD_N_EVENTS', '2'),
+                ('PS_LEGION_INFLIGHT', inflight),
+                ('TEST_XTC_DIR', str(tmp_path)),
+            ])
+            subprocess.check_call(['legion_python', pipeline, '-ll:py', '2'], env=env)
+
     def test_run_pickle(self, tmp_path):
         # Test that run is pickleable
         setup_input_files(tmp_path)
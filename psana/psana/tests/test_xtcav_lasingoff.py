@@ -0,0 +1,77 @@
+import types
+import numpy as np
+import psana.xtcav.Constants as cons
+import psana.xtcav.ClusteringUtils as cu
+import psana.xtcav.LasingOffReference as lor
+
+def test_find_opt_groups():
+    rng = np.random.RandomState(0)
+    t = np.linspace(-1., 1., 60)
+    X = np.array([np.exp(-0.5*((t-c)/0.2)**2) for c in rng.choice([-0.5, 0., 0.5], 40)]) \
+      + rng.normal(0, 0.05, (40, t.size))
+    opt = []
+    for nprocs in [1, 2]:
+        np.random.seed(1) # reference sets
+        opt.append(cu.findOptGroups(X, 10, B=8, nprocs=nprocs))
+    assert opt[0] == opt[1]
+
+class FakeComm:
+    """Communicator of a single rank"""
+    def Get_rank(self): return 0
+    def Get_size(self): return 1
+    def gather(self, obj, root=0): return [obj]
+    def reduce(self, obj, root=0): return obj
+
+class FakeRun:
+    expt, runnum = 'amox23616', 131
+    def __init__(self, nevents):
+        self.nevents, self.nread = nevents, 0
+    def Detector(self, name):
+        return name
+    def events(self):
+        for i in range(self.nevents):
+            self.nread += 1
+            # every third event has no image
+            yield types.SimpleNamespace(i=i, img=None if i%3==0 else np.ones((4,4)))
+
+class FakeDataSource:
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.comms = types.SimpleNamespace(psana_comm=FakeComm(), bd_group=FakeComm)
+        self.run = FakeRun(min(kwargs.get('max_events') or 1000, 1000))
+        sources.append(self)
+    def runs(self):
+        yield self.run
+
+sources = []
+
+def test_parallel_reference(monkeypatch):
+    averaged = []
+    monkeypatch.setattr(lor, 'DataSource', FakeDataSource)
+    monkeypatch.setattr(lor.xtup, 'get_calibconst', lambda *args: ({}, {}))
+    monkeypatch.setattr(lor.xtu, 'xtcav_calib_object_from_dict', lambda d: types.SimpleNamespace(ROI=None, image=None))
+    monkeypatch.setattr(lor.xtup, 'get_attribute', lambda det, name: (lambda evt: evt.img) if name=='raw' else name)
+    monkeypatch.setattr(lor.LasingOffReference, '_getCalibrationValues', staticmethod(lambda *args: (1, 2, 3)))
+    monkeypatch.setattr(lor.xtup, 'getShotToShotParameters', lambda evt, *args: types.SimpleNamespace(valid=True, i=evt.i))
+    monkeypatch.setattr(lor.xtu, 'processImage', lambda img, pars, dark, cal, sat, roi, sts: (sts.i, None))
+    def average(profiles, num_groups, nprocs):
+        averaged.append((profiles, nprocs))
+        return None, num_groups
+    monkeypatch.setattr(lor.xtu, 'averageXTCAVProfilesGroups', average)
+
+    args = types.SimpleNamespace(experiment='amox23616', run=131, dir='/xtc', max_shots=50,
+                                 num_groups=5, save_to_file=False)
+    o = lor.LasingOffReference(args)
+    ds = sources[-1]
+    assert ds.kwargs == {'exp': 'amox23616', 'run': 131, 'dir': '/xtc', 'max_events': cons.EVENTS_PER_SHOT*50}
+    # the rank reads the bounded run to its end, the profiles of its first 50 images are gathered
+    assert ds.run.nread == cons.EVENTS_PER_SHOT*50
+    profiles, nprocs = averaged[-1]
+    assert profiles == [i for i in range(75) if i%3][:50]
+    assert nprocs == 1 and o.n == 50
+
+    # max_events 0 reads the whole run
+    args.max_events = 0
+    lor.LasingOffReference(args)
+    assert sources[-1].kwargs['max_events'] == 0 and sources[-1].run.nread == 1000
+    assert len(averaged[-1][0]) == 50
@@ -0,0 +1,105 @@
+import types
+import numpy as np
+import scipy.interpolate
+import psana.xtcav.Utils as xtu
+import psana.xtcav.LasingOnCharacterization as lon
+
+NT, NGROUPS = 200, 4
+
+def gaussian(x, x0, w):
+    return np.exp(-0.5*((x-x0)/w)**2)
+
+def averaged_profiles():
+    """Lasing off reference of one bunch with NGROUPS groups of different current shapes"""
+    t = np.linspace(-50., 50., NT)
+    eCurrent  = np.array([1e17*gaussian(t, c, w) for c, w in [(-10, 8), (0, 12), (5, 6), (15, 10)]])
+    eCOMslice = np.array([0.02*k*t for k in range(1, NGROUPS+1)])
+    eRMSslice = np.array([1. + 0.1*k*gaussian(t, 0, 20) for k in range(NGROUPS)])
+    return xtu.AveragedProfiles(t, [eCurrent], [eCOMslice], [eRMSslice], [np.zeros(NGROUPS)], [np.zeros(NGROUPS)],
+                                None, None, 1, None, None)
+
+def image_profiles(nshots, seed=0):
+    rng = np.random.RandomState(seed)
+    xfs = np.linspace(-60., 60., 240)
+    profiles = []
+    for i in range(nshots):
+        xProfile = gaussian(xfs, rng.uniform(-12, 16), rng.uniform(6, 12)) + rng.uniform(0, 0.01, xfs.size)
+        stats = xtu.ImageStatistics(imfrac=1., xProfile=xProfile/xProfile.sum(), yProfile=None,
+                                    xCOM=100., yCOM=50., yCOMslice=50. + 0.3*xfs + rng.normal(0, 0.5, xfs.size),
+                                    yRMSslice=12. + rng.normal(0, 0.5, xfs.size))
+        units = xtu.PhysicalUnits(xfs=xfs, yMeV=None, xfsPerPix=0.5, yMeVPerPix=0.1, valid=1)
+        profiles.append(xtu.ImageProfile([stats], None, xtu.ShotToShotParameters(unixtime=0, fiducial=i), units))
+    return profiles
+
+def test_prepared_reference():
+    ref = averaged_profiles()
+    for profile in image_profiles(8):
+        pc = xtu.processLasingSingleShot(profile, ref)
+        stats, units = profile.image_stats[0], profile.physical_units
+        # interpolation to master time as scipy interp1d with zeros outside
+        dt_old = units.xfs[1] - units.xfs[0]
+        eCurrent = stats.xProfile/(dt_old*xtu.cons.FS_TO_S)*profile.shot_to_shot.dumpecharge/xtu.cons.E_CHARGE
+        interp = scipy.interpolate.interp1d(units.xfs, eCurrent, kind='linear', fill_value=0, bounds_error=False)
+        assert np.allclose(pc.lasingECurrent[0], interp(ref.t), rtol=1e-12)
+        # best group as the highest np.corrcoef
+        corr = [np.corrcoef(pc.lasingECurrent[0], g)[0,1] for g in ref.eCurrent[0]]
+        assert pc.groupnum[0] == np.argmax(corr)
+        # the same with the reference prepared once
+        pc2 = xtu.processLasingSingleShot(profile, ref, xtu.prepareLasingOffReference(ref))
+        assert np.array_equal(pc.powerECOM, pc2.powerECOM) and np.array_equal(pc.powerERMS, pc2.powerERMS)
+
+def test_process_images(monkeypatch):
+    ref = averaged_profiles()
+    profiles = image_profiles(6)
+    o = lon.LasingOnCharacterization.__new__(lon.LasingOnCharacterization)
+    o._calibrationsset = True
+    o._lasingoffreference = types.SimpleNamespace(averaged_profiles=ref)
+    o._lasingoffcache = xtu.prepareLasingOffReference(ref)
+    o.parameters = o._darkreference = o._global_calibration = o._saturation_value = o._roixtcav = None
+    # images are indexes of the synthetic profiles
+    monkeypatch.setattr(xtu, 'processImage', lambda img, *args: (profiles[int(img)], None))
+
+    images = [np.array(i) for i in range(len(profiles))]
+    images[2] = None
+    shots = [xtu.ShotToShotParameters(unixtime=0, fiducial=i, valid=(i!=4)) for i in range(len(profiles))]
+    t, powerECOM, powerERMS, valid = o.processImages(images, shots)
+
+    assert valid.tolist() == [True, True, False, True, False, True]
+    assert np.array_equal(t, ref.t) and powerECOM.shape == (6, 1, NT)
+    for i, profile in enumerate(profiles):
+        if not valid[i]:
+            assert not powerECOM[i].any() and not powerERMS[i].any()
+            continue
+        pc = xtu.processLasingSingleShot(profile, ref)
+        assert np.array_equal(powerECOM[i], pc.powerECOM)
+        assert np.array_equal(powerERMS[i], pc.powerERMS)
+    # results of the last image are kept as for processEvent
+    assert np.array_equal(o._pulse_characterization.powerECOM, powerECOM[-1])
+
+def test_reference_cache(monkeypatch):
+    loads = []
+    pars = types.SimpleNamespace(num_bunches=1, snr_filter=10, roi_expand=2.5, roi_fraction=0.001,
+                                 island_split_method='scipyLabel', island_split_par1=3., island_split_par2=5.)
+    def load_lasingoff(path):
+        loads.append(path)
+        return types.SimpleNamespace(averaged_profiles=averaged_profiles(), parameters=pars)
+    def load_dark(path):
+        loads.append(path)
+        return types.SimpleNamespace(image=None, ROI=None)
+    monkeypatch.setattr(lon.LasingOffReference, 'load', load_lasingoff)
+    monkeypatch.setattr(lon.DarkBackgroundReference, 'load', load_dark)
+
+    lon.clearReferenceCache()
+    args = types.SimpleNamespace(dark_reference_path='dark.h5', lasingoff_reference_path='lasingoff.h5')
+    o1 = lon.LasingOnCharacterization(args, None, types.SimpleNamespace())
+    o2 = lon.LasingOnCharacterization(args, None, types.SimpleNamespace())
+    assert loads == ['dark.h5', 'lasingoff.h5']
+    assert o2._lasingoffreference is o1._lasingoffreference
+    assert o2._lasingoffcache is o1._lasingoffcache
+    assert o2._lasingoffcache.averaged_profiles is o1._lasingoffreference.averaged_profiles
+
+    lon.clearReferenceCache()
+    o3 = lon.LasingOnCharacterization(args, None, types.SimpleNamespace())
+    assert loads == ['dark.h5', 'lasingoff.h5']*2
+    assert o3._lasingoffreference is not o1._lasingoffreference
+    lon.clearReferenceCache()
@@ -1,6 +1,12 @@
+import logging
+logger = logging.getLogger(__name__)
+
+import os
 import numpy as np
 import scipy.interpolate
 import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import cv2
 import scipy.io
 import math
@@ -76,20 +82,18 @@ def hierarchicalClustering(X, num_clusters, distance='euclidean'):
     return model.labels_
 
 
-def findOptGroups(X, max_num, method='hierarchical', B=30, use_SVD=True):
+def findOptGroups(X, max_num, method='hierarchical', B=30, use_SVD=True, nprocs=1):
     """
     Helper function to find optimal # of groups for profiles using the Gap Statistic
     Arguments:
       X: profiles to group
       B: number of reference groups to generate
       max_num: maximum number of groups allowed
+      nprocs: number of processes clustering the reference sets (default 1: no pool, None: all cpus)
     Output
       opt: the optimal number of groups for this data
     """
     num_profiles, t = X.shape
-    rand_cluster_variance = {}
-    true_cluster_variance = {}
-    sd = {}
 
     if use_SVD:
         #use the SVD of profiles to cluster. Speeds things up a lot...
@@ -117,30 +121,45 @@ def findOptGroups(X, max_num, method='hierarchical', B=30, use_SVD=True):
     min_clusters = 2
     step = 1 if max_num - min_clusters <= 15 else 2 if max_num - min_clusters <= 30 else 3 #choose step size of 1, 2 or 3
     clusters = list(range(min_clusters+step, max_num+step, step))
-    gap_statistic[min_clusters], _ = calculateGapStatistic(min_clusters, X, reference_sets, method=method)
-    
-    for clus in clusters:
-        gap_statistic[clus], sd[clus] = calculateGapStatistic(clus, X, reference_sets, method=method)
-        if gap_statistic[clus] - sd[clus]*step < gap_statistic[clus-step]:
-            return clus-step
+
+    if nprocs is None: nprocs = min(os.cpu_count(), B + 1)
+    # spawn: the caller may be an MPI rank, which should not be forked
+    pool = ProcessPoolExecutor(max_workers=nprocs, mp_context=multiprocessing.get_context('spawn')) \
+            if nprocs > 1 else None
+    try:
+        gap_statistic[min_clusters], _ = calculateGapStatistic(min_clusters, X, reference_sets, method=method, pool=pool)
+        for clus in clusters:
+            gap_statistic[clus], sd[clus] = calculateGapStatistic(clus, X, reference_sets, method=method, pool=pool)
+            logger.info('gap statistic for %d groups: %.4f +- %.4f (max. %d groups)' % (clus, gap_statistic[clus], sd[clus], max_num))
+            if gap_statistic[clus] - sd[clus]*step < gap_statistic[clus-step]:
+                return clus-step
+    finally:
+        if pool is not None: pool.shutdown()
     return max_num
 
 
-def calculateGapStatistic(n, X, reference_sets, method='hierarchical'):
+def _logClusterVariance(X, n, method):
+    groups = getGroups(X, n, method=method)
+    return np.log(calculateClusterVariance(groups, X, n))
+
+
+def calculateGapStatistic(n, X, reference_sets, method='hierarchical', pool=None):
     """
     Calculation of gap statistic for specific number of clusters
     https://statweb.stanford.edu/~gwalther/gap
 
+    The B reference sets are clustered in pool (a concurrent.futures
+    executor) when given.
     """
     B = len(reference_sets)
-    groups = getGroups(X, n, method=method)
-    true_cluster_variance = np.log(calculateClusterVariance(groups, X, n))
-    rand_variance = []
-    num_profiles = X.shape[0]
-    #fit to B random reference datasets
-    for k in range(B):        
-        groups = getGroups(reference_sets[k], n, method=method)
-        rand_variance.append(np.log(calculateClusterVariance(groups, reference_sets[k], n)))
+    if pool is None:
+        true_cluster_variance = _logClusterVariance(X, n, method)
+        #fit to B random reference datasets
+        rand_variance = [_logClusterVariance(ref, n, method) for ref in reference_sets]
+    else:
+        futures = [pool.submit(_logClusterVariance, x, n, method) for x in [X] + reference_sets]
+        true_cluster_variance = futures[0].result()
+        rand_variance = [f.result() for f in futures[1:]]
     rand_cluster_variance = np.mean(rand_variance)
     sd = np.std(rand_variance)* np.sqrt(1+1./B)
     gap_statistic = rand_cluster_variance - true_cluster_variance
@@ -155,7 +174,7 @@ def calculateClusterVariance(assignments, data, num_clusters):
     for group in range(num_clusters):
         points = data[assignments == group,:]
         center = np.mean(points, axis = 0)
-        d += sum(np.apply_along_axis(lambda x: np.linalg.norm(x - center)**2, 1, points))
+        d += np.sum((points - center)**2)
     return d
 
 def getPercentile(data, percentile=0.9):
@@ -29,16 +29,9 @@ from psana.pyalgos.generic.NDArrUtils import info_ndarr, print_ndarr
 
 import psana.pyalgos.generic.Graphics as gr
 
-## PP imports
-#from mpi4py import MPI
-#comm = MPI.COMM_WORLD
-#rank = comm.Get_rank()
-#size = comm.Get_size()
-##print('Core %s ... ready' % (rank + 1)) # useful for debugging purposes
-##sys.stdout.flush()
-
-rank = 0
-size = 1
+# Images are processed on the BigData ranks of RunParallel when an xtc
+# directory is given (mpirun -n N xtcavLasingOff ... --dir <xtc dir>),
+# the profiles are gathered on psana rank 0 which does the clustering.
 
 """
     Class that generates a set of lasing off references for XTCAV reconstruction purposes
@@ -56,6 +49,9 @@ size = 1
         roi_expand (float): number of waists that the region of interest around will span around the center of the trace.
         roi_fraction (float): fraction of pixels that must be non-zero in roi(s) of image for analysis
         island_split_method (str): island splitting algorithm. Set to 'scipylabel' or 'contourLabel'  The defaults parameter is 'scipylabel'.
+        dir (str): xtc directory; if set, the run is read with DataSource(exp, run, dir) instead of fname (parallel under mpirun).
+        max_events (int): maximum number of events read in parallel (default: EVENTS_PER_SHOT*max_shots, 0: whole run).
+        nprocs (int): number of processes for clustering the profiles (default: 1, None: all cpus).
 """
 
 class LasingOffReference():
@@ -67,7 +63,7 @@ class LasingOffReference():
 
         fname = getattr(args, 'fname', '/reg/g/psdm/detector/data2_test/xtc/data-amox23616-r0131-e000200-xtcav-v2.xtc2')
         experiment          = getattr(args, 'experiment', 'amox23616')
-        run_number          = getattr(args, 'run_number', 131)
+        run_number          = getattr(args, 'run_number', getattr(args, 'run', 131))
         max_shots           = getattr(args, 'max_shots', 401) #Maximum number of shots to process
         validity_range      = getattr(args, 'validity_range', None)
         save_to_file        = getattr(args, 'save_to_file', True)
@@ -83,6 +79,9 @@ class LasingOffReference():
         island_split_par1   = getattr(args, 'island_split_par1', 3.0)  #Ratio between number of pixels between largest and second largest groups when calling scipy.label
         island_split_par2   = getattr(args, 'island_split_par2', 5.)   #Ratio between number of pixels between second/third largest groups when calling scipy.label
         PLOT_IMAGE          = getattr(args, 'plot_image', False)
+        xtc_dir             = getattr(args, 'dir', None)     #Directory of the run for parallel processing
+        max_events          = getattr(args, 'max_events', None) #Maximum number of events read in parallel
+        nprocs              = getattr(args, 'nprocs', 1)     #Number of processes for clustering
 
         if PLOT_IMAGE :
             self.fig, self.axim, self.axcb = gr.fig_img_cbar_axes(fig=None,\
@@ -99,7 +98,20 @@ class LasingOffReference():
             island_split_par2 = island_split_par2, island_split_par1=island_split_par1, 
             calibration_path=calibration_path, fname=fname, version=1)
 
-        if rank == 0:
+        if xtc_dir:
+            # RunParallel ranks cannot stop before the run ends, bound the
+            # events read to what max_shots needs
+            if max_events is None: max_events = cons.EVENTS_PER_SHOT*max_shots
+            ds = DataSource(exp=experiment, run=run_number, dir=xtc_dir, max_events=max_events)
+        else:
+            ds = DataSource(files=fname)
+        comm = self._psanaComm(ds)
+        if comm is False: return # not a psana rank (e.g. smalldata server)
+        self.rank = 0 if comm is None else comm.Get_rank()
+        # ranks that see events: all BigData ranks in RunParallel
+        self.size = 1 if comm is None else ds.comms.bd_group().Get_size()
+
+        if self.rank == 0:
             print('Lasing off reference')
             print('\t File name: %s' % self.parameters.fname)
             print('\t Experiment: %s' % self.parameters.experiment)
@@ -112,7 +124,6 @@ class LasingOffReference():
 
         #ds = psana.DataSource("exp=%s:run=%s:idx" % (self.parameters.experiment, self.parameters.run_number))
 
-        ds = DataSource(files=fname)
         run = next(ds.runs()) # run = ds.runs().next()
         #env = SimulatorEnvironment() # ds.env()
 
@@ -157,8 +168,16 @@ class LasingOffReference():
         roi_xtcav, global_calibration, saturation_value = None, None, None
         num_processed = 0 #Counter for the total number of xtcav images processed within the run
 
+        max_shots_per_rank = np.ceil(self.parameters.max_shots/float(self.size))
+
         for nev,evt in enumerate(run.events()):
             #logger.info('Event %03d'%nev)
+            if num_processed >= max_shots_per_rank:
+                # RunParallel ranks must keep asking for events until the
+                # run (bounded by max_events) ends, only the processing is skipped.
+                if comm is None: break
+                continue
+
             img = camraw(evt)
             if img is None: continue
 
@@ -188,9 +207,6 @@ class LasingOffReference():
 
             self._printProgressStatements(num_processed)
 
-            if num_processed >= np.ceil(self.parameters.max_shots/float(size)):
-                break
-
             if PLOT_IMAGE :
 
                 nda = img
@@ -209,14 +225,19 @@ class LasingOffReference():
                 gr.show(mode='non-hold')
 
         # here gather all shots in one core, add all lists
-        #image_profiles = comm.gather(list_image_profiles, root=0)
-        image_profiles = list_image_profiles
+        if comm is None:
+            image_profiles = list_image_profiles
+        else:
+            image_profiles = comm.gather(list_image_profiles, root=0)
+            num_processed = comm.reduce(num_processed, root=0)
 
-        if rank != 0: return
+        if self.rank != 0: return
 
         sys.stdout.write('\n')
         # Flatten gathered arrays
-        #image_profiles = [item for sublist in image_profiles for item in sublist]
+        if comm is not None:
+            image_profiles = [item for sublist in image_profiles for item in sublist]
+            logger.info('Gathered %d profiles from %d ranks' % (len(image_profiles), comm.Get_size()))
 
         #for i,ipf in enumerate(image_profiles) :
         #  print('XXX image_profiles %d:\n  %s'%(i,str(ipf)))
@@ -226,7 +247,7 @@ class LasingOffReference():
             image_profiles = image_profiles[0:self.parameters.max_shots]
         
         #At the end, all the reference profiles are converted to Physical units, grouped and averaged together
-        averaged_profiles = xtu.averageXTCAVProfilesGroups(image_profiles, self.parameters.num_groups);     
+        averaged_profiles = xtu.averageXTCAVProfilesGroups(image_profiles, self.parameters.num_groups, nprocs=nprocs);     
 
         self.averaged_profiles, num_groups=averaged_profiles
         self.n=num_processed
@@ -255,11 +276,27 @@ class LasingOffReference():
     def _printProgressStatements(self, num_processed):
         # print core numb and percentage
         if num_processed % 5 == 0:
-            extrainfo = '\r' if size == 1 else '\nCore %d: '%(rank + 1)
-            sys.stdout.write('%s%.1f %% done, %d / %d' % (extrainfo, float(num_processed) / np.ceil(self.parameters.max_shots/float(size)) *100, num_processed, np.ceil(self.parameters.max_shots/float(size))))
+            extrainfo = '\r' if self.size == 1 else '\nCore %d: '%(self.rank + 1)
+            sys.stdout.write('%s%.1f %% done, %d / %d' % (extrainfo, float(num_processed) / np.ceil(self.parameters.max_shots/float(self.size)) *100, num_processed, np.ceil(self.parameters.max_shots/float(self.size))))
             sys.stdout.flush()
 
 
+    @staticmethod
+    def _psanaComm(ds):
+        """
+        Internal method. Returns the communicator of all psana ranks for
+        RunParallel, None for serial DataSources and False for ranks
+        without events (smalldata servers).
+        """
+        comms = getattr(ds, 'comms', None)
+        if comms is not None:
+            return comms.psana_comm
+        from psana.psexp.null_ds import NullDataSource
+        if isinstance(ds, NullDataSource):
+            return False
+        return None
+
+
 #    def _getDarkBackground(self, env):
 #        """
 #        DEPRECATED: Internal method. Loads dark background reference
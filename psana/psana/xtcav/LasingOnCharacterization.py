@@ -24,6 +24,15 @@ from   psana.xtcav.CalibrationPaths import CalibrationPaths
 #from psana.pscalib.calib.XtcavUtils import dict_from_xtcav_calib_object, xtcav_calib_object_from_dict
 from psana.pyalgos.generic.NDArrUtils import info_ndarr, print_ndarr
 
+#Loaded dark and lasing off references shared by all instances in the process,
+#keyed by ('file', path) or ('db', ctype, expt, runnum)
+_references = {}
+
+def clearReferenceCache():
+    """ Forgets the dark and lasing off references loaded so far (e.g. after a new reference was deployed).
+    """
+    _references.clear()
+
 class LasingOnCharacterization():
     """
     Class reconstructs the full X-Ray power time profile for single or multiple bunches, relying on the presence of a dark background reference, and a lasing off reference. (See DarkBackgroundReference and LasingOffReference for more information)
@@ -98,10 +107,18 @@ class LasingOnCharacterization():
         """
         self._darkreference = None
         if self.dark_reference_path :
-            self._darkreference = DarkBackgroundReference.load(self.dark_reference_path)
+            key = ('file', self.dark_reference_path)
+            if key not in _references:
+                _references[key] = DarkBackgroundReference.load(self.dark_reference_path)
+            self._darkreference = _references[key]
             logger.info('Using file ' + self.dark_reference_path.split('/')[-1] + ' for dark reference')
 
         if self._darkreference is None :
+            key = ('db', 'xtcav_pedestals', self.run.expt, self.run.runnum)
+            if key in _references:
+                self._darkreference = _references[key]
+                logger.info('Using dark reference from DB (cached)')
+                return
            #dark_data, dark_meta = self._camera.calibconst.get('xtcav_pedestals')
             dark_data, dark_meta = xtup.get_calibconst(self._camera, 'xtcav_pedestals', cons.DETNAME, self.run.expt, self.run.runnum)
 
@@ -111,19 +128,32 @@ class LasingOnCharacterization():
             logger.debug('==== _darkreference.ROI:\n%s'% str(self._darkreference.ROI))
             logger.debug(info_ndarr(self._darkreference.image, '==== darkreference.image:'))
             logger.info('Using dark reference from DB')
+            _references[key] = self._darkreference
 
                 
     def _loadLasingOffReference(self):
         """ Loads the lasing off reference parameters from file or DB or set them to default.
         """
         self._lasingoffreference = None
+        self._lasingoffcache = None
             
         if self.lasingoff_ref_path:
-            self._lasingoffreference = LasingOffReference.load(self.lasingoff_ref_path)
+            key = ('file', self.lasingoff_ref_path)
+            if key not in _references:
+                lofr = LasingOffReference.load(self.lasingoff_ref_path)
+                _references[key] = (lofr, xtu.prepareLasingOffReference(lofr.averaged_profiles))
+            self._lasingoffreference, self._lasingoffcache = _references[key]
             logger.info('Using lasing off reference from file %s'%self.lasingoff_ref_path.split('/')[-1])
             self._setLasingOffReferenceParameters()
             return
 
+        key = ('db', 'xtcav_lasingoff', self.run.expt, self.run.runnum)
+        if key in _references:
+            self._lasingoffreference, self._lasingoffcache = _references[key]
+            logger.info('Using lasing off reference from DB (cached)')
+            self._setLasingOffReferenceParameters()
+            return
+
         if self._lasingoffreference is None:
             #lofr_data, lofr_meta = self._camera.calibconst.get('xtcav_lasingoff')
             lofr_data, lofr_meta = xtup.get_calibconst(self._camera, 'xtcav_lasingoff', cons.DETNAME, self.run.expt, self.run.runnum)
@@ -133,6 +163,9 @@ class LasingOnCharacterization():
             logger.debug('==== _lasingoffreference.parameters:\n%s'% str(self._lasingoffreference.parameters))
             logger.debug('==== _lasingoffreference.averaged_profiles:\n%s'% str(self._lasingoffreference.averaged_profiles))            
             logger.info('Using lasing off reference from DB')
+            if self._lasingoffreference:
+                self._lasingoffcache = xtu.prepareLasingOffReference(self._lasingoffreference.averaged_profiles)
+                _references[key] = (self._lasingoffreference, self._lasingoffcache)
             self._setLasingOffReferenceParameters()
             return
 
@@ -266,13 +299,64 @@ class LasingOnCharacterization():
             return False
 
         #Using all the available data, perform the retrieval for that given shot        
-        self._pulse_characterization = xtu.processLasingSingleShot(self._image_profile, self._lasingoffreference.averaged_profiles) 
+        self._pulse_characterization = xtu.processLasingSingleShot(self._image_profile, self._lasingoffreference.averaged_profiles, self._lasingoffcache)
         logger.debug('After xtu.processLasingSingleShot: _pulse_characterization:\n%s', xtu.info_xtcav_object(self._pulse_characterization))
 
         if not self._pulse_characterization : return False
 
         return True
 
+
+    def processImages(self, images, shots_to_shot):
+        """
+        Batched version of processEvent for a stack of already retrieved camera images, e.g. to keep up with 120 Hz.
+        Calibrations are the ones set by the last call to processEvent, so call processEvent at least once before.
+        The results of the last image are accessible through the usual methods (xRayPower, etc.).
+        Args:
+            images (numpy array or list): raw camera images, shape (nshots, rows, cols)
+            shots_to_shot (list of ShotToShotParameters): shot to shot parameters of each image (see UtilsPsana.getShotToShotParameters)
+            
+        Returns:
+            t (numpy array): master time in fs, shape (nt,)
+            powerECOM (numpy array): power in GW based on ECOM, shape (nshots, num_bunches, nt), 0 for invalid shots
+            powerERMS (numpy array): power in GW based on ERMS, shape (nshots, num_bunches, nt), 0 for invalid shots
+            valid (numpy array of bool): shots for which the retrieval succeeded, shape (nshots,)
+        """
+        if not self._calibrationsset:
+            raise RuntimeError('Calibrations are not set, call processEvent before processImages')
+        if not self._lasingoffreference:
+            raise RuntimeError('Cannot perform analysis without lasing off reference')
+        if len(images) != len(shots_to_shot):
+            raise ValueError('Got %d images and %d shot to shot parameters' % (len(images), len(shots_to_shot)))
+
+        t = self._lasingoffcache.t
+        num_bunches = self._lasingoffreference.averaged_profiles.num_bunches
+        powerECOM = np.zeros((len(images), num_bunches, t.size), dtype=np.float64)
+        powerERMS = np.zeros((len(images), num_bunches, t.size), dtype=np.float64)
+        valid = np.zeros(len(images), dtype=bool)
+
+        for i, (image, shot_to_shot) in enumerate(zip(images, shots_to_shot)):
+            self._pulse_characterization = None
+            self._image_profile = None
+            self._processed_image = None
+            if image is None or not shot_to_shot.valid: continue
+
+            self._rawimage = image
+            self._image_profile, self._processed_image = xtu.processImage(image, self.parameters,
+                self._darkreference, self._global_calibration, self._saturation_value, self._roixtcav, shot_to_shot)
+            if not self._image_profile: continue
+
+            self._pulse_characterization = xtu.processLasingSingleShot(self._image_profile,
+                self._lasingoffreference.averaged_profiles, self._lasingoffcache)
+            if not self._pulse_characterization: continue
+
+            n = min(num_bunches, self._pulse_characterization.num_bunches)
+            powerECOM[i,:n] = self._pulse_characterization.powerECOM[:n]
+            powerERMS[i,:n] = self._pulse_characterization.powerERMS[:n]
+            valid[i] = True
+
+        return t, powerECOM, powerERMS, valid
+
         
     def physicalUnits(self):
         """
@@ -312,15 +312,42 @@ def processImage(img, parameters, dark_background, global_calibration,
         return ImageProfile(image_stats, roi, shot_to_shot, physical_units), processed_image
 
 
-def processLasingSingleShot(image_profile, nolasing_averaged_profiles):
+def prepareLasingOffReference(nolasing_averaged_profiles, threslevel=0.1):
+    """
+    Precompute the quantities of processLasingSingleShot that only depend on the no lasing reference groups
+    Arguments:
+      nolasing_averaged_profiles: no lasing reference profiles
+      threslevel: fraction of the peak electron current delimiting the trace
+    Output
+      reference: LasingOffReferenceCache
+    """
+    ref = nolasing_averaged_profiles
+    t = ref.t
+    eCurrentNormed = []   #Centered electron current of each group divided by its norm (for the correlation)
+    indFirst = []         #First index above threshold of each group
+    indLast = []          #Last index above threshold of each group
+    for j in range(ref.num_bunches):
+        eCurrent = np.asarray(ref.eCurrent[j], dtype=np.float64)
+        centered = eCurrent - eCurrent.mean(axis=1)[:,None]
+        eCurrentNormed.append(centered/np.sqrt(np.sum(centered**2, axis=1))[:,None])
+        above = eCurrent > np.amax(eCurrent, axis=1)[:,None]*threslevel
+        indFirst.append(np.argmax(above, axis=1))
+        indLast.append(eCurrent.shape[1] - 1 - np.argmax(above[:,::-1], axis=1))
+    return LasingOffReferenceCache(ref, t, (t[-1]-t[0])/(t.size-1), threslevel, eCurrentNormed, indFirst, indLast)
+
+
+def processLasingSingleShot(image_profile, nolasing_averaged_profiles, reference=None):
     """
     Process a single shot profiles, using the no lasing references to retrieve the x-ray pulse(s)
     Arguments:
       image_profile: profile for xtcav image
       nolasing_averaged_profiles: no lasing reference profiles
+      reference: prepareLasingOffReference(nolasing_averaged_profiles), computed here if not given
     Output
       pulsecharacterization: retrieved pulse
     """
+    if reference is None or reference.averaged_profiles is not nolasing_averaged_profiles:
+        reference = prepareLasingOffReference(nolasing_averaged_profiles)
 
     image_stats = image_profile.image_stats
     physical_units = image_profile.physical_units
@@ -333,8 +360,8 @@ def processLasingSingleShot(image_profile, nolasing_averaged_profiles):
     if (num_bunches != nolasing_averaged_profiles.num_bunches):
         logger.warning('Different number of bunches in the reference')
     
-    t = nolasing_averaged_profiles.t   #Master time obtained from the no lasing references
-    dt = (t[-1]-t[0])/(t.size-1)
+    t = reference.t   #Master time obtained from the no lasing references
+    dt = reference.dt
     
              #Electron charge in coulombs
     Nelectrons = shot_to_shot.dumpecharge/cons.E_CHARGE   #Total number of electrons in the bunch    
@@ -376,18 +403,15 @@ def processLasingSingleShot(image_profile, nolasing_averaged_profiles):
         eCOMslice=(image_stats[j].yCOMslice-image_stats[j].yCOM)*physical_units.yMeVPerPix       #Center of mass in energy for each t converted to the right units        
         eRMSslice=image_stats[j].yRMSslice*physical_units.yMeVPerPix                               #Energy dispersion for each t converted to the right units
 
-        interp=scipy.interpolate.interp1d(physical_units.xfs-distT,eCurrent,kind='linear',fill_value=0,bounds_error=False,assume_sorted=True)  #Interpolation to master time
-        eCurrent=interp(t)    
-                                                   
-        interp=scipy.interpolate.interp1d(physical_units.xfs-distT,eCOMslice,kind='linear',fill_value=0,bounds_error=False,assume_sorted=True)  #Interpolation to master time
-        eCOMslice=interp(t)
-            
-        interp=scipy.interpolate.interp1d(physical_units.xfs-distT,eRMSslice,kind='linear',fill_value=0,bounds_error=False,assume_sorted=True)  #Interpolation to master time
-        eRMSslice=interp(t)        
+        #Interpolation to master time (linear, 0 outside)
+        xfs = physical_units.xfs-distT
+        eCurrent=np.interp(t, xfs, eCurrent, left=0, right=0)
+        eCOMslice=np.interp(t, xfs, eCOMslice, left=0, right=0)
+        eRMSslice=np.interp(t, xfs, eRMSslice, left=0, right=0)
         
-        #Find best no lasing match
-        num_groups = nolasing_averaged_profiles.eCurrent[j].shape[0]
-        corr = np.apply_along_axis(lambda x: np.corrcoef(eCurrent, x)[0,1], 1, nolasing_averaged_profiles.eCurrent[j])
+        #Find best no lasing match: correlation with the (normalized) reference groups
+        centered = eCurrent - eCurrent.mean()
+        corr = np.dot(reference.eCurrentNormed[j], centered)/np.sqrt(np.dot(centered, centered))
         
         #The index of the most similar is that with a highest correlation, i.e. the last in the array after sorting it
         groupnum[j]=np.argmax(corr)
@@ -402,13 +426,10 @@ def processLasingSingleShot(image_profile, nolasing_averaged_profiles):
         nolasingECurrent[j,:]=nolasing_averaged_profiles.eCurrent[j][groupnum[j],:]
 
         #We threshold the ECOM and ERMS based on electron current
-        threslevel=0.1
-        threslasing=np.amax(lasingECurrent[j,:])*threslevel
-        thresnolasing=np.amax(nolasingECurrent[j,:])*threslevel      
+        threslasing=np.amax(lasingECurrent[j,:])*reference.threslevel
         indiceslasing=np.where(lasingECurrent[j,:]>threslasing)
-        indicesnolasing=np.where(nolasingECurrent[j,:]>thresnolasing)      
-        ind1=np.amax([indiceslasing[0][0],indicesnolasing[0][0]])
-        ind2=np.amin([indiceslasing[0][-1],indicesnolasing[0][-1]])        
+        ind1=np.amax([indiceslasing[0][0],reference.indFirst[j][groupnum[j]]])
+        ind2=np.amin([indiceslasing[0][-1],reference.indLast[j][groupnum[j]]])        
         if ind1>ind2:
             ind1=ind2
         
@@ -445,12 +466,13 @@ def processLasingSingleShot(image_profile, nolasing_averaged_profiles):
         nolasingECurrent, lasingECOM, nolasingECOM, lasingERMS, nolasingERMS, num_bunches, 
         groupnum)
     
-def averageXTCAVProfilesGroups(list_image_profiles, num_groups=0, method='hierarchical'):
+def averageXTCAVProfilesGroups(list_image_profiles, num_groups=0, method='hierarchical', nprocs=1):
     """
     Cluster together profiles of xtcav images
     Arguments:
       list_image_profiles: list of the image profiles for all the XTCAV non lasing profiles to average
       shots_per_group
+      nprocs: number of processes for finding the number of groups (see ClusteringUtils.findOptGroups)
     Output
       averagedProfiles: list with the averaged reference of the reference for each group 
     """
@@ -499,7 +521,7 @@ def averageXTCAVProfilesGroups(list_image_profiles, num_groups=0, method='hierar
             distT=(list_image_stats[i][j].xCOM-list_image_stats[i][0].xCOM)*list_physical_units[i].xfsPerPix
             profilesT[i,:]=scipy.interpolate.interp1d(list_physical_units[i].xfs-distT,list_image_stats[i][j].xProfile, kind='linear',fill_value=0,bounds_error=False,assume_sorted=True)(t)
             
-        num_clusters = cu.findOptGroups(profilesT, 100, method=method.lower()) if not num_groups else num_groups 
+        num_clusters = cu.findOptGroups(profilesT, 100, method=method.lower(), nprocs=nprocs) if not num_groups else num_groups 
 
         # temporary since h5py current;y isnt supporting variable length arrays
         num_groups = num_clusters 
@@ -681,6 +703,15 @@ PulseCharacterization = namedtuple('PulseCharacterization',
     'groupnum'                   #group number of lasing-off shot
     ])
 
+LasingOffReferenceCache = namedtuple('LasingOffReferenceCache',
+    ['averaged_profiles',   #AveragedProfiles the cache was computed from
+    't',                    #Master time in fs
+    'dt',                   #Step of master time in fs
+    'threslevel',           #Fraction of peak electron current delimiting the trace
+    'eCurrentNormed',       #Per bunch: centered electron current of each group / its norm
+    'indFirst',             #Per bunch: first index of each group above threshold
+    'indLast'])             #Per bunch: last index of each group above threshold
+
 ROIMetrics = namedtuple('ROIMetrics',
     ['xN', #Size of the image in X   
     'x0',  #Position of the first pixel in x
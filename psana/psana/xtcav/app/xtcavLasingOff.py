@@ -8,8 +8,9 @@ from psana.pyalgos.generic.logger import init_logger, STR_LEVEL_NAMES
 
 scrname = sys.argv[0].rsplit('/')[-1]
 usage = '\nE.g. : %s amox23616 131' % scrname\
-      + '\n  or : %s amox23616 131 -l INFO -p True\n' % scrname
-      + '\n  or : %s amox23616 131 -l DEBUG --max_shots 200 --num_bunches 1\n' % scrname
+      + '\n  or : %s amox23616 131 -l INFO -p True\n' % scrname\
+      + '\n  or : %s amox23616 131 -l DEBUG --max_shots 200 --num_bunches 1\n' % scrname\
+      + '\n  or : mpirun -n 16 %s amox23616 131 -d <xtc dir> --nprocs 16\n' % scrname
 print(usage)
 
 d_fname = '/reg/g/psdm/detector/data2_test/xtc/data-amox23616-r0131-e000200-xtcav-v2.xtc2'
@@ -23,6 +24,9 @@ parser.add_argument('--num_groups',  nargs='?', const=12,  type=int,   default=1
 parser.add_argument('--snr_filter',  nargs='?', const=10,  type=int,   default=10)
 parser.add_argument('--roi_expand',  nargs='?', const=1.0, type=float, default=1.0)
 parser.add_argument('-f', '--fname', type=str, default=d_fname, help='xtc2 file')
+parser.add_argument('-d', '--dir',   type=str, default=None, help='xtc directory; reads the run in parallel under mpirun instead of fname')
+parser.add_argument('--max_events',  type=int, default=None, help='maximum number of events read with --dir (default: 4*max_shots, 0: whole run)')
+parser.add_argument('--nprocs',      type=int, default=1, help='number of processes for clustering (default: 1)')
 parser.add_argument('-p', '--plot_image', type=bool, default=False, help='plot events')
 parser.add_argument('-l', '--loglev', default='INFO', type=str, help='logging level name, one of %s' % STR_LEVEL_NAMES)
 
@@ -4,53 +4,179 @@ import sys
 import time
 import argparse
 import logging
+import threading
+from collections import deque
 from p4p.client.thread import Context
 from prometheus_client import start_http_server
-from prometheus_client.core import GaugeMetricFamily, REGISTRY
+from prometheus_client.core import GaugeMetricFamily, CounterMetricFamily, REGISTRY
 
+#
+# The collector keeps a monitor on every registered PV and serves scrapes
+# from the latest values received, so that a scrape does not wait for the
+# IOCs.  Besides the PV values (one gauge per registered name), it exports
+# per PV:
+#   epics_pv_connected            1 if the monitor is connected
+#   epics_pv_age_seconds          time since the last update
+#   epics_pv_updates_total        number of updates received
+#   epics_pv_update_rate          updates per second over the last 'window' seconds
+# Values of disconnected PVs are not exported.
+#
 class CustomCollector():
-    def __init__(self):
-        self.pvactx = Context('pva')
-        self._pvs   = {}
+    def __init__(self, ctx=None, window=60.):
+        self.pvactx  = Context('pva') if ctx is None else ctx
+        self._window = window
+        self._lock   = threading.Lock()
+        self._pvs    = {}   # metric name -> (label names, [(label values, PV name)])
+        self._cache  = {}   # PV name -> _PVState
+        self._subs   = []
+
+    def registerPV(self, name, pv, hutch, partitions=range(8)):
+        self.addPVs(name, ['instrument','partition'],
+                    [([hutch,str(i)], pv%i) for i in partitions])
+
+    # Add the PVs of the metric name.  pvs is a list of (label values, PV name).
+    def addPVs(self, name, labelnames, pvs):
+        with self._lock:
+            if name in self._pvs:
+                if self._pvs[name][0] != labelnames:
+                    raise ValueError('%s: labels %s differ from %s' % (name, labelnames, self._pvs[name][0]))
+                self._pvs[name][1].extend(pvs)
+            else:
+                self._pvs[name] = (labelnames, list(pvs))
+            new = [pvname for labels, pvname in pvs if pvname not in self._cache]
+            for pvname in new:
+                self._cache[pvname] = _PVState()
+        for pvname in new:
+            self._subs.append(self.pvactx.monitor(pvname, self._callback(pvname), notify_disconnect=True))
 
-    def registerPV(self, name, pv, hutch):
-        self._hutch = hutch
-        pvs = []
-        for i in range(8):
-            pvs.append( pv%i )
-        self._pvs[name] = pvs
+    def _callback(self, pvname):
+        def update(value):
+            now = time.time()
+            with self._lock:
+                state = self._cache[pvname]
+                if isinstance(value, Exception):
+                    logging.debug('%s: %s' % (pvname, value))
+                    state.connected = False
+                    return
+                try:
+                    state.value = float(value.raw.value)
+                except (TypeError, ValueError):
+                    logging.warning('%s: value %r is not a number' % (pvname, value))
+                    return
+                state.connected = True
+                state.updated   = now
+                state.count    += 1
+                state.times.append(now)
+        return update
+
+    def close(self):
+        for sub in self._subs:
+            sub.close()
+        self._subs = []
 
     def collect(self):
-        for name,pvs in self._pvs.items():
-            g = GaugeMetricFamily(name, documentation='', labels=['instrument','partition'])
-            values = self.pvactx.get(pvs)
-            logging.debug('collect %s: %s' % (pvs, str(values)))
-            for i in range(8):
-                g.add_metric([self._hutch,str(i)], values[i].raw.value)
+        now = time.time()
+        with self._lock:
+            pvs = [(name, labelnames, list(entries)) for name, (labelnames, entries) in self._pvs.items()]
+            snapshot = {}
+            for pvname, state in self._cache.items():
+                while state.times and state.times[0] < now - self._window:
+                    state.times.popleft()
+                snapshot[pvname] = (state.connected, state.value, state.updated,
+                                    state.count, len(state.times))
+
+        for name, labelnames, entries in pvs:
+            g = GaugeMetricFamily(name, documentation='', labels=labelnames)
+            for labels, pvname in entries:
+                connected, value, updated, count, recent = snapshot[pvname]
+                if connected:
+                    g.add_metric(labels, value)
             yield g
 
+        connected_g = GaugeMetricFamily('epics_pv_connected', 'PV monitor is connected', labels=['pv'])
+        age_g = GaugeMetricFamily('epics_pv_age_seconds', 'Seconds since the last PV update', labels=['pv'])
+        updates_c = CounterMetricFamily('epics_pv_updates', 'PV updates received', labels=['pv'])
+        rate_g = GaugeMetricFamily('epics_pv_update_rate', 'PV updates per second over %g s' % self._window,
+                                   labels=['pv'])
+        for pvname, (connected, value, updated, count, recent) in snapshot.items():
+            connected_g.add_metric([pvname], 1 if connected else 0)
+            if updated is not None:
+                age_g.add_metric([pvname], now - updated)
+            updates_c.add_metric([pvname], count)
+            rate_g.add_metric([pvname], recent / self._window)
+        yield connected_g
+        yield age_g
+        yield updates_c
+        yield rate_g
+
+class _PVState():
+    def __init__(self):
+        self.connected = False
+        self.value     = None
+        self.updated   = None       # time of the last update
+        self.count     = 0
+        self.times     = deque()    # times of the updates within the window
+
+#
+# Read a PV list file.  Each line is
+#     NAME PVNAME [LABEL=VALUE ...]
+# Blank lines and lines starting with '#' are ignored.
+# Returns a dictionary of NAME -> (label names, [(label values, PVNAME)]).
+#
+def read_pvlist(fname, hutch):
+    metrics = {}
+    with open(fname) as f:
+        for lineno, line in enumerate(f, 1):
+            fields = line.split()
+            if not fields or fields[0].startswith('#'):
+                continue
+            if len(fields) < 2:
+                raise ValueError('%s:%d: expected NAME PVNAME [LABEL=VALUE ...]' % (fname, lineno))
+            labels = {'instrument': hutch}
+            for field in fields[2:]:
+                key, sep, value = field.partition('=')
+                if not sep:
+                    raise ValueError('%s:%d: expected LABEL=VALUE, got %s' % (fname, lineno, field))
+                labels[key] = value
+            labelnames = sorted(labels.keys())
+            entry = metrics.setdefault(fields[0], (labelnames, []))
+            if entry[0] != labelnames:
+                raise ValueError('%s:%d: labels of %s differ from previous lines' % (fname, lineno, fields[0]))
+            entry[1].append(([labels[k] for k in labelnames], fields[1]))
+    return metrics
+
 def main():
-    parser = argparse.ArgumentParser(prog=sys.argv[0], description='host PVs for XPM')
+    parser = argparse.ArgumentParser(prog=sys.argv[0], description='export PVs to prometheus')
 
     parser.add_argument('-H', required=False, help='e.g. tst', metavar='HUTCH', default='tst')
-    parser.add_argument('-P', required=True, help='e.g. DAQ:LAB2:XPM:2', metavar='PREFIX')
-    parser.add_argument('N', help='e.g. DeadFrac', nargs='+', metavar='NAME')
+    parser.add_argument('-P', required=False, help='e.g. DAQ:LAB2:XPM:2', metavar='PREFIX')
+    parser.add_argument('N', help='e.g. DeadFrac', nargs='*', metavar='NAME')
+    parser.add_argument('--partitions', type=int, nargs='+', default=list(range(8)),
+                        help='partitions of PREFIX:PART:<partition>:NAME (default 0-7)')
+    parser.add_argument('--pvlist', help='file of NAME PVNAME [LABEL=VALUE ...] lines')
+    parser.add_argument('--port', type=int, default=9200, help='http port')
+    parser.add_argument('--window', type=float, default=60., help='update rate window (seconds)')
     parser.add_argument('-v', '--verbose', action='store_true', help='be verbose')
 
     args = parser.parse_args()
     if args.verbose:
         logging.basicConfig(level=logging.DEBUG)
+    if args.N and args.P is None:
+        parser.error('NAME requires -P PREFIX')
+    if not args.N and args.pvlist is None:
+        parser.error('no NAME nor --pvlist')
 
     # Start up the server to expose the metrics.
-    c = CustomCollector()
+    c = CustomCollector(window=args.window)
     REGISTRY.register(c)
     for name in args.N:
-        c.registerPV(name, args.P + ':PART:%d:' + name, args.H)
-    c.collect()
-    start_http_server(9200)
+        c.registerPV(name, args.P + ':PART:%d:' + name, args.H, args.partitions)
+    if args.pvlist:
+        for name, (labelnames, pvs) in read_pvlist(args.pvlist, args.H).items():
+            c.addPVs(name, labelnames, pvs)
+    start_http_server(args.port)
     while True:
         time.sleep(5)
 
 if __name__ == '__main__':
     main()
-
@@ -0,0 +1,72 @@
+"""Benchmark of the typed JSON list and binary encodings of large arrays.
+
+Builds configurations with array sizes of real detectors, then times the
+steps of storing (cdict -> typed JSON -> JSON text, as in configdb
+modify_device and write_typed_json) and of reading back (JSON text ->
+typed JSON -> cdict) for both encodings, and reports the JSON size.
+
+Example:
+    python -m psdaq.configdb.bench_typed_json -n 5
+"""
+import io
+import json
+import time
+import argparse
+import numpy as np
+from psdaq.configdb.typed_json import cdict
+
+# name: list of (field, shape, type) of the large arrays of a configuration
+CONFIGS = {
+    'opal'     : [('user.lut', (4096,), 'UINT16')],
+    'hsd'      : [('expert.fex.baseline', (4, 1600), 'UINT16'),
+                  ('expert.fex.threshold', (4, 1600), 'INT16')],
+    'epix10ka' : [('user.pixel_map', (16, 178, 192), 'UINT8'),
+                  ('expert.pedestal', (16, 178, 192), 'FLOAT')],
+}
+
+def make_config(name):
+    top = cdict()
+    top.setInfo(name, name + '_0', None, 'serial1234', 'benchmark')
+    top.setAlg('config', [0, 0, 1])
+    top.set('user.start_ns', 107749, 'UINT32')
+    rng = np.random.default_rng(0)
+    for field, shape, typ in CONFIGS[name]:
+        if typ == 'FLOAT':
+            a = rng.normal(1000., 10., shape).astype(np.float32)
+        else:
+            a = rng.integers(0, 256, shape).astype(np.dtype(typ.lower()))
+        top.set(field, a)
+    return top
+
+def _time(fn, n):
+    st = time.time()
+    for i in range(n):
+        result = fn()
+    return (time.time() - st) / n, result
+
+def bench(name, binary, n):
+    c = make_config(name)
+    t_create, d = _time(lambda: c.typed_json(binary=binary), n)
+    t_dumps, text = _time(lambda: json.dumps(d), n)
+    t_loads, d2 = _time(lambda: json.loads(text), n)
+    t_cdict, _ = _time(lambda: cdict(d2), n)
+    t_write, _ = _time(lambda: c.writeFile(io.StringIO(), binary=binary), n)
+    return {'config': name, 'binary': binary, 'bytes': len(text),
+            'store_ms': 1e3 * (t_create + t_dumps), 'read_ms': 1e3 * (t_loads + t_cdict),
+            'write_ms': 1e3 * t_write}
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark typed JSON array encodings')
+    parser.add_argument('-n', type=int, default=3, help='repetitions')
+    parser.add_argument('-c', '--configs', nargs='*', default=list(CONFIGS.keys()))
+    args = parser.parse_args()
+
+    print('%-10s %-7s %12s %10s %10s %10s' % ('config', 'binary', 'json bytes', 'store ms', 'read ms', 'write ms'))
+    for name in args.configs:
+        for binary in [False, True]:
+            r = bench(name, binary, args.n)
+            print('%-10s %-7s %12d %10.2f %10.2f %10.2f' % (r['config'], r['binary'], r['bytes'],
+                                                            r['store_ms'], r['read_ms'], r['write_ms']))
+
+if __name__ == '__main__':
+    main()
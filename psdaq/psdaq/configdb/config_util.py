@@ -0,0 +1,80 @@
+"""Helpers shared by the detector configuration scripts (*_config.py).
+
+wait_pv waits for a PV condition with a monitor instead of get/sleep
+polling, configure_all configures several devices concurrently, and timed
+records how long each device took to configure.
+"""
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+# device -> duration (s) of its last configure
+durations = {}
+
+class ConfigureError(Exception):
+    """Raised by configure_all with the exception of each device that failed."""
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('configure failed for %s' %
+                         '; '.join('%s: %s' % (dev, err) for dev, err in errors.items()))
+
+def wait_pv(ctxt, name, cond=bool, timeout=10.):
+    """Wait until cond(value) is true for the PV name and return the value.
+
+    The monitor delivers the current value when it connects, so a condition
+    already true when this is called returns without waiting.  Raises
+    TimeoutError if the condition does not become true within timeout
+    seconds.
+    """
+    done = threading.Event()
+    result = []
+    def update(value):
+        if not isinstance(value, Exception) and not done.is_set() and cond(value):
+            result.append(value)
+            done.set()
+    sub = ctxt.monitor(name, update, notify_disconnect=True)
+    try:
+        if not done.wait(timeout):
+            raise TimeoutError('timed out after %g s waiting for %s' % (timeout, name))
+    finally:
+        sub.close()
+    return result[0]
+
+@contextmanager
+def timed(device):
+    """Record the time spent in the block as the configure duration of device."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        durations[device] = time.perf_counter() - start
+        logging.info('%s configure took %.3f s' % (device, durations[device]))
+
+def configure_all(fn, devices, parallel=None):
+    """Call fn(*args) for each device of the dictionary devices (device -> args)
+    concurrently, at most parallel at a time (default all).
+
+    Returns a dictionary of device -> result.  Every device is configured
+    even if some fail; the failures are then raised together as a
+    ConfigureError.
+    """
+    if not devices:
+        return {}
+    results = {}
+    errors = {}
+    with ThreadPoolExecutor(max_workers=parallel or len(devices)) as pool:
+        def run(device, args):
+            with timed(device):
+                return fn(*args)
+        futures = {dev: pool.submit(run, dev, args) for dev, args in devices.items()}
+        for dev, future in futures.items():
+            try:
+                results[dev] = future.result()
+            except Exception as e:
+                logging.error('%s configure failed: %s' % (dev, e))
+                errors[dev] = e
+    if errors:
+        raise ConfigureError(errors)
+    return results
@@ -1,11 +1,36 @@
 import requests
 from requests.auth import HTTPBasicAuth
-from krtc import KerberosTicket
 from urllib.parse import urlparse
+import os
+import time
 import json
+import hashlib
 import logging
+import threading
 from .typed_json import cdict
 
+# HTTP sessions shared by all configdb objects of the process (keep-alive
+# connections are reused across get_config calls), one per server and user
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def _session(host, user, password):
+    with _sessions_lock:
+        key = (host, user)
+        if key not in _sessions:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            if user is not None:
+                session.auth = HTTPBasicAuth(user, password)
+            _sessions[key] = session
+        return _sessions[key]
+
+# Default directory of the local configuration cache
+def default_cache_dir():
+    return os.environ.get('CONFIGDB_CACHE', os.path.expanduser('~/.psdaq/configdb_cache'))
+
 class JSONEncoder(json.JSONEncoder):
     def default(self, o):
         if isinstance(o, float) and not math.isfinite(o):
@@ -24,7 +49,13 @@ class configdb(object):
     #     root   - Database name, usually "configDB"
     #     user   - User for HTTP authentication
     #     password - Password for HTTP authentication
-    def __init__(self, url, hutch, create=False, root="NONE", user="tstopr", password="pcds"):
+    #     cache_dir - Directory of the local cache of configurations used by
+    #              get_configurations (default: $CONFIGDB_CACHE or
+    #              ~/.psdaq/configdb_cache, None disables the cache)
+    #     key_ttl - Seconds during which the key of an alias read from the
+    #              server is reused without asking again (default 0)
+    def __init__(self, url, hutch, create=False, root="NONE", user="tstopr", password="pcds",
+                 cache_dir="DEFAULT", key_ttl=0):
         if root == "NONE":
             raise Exception("configdb: Must specify root!")
         self.hutch  = hutch
@@ -33,6 +64,13 @@ class configdb(object):
         self.timeout = 15.05     # timeout for http requests
         self.user = user
         self.password = password
+        self.cache_dir = default_cache_dir() if cache_dir == "DEFAULT" else cache_dir
+        self.key_ttl = key_ttl
+        self.bulk = True         # server supports get_configurations
+        if 'ws-auth' in self.prefix:
+            self.session = _session(self.host, user, password)
+        else:
+            self.session = _session(self.host, None, None)
 
         if create:
             try:
@@ -47,24 +85,19 @@ class configdb(object):
 
     # Return json response.
     # Raise exception on error.
+    # Basic authentication is set in the session.
     def _get_response(self, cmd, *, json=None):
-        if 'ws-auth' in self.prefix:
-            # basic authentication
-            resp = requests.get(self.prefix + cmd,
-                                auth=HTTPBasicAuth(self.user, self.password),
-                                json=json,
-                                timeout=self.timeout)
-        elif 'ws-kerb' in self.prefix:
+        if 'ws-kerb' in self.prefix:
             # kerberos authentication
-            resp = requests.get(self.prefix + cmd,
-                                **{"headers": KerberosTicket('HTTP@' + self.host).getAuthHeaders()},
-                                json=json,
-                                timeout=self.timeout)
+            from krtc import KerberosTicket
+            resp = self.session.get(self.prefix + cmd,
+                                    **{"headers": KerberosTicket('HTTP@' + self.host).getAuthHeaders()},
+                                    json=json,
+                                    timeout=self.timeout)
         else:
-            # no authentication
-            resp = requests.get(self.prefix + cmd,
-                                json=json,
-                                timeout=self.timeout)
+            resp = self.session.get(self.prefix + cmd,
+                                    json=json,
+                                    timeout=self.timeout)
         # raise exception if status is not ok
         resp.raise_for_status()
         return resp.json()
@@ -92,6 +125,111 @@ class configdb(object):
         else:
             return xx['value']
 
+    # Retrieve the configurations of several devices with the specified alias.
+    # This returns a dictionary where the keys are the devices and the values
+    # are the configurations returned by get_configuration.
+    # Configurations are fetched in one request (get_configurations endpoint,
+    # or one request per device if the server does not support it) and kept
+    # in the local cache under the key of the alias, so that fetching them
+    # again only costs the get_key request (none within key_ttl seconds).
+    # Raise exception on error.
+    def get_configurations(self, alias, devices, hutch=None):
+        if hutch is None:
+            hutch = self.hutch
+        key = self._cached_key(alias, hutch) if self.cache_dir else None
+
+        configs = {}
+        for device in devices:
+            cfg = self._cache_load(hutch, alias, key, device)
+            if cfg is not None:
+                configs[device] = cfg
+        missing = [device for device in devices if device not in configs]
+        if not missing:
+            logging.debug('get_configurations: %s/%s key %s from cache' % (hutch, alias, key))
+            return configs
+
+        fetched = None
+        if self.bulk:
+            try:
+                xx = self._get_response('get_configurations/' + hutch + '/' + alias + '/',
+                                        json={'devices': missing})
+            except requests.exceptions.HTTPError as ex:
+                if ex.response is None or ex.response.status_code != 404:
+                    logging.error('Web server error: %s' % ex)
+                    raise ex
+                logging.debug('get_configurations: not supported by server, fetching devices one by one')
+                self.bulk = False
+            except Exception as ex:
+                logging.error('%s' % ex)
+                raise ex
+            else:
+                if not xx['success']:
+                    logging.error('%s' % xx['msg'])
+                    raise RuntimeError('Internal error fetching detector configuration')
+                fetched = xx['value']
+                key = xx.get('key', key)
+        if fetched is None:
+            fetched = {device: self.get_configuration(alias, device, hutch) for device in missing}
+
+        for device in missing:
+            if device not in fetched:
+                raise RuntimeError('No configuration for device %s in %s/%s' % (device, hutch, alias))
+            configs[device] = fetched[device]
+            self._cache_store(hutch, alias, key, device, fetched[device])
+        return configs
+
+    # Return the key of the alias, reusing the one read less than key_ttl
+    # seconds ago (by any process using the same cache), or None on error.
+    def _cached_key(self, alias, hutch):
+        fname = os.path.join(self._cache_root(), hutch, alias, 'key.json')
+        if self.key_ttl > 0:
+            try:
+                with open(fname) as f:
+                    entry = json.load(f)
+                if time.time() - entry['time'] < self.key_ttl:
+                    return entry['key']
+            except (OSError, ValueError, KeyError):
+                pass
+        key = self.get_key(alias, hutch)
+        if not isinstance(key, int):
+            return None
+        if self.key_ttl > 0:
+            self._write_atomic(fname, {'key': key, 'time': time.time()})
+        return key
+
+    def _cache_root(self):
+        # one directory per database (server and root)
+        return os.path.join(self.cache_dir, hashlib.sha1(self.prefix.encode()).hexdigest()[:16])
+
+    def _cache_fname(self, hutch, alias, key, device):
+        return os.path.join(self._cache_root(), hutch, alias, str(key), device + '.json')
+
+    def _cache_load(self, hutch, alias, key, device):
+        if key is None:
+            return None
+        try:
+            with open(self._cache_fname(hutch, alias, key, device)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _cache_store(self, hutch, alias, key, device, cfg):
+        if key is None or not self.cache_dir:
+            return
+        try:
+            self._write_atomic(self._cache_fname(hutch, alias, key, device), cfg)
+        except OSError as ex:
+            logging.warning('configdb cache: %s' % ex)
+
+    # Write json to a temporary file renamed to fname, so that concurrent
+    # readers (other segments) never see a partial file.
+    def _write_atomic(self, fname, value):
+        os.makedirs(os.path.dirname(fname), exist_ok=True)
+        tmp = '%s.%d.%d.tmp' % (fname, os.getpid(), threading.get_ident())
+        with open(tmp, 'w') as f:
+            json.dump(value, f)
+        os.replace(tmp, fname)
+
     # Get the history of the device configuration for the variables 
     # in plist.  The variables are dot-separated names with the first
     # component being the the device configuration name.
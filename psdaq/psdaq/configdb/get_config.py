@@ -31,16 +31,31 @@ def get_config(connect_json,cfgtype,detname,detsegm):
     db_name =cfg_dbase[1]
     return get_config_with_params(db_url, instrument, db_name, cfgtype, detname+'_%d'%detsegm)
 
+# configdb objects are kept so that their HTTP connections are reused
+_cdbs = {}
+
+def _configdb(db_url, instrument, db_name):
+    key = (db_url, instrument, db_name)
+    if key not in _cdbs:
+        create = False
+        _cdbs[key] = cdb.configdb(db_url, instrument, create, db_name)
+    return _cdbs[key]
+
 def get_config_with_params(db_url, instrument, db_name, cfgtype, detname):
-    create = False
-    mycdb = cdb.configdb(db_url, instrument, create, db_name)
-    cfg = mycdb.get_configuration(cfgtype, detname)
+    return get_configs_with_params(db_url, instrument, db_name, cfgtype, [detname])[detname]
 
-    if cfg is None: raise ValueError('Config for instrument/detname %s/%s not found. dbase url: %s, db_name: %s, config_style: %s'%(instrument,detname,db_url,db_name,cfgtype))
+# configurations of several detectors (detname_segment) in one request
+def get_configs_with_params(db_url, instrument, db_name, cfgtype, detnames):
+    mycdb = _configdb(db_url, instrument, db_name)
+    cfgs = mycdb.get_configurations(cfgtype, detnames)
 
-    cfg_no_RO_names = remove_read_only(cfg)
+    retval = {}
+    for detname in detnames:
+        cfg = cfgs.get(detname)
+        if cfg is None: raise ValueError('Config for instrument/detname %s/%s not found. dbase url: %s, db_name: %s, config_style: %s'%(instrument,detname,db_url,db_name,cfgtype))
+        retval[detname] = remove_read_only(cfg)
 
-    return cfg_no_RO_names
+    return retval
 
 def get_config_json(*args):
     return json.dumps(get_config(*args))
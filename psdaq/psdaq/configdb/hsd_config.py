@@ -1,9 +1,22 @@
 from psdaq.configdb.get_config import get_config
+from psdaq.configdb.config_util import wait_pv, timed, configure_all
 from p4p.client.thread import Context
 import json
 import time
 
+# seconds to wait for :READY after a configure
+READY_TIMEOUT = 10.
+
 def hsd_config(connect_str,epics_prefix,cfgtype,detname,detsegm,group):
+    with timed(epics_prefix):
+        return _hsd_config(connect_str,epics_prefix,cfgtype,detname,detsegm,group)
+
+#  Configure the hsds of prefixes (a list of (epics_prefix,detsegm)) concurrently.
+#  Returns a dictionary of epics_prefix -> configuration JSON.
+def hsd_config_all(connect_str,prefixes,cfgtype,detname,group):
+    return configure_all(hsd_config, {p:(connect_str,p,cfgtype,detname,segm,group) for p,segm in prefixes})
+
+def _hsd_config(connect_str,epics_prefix,cfgtype,detname,detsegm,group):
 
     cfg = get_config(connect_str,cfgtype,detname,detsegm)
 
@@ -71,16 +84,11 @@ def hsd_config(connect_str,epics_prefix,cfgtype,detname,detsegm,group):
 
     # the completion of the "put" guarantees that all of the above
     # have completed (although in no particular order)
-    complete = False
-    for i in range(100):
-        complete = ctxt.get(epics_prefix+':READY')!=0
-        if complete: break
-        print('hsd config wait for complete',i)
-        time.sleep(0.1)
-    if complete:
-        print('hsd config complete')
-    else:
+    try:
+        wait_pv(ctxt, epics_prefix+':READY', lambda v: v!=0, READY_TIMEOUT)
+    except TimeoutError:
         raise Exception('timed out waiting for hsd configure')
+    print('hsd config complete')
 
     cfg['firmwareVersion'] = ctxt.get(epics_prefix+':FWVERSION').raw.value
     cfg['firmwareBuild'  ] = ctxt.get(epics_prefix+':FWBUILD'  ).raw.value
@@ -99,16 +107,11 @@ def hsd_unconfig(epics_prefix):
     ctxt.put(epics_prefix+':CONFIG',values,wait=True)
 
     #  This handshake seems to be necessary, or at least the .get()
-    complete = False
-    for i in range(100):
-        complete = ctxt.get(epics_prefix+':READY')!=0
-        if complete: break
-        print('hsd_unconfig wait for complete',i)
-        time.sleep(0.1)
-    if complete:
-        print('hsd config complete')
-    else:
+    try:
+        wait_pv(ctxt, epics_prefix+':READY', lambda v: v!=0, READY_TIMEOUT)
+    except TimeoutError:
         raise Exception('timed out waiting for hsd_unconfig')
+    print('hsd config complete')
 
     ctxt.close()
 
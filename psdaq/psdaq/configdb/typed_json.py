@@ -1,5 +1,6 @@
 import numpy as np
 import numbers
+import base64
 import re
 
 #
@@ -33,8 +34,8 @@ import re
 #      for dictionary d, with a dictionary of enum definitions edef and returns
 #      True/False.
 #
-#      write_typed_json(filename_or_fd, d) writes the dictionary d as JSON 
-#      to the given filename (or file descriptor).
+#      write_typed_json(filename_or_fd, d, edef, binary=False) writes the
+#      dictionary d as JSON to the given filename (or file descriptor).
 #
 #      class cdict is a helper class for building typed JSON dictionaries.
 #          cdict(old_cdict) - The constructor optionally takes an old cdict to clone.
@@ -62,8 +63,16 @@ import re
 #                             clist.
 #          setAlg(alg, version=[0,0,0], doc="")
 #                           - Set the algorithm information.
-#          writeFile(filename)
+#          writeFile(filename, binary=False)
 #                           - Write the typed JSON to a file.
+#          typed_json(binary=False)
+#                           - Return the typed JSON dictionary.
+#
+# With binary=True, array values are written in a compact binary encoding:
+# a string "base64:" followed by the base64 encoding of the little-endian
+# array data (enum arrays as INT32).  The type of the value is still the
+# array type, e.g. ["UINT16", 512, 512].  Readers (cdict, getValue and
+# json2xtc) accept both the list and the binary encodings.
 #
 # The following routines work on typed JSON dictionaries, or a dictionary
 # that maps strings to typed JSON dictionaries, such as those returned from
@@ -128,6 +137,42 @@ nptypedict = {
     np.dtype("float64"): ("DOUBLE", True)
 }
 
+BINARY_PREFIX = "base64:"
+
+def array_dtype(t):
+    # numpy dtype of an array of type t (enums are INT32)
+    return np.dtype(typedict.get(t, "int32")).newbyteorder("<")
+
+def encode_array(a, t=None):
+    if t is None:
+        t = nptypedict[a.dtype][0]
+    a = np.ascontiguousarray(a, dtype=array_dtype(t))
+    return BINARY_PREFIX + base64.b64encode(a.tobytes()).decode()
+
+def is_binary(v):
+    return isinstance(v, str) and v.startswith(BINARY_PREFIX)
+
+# Decode a binary array value with the array type t, e.g. ["UINT16", 2, 3].
+def decode_array(v, t):
+    dtype = array_dtype(t[0])
+    a = np.frombuffer(base64.b64decode(v[len(BINARY_PREFIX):]), dtype=dtype)
+    return a.astype(dtype.newbyteorder("=")).reshape(t[1:])
+
+# Convert a list of numbers (possibly nested) to a numpy array of type t,
+# checking that all values are in the range of the type.
+def toarray(l, t):
+    dtype = array_dtype(t).newbyteorder("=")
+    a = np.asarray(l)
+    if a.dtype.kind not in "biuf":
+        raise TypeError("expected a list of numbers")
+    rng = typerange.get(t)
+    if rng is not None and a.size > 0:
+        if a.dtype.kind == "f" and not np.array_equal(a, np.floor(a)):
+            raise ValueError("value is not an int")
+        if a.min() < rng[0] or a.max() > rng[1]:
+            raise ValueError("value is out of range of %s" % t)
+    return a.astype(dtype)
+
 def namify(l):
     s = ""
     for v in l:
@@ -257,7 +302,7 @@ def write_json_dict(f, d, edef, tdict, top=[], indent="    ", **hw):
             else:
                 f.write('%s"%s": {\n' % (prefix, n))
                 tdict0 = {}
-                write_json_dict(f, v, edef, tdict0, top + [n], indent + "    ")
+                write_json_dict(f, v, edef, tdict0, top + [n], indent + "    ", binary=hw.get('binary'))
                 f.write('\n%s}' % indent)
                 tdict[n] = tdict0
         elif isinstance(v, list):
@@ -268,7 +313,7 @@ def write_json_dict(f, d, edef, tdict, top=[], indent="    ", **hw):
                     if nn != 0:
                         f.write(',\n')
                     f.write('%s    {\n' % indent)
-                    write_json_dict(f, dd, edef, tdict0, top + [n, nn], indent + "        ")
+                    write_json_dict(f, dd, edef, tdict0, top + [n, nn], indent + "        ", binary=hw.get('binary'))
                     f.write('\n%s    }' % indent)
                 f.write('\n%s]' % indent)
                 tdict[n] = tdict0
@@ -284,12 +329,10 @@ def write_json_dict(f, d, edef, tdict, top=[], indent="    ", **hw):
                     f.write('%s"%s": %d' % (prefix, n, v[1]))
                     tdict[n] = v[0]
                 elif isinstance(v[1], np.ndarray):
-                    f.write('%s"%s": [' % (prefix, n))
-                    start = ""
-                    for vv in v[1].ravel():
-                        f.write('%s%d' % (start, vv))
-                        start = ", "
-                    f.write(']')
+                    if hw.get('binary'):
+                        f.write('%s"%s": "%s"' % (prefix, n, encode_array(v[1], v[0])))
+                    else:
+                        f.write('%s"%s": [%s]' % (prefix, n, ", ".join(map(str, v[1].ravel().tolist()))))
                     tdict[n] = list((v[0],) + v[1].shape)
             else:
                 vv = typerange[v[0]]
@@ -303,21 +346,17 @@ def write_json_dict(f, d, edef, tdict, top=[], indent="    ", **hw):
                 tdict[n] = v[0]
         elif isinstance(v, np.ndarray):
             typ = nptypedict[v.dtype]
-            f.write('%s"%s": [' % (prefix, n))
-            start = ""
-            for vv in v.ravel():
-                if typ[1]:
-                    f.write('%s%g' % (start, vv))
-                else:
-                    f.write('%s%d' % (start, vv))
-                start = ", "
-            f.write(']')
+            if hw.get('binary'):
+                f.write('%s"%s": "%s"' % (prefix, n, encode_array(v, typ[0])))
+            else:
+                fmt = '%g' if typ[1] else '%d'
+                f.write('%s"%s": [%s]' % (prefix, n, ", ".join([fmt % vv for vv in v.ravel().tolist()])))
             tdict[n] = list((typ[0],) + v.shape)
         else: # Must be an enum!
             f.write('%s"%s": %d' % (prefix, n, v))
         prefix = ",\n" + indent
 
-def write_typed_json(filename_or_fd, d, edef, headers=True):
+def write_typed_json(filename_or_fd, d, edef, headers=True, binary=False):
     r = validate_typed_json(d, edef, [], headers)
     if r is not None:
         print(r)
@@ -328,7 +367,7 @@ def write_typed_json(filename_or_fd, d, edef, headers=True):
         f = filename_or_fd
     f.write('{\n')
     tdict = {}
-    write_json_dict(f, d, edef, tdict, headers=headers)
+    write_json_dict(f, d, edef, tdict, headers=headers, binary=binary)
     f.write(',\n    ":types:": {\n')
     if edef != {}:
         f.write('        ":enum:": {\n')
@@ -374,7 +413,7 @@ class cdict(object):
             if ":types:" in old.keys():
                 cp = {}
                 cp.update(old)
-                jt = cp[':types:']
+                jt = dict(cp[':types:'])
                 if ":enum:" in jt.keys():
                     self.enumdef = jt[":enum:"]
                     del jt[":enum:"]
@@ -427,11 +466,12 @@ class cdict(object):
                     n = base + "." + k
                 if isinstance(v, dict) or (isinstance(v, list) and not self.checknumlist(v)):
                     self.init_from_json(v, t, n)
+                elif isinstance(t, list) and is_binary(v):
+                    self.set(n, decode_array(v, t))
                 elif isinstance(v, list) or isinstance(v, np.ndarray):
                     if isinstance(v, list):
                         # set v to an np.array of the appropriate type!
-                        v = np.array(v, dtype=typedict[t[0]]).reshape(t[1:])
-                        pass
+                        v = np.array(v, dtype=array_dtype(t[0]).newbyteorder("=")).reshape(t[1:])
                     self.set(n, v)
                 else:
                     # Scalar!
@@ -441,8 +481,8 @@ class cdict(object):
                 n = base + "." + str(k)
                 self.init_from_json(v, jt, n)
 
-    def typed_json(self):
-        (d, t) = self.create_json(self.dict, True)
+    def typed_json(self, binary=False):
+        (d, t) = self.create_json(self.dict, True, binary)
         if self.enumdef != {}:
             t[":enum:"] = {}
             t[":enum:"].update(self.enumdef)
@@ -462,7 +502,7 @@ class cdict(object):
             else:
                 t1[k] = t2[k]
 
-    def create_json(self, input, top=False):
+    def create_json(self, input, top=False, binary=False):
         if isinstance(input, dict):
             d = {}
             t = {}
@@ -474,23 +514,27 @@ class cdict(object):
                     else:
                         t[k] = "CHARSTR"
                     continue
-                (d2, t2) = self.create_json(input[k])
+                (d2, t2) = self.create_json(input[k], binary=binary)
                 d[k] = d2
                 t[k] = t2
         elif isinstance(input, list):
             d = []
             t = {}
             for (k, v) in enumerate(input):
-                (d2, t2) = self.create_json(v)
+                (d2, t2) = self.create_json(v, binary=binary)
                 d.append(d2)
                 self.merge_dict(t, t2)
         elif isinstance(input, np.ndarray):
             typ = nptypedict[input.dtype]
-            if typ[1]:
-                d = [float(x) for x in input.ravel()]
+            if binary:
+                d = encode_array(input, typ[0])
             else:
-                d = [int(x) for x in input.ravel()]
+                d = input.ravel().tolist()
             t = list((typ[0],)+ input.shape)
+        elif isinstance(input, tuple) and isinstance(input[1], np.ndarray):
+            # An enum array
+            d = encode_array(input[1], input[0]) if binary else input[1].ravel().tolist()
+            t = list((input[0],) + input[1].shape)
         elif isinstance(input, tuple):
             d = input[1]
             t = input[0]
@@ -551,6 +595,11 @@ class cdict(object):
             return r
 
     def checknumlist(self, l):
+        try:
+            if np.asarray(l).dtype.kind in "biuf":
+                return True
+        except ValueError:
+            pass  # ragged
         for v in l:
             if isinstance(v, list):
                 if not self.checknumlist(v):
@@ -592,8 +641,10 @@ class cdict(object):
             if self.checknumlist(value):
                 if type in self.enumdef.keys():
                     value = np.array(value, dtype='int32')
+                elif type in typerange.keys() and type != "CHARSTR":
+                    value = toarray(value, type)
                 else:
-                    value = np.array(value, dtype=typedict[type])
+                    raise TypeError('set: Invalid type: %s' % (type))
                 issimple = True
             else:
                 # Must be a list of cdicts!
@@ -716,8 +767,8 @@ class cdict(object):
         self.setString("detId:RO", detId)
         self.setString("doc:RO", doc)
 
-    def writeFile(self, file, headers=True):
-        return write_typed_json(file, self.dict, self.enumdef, headers)
+    def writeFile(self, file, headers=True, binary=False):
+        return write_typed_json(file, self.dict, self.enumdef, headers, binary)
 
 
 ########################################################################
@@ -782,7 +833,8 @@ def getType(typed_json, name):
         raise TypeError("getType: Invalid type %s" % t)
 
 #
-# Get the value from a typed JSON dictionary.
+# Get the value from a typed JSON dictionary.  Binary array values are
+# returned as lists.
 #
 def getValue(typed_json, name):
     if not isinstance(typed_json, dict):
@@ -794,6 +846,12 @@ def getValue(typed_json, name):
             v = v[i]
         except:
             return None
+    if is_binary(v):
+        t = getType(typed_json, name)
+        if isinstance(t, list):
+            if isinstance(t[0], dict):
+                t = ["INT32"] + t[1:]
+            return decode_array(v, t).ravel().tolist()
     return v
 
 #
@@ -829,6 +887,16 @@ def convertValue(v, t, e={}):
         l = np.prod(t[1:])
         if len(vs) != l:
             raise TypeError("convertValue: value has %d elements, not %d!" % (len(vs), l))
+        if t[0] == 'FLOAT' or t[0] == 'DOUBLE':
+            return np.array(vs, dtype='float64').tolist()
+        if t[0] in typerange.keys() and t[0] not in ['CHARSTR', 'INT64', 'UINT64']:
+            try:
+                a = np.array(vs, dtype='int64')
+            except (ValueError, OverflowError):
+                raise ValueError("convertValue: %s is not a list of integers!" % v)
+            if a.min() < typerange[t[0]][0] or a.max() > typerange[t[0]][1]:
+                raise ValueError("convertValue: %s is not in range of %s!" % (v, t[0]))
+            return a.tolist()
         return [simpleConvert(vw, t[0], e) for vw in vs]
     else:
         raise TypeError("convertValue: type must be a str or list.")
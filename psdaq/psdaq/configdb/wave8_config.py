@@ -1,4 +1,5 @@
 from psdaq.configdb.get_config import get_config
+from psdaq.configdb.config_util import wait_pv, timed
 from p4p.client.thread import Context
 
 import json
@@ -20,14 +21,14 @@ def wave8_init(epics_prefix, xpmpv=None):
 def wave8_connect(epics_prefix):
 
     # Retrieve connection information from EPICS
-    # May need to wait for other processes here, so poll
+    # May need to wait for other processes here, so monitor
     ctxt = Context('pva')
-    for i in range(50):
-        values = ctxt.get(epics_prefix+':Top:TriggerEventManager:XpmMessageAligner:RxId').raw.value
-        if values!=0:
-            break
-        print('{:} is zero, retry'.format(epics_prefix+':Top:TriggerEventManager:XpmMessageAligner:RxId'))
-        time.sleep(0.1)
+    name = epics_prefix+':Top:TriggerEventManager:XpmMessageAligner:RxId'
+    try:
+        values = wait_pv(ctxt, name, lambda v: v.raw.value!=0, 5.).raw.value
+    except TimeoutError:
+        print('{:} is zero'.format(name))
+        values = 0
 
     ctxt.close()
 
@@ -36,6 +37,10 @@ def wave8_connect(epics_prefix):
     return json.dumps(d)
 
 def wave8_config(prefix,connect_str,cfgtype,detname,detsegm,group):
+    with timed(prefix):
+        return _wave8_config(prefix,connect_str,cfgtype,detname,detsegm,group)
+
+def _wave8_config(prefix,connect_str,cfgtype,detname,detsegm,group):
     global ctxt
 
     cfg = get_config(connect_str,cfgtype,detname,detsegm)
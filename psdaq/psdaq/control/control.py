@@ -1,5 +1,6 @@
 import os
 import time
+import math
 import copy
 import socket
 from datetime import datetime, timezone, timedelta
@@ -217,6 +218,28 @@ class DaqControl:
 
         return r1
 
+    #
+    # DaqControl.getTransitionTiming - get reply latencies of the last transitions
+    #
+    # Returns dict with one entry per transition (or only the requested one),
+    # including the 'count' slowest responders to the last transition, or None.
+    #
+    def getTransitionTiming(self, transition=None, count=10):
+        r1 = None
+        try:
+            msg = create_msg('gettransitiontiming', body={'transition': transition, 'count': count})
+            self.front_req.send_json(msg)
+            reply = self.front_req.recv_json()
+        except Exception as ex:
+            print('getTransitionTiming() Exception: %s' % ex)
+        else:
+            try:
+                r1 = reply['body']['timing']
+            except Exception as ex:
+                print('getTransitionTiming() Exception: %s' % ex)
+
+        return r1
+
     #
     # DaqControl.getStatus - get status
     #
@@ -605,6 +628,173 @@ def wait_for_answers(socket, wait_time, msg_id):
                           (msg['header']['msg_id'], msg_id))
         remaining = max(0, int(wait_time - 1000*(time.time() - start)))
 
+class ReplyCollector():
+    """
+    Collect the replies with msg_id from a set of ids on socket
+
+    All messages available are handled each time poll() returns, and
+    outstanding ids are kept in a set, so collecting hundreds of replies
+    costs one pass over the messages.  Reply latencies (msec since the
+    collector was created, i.e. since the request was sent) are kept per id.
+    Collection stops when all ids replied, on the first error or at timeout.
+    Parameters
+    ----------
+    socket: zmq socket
+    msg_id: int or None, expected msg_id (None: msg_id of the first reply)
+    ids: iterable of expected sender ids
+    wait_time: int, timeout in milliseconds
+    progress: callable or None, called about once per second while waiting
+    """
+    def __init__(self, socket, msg_id, ids, wait_time, *, progress=None):
+        self.socket = socket
+        self.msg_id = msg_id
+        self.pending = set(ids)
+        self.wait_time = wait_time
+        self.progress = progress
+        self.start = time.monotonic()
+        self.latency = {}   # sender_id: msec
+        self.msgs = []
+        self.reports = []
+        self.error = False
+
+    def elapsed_ms(self):
+        return 1000*(time.monotonic() - self.start)
+
+    def handle(self, msg):
+        global report_keys
+        key = msg['header']['key']
+        sender = msg['header']['sender_id']
+        if key not in report_keys:
+            # if msg_id is none take the msg_id of the first message as reference
+            if self.msg_id is None:
+                self.msg_id = msg['header']['msg_id']
+            if msg['header']['msg_id'] != self.msg_id:
+                logging.error('unexpected msg_id: got %s but expected %s' %
+                              (msg['header']['msg_id'], self.msg_id))
+                return
+
+        # stop early if an error is received
+        if msg['body'] is not None and 'err_info' in msg['body']:
+            logging.debug('ReplyCollector: id %s error: %s' % (sender, msg['body']['err_info']))
+            self.pending = {sender}
+            self.error = True
+
+        if key in report_keys:
+            self.reports.append(msg)
+        elif sender in self.pending:
+            self.msgs.append(msg)
+            self.pending.discard(sender)
+            self.latency[sender] = self.elapsed_ms()
+        else:
+            logging.debug('ReplyCollector: %s not in ids' % sender)
+
+    def collect(self):
+        """
+        Returns (set of ids that did not reply, replies, async reports)
+        """
+        deadline = self.start + self.wait_time/1000
+        next_progress = self.start + 1.0
+        while self.pending and not self.error:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            if self.progress is not None and now >= next_progress:
+                self.progress()
+                next_progress = now + 1.0
+            wake = min(deadline, next_progress) if self.progress is not None else deadline
+            if self.socket.poll(math.ceil(1000*(wake - now))) != zmq.POLLIN:
+                continue
+            # handle everything that arrived without waiting again
+            while self.pending and not self.error:
+                try:
+                    msg = self.socket.recv_json(flags=zmq.NOBLOCK)
+                except zmq.Again:
+                    break
+                except Exception as ex:
+                    logging.error('recv_json(): %s' % ex)
+                    continue
+                logging.debug('recv_json(): %s' % msg)
+                self.handle(msg)
+        return self.pending, self.msgs, self.reports
+
+class TransitionTiming():
+    """
+    Reply latency histograms (msec) per transition and per process
+    """
+    buckets_ms = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 60000]
+
+    def __init__(self):
+        self.transitions = {}   # transition: totals of the transition
+        self.senders = {}       # transition: {sender_id: latency stats}
+
+    def _bucket(self, msec):
+        for ii, le in enumerate(self.buckets_ms):
+            if msec <= le:
+                return ii
+        return len(self.buckets_ms)
+
+    def _stats(self):
+        return {'count': 0, 'last_ms': 0., 'max_ms': 0., 'sum_ms': 0.,
+                'hist': [0] * (len(self.buckets_ms) + 1)}
+
+    def _update(self, stats, msec):
+        stats['count'] += 1
+        stats['last_ms'] = msec
+        stats['max_ms'] = max(stats['max_ms'], msec)
+        stats['sum_ms'] += msec
+        stats['hist'][self._bucket(msec)] += 1
+
+    def record(self, transition, latency, duration_ms, missing):
+        """
+        latency: dict of reply latency (msec) per sender id
+        duration_ms: time spent waiting for all replies
+        missing: ids that did not reply
+        """
+        total = self.transitions.setdefault(transition, self._stats())
+        self._update(total, duration_ms)
+        total['replies'] = len(latency)
+        total['missing'] = sorted(str(xid) for xid in missing)
+        senders = self.senders.setdefault(transition, {})
+        for xid, msec in latency.items():
+            self._update(senders.setdefault(xid, self._stats()), msec)
+        for xid in missing:
+            senders.setdefault(xid, self._stats())['last_ms'] = None
+
+    def report(self, transition=None, count=10, aliases={}):
+        """
+        Returns dict with one entry per transition (or only the requested
+        one) with total duration stats and the count slowest responders to
+        its last occurrence (processes that did not reply first).
+        aliases: dict of alias per sender id
+        """
+        retval = {}
+        names = self.transitions.keys() if transition is None else [transition]
+        for name in names:
+            if name not in self.transitions:
+                continue
+            entry = self._summary(self.transitions[name])
+            entry['replies'] = self.transitions[name]['replies']
+            entry['missing'] = self.transitions[name]['missing']
+            senders = self.senders.get(name, {})
+            slowest = sorted(senders.items(), key=lambda item: math.inf
+                             if item[1]['last_ms'] is None else item[1]['last_ms'], reverse=True)
+            entry['slowest'] = []
+            for xid, stats in slowest[:count]:
+                summary = self._summary(stats)
+                summary['id'] = str(xid)
+                summary['alias'] = aliases.get(xid, str(xid))
+                entry['slowest'].append(summary)
+            retval[name] = entry
+        return retval
+
+    def _summary(self, stats):
+        return {'count': stats['count'],
+                'last_ms': stats['last_ms'],
+                'max_ms': stats['max_ms'],
+                'mean_ms': stats['sum_ms'] / stats['count'] if stats['count'] else None,
+                'buckets_ms': self.buckets_ms,
+                'hist': stats['hist']}
+
 def levels_to_activedet(src):
     dst = {"activedet": {}}
     for level, item1 in src.items():
@@ -754,12 +944,14 @@ class CollectionManager():
             self.station = self.platform
         logging.debug('instrument=%s, station=%d' % (self.instrument, self.station))
         self.ids = set()
+        self.timing = TransitionTiming()
         self.handle_request = {
             'selectplatform': self.handle_selectplatform,
             'getinstrument': self.handle_getinstrument,
             'getstate': self.handle_getstate,
             'storejsonconfig': self.handle_storejsonconfig,
-            'getstatus': self.handle_getstatus
+            'getstatus': self.handle_getstatus,
+            'gettransitiontiming': self.handle_gettransitiontiming
         }
         self.lastTransition = 'reset'
         self.recording = False
@@ -922,39 +1114,25 @@ class CollectionManager():
     #
     # confirm_response -
     #
-    def confirm_response(self, socket, wait_time, msg_id, ids, *, progress_txt=None):
-        global report_keys
+    # Reply latencies are recorded under transition (default: progress_txt)
+    #
+    def confirm_response(self, socket, wait_time, msg_id, ids, *, progress_txt=None, transition=None):
         logging.debug('confirm_response(): ids = %s' % ids)
-        msgs = []
-        reports = []
-        error_flag = False
         begin_time = datetime.now(timezone.utc)
         end_time = begin_time + timedelta(milliseconds=wait_time)
-        while len(ids) > 0 and datetime.now(timezone.utc) < end_time and not error_flag:
-            if progress_txt is not None:
-                self.progressReport(begin_time, end_time, progress_txt=progress_txt)
-            for msg in wait_for_answers(socket, 1000, msg_id):
-
-                # exit loop early if an error is received
-                if msg['body'] is not None and 'err_info' in msg['body']:
-                    logging.debug('confirm_response(): id %s error: %s' %\
-                                  (msg['header']['sender_id'], msg['body']['err_info']))
-                    ids = [msg['header']['sender_id']]
-                    error_flag = True
-
-                if msg['header']['key'] in report_keys:
-                    reports.append(msg)
-                elif msg['header']['sender_id'] in ids:
-                    msgs.append(msg)
-                    ids.remove(msg['header']['sender_id'])
-                    logging.debug('confirm_response(): removed %s from ids' % msg['header']['sender_id'])
-                else:
-                    logging.debug('confirm_response(): %s not in ids' % msg['header']['sender_id'])
-                if error_flag or len(ids) == 0:
-                    break
-        for ii in ids:
+        progress = None
+        if progress_txt is not None:
+            progress = lambda: self.progressReport(begin_time, end_time, progress_txt=progress_txt)
+        collector = ReplyCollector(socket, msg_id, ids, wait_time, progress=progress)
+        missing, msgs, reports = collector.collect()
+        for ii in missing:
             logging.debug('id %s did not respond' % ii)
-        return ids, msgs, reports
+        if transition is None:
+            transition = progress_txt
+        if transition is not None:
+            self.timing.record(transition, collector.latency, collector.elapsed_ms(), missing)
+            logging.debug('confirm_response(): %s took %.1f ms' % (transition, collector.elapsed_ms()))
+        return list(missing), msgs, reports
 
     #
     # process_reports
@@ -1142,7 +1320,8 @@ class CollectionManager():
         ids = self.filter_active_set(self.ids)
         ids = self.filter_level('drp', ids)
         # make sure all the clients respond to transition before timeout
-        missing, answers, reports = self.confirm_response(self.back_pull, self.phase2_timeout, None, ids)
+        missing, answers, reports = self.confirm_response(self.back_pull, self.phase2_timeout, None, ids,
+                                                          transition='%s_phase2' % transition)
         try:
             self.process_reports(reports)
         except ConfigDBError as ex:
@@ -1163,7 +1342,7 @@ class CollectionManager():
         self.back_pub.send_multipart([b'all', json.dumps(msg)])
 
         # make sure all the clients respond to alloc message with their connection info
-        retlist, answers, reports = self.confirm_response(self.back_pull, 1000, msg['header']['msg_id'], ids)
+        retlist, answers, reports = self.confirm_response(self.back_pull, 1000, msg['header']['msg_id'], ids, transition='alloc')
         self.process_reports(reports)
         ret = len(retlist)
         if ret:
@@ -1456,6 +1635,19 @@ class CollectionManager():
         logging.debug('handle_getstatus()')
         return self.status_msg()
 
+    # returns reply latencies of the last transitions, slowest responders first
+    def handle_gettransitiontiming(self, body):
+        logging.debug('handle_gettransitiontiming()')
+        aliases = {}
+        for level, item in self.cmstate_levels().items():
+            for xid, info in item.items():
+                try:
+                    aliases[xid] = info['proc_info']['alias']
+                except KeyError:
+                    pass
+        timing = self.timing.report(body.get('transition'), body.get('count', 10), aliases)
+        return create_msg('transitiontiming', body={'timing': timing})
+
     # Update the active detector file.
     # May throw an exception.
     def handle_storejsonconfig(self, body):
@@ -1707,6 +1899,7 @@ class CollectionManager():
         return matches.intersection(ids)
 
     def get_aliases(self, id_list):
+        id_list = set(id_list)
         alias_list = []
         for level, item in self.cmstate_levels().items():
             for xid in item.keys():
@@ -0,0 +1,221 @@
+"""
+Module :py:class:`CGStatusReceiver` receives control level messages off the Qt thread
+=====================================================================================
+
+StatusReceiver receives the messages published by the control level in a
+background thread and merges them into a StatusSnapshot. The GUI takes the
+snapshot at a capped rate and repaints from it, so that bursts of progress
+and fileReport messages from hundreds of processes do not block the Qt
+event loop. StatusReplay feeds a recorded message stream into the snapshot
+in place of the receiver for performance tests.
+
+Usage ::
+
+    from psdaq.control_gui.CGStatusReceiver import StatusSnapshot, StatusReceiver, StatusReplay
+
+    snapshot = StatusSnapshot()
+    receiver = StatusReceiver(snapshot, 'tcp://localhost:30016', record='messages.jsonl')
+    #receiver = StatusReplay(snapshot, 'messages.jsonl', speed=10)
+    receiver.start()
+    ...
+    d = snapshot.take() # {'status': body or None, 'progress': body or None,
+                        #  'hide_progress': bool, 'events': [(key, body),...], 'dropped': int}
+    ...
+    receiver.stop()
+
+    # write a synthetic stream of a transition of 500 processes
+    write_stream('messages.jsonl', synthetic_stream(nprocs=500))
+
+Recorded streams have one JSON object per line: {"t": <seconds>, "msg": <message>}.
+"""
+
+#----------
+
+import logging
+logger = logging.getLogger(__name__)
+
+import json
+import threading
+from time import time, sleep
+from collections import deque
+
+#----------
+
+class StatusSnapshot :
+    """Latest state merged from control level messages.
+
+    status   - body of the latest 'status' message
+    progress - body of the latest 'progress' message, dropped when any other
+               message follows it, as the GUI hides the progress bar then
+    events   - every other message (and every status for the log), up to
+               maxevents between takes; older ones are counted as dropped
+    """
+    def __init__(self, maxevents=1000) :
+        self._lock = threading.Lock()
+        self.nmessages = 0
+        self._events = deque(maxlen=maxevents)
+        self._reset()
+
+    def _reset(self) :
+        self._status = None
+        self._progress = None
+        self._hide_progress = False
+        self._events.clear()
+        self._dropped = 0
+
+    def merge(self, jo) :
+        """Merges one decoded message."""
+        key = jo['header']['key']
+        body = jo.get('body', {})
+        with self._lock :
+            self.nmessages += 1
+            if key == 'progress' :
+                self._progress = body
+                return
+            if key == 'status' :
+                self._status = body
+            self._progress = None
+            self._hide_progress = True
+            if len(self._events) == self._events.maxlen : self._dropped += 1
+            self._events.append((key, body))
+
+    def merge_multipart(self, msg) :
+        """Merges the parts of a zmq multipart message."""
+        for rec in msg :
+            try :
+                self.merge(json.loads(rec))
+            except (ValueError, KeyError, TypeError) as ex :
+                logger.warning('StatusSnapshot.merge_multipart: %s\nError: %s' % (str(rec), ex))
+
+    def take(self) :
+        """Returns what was merged since the previous take, or None if nothing was."""
+        with self._lock :
+            if self._status is None and self._progress is None and not self._hide_progress :
+                return None
+            d = {'status'       : self._status,
+                 'progress'     : self._progress,
+                 'hide_progress': self._hide_progress,
+                 'events'       : list(self._events),
+                 'dropped'      : self._dropped}
+            self._reset()
+            return d
+
+#----------
+
+class StatusReceiver(threading.Thread) :
+    """Receives the messages of a zmq SUB socket connected to uri into snapshot.
+       If record is a file name, the messages are also written there for StatusReplay.
+    """
+    def __init__(self, snapshot, uri, topicfilter=b'', record=None, poll_ms=100) :
+        threading.Thread.__init__(self, name='StatusReceiver', daemon=True)
+        self.snapshot = snapshot
+        self.uri = uri
+        self.topicfilter = topicfilter
+        self.record = record
+        self.poll_ms = poll_ms
+        self._stop_event = threading.Event()
+
+    def run(self) :
+        import zmq
+        context = zmq.Context(1)
+        socket = context.socket(zmq.SUB)
+        socket.connect(self.uri)
+        socket.setsockopt(zmq.SUBSCRIBE, self.topicfilter)
+        frec = open(self.record, 'w') if self.record else None
+        logger.debug('StatusReceiver connected to %s' % self.uri)
+        try :
+            while not self._stop_event.is_set() :
+                if not socket.poll(self.poll_ms) : continue
+                while True :
+                    try :
+                        msg = socket.recv_multipart(zmq.NOBLOCK)
+                    except zmq.Again :
+                        break
+                    self.snapshot.merge_multipart(msg)
+                    if frec is not None :
+                        t = time()
+                        for rec in msg :
+                            frec.write('{"t": %.6f, "msg": %s}\n' % (t, rec.decode()))
+        finally :
+            if frec is not None : frec.close()
+            socket.close()
+            context.term()
+
+    def stop(self) :
+        self._stop_event.set()
+
+#----------
+
+class StatusReplay(threading.Thread) :
+    """Feeds the messages recorded in file fname into snapshot.
+       speed scales the recorded intervals; 0 feeds the messages as fast as possible.
+    """
+    def __init__(self, snapshot, fname, speed=1.) :
+        threading.Thread.__init__(self, name='StatusReplay', daemon=True)
+        self.snapshot = snapshot
+        self.fname = fname
+        self.speed = speed
+        self._stop_event = threading.Event()
+        self.done = threading.Event()
+
+    def run(self) :
+        t0 = None
+        tstart = time()
+        with open(self.fname) as f :
+            for line in f :
+                if self._stop_event.is_set() : break
+                if not line.strip() : continue
+                rec = json.loads(line)
+                if self.speed > 0 :
+                    if t0 is None : t0 = rec['t']
+                    dt = (rec['t'] - t0)/self.speed - (time() - tstart)
+                    if dt > 0 : sleep(dt)
+                self.snapshot.merge(rec['msg'])
+        logger.info('StatusReplay of %s done in %.3f sec' % (self.fname, time() - tstart))
+        self.done.set()
+
+    def stop(self) :
+        self._stop_event.set()
+
+#----------
+
+def _msg(key, body) :
+    """Same layout as psdaq.control.control.create_msg, without importing zmq."""
+    return {'header': {'key': key, 'msg_id': None, 'sender_id': None}, 'body': body}
+
+def synthetic_stream(nprocs=500, transitions=('configure','enable'), nprogress=20, nfiles=2, interval=0.0005) :
+    """Yields (t, message) of transitions reported by nprocs processes:
+       a status message, nprogress progress messages per process and
+       nfiles fileReport messages per process for each transition.
+    """
+    t = 0.
+    for tr in transitions :
+        for i in range(nprogress) :
+            for p in range(nprocs) :
+                t += interval
+                yield t, _msg('progress', {'transition': tr, 'elapsed': 1000*(i+1), 'total': 1000*nprogress})
+        for p in range(nprocs) :
+            for i in range(nfiles) :
+                t += interval
+                yield t, _msg('fileReport', {'path': '/tmp/drp%03d-s%03d.xtc2' % (p,i)})
+        t += interval
+        yield t, _msg('status', {'transition': tr, 'state': tr+'d', 'config_alias': 'BEAM',
+                                            'recording': False, 'platform': None, 'bypass_activedet': False,
+                                            'experiment_name': 'tst00000', 'run_number': 1, 'last_run_number': 0})
+
+def write_stream(fname, stream) :
+    """Writes (t, message) pairs in the format read by StatusReplay."""
+    with open(fname, 'w') as f :
+        for t, msg in stream :
+            f.write('%s\n' % json.dumps({'t': t, 'msg': msg}))
+
+#----------
+
+if __name__ == "__main__" :
+    import sys
+    fname = sys.argv[1] if len(sys.argv) > 1 else 'control-messages.jsonl'
+    nprocs = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    write_stream(fname, synthetic_stream(nprocs))
+    print('wrote synthetic stream of %d processes to %s' % (nprocs, fname))
+
+#----------
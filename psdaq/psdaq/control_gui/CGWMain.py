@@ -30,7 +30,7 @@ import zmq.utils.jsonapi as json
 from time import time
 
 from PyQt5.QtWidgets import QWidget, QHBoxLayout, QVBoxLayout, QSplitter, QTextEdit, QSizePolicy
-from PyQt5.QtCore import Qt, QSize, QPoint
+from PyQt5.QtCore import Qt, QSize, QPoint, QTimer
 
 from psdaq.control_gui.CGConfigParameters   import cp
 from psdaq.control_gui.CGWMainConfiguration import CGWMainConfiguration
@@ -40,6 +40,8 @@ from psdaq.control_gui.CGDaqControl         import daq_control, DaqControl,\
 from psdaq.control_gui.QWZMQListener        import QWZMQListener, zmq
 from psdaq.control_gui.QWUtils              import confirm_or_cancel_dialog_box
 from psdaq.control_gui.CGWMainTabs          import CGWMainTabs
+from psdaq.control_gui.CGStatusReceiver     import StatusSnapshot, StatusReceiver, StatusReplay
+from psdaq.control.control                  import front_pub_port
 
 #------------------------------
 
@@ -51,11 +53,21 @@ class CGWMain(QWZMQListener):
 
         self.proc_parser(parser)
 
+        # messages are received in a background thread (or replayed from a file)
+        # into self.snapshot, and the widgets are updated from it by on_refresh
+        # at most self.fps times per second
+        QWZMQListener.__init__(self, is_normal=False, timeout=self.timeout)
+        self.snapshot = StatusSnapshot()
+        self.receiver = None
+
+        if self.replay is not None:
+          self.receiver = StatusReplay(self.snapshot, self.replay, speed=self.replay_speed)
         if __name__ != "__main__":
           daq_control.set_daq_control(DaqControl(host=self.host, platform=self.platform, timeout=self.timeout))
-          QWZMQListener.__init__(self, host=self.host, platform=self.platform, timeout=self.timeout)
-        else: # emulator mode for TEST ONLY
-          QWZMQListener.__init__(self, is_normal=False)
+          if self.receiver is None:
+            uri = 'tcp://%s:%d' % (self.host, front_pub_port(self.platform))
+            self.receiver = StatusReceiver(self.snapshot, uri, record=self.record)
+        # else: emulator mode for TEST ONLY
 
         self.init_daq_control_parameters() # cach parameters in cp
 
@@ -90,6 +102,11 @@ class CGWMain(QWZMQListener):
         #self.connect_signals_to_slots()
         #self.move(self.pos()) # + QPoint(self.width()+5, 0))
 
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.on_refresh)
+        self.refresh_timer.start(int(1000/self.fps))
+        if self.receiver is not None: self.receiver.start()
+
     def connect_signals_to_slots(self):
         pass
         #self.connect(self.wbut.but_reset, QtCore.SIGNAL('clicked()'), self.on_but_reset)
@@ -100,6 +117,12 @@ class CGWMain(QWZMQListener):
     def proc_parser(self, parser=None):
         self.parser=parser
 
+        self.timeout      = 1000 # ms
+        self.fps          = 10
+        self.replay       = None
+        self.replay_speed = 1.
+        self.record       = None
+
         if parser is None:
             self.loglevel = 'DEBUG'
             self.logdir   = 'logdir'
@@ -121,6 +144,10 @@ class CGWMain(QWZMQListener):
         self.expert     = popts.expert # bool
         self.user       = popts.user 
         self.password   = popts.password 
+        self.fps          = popts.fps
+        self.replay       = popts.replay
+        self.replay_speed = popts.replay_speed
+        self.record       = popts.record
 
         #if host     != self.defs['host']      : cp.cdb_host.setValue(host)
         #if host     != self.defs['host']      : cp.cdb_host.setValue(host)
@@ -236,6 +263,9 @@ class CGWMain(QWZMQListener):
         #except Exception as ex:
         #    print('Exception: %s' % ex)
 
+        self.refresh_timer.stop()
+        if self.receiver is not None: self.receiver.stop()
+
         try: 
             self.wtabs.close()
             self.wconf.close()
@@ -332,79 +362,78 @@ class CGWMain(QWZMQListener):
 
 
     def process_zmq_message(self, msg):
-        #print('==== msg: %s' % str(msg))
+        self.snapshot.merge_multipart(msg)
+        self.on_refresh()
+
+
+    def on_refresh(self):
+        """Updates the widgets from the messages merged in self.snapshot since the previous refresh.
+        """
+        d = self.snapshot.take()
+        if d is None: return
+        t0_sec = time()
 
         wcoll = cp.cgwmaincollection
         wctrl = cp.cgwmaintabuser if cp.cgwmaintabuser is not None else\
                 cp.cgwmaincontrol
 
-        try:
-            for rec in msg:
-                jo = json.loads(rec)
-                #  jo['header'] # {'key': 'status', 'msg_id': '0918505109-317821000', 'sender_id': None}
-                #  jo['body']   # {'state': 'allocated', 'transition': 'alloc'}
-
-                jo_header_key = jo['header']['key']
-
-                if  jo_header_key == 'status':
-                    body = jo['body']
-                    cp.s_transition = body['transition']
-                    cp.s_state      = body['state']
-                    cp.s_cfgtype    = body['config_alias'] # BEAM/NO BEAM
-                    cp.s_recording  = body['recording']    # True/False
-                    cp.s_platform   = body.get('platform', None) # dict
-                    cp.s_bypass_activedet  = body['bypass_activedet']   # True/False
-                    cp.s_experiment_name  = body['experiment_name']     # string
-                    cp.s_run_number  = body['run_number']               # int
-                    cp.s_last_run_number  = body['last_run_number']     # int
-
-                    #====
-                    if wctrl is not None: wctrl.set_but_ctrls()
-                    if wctrl is not None: wctrl.update_progress_bar(0, is_visible=False)
-                    self.wconf.set_config_type(cp.s_cfgtype)
-                    if wcoll is not None: wcoll.update_table()
+        set_ctrls = False
+        for key, body in d['events']:
+            try:
+                if key == 'status':
                     logger.info('zmq msg transition:%s state:%s config:%s recording:%s'%\
-                                (cp.s_transition, cp.s_state, cp.s_cfgtype, cp.s_recording))
+                                (body['transition'], body['state'], body['config_alias'], body['recording']))
+                    set_ctrls = True
 
-                elif jo_header_key == 'error':
-                    body = jo['body']
+                elif key == 'error':
                     logger.error(str(body['err_info']))
-                    if wctrl is not None: wctrl.update_progress_bar(0, is_visible=False)
-                    if wctrl is not None: wctrl.set_but_ctrls()
-
-                    ## grab status directly (not from error message)
-                    #status = daq_control_get_status()
-                    #if status is None:
-                    #    logger.warning('process_zmq_message on error: STATUS IS NOT AVAILABLE')
-                    #    return
+                    set_ctrls = True
 
-                    #transition, state, cfgtype, recording = status
-                    #self.wconf.set_config_type(cfgtype)
-                    #if wcoll is not None: wcoll.update_table()
-
-                elif jo_header_key == 'warning':
-                    body = jo['body']
+                elif key == 'warning':
                     logger.warning(str(body['err_info']))
-                    if wctrl is not None: wctrl.update_progress_bar(0, is_visible=False)
-                    if wctrl is not None: wctrl.set_but_ctrls()
-
-                elif jo_header_key == 'progress':
-                    body = jo['body']
-                    logger.debug('progress: %s' % str(body))
-                    if wctrl is not None: 
-                        v = 100*body['elapsed'] / body['total']
-                        wctrl.update_progress_bar(v, is_visible=True, trans_name=body['transition'])
+                    set_ctrls = True
 
                 else:
-                    sj = json.dumps(jo, indent=2, sort_keys=False)
-                    logger.debug('received jason:\n%s' % sj)
-                    if wctrl is not None: wctrl.update_progress_bar(0, is_visible=False)
-
-        except KeyError as ex:
-             logger.warning('CGWMain.process_zmq_message: %s\nError: %s' % (str(msg),ex))
-
-        except Exception as ex:
-             logger.warning('CGWMain.process_zmq_message: %s\nError: %s' % (str(msg),ex))
+                    logger.debug('received %s: %s' % (key, str(body)))
+
+            except KeyError as ex:
+                logger.warning('CGWMain.on_refresh: %s %s\nError: %s' % (key, str(body), ex))
+
+        if d['dropped']:
+            logger.debug('CGWMain.on_refresh: %d messages not shown' % d['dropped'])
+
+        body = d['status']
+        if body is not None:
+            #  body # {'state': 'allocated', 'transition': 'alloc', ...}
+            try:
+                cp.s_transition = body['transition']
+                cp.s_state      = body['state']
+                cp.s_cfgtype    = body['config_alias'] # BEAM/NO BEAM
+                cp.s_recording  = body['recording']    # True/False
+                cp.s_platform   = body.get('platform', None) # dict
+                cp.s_bypass_activedet  = body['bypass_activedet']   # True/False
+                cp.s_experiment_name  = body['experiment_name']     # string
+                cp.s_run_number  = body['run_number']               # int
+                cp.s_last_run_number  = body['last_run_number']     # int
+            except KeyError as ex:
+                logger.warning('CGWMain.on_refresh: %s\nError: %s' % (str(body), ex))
+            self.wconf.set_config_type(cp.s_cfgtype)
+            if wcoll is not None: wcoll.update_table()
+
+        if wctrl is not None:
+            if set_ctrls: wctrl.set_but_ctrls()
+            body = d['progress']
+            if body is not None:
+                try:
+                    v = 100*body['elapsed'] / body['total']
+                    wctrl.update_progress_bar(v, is_visible=True, trans_name=body['transition'])
+                except Exception as ex:
+                    logger.warning('CGWMain.on_refresh: progress %s\nError: %s' % (str(body), ex))
+            elif d['hide_progress']:
+                wctrl.update_progress_bar(0, is_visible=False)
+
+        logger.debug('CGWMain.on_refresh %d events, total messages %d, processing time = %.6f sec'%\
+                     (len(d['events']), self.snapshot.nmessages, time()-t0_sec))
 
 #------------------------------
 #------------------------------
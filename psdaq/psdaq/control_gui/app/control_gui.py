@@ -58,6 +58,10 @@ def input_option_parser() :
     d_expert     = False  
     d_user       = 'tmoopr'
     d_password   = 'pcds'
+    d_fps        = 10
+    d_replay     = None
+    d_speed      = 1.
+    d_record     = None
 
     h_platform   = 'platform in range [0,7], default = %s' % d_platform
     h_host       = 'control host, default = %s' % d_host
@@ -69,6 +73,10 @@ def input_option_parser() :
     h_expert     = 'force start gui in expert mode, default = %s' % d_expert
     h_user       = 'user login name, default = %s' % d_user
     h_password   = 'password for interaction with configuration DB, default = %s' % d_password
+    h_fps        = 'maximal rate of status updates [Hz], default = %s' % d_fps
+    h_replay     = 'replay control messages recorded in file instead of receiving them, default = %s' % d_replay
+    h_speed      = 'replay speed factor, 0 - as fast as possible, default = %s' % d_speed
+    h_record     = 'record received control messages in file, default = %s' % d_record
 
     parser = OptionParser(description='DAQ Control GUI', usage=usage())
 
@@ -82,6 +90,10 @@ def input_option_parser() :
     parser.add_option('-E', '--expert',   default=d_expert,   action='store_true',           help=h_expert)
     parser.add_option(      '--user',     default=d_user,     action='store', type='string', help=h_user)
     parser.add_option(      '--password', default=d_password, action='store', type='string', help=h_password)
+    parser.add_option(      '--fps',      default=d_fps,      action='store', type='float',  help=h_fps)
+    parser.add_option(      '--replay',   default=d_replay,   action='store', type='string', help=h_replay)
+    parser.add_option(      '--replay-speed', default=d_speed, action='store', type='float', help=h_speed)
+    parser.add_option(      '--record',   default=d_record,   action='store', type='string', help=h_record)
 
     return parser
   
@@ -0,0 +1,339 @@
+#
+#  Shared receiver of the monitoring data published by the event builder
+#  and infiniband processes
+#
+#  The processes publish [hostname, metrics] JSON messages, metrics being a
+#  dictionary of equal length lists: 'time' (seconds, UTC) and one list per
+#  metric.  The metrics are self-describing: the names a host publishes in
+#  its first message are the ones kept for it.
+#
+#  One MonReceiver thread per server subscribes to the publishers (usually
+#  the back-end of forwarder.py) and feeds a MonData, which averages each
+#  host's samples into bins of several periods (1 s, 10 s, 1 min by
+#  default) and keeps the latest bins of each period in fixed-size ring
+#  buffers.  The bokeh sessions of ebMonitor.py, ibMonitor.py and
+#  ibHwMonitor.py read new bins from the MonData with a cursor, so memory
+#  stays bounded however long a dashboard runs and however many browsers
+#  look at it.
+#
+#  Run as a script, this module publishes synthetic metrics for load tests:
+#
+#    python -m psdaq.eb.monReceiver --connect tcp://psdev7b:55561 --hosts 100
+#
+import argparse
+import json
+import logging
+import threading
+import time
+import numpy as np
+
+PERIODS = (1, 10, 60)   # seconds
+SIZE    = 3600          # bins kept per host and period
+
+EB_METRICS = ['EventCount', 'BatchCount', 'FreeBatchCnt', 'FreeEpochCnt', 'FreeEventCnt']
+
+class RingBuffer(object):
+    """The last size rows of ncols values appended"""
+    def __init__(self, size, ncols):
+        self._buf  = np.full((size, ncols), np.nan)
+        self.count = 0      # rows appended so far
+
+    def append(self, row):
+        self._buf[self.count % len(self._buf)] = row
+        self.count += 1
+
+    def since(self, cursor):
+        """Rows appended since count was cursor (at most size of them) and the new cursor"""
+        n   = min(self.count - cursor, len(self._buf))
+        idx = np.arange(self.count - n, self.count) % len(self._buf)
+        return self._buf[idx], self.count
+
+class Decimator(object):
+    """Averages samples into bins of period seconds.  A bin is complete, and
+    appended to the ring buffer as (bin start time, means), when a sample of
+    a later bin arrives."""
+    def __init__(self, period, size, nvalues):
+        self.period = period
+        self.ring   = RingBuffer(size, nvalues+1)
+        self._bin   = None
+        self._sum   = np.zeros(nvalues)
+        self._n     = np.zeros(nvalues)
+
+    def add(self, t, values):
+        b = int(t // self.period)
+        if self._bin is None:
+            self._bin = b
+        elif b > self._bin:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                means = self._sum/self._n
+            self.ring.append(np.concatenate(([self._bin*self.period], means)))
+            self._bin = b
+            self._sum[:] = 0
+            self._n  [:] = 0
+        # samples older than the current bin are counted in it
+        ok = np.isfinite(values)
+        self._sum[ok] += values[ok]
+        self._n  [ok] += 1
+
+class HostMetrics(object):
+    """Decimated metrics of one host"""
+    def __init__(self, names, periods=PERIODS, size=SIZE):
+        self.names = list(names)
+        self.decimators = {p: Decimator(p, size, len(self.names)) for p in periods}
+
+    def add(self, metrics):
+        times  = metrics['time']
+        values = np.full((len(times), len(self.names)), np.nan)
+        for i, name in enumerate(self.names):
+            if name in metrics:
+                if len(metrics[name]) != len(times):
+                    raise ValueError('%d %s values for %d times' % (len(metrics[name]), name, len(times)))
+                values[:,i] = np.array(metrics[name], dtype=float)
+        for t, row in zip(times, values):
+            for d in self.decimators.values():
+                d.add(t, row)
+
+    def since(self, period, cursor):
+        rows, cursor = self.decimators[period].ring.since(cursor)
+        data = {'time': rows[:,0]}
+        for i, name in enumerate(self.names):
+            data[name] = rows[:,i+1]
+        return data, cursor
+
+class MonData(object):
+    """Decimated metrics of every host, shared by the sessions of a server"""
+    def __init__(self, periods=PERIODS, size=SIZE):
+        self.periods   = tuple(periods)
+        self.size      = size
+        self._hosts    = {}
+        self._lock     = threading.Lock()
+        self.nmessages = 0
+        self.nerrors   = 0
+
+    def add(self, hostname, metrics):
+        with self._lock:
+            self.nmessages += 1
+            host = self._hosts.get(hostname)
+            if host is None:
+                if 'time' not in metrics:
+                    raise KeyError('time')
+                names = [k for k in metrics if k != 'time']
+                host  = HostMetrics(names, self.periods, self.size)
+                self._hosts[hostname] = host
+                logging.info('new host %s: %s' % (hostname, ', '.join(names)))
+            host.add(metrics)
+
+    def add_message(self, msg):
+        """Add a decoded [hostname, metrics] message"""
+        try:
+            hostname, metrics = msg
+            self.add(hostname, metrics)
+        except (ValueError, KeyError, TypeError) as e:
+            self.nerrors += 1
+            logging.warning('bad monitor message %.100s: %s' % (msg, e))
+
+    def hosts(self):
+        with self._lock:
+            return list(self._hosts)
+
+    def names(self, hostname):
+        with self._lock:
+            return list(self._hosts[hostname].names)
+
+    def since(self, hostname, period, cursor=0):
+        """Bins of period completed for hostname since cursor, as a dictionary of
+        arrays of 'time' (bin start, seconds UTC) and the mean of each metric,
+        and the cursor for the next call"""
+        with self._lock:
+            return self._hosts[hostname].since(period, cursor)
+
+class MonReceiver(threading.Thread):
+    """Receives the messages of a zmq SUB socket connected to endpoint into data"""
+    def __init__(self, data, endpoint, poll_ms=100):
+        threading.Thread.__init__(self, name='MonReceiver', daemon=True)
+        self.data = data
+        self.endpoint = endpoint
+        self.poll_ms = poll_ms
+        self._stop_event = threading.Event()
+
+    def run(self):
+        import zmq
+        context = zmq.Context(1)
+        socket = context.socket(zmq.SUB)
+        socket.connect(self.endpoint)
+        socket.setsockopt(zmq.SUBSCRIBE, b'')
+        logging.info('listening to %s' % self.endpoint)
+        try:
+            while not self._stop_event.is_set():
+                if not socket.poll(self.poll_ms): continue
+                while True:
+                    try:
+                        msg = socket.recv(zmq.NOBLOCK)
+                    except zmq.Again:
+                        break
+                    try:
+                        msg = json.loads(msg)
+                    except ValueError as e:
+                        self.data.nerrors += 1
+                        logging.warning('bad monitor message: %s' % e)
+                        continue
+                    self.data.add_message(msg)
+        finally:
+            socket.close()
+            context.term()
+
+    def stop(self):
+        self._stop_event.set()
+
+#  Bokeh server of the decimated data.  panels is a list of (metric, title,
+#  y axis label) and layout the rows of panel indices (None for an empty
+#  cell) under the legend.
+def serve(title, panels, layout, args):
+    from bokeh.plotting import figure
+    from bokeh.layouts import gridplot, column
+    from bokeh.palettes import Category10
+    from bokeh.server.server import Server
+    from bokeh.application import Application
+    from bokeh.models.ranges import DataRange1d
+    from bokeh.models import ColumnDataSource, DatetimeTickFormatter, Select
+    from bokeh.application.handlers.function import FunctionHandler
+    import itertools
+
+    data = MonData(args.periods, args.size)
+    receiver = MonReceiver(data, args.connect)
+    receiver.start()
+
+    def make_document(doc):
+        period  = data.periods[0]
+        sources = {}   # hostname -> [source, cursor]
+        figures = []
+        color_cycle = itertools.cycle(Category10[10])
+
+        formatter = DatetimeTickFormatter(**{k: ["%H:%M:%S"] for k in
+                                             ['seconds','minsec','minutes','hourmin',
+                                              'hours','days','months','years']})
+
+        x_range = DataRange1d(follow='end', follow_interval=300*period*1000, range_padding=0)
+        figleg  = figure(x_axis_type='datetime', x_range=x_range, plot_width=400, plot_height=233, title='Legend')
+        figleg.xaxis.formatter = formatter
+
+        for metric, label, axis_label in panels:
+            fig = figure(x_axis_type='datetime', x_range=x_range, plot_width=400, plot_height=233, title=label)
+            fig.xaxis.formatter  = formatter
+            fig.yaxis.axis_label = axis_label
+            figures.append(fig)
+
+        select = Select(title='Resolution', value=str(period),
+                        options=[(str(p), '%d s' % p) for p in data.periods])
+
+        rows = [[figleg] + [None]*(max(len(r) for r in layout)-1)]
+        rows += [[figures[i] if i is not None else None for i in r] for r in layout]
+        doc.add_root(column(select, gridplot(rows)))
+        doc.title = title
+
+        def columns(hostname, cursor):
+            new, cursor = data.since(hostname, period, cursor)
+            # shift timestamp from UTC to current timezone and convert to milliseconds
+            new['time'] = (new['time'] - time.altzone)*1000
+            return new, cursor
+
+        def update():
+            for hostname in data.hosts():
+                if hostname not in sources:
+                    new, cursor = columns(hostname, 0)
+                    source = ColumnDataSource(data=new)
+                    color  = next(color_cycle)
+                    for fig, (metric, label, axis_label) in zip(figures, panels):
+                        if metric in new:
+                            fig.line(x='time', y=metric, source=source, line_width=1, color=color)
+                    figleg.line(x=0, y=0, line_width=2, color=color, legend=hostname)
+                    sources[hostname] = [source, cursor]
+                else:
+                    source, cursor = sources[hostname]
+                    new, sources[hostname][1] = columns(hostname, cursor)
+                    if len(new['time']):
+                        source.stream(new, rollover=data.size)
+
+        def set_period(attr, old, new):
+            nonlocal period
+            period = int(new)
+            x_range.follow_interval = 300*period*1000
+            for hostname, entry in sources.items():
+                entry[0].data, entry[1] = columns(hostname, 0)
+
+        select.on_change('value', set_period)
+        doc.add_periodic_callback(update, 1000)
+
+    apps   = {'/': Application(FunctionHandler(make_document))}
+    origin = args.allow_origin or ['pslogin7c:%d' % args.port]
+    server = Server(apps, port=args.port, allow_websocket_origin=origin)
+    server.start()
+    server.io_loop.add_callback(server.show, '/')
+    server.io_loop.start()
+
+def server_args(description, connect, port):
+    """Command line of the monitor servers, with their default endpoint and http port"""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('-C', '--connect', default=connect,
+                        help='endpoint of the monitor data publisher [%s]' % connect)
+    parser.add_argument('-P', '--port', type=int, default=port, help='http port [%d]' % port)
+    parser.add_argument('--allow-origin', action='append',
+                        help='allowed websocket origin (repeatable) [pslogin7c:<port>]')
+    parser.add_argument('--periods', type=int, nargs='+', default=list(PERIODS),
+                        help='decimation periods in seconds %s' % list(PERIODS))
+    parser.add_argument('--size', type=int, default=SIZE, help='bins kept per host and period [%d]' % SIZE)
+    parser.add_argument('-v', '--verbose', action='store_true', help='log new hosts')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    return args
+
+def synthetic_metrics(names, t, nsamples=1, rng=np.random):
+    """Random metrics of nsamples samples, one per second ending at time t"""
+    metrics = {'time': [t - nsamples + 1 + i for i in range(nsamples)]}
+    for name in names:
+        metrics[name] = list(rng.uniform(0, 1000, nsamples))
+    return metrics
+
+def publish(socket, nhosts, names, interval=1., nsamples=1, count=0):
+    """Publish synthetic metrics of nhosts hosts every interval seconds,
+    count times (forever if 0)"""
+    hostnames = ['synth%04d' % i for i in range(nhosts)]
+    i = 0
+    while count == 0 or i < count:
+        start = time.time()
+        for hostname in hostnames:
+            socket.send_json([hostname, synthetic_metrics(names, start, nsamples)])
+        i += 1
+        dt = interval - (time.time() - start)
+        if dt > 0:
+            time.sleep(dt)
+        else:
+            logging.warning('publishing %d hosts took %.3f s, longer than the interval' % (nhosts, interval - dt))
+
+def main():
+    parser = argparse.ArgumentParser(description='Synthetic monitor data publisher for load tests')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--connect', default='tcp://localhost:55561',
+                       help='connect to a forwarder front-end [tcp://localhost:55561]')
+    group.add_argument('--bind', help='bind for monitors to connect to instead')
+    parser.add_argument('--hosts', type=int, default=10, help='number of hosts [10]')
+    parser.add_argument('--metrics', default=','.join(EB_METRICS), help='comma separated metric names')
+    parser.add_argument('--interval', type=float, default=1., help='seconds between messages of a host [1]')
+    parser.add_argument('--samples', type=int, default=1, help='samples per message [1]')
+    parser.add_argument('--count', type=int, default=0, help='messages per host, 0 for unlimited [0]')
+    args = parser.parse_args()
+
+    import zmq
+    context = zmq.Context(1)
+    socket = context.socket(zmq.PUB)
+    if args.bind:
+        socket.bind(args.bind)
+    else:
+        socket.connect(args.connect)
+    try:
+        publish(socket, args.hosts, args.metrics.split(','), args.interval, args.samples, args.count)
+    except KeyboardInterrupt:
+        print()
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,7 @@
 # ProcMgr.py - configure (start, stop, status) the DAQ processes
 
 import os, sys, string, telnetlib
+import asyncio
 from subprocess import Popen, PIPE, DEVNULL, run
 import stat, errno, time
 import re
@@ -11,33 +12,45 @@ import io
 from platform import node, python_version
 from getpass import getuser
 import shutil
+from psdaq.procmgr import procserv
 
 uniqueid_maxlen = 30
 rcFileDefault = '/etc/procmgrd.conf'
 
 #
-# printError
+# errorMessage
 #
-def printError(errorCode, args):
+# RETURNS: error message for errorCode, or None if errorCode is 0.
+#
+def errorMessage(errorCode, args):
     if (errorCode == 5):
-        print("*** ERR: failed to run '%s' (invalid arguments)" % args)
+        return "*** ERR: failed to run '%s' (invalid arguments)" % args
     elif (errorCode == 6):
-        print("*** ERR: failed to run '%s' (conda activate failed)" % args)
+        return "*** ERR: failed to run '%s' (conda activate failed)" % args
     elif (errorCode == 7):
-        print("*** ERR: failed to run '%s' (command not found on PATH)" % args)
+        return "*** ERR: failed to run '%s' (command not found on PATH)" % args
     elif (errorCode == 8):
-        print("*** ERR: failed to run '%s' (conda.sh not found)" % args)
+        return "*** ERR: failed to run '%s' (conda.sh not found)" % args
     elif (errorCode == 9):
-        print("*** ERR: failed to run '%s' (procServ not found)" % args)
+        return "*** ERR: failed to run '%s' (procServ not found)" % args
     elif (errorCode == 10):
-        print("*** ERR: failed to run '%s' (rcfile not found)" % args)
+        return "*** ERR: failed to run '%s' (rcfile not found)" % args
     elif (errorCode == 11):
-        print("*** ERR: failed to run '%s' (CONDABASE not defined in rcfile)" % args)
+        return "*** ERR: failed to run '%s' (CONDABASE not defined in rcfile)" % args
     elif (errorCode == 12):
-        print("*** ERR: failed to run '%s' (PROCSERVBIN not defined in rcfile)" % args)
+        return "*** ERR: failed to run '%s' (PROCSERVBIN not defined in rcfile)" % args
     elif (errorCode != 0):
-        print("*** ERR: failed to run '%s' (procServ returned %d)" % \
-            (args, errorCode))
+        return "*** ERR: failed to run '%s' (procServ returned %d)" % \
+            (args, errorCode)
+    return None
+
+#
+# printError
+#
+def printError(errorCode, args):
+    msg = errorMessage(errorCode, args)
+    if msg is not None:
+        print(msg)
     return
 
 #
@@ -90,6 +103,24 @@ def progressMessage(msg):
     sys.stdout.flush()
     return
 
+#
+# parseBanner - get status from the banner of a procServ control port
+#
+# RETURNS: Four values: status, pid, ppid, getid (bytes)
+#
+def parseBanner(response):
+    if re.search(b'SHUT DOWN', response):
+        status = ProcMgr.STATUS_SHUTDOWN
+        pid = b"-"
+        ppid = re.search(b'@@@ procServ server PID: ([0-9]*)', response).group(1)
+        getid = re.search(b'@@@ Child \"(.*)\" start', response).group(1)
+    else:
+        status = ProcMgr.STATUS_RUNNING
+        pid = re.search(b'@@@ Child \"(.*)\" PID: ([0-9]*)', response).group(2)
+        getid = re.search(b'@@@ Child \"(.*)\" PID: ([0-9]*)', response).group(1)
+        ppid = re.search(b'@@@ procServ server PID: ([0-9]*)', response).group(1)
+    return status, pid, ppid, getid
+
 #
 # The ProcMgr class maintains a dictionary with keys of
 # the form "<host>:<uniqueid>".  The following helper functions
@@ -319,7 +350,14 @@ class ProcMgr:
 
     valid_flag_list = ['X', 'x', 'k', 's', 'u', 'p'] 
 
-    def __init__(self, configfilename, platform, Xterm_list=[], xterm_list=[], procmgr_macro={}, baseport=29000):
+    #
+    # The procServ control ports are read concurrently, at most 'parallel'
+    # at a time (default: procserv.DEFAULT_PARALLEL, $PROCMGR_PARALLEL).
+    # Messages are printed in the same order as when reading them one by one.
+    #
+    def __init__(self, configfilename, platform, Xterm_list=[], xterm_list=[], procmgr_macro={}, baseport=29000,
+                 parallel=None):
+        self.parallel = parallel
         self.pid = self.STRING_NOPID
         self.ppid = self.STRING_NOPID
         self.getid = None
@@ -406,8 +444,26 @@ class ProcMgr:
         else:
           print('Error: procmgr_config not a list', config['procmgr_config'])
 
+        # entries waiting for their procServ banner to be read
+        pending = []
+
+        try:
+          self._parseConfigList(configlist, pending, nextCtrlPort, staticPorts,
+                                dup_list, localPorts, remotePorts)
+        finally:
+          # read banners of the entries parsed (also if parsing failed)
+          self._addEntries(pending)
+
+    def _parseConfigList(self, configlist, pending, nextCtrlPort, staticPorts,
+                         dup_list, localPorts, remotePorts):
+        Xterm_list = self.Xterm_list
+        xterm_list = self.xterm_list
+
         # for each entry in the list...
         for entry in configlist:
+          # messages printed after the entries before this one
+          msgs = []
+
           # ...process the fields
 
           # --- real-time priority (optional) ---
@@ -498,7 +554,7 @@ class ProcMgr:
               self.flags += 'p'
             for nextflag in self.flags:
               if (nextflag not in self.valid_flag_list):
-                print('*** ERR: invalid flag:', nextflag)
+                msgs.append('*** ERR: invalid flag: %s' % nextflag)
           else:
             self.flags = '-'
 
@@ -532,12 +588,12 @@ class ProcMgr:
             try:
               tmpsum = int(entry['port'])
             except:
-              print('Error: malformed port value:', entry)
+              msgs.append('Error: malformed port value: %s' % entry)
 
           if tmpsum:
             # assign the port statically
             if tmpsum in staticPorts[self.host]:
-                print('*** ERR: port #%d duplicated in the config file' % tmpsum)
+                msgs.append('*** ERR: port #%d duplicated in the config file' % tmpsum)
             else:
                 # avoid dup: update the set of statically assigned ports
                 staticPorts[self.host].add(tmpsum)
@@ -563,54 +619,91 @@ class ProcMgr:
               else:
                   remotePorts.add(tmpport)
 
-          self.pid = b"-"
-          self.ppid = b"-"
-          self.getid = b"-"
-          # open a connection to the control port (procServ)
-          telnethost = self.host
-          if telnethost == 'localhost':
-              telnethost = self.procmgr_macro.get('HOST', 'localhost')
-          try:
-              self.telnet.open(telnethost, self.ctrlport)
-          except:
-              # telnet failed
-              self.tmpstatus = self.STATUS_NOCONNECT
-              # TODO ping each host first, as telnet could fail due to an error
-          else:
-              # telnet succeeded: gather status from procServ banner
-              try: 
-                ok = self.readLogPortBanner()
-              except EOFError:
-                print('EOFError in readLogPortBanner') 
-                ok = False
-              except:
-                ok = False
-              if not ok:
-                  # reading procServ banner failed
-                  print("*** ERR: failed to read procServ banner for \'%s\' on host %s" \
-                          % (self.uniqueid, self.host))
-              # close connection to the logging port (procServ)
-              self.telnet.close()
-
-          if self.getid.endswith(b".log"):
+          pending.append([msgs, self.host, self.uniqueid, self.ctrlport,
+                          self.cmd, self.flags, self.conda, self.env, self.rtprio])
+
+    #
+    # _addEntries - read the procServ banners of the pending entries and
+    # add the entries to the dictionary
+    #
+    def _addEntries(self, pending):
+        def telnethost(host):
+          if host == 'localhost':
+              return self.procmgr_macro.get('HOST', 'localhost')
+          return host
+
+        banners = procserv.run_gather(self._readBanner,
+                                      [(telnethost(p[1]), p[2], p[3]) for p in pending],
+                                      self.parallel)
+
+        for (msgs, host, uniqueid, ctrlport, cmd, flags, conda, env, rtprio), banner in zip(pending, banners):
+          for msg in msgs:
+              print(msg)
+          tmpstatus, pid, ppid, getid, ok, eof, errmsg = banner
+          if errmsg:
+              print(errmsg)
+          if eof:
+              print('EOFError in readLogPortBanner')
+          if not ok:
+              # reading procServ banner failed
+              print("*** ERR: failed to read procServ banner for \'%s\' on host %s" \
+                      % (uniqueid, host))
+
+          if getid.endswith(b".log"):
             # '/reg/lab2/home/caf/2012/03/29_16:27:22_localhost:helloX.log' -> 'helloX'
-            gotid = self.getid[0:-4].split(b":")[-1]
+            gotid = getid[0:-4].split(b":")[-1]
           else:
-            gotid = self.getid
+            gotid = getid
 
-          if ((self.tmpstatus != self.STATUS_NOCONNECT) and \
-              (self.tmpstatus != self.STATUS_ERROR) and \
-              (gotid != bytes(self.uniqueid, 'utf-8')) and \
-              (not gotid.endswith(bytes(self.uniqueid+".log", 'utf-8')))):
+          if ((tmpstatus != self.STATUS_NOCONNECT) and \
+              (tmpstatus != self.STATUS_ERROR) and \
+              (gotid != bytes(uniqueid, 'utf-8')) and \
+              (not gotid.endswith(bytes(uniqueid+".log", 'utf-8')))):
               print("*** ERR: found %r, expected %r on host %s port %s" % \
-                  (gotid, self.uniqueid, self.host, self.ctrlport))
+                  (gotid, uniqueid, host, ctrlport))
           else:
               # add an entry to the dictionary
-              key = makekey(self.host, self.uniqueid)
+              key = makekey(host, uniqueid)
               self.d[key] = \
-                [ self.tmpstatus, self.pid, self.cmd, self.ctrlport, self.ppid, self.flags, self.getid, self.conda, self.env, self.rtprio]
+                [ tmpstatus, pid, cmd, ctrlport, ppid, flags, getid, conda, env, rtprio]
                 # DICT_STATUS  DICT_PID  DICT_CMD  DICT_CTRL      DICT_PPID  DICT_FLAGS  DICT_GETID DICT_CONDA DICT_ENV DICT_RTPRIO
 
+    #
+    # _readBanner - gather status from the banner of a procServ control port
+    #
+    # RETURNS: status, pid, ppid, getid, ok (banner read), eof (EOFError),
+    #          error message (None if the banner was found)
+    #
+    # Messages are returned instead of printed, as the banners of several
+    # entries are read concurrently, so that _addEntries prints them in order.
+    #
+    async def _readBanner(self, item):
+        host, uniqueid, ctrlport = item
+        # open a connection to the control port (procServ)
+        connection = await procserv.open_retry(host, ctrlport, 1)
+        if connection is None:
+            # telnet failed
+            # TODO ping each host first, as telnet could fail due to an error
+            return self.STATUS_NOCONNECT, b"-", b"-", b"-", True, False, None
+        # telnet succeeded: gather status from procServ banner
+        result = (self.STATUS_ERROR, b"-", b"-", bytes(uniqueid, 'utf-8'))
+        ok = eof = False
+        errmsg = None
+        try:
+            response = await connection.read_until(self.MSG_BANNER_END, 1)
+            if not response.count(self.MSG_BANNER_END):
+                errmsg = 'readLogPortBanner: banner not found in response: %r' % response
+            else:
+                result = parseBanner(response)
+                ok = True
+        except EOFError:
+            eof = True
+        except:
+            pass
+        # close connection to the logging port (procServ)
+        await connection.close()
+        return result + (ok, eof, errmsg)
+
     def spawnXterm(self, name, host, port, large=False):
         if large:
             args = [self.PATH_XTERM, "-bg", "midnightblue", "-fg", "white", "-fa", "18", "-T", name, \
@@ -688,20 +781,14 @@ class ProcMgr:
     def readLogPortBanner(self):
         response = self.telnet.read_until(self.MSG_BANNER_END, 1)
         if not response.count(self.MSG_BANNER_END):
-            print('readLogPortBanner: banner not found in response: '+response)
+            print('readLogPortBanner: banner not found in response: %r' % response)
             self.tmpstatus = self.STATUS_ERROR
             # when reading banner fails, set the ID so the error output includes name instead of '-'
-            self.getid = self.uniqueid
+            self.getid = bytes(self.uniqueid, 'utf-8')
             return 0
-        if re.search(b'SHUT DOWN', response):
-            self.tmpstatus = self.STATUS_SHUTDOWN
-            self.ppid = re.search(b'@@@ procServ server PID: ([0-9]*)', response).group(1)
-            self.getid = re.search(b'@@@ Child \"(.*)\" start', response).group(1)
-        else:
-            self.tmpstatus = self.STATUS_RUNNING
-            self.pid = re.search(b'@@@ Child \"(.*)\" PID: ([0-9]*)', response).group(2)
-            self.getid = re.search(b'@@@ Child \"(.*)\" PID: ([0-9]*)', response).group(1)
-            self.ppid = re.search(b'@@@ procServ server PID: ([0-9]*)', response).group(1)
+        self.tmpstatus, pid, self.ppid, self.getid = parseBanner(response)
+        if self.tmpstatus == self.STATUS_RUNNING:
+            self.pid = pid
         return 1
 
     #
@@ -826,30 +913,31 @@ class ProcMgr:
     # checkConnection
     #
     def checkConnection(self, key, value, verbose=0):
-        connected = False
-        # open a connection to the procServ control port
-        started = False
-        connected = False
-        telnetCount = 0
-        host = key2host(key)
-        while (not connected) and (telnetCount < 2):
-            telnetCount += 1
-            try:
-                self.telnet.open(host, value[self.DICT_CTRL])
-            except:
-                sleep(.25)
-            else:
-                connected = True
-
-        if connected:
-            # close telnet connection
-            self.telnet.close()
+        connected = self.checkConnections([(key, value)])[0]
 
         if verbose:
             print(' --- checkConnection(key=%s) returning %s ---' % (key, connected))
 
         return connected
 
+    #
+    # checkConnections - checkConnection() for a list of (key, value),
+    # concurrently
+    #
+    # RETURNS: list of connected flags, in the order of the list.
+    #
+    def checkConnections(self, items):
+        async def check(item):
+            key, value = item
+            # open a connection to the procServ control port
+            connection = await procserv.open_retry(key2host(key), value[self.DICT_CTRL], 2)
+            if connection is None:
+                return False
+            # close telnet connection
+            await connection.close()
+            return True
+        return procserv.run_gather(check, items, self.parallel)
+
     #
     # restart
     #
@@ -929,6 +1017,13 @@ class ProcMgr:
             logpath = '%s/%s' % (logpathbase, time.strftime('%Y/%m'))
             time_string = time.strftime('%d_%H:%M:%S')
 
+        # double check (concurrently) to see if SHUTDOWN processes are
+        # actually NOCONNECT
+        checklist = [(key, value) for key, value in self.d.items()
+                     if ((len(id_list) == 0) or (key2uniqueid(key) in id_list)) and
+                        (value[self.DICT_STATUS] == self.STATUS_SHUTDOWN)]
+        connected = dict(zip([key for key, value in checklist], self.checkConnections(checklist)))
+
         # create a dictionary mapping hosts to a set of start commands
         startdict = dict()
         for key, value in self.d.items():
@@ -940,7 +1035,9 @@ class ProcMgr:
 
             if value[self.DICT_STATUS] == self.STATUS_SHUTDOWN:
                 # double check to see if process is actually NOCONNECT
-                if not self.checkConnection(key, value, verbose):
+                if verbose:
+                    print(' --- checkConnection(key=%s) returning %s ---' % (key, connected[key]))
+                if not connected[key]:
                     value[self.DICT_STATUS] = self.STATUS_NOCONNECT
 
             if value[self.DICT_STATUS] == self.STATUS_NOCONNECT:
@@ -1055,90 +1152,17 @@ class ProcMgr:
                     started_count += 1
 
         # now use the newly created dictionary to run start command(s)
-        # on each host
-
-        for host, value in startdict.items():
-
-            if (host == 'localhost'):
-                # process list of commands
-                while len(value) > 0:
-                    # send command
-                    args, key = value.pop()
-                    if verbose:
-                        print('Run locally: %s' % args)
-
-                    yy = Popen(args, stdout=DEVNULL, stderr=DEVNULL, shell=True)
-                    yy.wait()
-                    if (yy.returncode != 0):
-                        printError(yy.returncode, args)
-                    else:
-                        self.setStatus([key], self.STATUS_RUNNING)
-                        started_count += 1
-            else:
-                # open a connection to the procmgr control port (procServ)
-                try:
-                    self.telnet.open(host, self.EXECMGRCTRL)
-                except:
-                    # telnet failed
-                    print('*** ERR: telnet to procmgr (%s port %d) failed' % \
-                            (host, self.EXECMGRCTRL))
-                    print('>>> Please start the procServ process on host %s!' % host)
-                else:
-                    # telnet succeeded
-
-                    # send ^U followed by carriage return to safely reach the prompt
-                    self.telnet.write(b"\x15\x0d");
-
-                    # wait for prompt (procServ)
-                    try:
-                        response = self.telnet.read_until(self.MSG_PROMPT, 10)
-                    except EOFError:
-                        response = ""
-                    if not response.count(self.MSG_PROMPT):
-                        print('*** ERR: no prompt at %s port %s' % \
-                            (key2host(key), self.EXECMGRCTRL))
-
-                    # process list of commands
-                    while len(value) > 0:
-
-                        nextcmd, nextkey = value.pop()
-                        args = nextcmd
-
-                        if verbose:
-                            print('Run on %s: %s' % (host, nextcmd))
-
-                        if 'TESTRELDIR' in os.environ:
-                          # set env var on remote host using subshell
-                          nextcmd = '(setenv TESTRELDIR %s; %s; echo "[return=$?]")' % (os.environ['TESTRELDIR'], nextcmd)
-                        else:
-                          nextcmd = '%s; echo "[return=$?]"' % nextcmd
-
-                        # send command
-                        self.telnet.write(bytes('%s\n' % nextcmd, 'utf-8'))
-                        # wait for prompt
-                        try:
-                          response = self.telnet.read_until(self.MSG_PROMPT, 10)
-                        except EOFError:
-                          response = b""
-                        # search for error code after "return="
-                        m = re.search(b'(?<=return=)\d+', response)
-                        if m is not None:
-                            printError(int(m.group(0)), args)
-
-                        if not response.count(self.MSG_PROMPT):
-                            print('*** ERR: no prompt at %s port %s' % \
-                                (host, self.EXECMGRCTRL))
-                        else:
-                            #
-                            # If X flag is set, procServ --wait is used so
-                            # the next state is actually STATUS_SHUTDOWN.
-                            # It will be STATUS_RUNNING after restart, below.
-                            #
-                            self.setStatus([nextkey], self.STATUS_RUNNING)
-                            started_count += 1
-
-                    # close telnet connection
-                    self.telnet.close()
+        # on each host (all hosts concurrently)
+
+        hostlist = list(startdict.items())
+        results = procserv.run_gather(lambda item: self._startHost(item[0], item[1], verbose),
+                                      hostlist, self.parallel)
+        for msgs, startedkeys in results:
+            for msg in msgs:
+                print(msg)
+            for key in startedkeys:
+                self.setStatus([key], self.STATUS_RUNNING)
+                started_count += 1
 
         if len(xlist) > 0 or len(Xlist) > 0:
           # is xterm available?
@@ -1171,6 +1195,100 @@ class ProcMgr:
 
         return rv
 
+    #
+    # _startHost - run the start commands of one host
+    #
+    # RETURNS: Two values: messages to print, keys of the processes started
+    #
+    async def _startHost(self, host, value, verbose):
+        msgs = []
+        startedkeys = []
+
+        if (host == 'localhost'):
+            # process list of commands
+            while len(value) > 0:
+                # send command
+                args, key = value.pop()
+                if verbose:
+                    msgs.append('Run locally: %s' % args)
+
+                yy = await asyncio.create_subprocess_shell(args, stdout=DEVNULL, stderr=DEVNULL)
+                returncode = await yy.wait()
+                if (returncode != 0):
+                    msg = errorMessage(returncode, args)
+                    if msg is not None:
+                        msgs.append(msg)
+                else:
+                    startedkeys.append(key)
+            return msgs, startedkeys
+
+        # open a connection to the procmgr control port (procServ)
+        connection = await procserv.open_retry(host, self.EXECMGRCTRL, 1)
+        if connection is None:
+            # telnet failed
+            msgs.append('*** ERR: telnet to procmgr (%s port %d) failed' % \
+                        (host, self.EXECMGRCTRL))
+            msgs.append('>>> Please start the procServ process on host %s!' % host)
+            return msgs, startedkeys
+
+        # telnet succeeded
+
+        # send ^U followed by carriage return to safely reach the prompt
+        connection.write(b"\x15\x0d");
+
+        # wait for prompt (procServ)
+        try:
+            response = await connection.read_until(self.MSG_PROMPT, 10)
+        except EOFError:
+            response = b""
+        if not response.count(self.MSG_PROMPT):
+            msgs.append('*** ERR: no prompt at %s port %s' % \
+                        (host, self.EXECMGRCTRL))
+
+        # process list of commands
+        while len(value) > 0:
+
+            nextcmd, nextkey = value.pop()
+            args = nextcmd
+
+            if verbose:
+                msgs.append('Run on %s: %s' % (host, nextcmd))
+
+            if 'TESTRELDIR' in os.environ:
+              # set env var on remote host using subshell
+              nextcmd = '(setenv TESTRELDIR %s; %s; echo "[return=$?]")' % (os.environ['TESTRELDIR'], nextcmd)
+            else:
+              nextcmd = '%s; echo "[return=$?]"' % nextcmd
+
+            # send command
+            connection.write(bytes('%s\n' % nextcmd, 'utf-8'))
+            # wait for prompt
+            try:
+              response = await connection.read_until(self.MSG_PROMPT, 10)
+            except EOFError:
+              response = b""
+            # search for error code after "return="
+            m = re.search(b'(?<=return=)\d+', response)
+            if m is not None:
+                msg = errorMessage(int(m.group(0)), args)
+                if msg is not None:
+                    msgs.append(msg)
+
+            if not response.count(self.MSG_PROMPT):
+                msgs.append('*** ERR: no prompt at %s port %s' % \
+                            (host, self.EXECMGRCTRL))
+            else:
+                #
+                # If X flag is set, procServ --wait is used so
+                # the next state is actually STATUS_SHUTDOWN.
+                # It will be STATUS_RUNNING after restart, below.
+                #
+                startedkeys.append(nextkey)
+
+        # close telnet connection
+        await connection.close()
+        return msgs, startedkeys
+
     #
     # isEmpty
     #
@@ -1180,34 +1298,34 @@ class ProcMgr:
     #
     # stopDictionary
     #
+    # The procServ connections are opened and the processes killed
+    # concurrently, messages are printed in the order of stopdict.
+    #
     def stopDictionary(self, stopdict, verbose, sigdelay):
+        return asyncio.run(self._stopDictionary(stopdict, verbose, sigdelay))
+
+    async def _stopDictionary(self, stopdict, verbose, sigdelay):
         rv = 0      # return value
         stopcount = 0
 
         telnetdict = dict()
 
         # open telnet connections
-        for key, value in stopdict.items():
-            connected = False
-            telnetCount = 0
+        def telnethost(key):
             host = key2host(key)
             if host == 'localhost':
                 host = self.procmgr_macro.get('HOST', 'localhost')
-
-            connection = telnetlib.Telnet()
-            while (not connected) and (telnetCount < 2):
-                telnetCount = telnetCount + 1
-                try:
-                    connection.open(host, value[self.DICT_CTRL])
-                except:
-                    sleep(.25)
-                else:
-                    connected = True
-
-            if connected:
+            return host
+
+        keys = list(stopdict.keys())
+        connections = await procserv.gather(
+            lambda key: procserv.open_retry(telnethost(key), stopdict[key][self.DICT_CTRL], 2),
+            keys, self.parallel)
+        for key, connection in zip(keys, connections):
+            if connection is not None:
                 telnetdict[key] = connection
             else:
-                print('*** ERR: telnet to %s port %r failed' % (host, value[self.DICT_CTRL]), end=' ')
+                print('*** ERR: telnet to %s port %r failed' % (telnethost(key), stopdict[key][self.DICT_CTRL]), end=' ')
 
         # send ^C to selected connections
         for key, connection in telnetdict.items():
@@ -1220,6 +1338,7 @@ class ProcMgr:
             try:
                 # 0x03 = ^C
                 telnetdict[key].write(b"\x03");
+                await telnetdict[key].drain()
             except:
                 rv = 1
                 if verbose:
@@ -1233,23 +1352,28 @@ class ProcMgr:
         if (sigdelay > 0) and (stopcount > 0):
             if verbose:
                 progressMessage('waiting %d seconds' % sigdelay)
-            sleep(sigdelay)
+            await asyncio.sleep(sigdelay)
             if verbose:
                 print('done')
 
+        # run fn for each key concurrently
+        # RETURNS: list of (response, exception) in the order of keys
+        async def each(fn, keys):
+            async def call(key):
+                try:
+                    return await fn(telnetdict[key]), None
+                except Exception as ex:
+                    return '(exception)', ex
+            return await procserv.gather(call, keys, self.parallel)
+
         # check for SHUTDOWN connections
-        for key, connection in telnetdict.items():
-            if (not 's' in stopdict[key][self.DICT_FLAGS]):
-                # no 's' flag: skip checking
-                continue
-            try:
-                # wait for SHUT DOWN message
-                response = telnetdict[key].read_very_eager()
-            except:
+        keys = [key for key in telnetdict if 's' in stopdict[key][self.DICT_FLAGS]]
+        for key, (response, ex) in zip(keys, await each(lambda c: c.read_very_eager(), keys)):
+            if ex is not None:
                 rv = 1
                 if verbose:
                     print('FAILED')
-                print('*** ERR: Exception while reading %r client: %r' % (key, sys.exc_info()[1]))
+                print('*** ERR: Exception while reading %r client: %r' % (key, ex))
             else:
                 if response.count(self.MSG_ISSHUTTING)  or response.count(self.MSG_ISSHUTDOWN):
                     if verbose:
@@ -1257,25 +1381,24 @@ class ProcMgr:
                     # change status to SHUTDOWN
                     self.setStatus([key], self.STATUS_SHUTDOWN)
 
+        # send ^X to connections and wait for KILLED message
+        async def kill(connection):
+            # 0x18 = ^X
+            connection.write(b"\x18");
+            return await connection.read_until(self.MSG_KILLED, 1)
+
         # send ^X to connections where status is not SHUTDOWN
         retrylist = []
-        for key, connection in telnetdict.items():
-            if (self.d[key][self.DICT_STATUS] == self.STATUS_SHUTDOWN):
-                continue    # skip
+        keys = [key for key in telnetdict if self.d[key][self.DICT_STATUS] != self.STATUS_SHUTDOWN]
+        for key, (response, ex) in zip(keys, await each(kill, keys)):
             if verbose:
                 progressMessage('sending ^X to %r (%s port %s)' % (key, key2host(key), stopdict[key][self.DICT_CTRL]))
-            try:
-                # 0x18 = ^X
-                telnetdict[key].write(b"\x18");
-                # wait for KILLED message
-                response = telnetdict[key].read_until(self.MSG_KILLED, 1)
-            except:
-                response = '(exception)'
+            if ex is not None:
                 rv = 1
                 if verbose:
                     print('FAILED')
                 retrylist.append(key)
-                print('*** ERR: Exception while killing %r client: %r' % (key, sys.exc_info()[1]))
+                print('*** ERR: Exception while killing %r client: %r' % (key, ex))
             else:
                 if response.count(b"Restarting"):
                     retrylist.append(key)
@@ -1285,20 +1408,14 @@ class ProcMgr:
                     print('done')
 
         # Retry: send ^X to connections for which first attempt failed
-        for key in retrylist:
+        for key, (response, ex) in zip(retrylist, await each(kill, retrylist)):
             if verbose:
                 progressMessage('retry sending ^X to %r (%s port %s)' % (key, key2host(key), stopdict[key][self.DICT_CTRL]))
-            try:
-                # 0x18 = ^X
-                telnetdict[key].write(b"\x18");
-                # wait for KILLED message
-                response = telnetdict[key].read_until(self.MSG_KILLED, 1)
-            except:
-                response = '(exception)'
+            if ex is not None:
                 rv = 1
                 if verbose:
                     print('FAILED')
-                print('*** ERR: Exception while killing %r client: %r' % (key, sys.exc_info()[1]))
+                print('*** ERR: Exception while killing %r client: %r' % (key, ex))
             else:
                 if verbose:
                     if response.count(b"Restarting"):
@@ -1323,8 +1440,8 @@ class ProcMgr:
                     print('done')
 
         # close all connections
-        for key, connection in telnetdict.items():
-            connection.close()
+        await procserv.gather(lambda connection: connection.close(),
+                              list(telnetdict.values()), self.parallel)
 
         return rv
 
@@ -0,0 +1,168 @@
+#!/bin/env python
+# procserv.py - concurrent telnet access to procServ ports (used by ProcMgr)
+#
+# ProcMgr talks to one procServ control port per managed process.  The
+# coroutines here open and read those ports concurrently, with at most
+# 'parallel' connections being opened or read at the same time, so that
+# checking or stopping a partition takes about as long as its slowest
+# procServ rather than the sum of all of them.
+#
+# Connection mimics the subset of telnetlib.Telnet used by ProcMgr
+# (read_until, read_very_eager, write, close), including the handling of
+# telnet option negotiation.
+
+import asyncio
+import os
+
+# default number of concurrent procServ operations
+DEFAULT_PARALLEL = int(os.environ.get('PROCMGR_PARALLEL', 64))
+
+# telnet protocol bytes (see telnetlib)
+IAC  = 255
+DONT = 254
+DO   = 253
+WONT = 252
+WILL = 251
+SB   = 250
+SE   = 240
+
+class Connection:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.cookedq = b''
+        self.rawq = b''
+        self.sb = False
+        self.eof = False
+
+    @classmethod
+    async def open(cls, host, port, timeout=2.5):
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, int(port)), timeout)
+        return cls(reader, writer)
+
+    # move data from rawq to cookedq, answering option negotiation
+    # with refusals like telnetlib does
+    def _process_rawq(self):
+        buf = bytearray()
+        i = 0
+        raw = self.rawq
+        while i < len(raw):
+            c = raw[i]
+            if c != IAC:
+                if not self.sb:
+                    buf.append(c)
+                i += 1
+                continue
+            if i + 1 >= len(raw):
+                break
+            cmd = raw[i+1]
+            if cmd == IAC:
+                if not self.sb:
+                    buf.append(IAC)
+                i += 2
+            elif cmd in (DO, DONT, WILL, WONT):
+                if i + 2 >= len(raw):
+                    break
+                if cmd in (DO, DONT):
+                    self.writer.write(bytes([IAC, WONT, raw[i+2]]))
+                else:
+                    self.writer.write(bytes([IAC, DONT, raw[i+2]]))
+                i += 3
+            else:
+                self.sb = (cmd == SB)
+                i += 2
+        self.rawq = raw[i:]
+        self.cookedq += bytes(buf)
+
+    async def _fill(self, timeout):
+        try:
+            data = await asyncio.wait_for(self.reader.read(4096), timeout)
+        except asyncio.TimeoutError:
+            return False
+        if not data:
+            self.eof = True
+            return False
+        self.rawq += data
+        self._process_rawq()
+        return True
+
+    # Read until match is found or timeout seconds have passed.  Like
+    # telnetlib, return what was read, and raise EOFError if the connection
+    # was closed and nothing was read.
+    async def read_until(self, match, timeout):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            i = self.cookedq.find(match)
+            if i >= 0:
+                i += len(match)
+                response, self.cookedq = self.cookedq[:i], self.cookedq[i:]
+                return response
+            remaining = deadline - loop.time()
+            if self.eof or remaining <= 0 or not await self._fill(remaining):
+                break
+        response, self.cookedq = self.cookedq, b''
+        if self.eof and not response:
+            raise EOFError('telnet connection closed')
+        return response
+
+    # Return the data available without waiting
+    async def read_very_eager(self):
+        while not self.eof and await self._fill(0.001):
+            pass
+        response, self.cookedq = self.cookedq, b''
+        if self.eof and not response:
+            raise EOFError('telnet connection closed')
+        return response
+
+    def write(self, data):
+        if IAC in data:
+            data = data.replace(bytes([IAC]), bytes([IAC, IAC]))
+        self.writer.write(data)
+
+    # flush the data written
+    async def drain(self):
+        await self.writer.drain()
+
+    async def close(self):
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except OSError:
+            pass
+
+#
+# open_retry - open a connection, trying up to 'count' times 0.25 s apart
+#
+# RETURNS: Connection, or None if all attempts failed.
+#
+async def open_retry(host, port, count):
+    for attempt in range(count):
+        try:
+            return await Connection.open(host, port)
+        except (OSError, asyncio.TimeoutError):
+            if attempt + 1 < count:
+                await asyncio.sleep(.25)
+    return None
+
+#
+# gather - run the coroutine function fn for each item, at most 'parallel'
+# at a time
+#
+# RETURNS: list of results, in the order of items.
+#
+async def gather(fn, items, parallel=None):
+    sem = asyncio.Semaphore(parallel or DEFAULT_PARALLEL)
+    async def limited(item):
+        async with sem:
+            return await fn(item)
+    return await asyncio.gather(*[limited(item) for item in items])
+
+#
+# run_gather - gather() from synchronous code
+#
+def run_gather(fn, items, parallel=None):
+    items = list(items)
+    if not items:
+        return []
+    return asyncio.run(gather(fn, items, parallel))
@@ -1,4 +1,5 @@
 import time
+import numpy as np
 
 lverbose = False
 
@@ -12,6 +13,29 @@ def pvUpdate(pv, val):
     value['timeStamp.secondsPastEpoch'], value['timeStamp.nanoseconds'] = divmod(float(time.time_ns()), 1.0e9)
     pv.post(value)
 
+#
+#  Post only values that differ from the last one posted to the pv, and
+#  repost unchanged values every 'heartbeat' seconds so that clients can
+#  tell a quiet statistic from a dead server.
+#
+heartbeat = 10.
+_posted   = {}
+
+def pvUpdateChanged(pv, val, timev=None):
+    if val is None:
+        return
+    now = time.monotonic()
+    last = _posted.get(pv)
+    if last is not None and now-last[1] < heartbeat and np.array_equal(last[0],val):
+        return
+    _posted[pv] = (val.copy() if isinstance(val,np.ndarray) else val, now)
+    if timev is None:
+        timev = divmod(float(time.time_ns()), 1.0e9)
+    value = pv.current()
+    value['value'] = val
+    value['timeStamp.secondsPastEpoch'], value['timeStamp.nanoseconds'] = timev
+    pv.post(value)
+
 class DefaultPVHandler(object):
 
     def __init__(self):
@@ -0,0 +1,64 @@
+import sys
+import time
+import threading
+import traceback
+from p4p.nt import NTScalar
+from p4p.server.thread import SharedPV
+from psdaq.pyxpm.pvhandler import *
+
+#
+#  Runs the update functions of one subsystem every 'period' seconds in its
+#  own thread, so that a slow register read delays only the statistics of
+#  that subsystem.  Publishes
+#    <name>:Period      update period (s), writable
+#    <name>:LoopTime    duration of the last pass (s)
+#    <name>:LoopTimeMax longest pass (s)
+#    <name>:Overruns    number of passes that took longer than the period
+#
+class UpdateScheduler(threading.Thread):
+    def __init__(self, provider, name, period, updates):
+        super(UpdateScheduler, self).__init__(name=name, daemon=True)
+        self._updates  = updates
+        self._period   = period
+        self._loopMax  = 0.
+        self._overruns = 0
+
+        def addPV(label, ctype, init, handler):
+            pv = SharedPV(initial=NTScalar(ctype).wrap(init), handler=handler)
+            provider.add(name+':'+label, pv)
+            return pv
+
+        self._pv_period   = addPV('Period'     ,'f', period, PVHandler(self.setPeriod))
+        self._pv_loopTime = addPV('LoopTime'   ,'f', 0.    , DefaultPVHandler())
+        self._pv_loopMax  = addPV('LoopTimeMax','f', 0.    , DefaultPVHandler())
+        self._pv_overruns = addPV('Overruns'   ,'I', 0     , DefaultPVHandler())
+
+    def setPeriod(self, pv, val):
+        if val > 0:
+            self._period = val
+
+    def run(self):
+        nextTime = time.perf_counter()
+        while True:
+            start = time.perf_counter()
+            for update in self._updates:
+                try:
+                    update()
+                except:
+                    exc = sys.exc_info()
+                    traceback.print_exception(exc[0],exc[1],exc[2])
+                    print('{}: caught exception... retrying.'.format(self.name))
+            curr  = time.perf_counter()
+            dt    = curr-start
+            nextTime += self._period
+            pvUpdate(self._pv_loopTime, dt)
+            if dt > self._loopMax:
+                self._loopMax = dt
+                pvUpdate(self._pv_loopMax, dt)
+            if curr > nextTime:
+                #  Skip the passes we missed rather than running them back to back
+                self._overruns += 1
+                pvUpdate(self._pv_overruns, self._overruns)
+                nextTime = curr
+            else:
+                time.sleep(nextTime-curr)
@@ -1,6 +1,7 @@
 import sys
 import time
 import traceback
+import numpy as np
 from p4p.nt import NTScalar
 from p4p.nt import NTTable
 from p4p.server.thread import SharedPV
@@ -12,6 +13,10 @@ lock     = None
 FID_PERIOD    = 1400e-6/1300.
 FID_PERIOD_NS = 1400e3 /1300.
 
+#  Split a wide counter register into its 32-bit per-link counters
+def linkCounts(reg, nlinks=32):
+    return np.frombuffer(reg.to_bytes(4*nlinks,'little'), dtype='<u4')
+
 def addPV(name,ctype,init=0):
     pv = SharedPV(initial=NTScalar(ctype).wrap(init), handler=DefaultPVHandler())
     provider.add(name, pv)
@@ -72,9 +77,13 @@ class SFPStatus(object):
         if mod is not None:
             self._value['ModuleAbsent'][self._link] = (mod>>j)&1
             if ((mod>>j)&1)==0:
-                amc.I2cMux.set(j|(1<<3))
-                (self._value['TxPower'][self._link],
-                 self._value['RxPower'][self._link]) = amc.SfpI2c.get_pwr()
+                lock.acquire()
+                try:
+                    amc.I2cMux.set(j|(1<<3))
+                    (self._value['TxPower'][self._link],
+                     self._value['RxPower'][self._link]) = amc.SfpI2c.get_pwr()
+                finally:
+                    lock.release()
 
         self._link += 1
         if self._link==14:
@@ -107,34 +116,32 @@ class LinkStatus(object):
     def update(self):
 
         def updatePv(pv,v):
-            if v is not None:
-                value = pv.current()
-                value['value'] = v
-                value['timeStamp.secondsPastEpoch'], value['timeStamp.nanoseconds'] = timev
-                pv.post(value)
+            pvUpdateChanged(pv,v,timev)
 
         timev = divmod(float(time.time_ns()), 1.0e9)
         lock.acquire()
-        self._app.link.set(self._idx)
-        status = self._app.dsLinkStatus.get()
-        if status is not None:
-            updatePv(self._pv_txResetDone,(status>>16)&1)
-            updatePv(self._pv_txReady    ,(status>>17)&1)
-            updatePv(self._pv_rxResetDone,(status>>18)&1)
-            updatePv(self._pv_rxReady    ,(status>>19)&1)
-            updatePv(self._pv_rxIsXpm    ,(status>>20)&1)
-            if self._idx==16:
-                pass
-            else:
-                value = status&0xffff
-                updatePv(self._pv_rxErr,value-self._rxErr)
-                self._rxErr = value
-        value = self._app.dsLinkRxCnt.get()
-        if value is not None:
-            updatePv(self._pv_rxRcv,value-self._rxRcv)
-            self._rxRcv = value
-        updatePv(self._pv_remoteLinkId,self._app.remId.get())
-        lock.release()
+        try:
+            self._app.link.set(self._idx)
+            status = self._app.dsLinkStatus.get()
+            if status is not None:
+                updatePv(self._pv_txResetDone,(status>>16)&1)
+                updatePv(self._pv_txReady    ,(status>>17)&1)
+                updatePv(self._pv_rxResetDone,(status>>18)&1)
+                updatePv(self._pv_rxReady    ,(status>>19)&1)
+                updatePv(self._pv_rxIsXpm    ,(status>>20)&1)
+                if self._idx==16:
+                    pass
+                else:
+                    value = status&0xffff
+                    updatePv(self._pv_rxErr,value-self._rxErr)
+                    self._rxErr = value
+            value = self._app.dsLinkRxCnt.get()
+            if value is not None:
+                updatePv(self._pv_rxRcv,value-self._rxRcv)
+                self._rxRcv = value
+            updatePv(self._pv_remoteLinkId,self._app.remId.get())
+        finally:
+            lock.release()
 
 class TimingStatus(object):
     def __init__(self, name, device):
@@ -172,10 +179,7 @@ class TimingStatus(object):
 
         def updatePv(pv,nv,ov,verbose=False,nb=32):
             if nv is not None:
-                value = pv.current()
-                value['value'] = (nv-ov)&((1<<nb)-1)
-                value['timeStamp.secondsPastEpoch'], value['timeStamp.nanoseconds'] = timev
-                pv.post(value)
+                pvUpdateChanged(pv,(nv-ov)&((1<<nb)-1),timev)
                 return nv
             else:
                 return ov
@@ -192,12 +196,7 @@ class TimingStatus(object):
         self._sofCount        = updatePv(self._pv_sofs, self._device.sofCount.get(), self._sofCount)
         self._eofCount        = updatePv(self._pv_eofs, self._device.eofCount.get(), self._eofCount)
 
-        v = self._device.RxLinkUp.get()
-        if v is not None:
-            value = self._pv_rxLinkUp.current()
-            value['value'] = v
-            value['timeStamp.secondsPastEpoch'], value['timeStamp.nanoseconds'] = timev
-            self._pv_rxLinkUp.post(value)
+        pvUpdateChanged(self._pv_rxLinkUp, self._device.RxLinkUp.get(), timev)
 
 class AmcPLLStatus(object):
     def __init__(self, name, app, idx):
@@ -216,20 +215,18 @@ class AmcPLLStatus(object):
     def update(self):
 
         def updatePv(pv,v):
-            if v is not None:
-                value = pv.current()
-                value['value'] = v
-                value['timeStamp.secondsPastEpoch'], value['timeStamp.nanoseconds'] = timev
-                pv.post(value)
+            pvUpdateChanged(pv,v,timev)
 
         timev = divmod(float(time.time_ns()), 1.0e9)
         lock.acquire()
-        self._idxreg.set(self._idx)
-        updatePv(self._pv_lol   ,self._device.lol   .get())
-        updatePv(self._pv_lolCnt,self._device.lolCnt.get())
-        updatePv(self._pv_los   ,self._device.los   .get())
-        updatePv(self._pv_losCnt,self._device.losCnt.get())
-        lock.release()
+        try:
+            self._idxreg.set(self._idx)
+            updatePv(self._pv_lol   ,self._device.lol   .get())
+            updatePv(self._pv_lolCnt,self._device.lolCnt.get())
+            updatePv(self._pv_los   ,self._device.los   .get())
+            updatePv(self._pv_losCnt,self._device.losCnt.get())
+        finally:
+            lock.release()
 
 class CuStatus(object):
     def __init__(self, name, device, phase):
@@ -245,11 +242,7 @@ class CuStatus(object):
     def update(self):
 
         def updatePv(pv,v):
-            if v is not None:
-                value = pv.current()
-                value['value'] = v
-                value['timeStamp.secondsPastEpoch'], value['timeStamp.nanoseconds'] = timev
-                pv.post(value)
+            pvUpdateChanged(pv,v,timev)
 
         timev = divmod(float(time.time_ns()), 1.0e9)
         updatePv(self._pv_timeStamp   , self._device.timeStampSec()         )
@@ -272,11 +265,7 @@ class MonClkStatus(object):
     def update(self):
 
         def updatePv(pv,v):
-            if v is not None:
-                value = pv.current()
-                value['value'] = v
-                value['timeStamp.secondsPastEpoch'], value['timeStamp.nanoseconds'] = timev
-                pv.post(value)
+            pvUpdateChanged(pv,v,timev)
 
         timev = divmod(float(time.time_ns()), 1.0e9)
         updatePv(self._pv_bpClk , self._app.monClk_0.get())
@@ -296,13 +285,8 @@ class GroupStats(object):
         self._numL0    = self._app.numL0   (l0Stats)
         self._numL0Acc = self._app.numL0Acc(l0Stats)
         self._numL0Inh = self._app.numL0Inh(l0Stats)
-        linkInhEvReg   = self._app.inhEvCnt.get()
-        linkInhTmReg   = self._app.inhTmCnt.get()
-        self._linkInhEv = []
-        self._linkInhTm = []
-        for i in range(32):
-            self._linkInhEv.append((linkInhEvReg>>(32*i))&0xffffffff)
-            self._linkInhTm.append((linkInhTmReg>>(32*i))&0xffffffff)
+        self._linkInhEv = linkCounts(self._app.inhEvCnt.get())
+        self._linkInhTm = linkCounts(self._app.inhTmCnt.get())
 
         def addPVF(label):
             return addPV(name+':'+label,'f')
@@ -324,84 +308,76 @@ class GroupStats(object):
     def update(self):
 
         def updatePv(pv,v):
-            if v is not None:
-                value = pv.current()
-                value['value'] = v
-                value['timeStamp.secondsPastEpoch'], value['timeStamp.nanoseconds'] = timev
-                pv.post(value)
+            pvUpdateChanged(pv,v,timev)
 
         timeval = float(time.time_ns())
         timev = divmod(timeval, 1.0e9)
         lock.acquire()
-        self._app.partition.set(self._group)
-        if self._master:
-            l0Stats  = self._app.l0Stats.get()
-            if l0Stats is not None:
-                l0Ena    = self._app.l0EnaCnt(l0Stats)
-                l0Inh    = self._app.l0InhCnt(l0Stats)
-                numL0    = self._app.numL0   (l0Stats)
-                numL0Acc = self._app.numL0Acc(l0Stats)
-                numL0Inh = self._app.numL0Inh(l0Stats)
-
-                updatePv(self._pv_runTime, l0Ena*FID_PERIOD)
-                updatePv(self._pv_msgDelay, self._app.l0Delay.get())
-                dL0Ena   = l0Ena    - self._l0Ena
-                dL0Inh   = l0Inh    - self._l0Inh
-                dt       = dL0Ena*FID_PERIOD
-                dnumL0   = numL0    - self._numL0
-                dnumL0Acc= numL0Acc - self._numL0Acc
-                dnumL0Inh= numL0Inh - self._numL0Inh
-                if dL0Ena:
-                    l0InpRate = dnumL0/dt
-                    l0AccRate = dnumL0Acc/dt
-                    updatePv(self._pv_deadTime, dL0Inh/dL0Ena)
-                    #   
-                    #  Choose the time based calculation instead
-                    #    More intuitive, updates when not running
-                    #
-                    if False:
-                        linkInhEvReg = self._app.inhEvCnt.get()
-                        linkInhEv = []
-                        for i in range(32):
-                            linkInh = (linkInhEvReg>>(32*i))&0xffffffff
+        try:
+            self._app.partition.set(self._group)
+            if self._master:
+                l0Stats  = self._app.l0Stats.get()
+                if l0Stats is not None:
+                    l0Ena    = self._app.l0EnaCnt(l0Stats)
+                    l0Inh    = self._app.l0InhCnt(l0Stats)
+                    numL0    = self._app.numL0   (l0Stats)
+                    numL0Acc = self._app.numL0Acc(l0Stats)
+                    numL0Inh = self._app.numL0Inh(l0Stats)
+
+                    updatePv(self._pv_runTime, l0Ena*FID_PERIOD)
+                    updatePv(self._pv_msgDelay, self._app.l0Delay.get())
+                    dL0Ena   = l0Ena    - self._l0Ena
+                    dL0Inh   = l0Inh    - self._l0Inh
+                    dt       = dL0Ena*FID_PERIOD
+                    dnumL0   = numL0    - self._numL0
+                    dnumL0Acc= numL0Acc - self._numL0Acc
+                    dnumL0Inh= numL0Inh - self._numL0Inh
+                    if dL0Ena:
+                        l0InpRate = dnumL0/dt
+                        l0AccRate = dnumL0Acc/dt
+                        updatePv(self._pv_deadTime, dL0Inh/dL0Ena)
+                        #   
+                        #  Choose the time based calculation instead
+                        #    More intuitive, updates when not running
+                        #
+                        if False:
+                            linkInhEv = linkCounts(self._app.inhEvCnt.get())
                             if dnumL0:
-                                linkInhEv.append((linkInh - self._linkInhEv[i])/dnumL0)
+                                updatePv(self._pv_deadFLink, (linkInhEv - self._linkInhEv)/dnumL0)
                             else:
-                                linkInhEv.append(0)
-                            self._linkInhEv[i] = linkInh
-                        updatePv(self._pv_deadFLink, linkInhEv)
-                else:
-                    l0InpRate = 0
-                    l0AccRate = 0
-                updatePv(self._pv_l0InpRate, l0InpRate)
-                updatePv(self._pv_l0AccRate, l0AccRate)
-                updatePv(self._pv_numL0Inp, numL0)
-                updatePv(self._pv_numL0Inh, numL0Inh)
-                updatePv(self._pv_numL0Acc, numL0Acc)
-                if dnumL0:
-                    deadFrac = dnumL0Inh/dnumL0
-                else:
-                    deadFrac = 0
-                updatePv(self._pv_deadFrac, deadFrac)
-
-                self._l0Ena   = l0Ena
-                self._l0Inh   = l0Inh
-                self._numL0   = numL0
-                self._numL0Acc= numL0Acc
-                self._numL0Inh= numL0Inh
+                                updatePv(self._pv_deadFLink, np.zeros(32))
+                            self._linkInhEv = linkInhEv
+                    else:
+                        l0InpRate = 0
+                        l0AccRate = 0
+                    updatePv(self._pv_l0InpRate, l0InpRate)
+                    updatePv(self._pv_l0AccRate, l0AccRate)
+                    updatePv(self._pv_numL0Inp, numL0)
+                    updatePv(self._pv_numL0Inh, numL0Inh)
+                    updatePv(self._pv_numL0Acc, numL0Acc)
+                    if dnumL0:
+                        deadFrac = dnumL0Inh/dnumL0
+                    else:
+                        deadFrac = 0
+                    updatePv(self._pv_deadFrac, deadFrac)
+
+                    self._l0Ena   = l0Ena
+                    self._l0Inh   = l0Inh
+                    self._numL0   = numL0
+                    self._numL0Acc= numL0Acc
+                    self._numL0Inh= numL0Inh
                 
-        #else:
-        if True:
-            nfid = (timeval - self._timeval)/FID_PERIOD_NS
-            linkInhTmReg = self._app.inhTmCnt.get()
-            if linkInhTmReg is not None:
-                linkInhTm = []
-                for i in range(32):
-                    linkInh = (linkInhTmReg>>(32*i))&0xffffffff
-                    linkInhTm.append((linkInh - self._linkInhTm[i])/nfid)
-                    self._linkInhTm[i] = linkInh
-                updatePv(self._pv_deadFLink, linkInhTm)
-        lock.release()
+            #else:
+            if True:
+                nfid = (timeval - self._timeval)/FID_PERIOD_NS
+                linkInhTmReg = self._app.inhTmCnt.get()
+                if linkInhTmReg is not None:
+                    #  uint32 differences wrap with the counters
+                    linkInhTm = linkCounts(linkInhTmReg)
+                    updatePv(self._pv_deadFLink, (linkInhTm - self._linkInhTm)/nfid)
+                    self._linkInhTm = linkInhTm
+        finally:
+            lock.release()
 
         self._timeval = timeval
 
@@ -451,20 +427,19 @@ class PVStats(object):
     def init(self):
         pass
 
+    #  Update functions by subsystem, for independent update schedulers
+    def updaters(self):
+        return {'Links' : [v.update for v in self._links+self._amcPll],
+                'Groups': [v.update for v in self._groups],
+                'Timing': [self._usTiming.update, self._cuTiming.update,
+                           self._cuGen.update, self._monClks.update],
+                'SFP'   : [self._sfpStat.update]}
+
     def update(self):
         try:
-            for i in range(32):
-                self._links[i].update()
-            for i in range(2):
-                self._amcPll[i].update()
-            for i in range(8):
-                self._groups[i].update()
-
-            self._usTiming.update()
-            self._cuTiming.update()
-            self._cuGen   .update()
-            self._monClks .update()
-            self._sfpStat .update()
+            for updates in self.updaters().values():
+                for update in updates:
+                    update()
         except:
             exc = sys.exc_info()
             if exc[0]==KeyboardInterrupt:
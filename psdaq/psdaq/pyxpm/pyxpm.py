@@ -19,6 +19,7 @@ from psdaq.pyxpm.pvstats import *
 from psdaq.pyxpm.pvctrls import *
 from psdaq.pyxpm.pvxtpg  import *
 from psdaq.pyxpm.pvhandler import *
+from psdaq.pyxpm.pvscheduler import *
 
 class NoLock(object):
     def __init__(self):
@@ -48,6 +49,7 @@ def main():
     parser.add_argument('--ip', type=str, required=True, help="IP address" )
     parser.add_argument('--db', type=str, default=None, help="save/restore db, for example [https://pswww.slac.stanford.edu/ws-auth/devconfigdb/ws/,configDB,LAB2,PROD]")
     parser.add_argument('-I', action='store_true', help='initialize Cu timing')
+    parser.add_argument('-T', type=float, default=1.0, help='statistics update period (s)', metavar='PERIOD')
 
     args = parser.parse_args()
     if args.verbose:
@@ -83,24 +85,27 @@ def main():
     pvctrls = PVCtrls(provider, lock, name=args.P, ip=args.ip, xpm=xpm, stats=pvstats._groups, db=args.db, cuInit=True) #cuInit=args.I)
     pvxtpg  = PVXTpg(provider, lock, args.P, xpm, xpm.mmcmParms, cuMode='xtpg' in xpm.AxiVersion.ImageName.get())
 
+    # Each subsystem is updated by its own scheduler, so that a slow
+    # register read only delays its own statistics.  Periods are in seconds
+    # and can be changed through the <PREFIX>:SCHED:<name>:Period PVs.
+    updatePeriod = args.T
+    updates = pvstats.updaters()
+    updates['Ctrls'] = [pvctrls.update]
+    if pvxtpg is not None:
+        updates['XTPG'] = [pvxtpg.update]
+    schedulers = [UpdateScheduler(provider, args.P+':SCHED:'+name, updatePeriod, updates[name])
+                  for name in sorted(updates.keys())]
+
     # process PVA transactions
-    updatePeriod = 1.0
     with Server(providers=[provider]):
         try:
             if pvxtpg is not None:
                 pvxtpg .init()
             pvstats.init()
+            for s in schedulers:
+                s.start()
             while True:
-                prev = time.perf_counter()
-                if pvxtpg is not None:
-                    pvxtpg .update()
-                pvstats.update()
-                pvctrls.update()
-                curr  = time.perf_counter()
-                delta = prev+updatePeriod-curr
-#                print('Delta {:.2f}  Update {:.2f}  curr {:.2f}  prev {:.2f}'.format(delta,curr-prev,curr,prev))
-                if delta>0:
-                    time.sleep(delta)
+                time.sleep(1)
         except KeyboardInterrupt:
             pass
 
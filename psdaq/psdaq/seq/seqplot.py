@@ -2,6 +2,7 @@ import pyqtgraph as pg
 import numpy
 import argparse
 import psdaq.seq.seq
+from psdaq.seq.seqsim import Engine, Simulator
 
 f=None
 verbose=False
@@ -16,21 +17,6 @@ class bcolors:
     BOLD = '\033[1m'
     UNDERLINE = '\033[4m'
 
-class Engine(object):
-
-    def __init__(self, acmode=False):
-        self.request = 0
-        self.instr   = 0
-        self.frame   = -1  # 1MHz timeslot
-        self.acframe = -1  # 360Hz timeslot
-        self.acmode  = acmode
-        self.modes   = 0
-        self.ccnt    = [0]*4
-        self.done    = False
-
-    def frame_number(self):
-        return int(self.acframe) if self.acmode else int(self.frame)
-
 class SeqUser:
     def __init__(self, start=0, stop=200, acmode=False):
         global f
@@ -54,28 +40,11 @@ class SeqUser:
 
     def execute(self, title, instrset, descset):
 
-        x = 0
-
-        engine  = Engine(self.acmode)
-        while engine.frame_number() < self.stop and not engine.done:
-
-            frame   = engine.frame_number()
-            request = int(engine.request)
-
-            instrset[engine.instr].execute(engine)
-            if engine.frame_number() != frame:
-                if verbose:
-                    print('frame: {}  instr {}  request {:x}'.format
-                          (frame,engine.instr,request))
-                if frame < self.start:
-                    continue
-                if request != 0:
-                    for i in range(16):
-                        if (request&(1<<i)):
-                            self.xdata.append(frame)
-                            self.ydata.append(i)
-                frame   = engine.frame_number()
-                request = int(engine.request)
+        sim  = Simulator(instrset, self.acmode)
+        bits = sim.trigger_bits(self.start, self.stop)
+        frames, ibits = numpy.nonzero((bits[:,None] >> numpy.arange(16)) & 1)
+        self.xdata = frames + self.start
+        self.ydata = ibits
 
         self.plot.setData(self.xdata,self.ydata)
 
@@ -90,7 +59,7 @@ class SeqUser:
 
         self.app.processEvents()
 
-        if engine.modes == 3:
+        if sim.modes == 3:
             print(bcolors.WARNING + "Found both fixed-rate-sync and ac-rate-sync instructions." + bcolors.ENDC)
 
         input(bcolors.OKGREEN+'Press ENTER to exit'+bcolors.ENDC)
@@ -0,0 +1,310 @@
+#
+#  Fast simulation of sequencer programs
+#
+#  Simulator runs an instruction set like the stepping Engine (the
+#  Instruction.execute methods in seq.py) but detects repeated loop
+#  iterations and replays them in closed form, so windows of many seconds
+#  of 929kHz timeslots take milliseconds.  A loop iteration is repeated when
+#  the state at its branch (request, timeslot phase modulo the sync
+#  intervals in use, other counters) is the same as at the previous
+#  iteration; the remaining iterations then emit the same requests shifted
+#  by the iteration length.
+#
+import argparse
+import numpy as np
+from bisect import bisect_right
+from psdaq.seq.seq import *
+
+CW_RATE = 1300e6/1400.  # MHz timeslots per second
+AC_RATE = 360.          # AC timeslots per second
+
+class Engine(object):
+
+    def __init__(self, acmode=False):
+        self.request = 0
+        self.instr   = 0
+        self.frame   = -1  # 1MHz timeslot
+        self.acframe = -1  # 360Hz timeslot
+        self.acmode  = acmode
+        self.modes   = 0
+        self.ccnt    = [0]*4
+        self.done    = False
+
+    def frame_number(self):
+        return int(self.acframe) if self.acmode else int(self.frame)
+
+def step(instrset, stop, acmode=False):
+    """Reference simulation, one Instruction.execute at a time.
+
+    Returns the arrays of (timeslot, request) for each timeslot < stop with a
+    request and the Engine.modes.
+    """
+    frames   = []
+    requests = []
+    engine  = Engine(acmode)
+    while engine.frame_number() < stop and not engine.done:
+        frame   = engine.frame_number()
+        request = int(engine.request)
+        instrset[engine.instr].execute(engine)
+        if engine.frame_number() != frame and request != 0:
+            frames  .append(frame)
+            requests.append(request)
+    return np.array(frames,dtype=np.int64), np.array(requests,dtype=np.int64), engine.modes
+
+def _lcm(values):
+    m = 1
+    for v in values:
+        m = m*v//np.gcd(m,v)
+    return int(m)
+
+#  Requests emitted by the simulation, kept as chunks of arrays
+class _Events(object):
+    def __init__(self):
+        self._chunks = []   # [(frames, requests)]
+        self._starts = []   # index of the first event of each chunk
+        self._frames = []   # events not yet in a chunk
+        self._reqs   = []
+        self._n      = 0
+
+    def __len__(self):
+        return self._n + len(self._frames)
+
+    def append(self, frame, request):
+        self._frames.append(frame)
+        self._reqs  .append(request)
+
+    def _add(self, frames, requests):
+        self._chunks.append((frames,requests))
+        self._starts.append(self._n)
+        self._n += len(frames)
+
+    def _flush(self):
+        if self._frames:
+            self._add(np.array(self._frames,dtype=np.int64), np.array(self._reqs,dtype=np.int64))
+            self._frames, self._reqs = [], []
+
+    def extend(self, frames, requests):
+        self._flush()
+        self._add(frames, requests)
+
+    def since(self, index):
+        self._flush()
+        i = max(bisect_right(self._starts, index)-1, 0)
+        chunks = self._chunks[i:]
+        if not chunks:
+            return np.zeros(0,dtype=np.int64), np.zeros(0,dtype=np.int64)
+        skip = index - self._starts[i]
+        return (np.concatenate([c[0] for c in chunks])[skip:],
+                np.concatenate([c[1] for c in chunks])[skip:])
+
+    def arrays(self):
+        return self.since(0)
+
+class Simulator(object):
+    """Compiled simulation of an instruction set.
+
+    acmode selects the timeslots of the results: AC (360Hz) timeslots if
+    True, MHz timeslots otherwise, as for seqplot.
+    """
+    def __init__(self, instrset, acmode=False):
+        self.acmode = acmode
+        self._code  = []
+        n = len(instrset)
+        for i,instr in enumerate(instrset):
+            op = instr.args[0]
+            if op==FixedRateSync.opcode:
+                code = (FixedIntvs[instr.args[1]], instr.args[2])
+            elif op==ACRateSync.opcode:
+                code = (instr.args[1]&0x3f, ACIntvs[instr.args[2]], instr.args[3])
+            elif op==Branch.opcode:
+                code = tuple(instr.args[1:])
+                if not 0 <= code[0] < n:
+                    raise ValueError('instruction {}: branch to line {} outside the program'.format(i,code[0]))
+                if len(code)>1 and not 0 <= code[1] < 4:
+                    raise ValueError('instruction {}: invalid counter {}'.format(i,code[1]))
+            elif op==BeamRequest.opcode:
+                code = ((instr.args[1]<<16) | 1,)
+            elif op==ControlRequest.opcode:
+                code = (instr.args[1],)
+            else:
+                code = ()
+            self._code.append((op,code))
+
+        self._mod = self._modulus(0, n)
+
+        #  Conditional backward branches whose iterations can be repeated:
+        #  nothing in the loop leaves it and no other branch of the program
+        #  tests the same counter.  The iterations then depend only on the
+        #  timeslot phase modulo the sync intervals inside the loop.
+        self._loops = {}
+        for b,(op,c) in enumerate(self._code):
+            if op!=Branch.opcode or len(c)==1 or c[0]>b:
+                continue
+            ok = True
+            for i,(opi,ci) in enumerate(self._code):
+                if opi!=Branch.opcode or i==b:
+                    continue
+                if len(ci)>1 and ci[1]==c[1]:
+                    ok = False
+                elif c[0] <= i < b and not c[0] <= ci[0] <= b:
+                    ok = False
+            if ok:
+                self._loops[b] = self._modulus(c[0], b)
+
+    #  Periods of the (MHz, AC) timeslots over which the syncs of lines
+    #  [begin,end) repeat
+    def _modulus(self, begin, end):
+        code = self._code[begin:end]
+        return (_lcm([c[0] for op,c in code if op==FixedRateSync.opcode]),
+                _lcm([6*c[1] for op,c in code if op==ACRateSync.opcode]))
+
+    def run(self, stop):
+        """Simulate until timeslot stop.
+
+        Returns the arrays of (timeslot, request) for each timeslot < stop
+        with a request.  The modes (1 for FixedRateSync, 2 for ACRateSync) of
+        the instructions executed are left in self.modes.
+        """
+        code    = self._code
+        acmode  = self.acmode
+        loops   = self._loops
+        events  = _Events()
+        snaps   = {}
+        frame   = -1
+        acframe = -1
+        request = 0
+        modes   = 0
+        ccnt    = [0]*4
+        pc      = 0
+
+        #  Replay n more iterations (as many as reach stop if None) of the
+        #  loop closing at pc, whose previous iteration ended in snapshot snap
+        def repeat(n, snap):
+            dframe   = frame   - snap[2]
+            dacframe = acframe - snap[3]
+            dmode    = dacframe if acmode else dframe
+            if dmode > 0:
+                nmax = -(-(stop - (acframe if acmode else frame))//dmode)
+                n = nmax if n is None else min(n, nmax)
+            elif n is None:
+                raise ValueError('sequence loops at line {} without advancing the timeslot'.format(pc))
+            if n > 0:
+                f, r = events.since(snap[4])
+                if len(f):
+                    events.extend((f[None,:] + dmode*np.arange(1,n+1,dtype=np.int64)[:,None]).ravel(),
+                                  np.tile(r,n))
+            return n, n*dframe, n*dacframe
+
+        while (acframe if acmode else frame) < stop:
+            op, c = code[pc]
+            if op==FixedRateSync.opcode:
+                intv, occ = c
+                adv = intv*occ-(frame%intv)
+                if adv>0:
+                    if not acmode and request != 0:
+                        events.append(frame, request)
+                    frame  += adv
+                    request = 0
+                modes |= 1
+                pc    += 1
+            elif op==ACRateSync.opcode:
+                mask, intv, occ = c
+                prev = acframe
+                for i in range(occ):
+                    while True:
+                        acframe += 1
+                        if ((1<<(acframe%6))&mask)!=0 and (acframe//6)%intv==0:
+                            break
+                if acmode and acframe != prev and request != 0:
+                    events.append(prev, request)
+                request = 0
+                modes  |= 2
+                pc     += 1
+            elif op==Branch.opcode:
+                if len(c)==1:
+                    if c[0]==pc:    # branch to self
+                        break
+                    if c[0]<pc:
+                        M, Mac = self._mod
+                        state = (request, frame%M, acframe%Mac, tuple(ccnt))
+                        snap  = snaps.get(pc)
+                        if snap is not None and snap[1]==state:
+                            n, df, dac = repeat(None, snap)
+                            frame += df; acframe += dac
+                        snaps[pc] = (None, state, frame, acframe, len(events))
+                    pc = c[0]
+                else:
+                    line, ctr, value = c
+                    k = ccnt[ctr]
+                    if k<value and pc in loops:
+                        M, Mac = loops[pc]
+                        state = (request, frame%M, acframe%Mac, tuple(ccnt[:ctr]+ccnt[ctr+1:]))
+                        snap  = snaps.get(pc)
+                        if snap is not None and snap[0]==k-1 and snap[1]==state:
+                            n, df, dac = repeat(value-k, snap)
+                            frame += df; acframe += dac
+                            k += n
+                        snaps[pc] = (k, state, frame, acframe, len(events))
+                    if k==value:
+                        pc += 1
+                        ccnt[ctr] = 0
+                    else:
+                        pc = line
+                        ccnt[ctr] = k+1
+            elif op==CheckPoint.opcode:
+                pc += 1
+            else:   # BeamRequest, ControlRequest
+                request = c[0]
+                pc     += 1
+
+        self.modes = modes
+        frames, requests = events.arrays()
+        keep = frames < stop
+        return frames[keep], requests[keep]
+
+    def trigger_bits(self, start, stop):
+        """Array of the 16 request bits of each timeslot in [start,stop)."""
+        frames, requests = self.run(stop)
+        keep = frames >= start
+        bits = np.zeros(stop-start, dtype=np.uint16)
+        bits[frames[keep]-start] = requests[keep]&0xffff
+        return bits
+
+    def counts(self, start, stop):
+        """Number of requests of each of the 16 bits in [start,stop)."""
+        frames, requests = self.run(stop)
+        bits = requests[frames >= start].astype('<u2').view(np.uint8)
+        return np.unpackbits(bits, bitorder='little').reshape(-1,16).sum(axis=0)
+
+    def rates(self, seconds=1., start=0):
+        """Request rate (Hz) of each of the 16 bits over the window starting
+        at timeslot start."""
+        rate = AC_RATE if self.acmode else CW_RATE
+        stop = start + int(round(seconds*rate))
+        return self.counts(start, stop)*rate/(stop-start)
+
+def load(fname):
+    """Execute the sequence script fname.  Returns its title, instrset and descset."""
+    config = {'title':'TITLE', 'descset':None, 'instrset':None}
+    exec(compile(open(fname).read(), fname, 'exec'), {}, config)
+    return config
+
+def main():
+    parser = argparse.ArgumentParser(description='sequence simulation; prints request rates')
+    parser.add_argument("seq", help="sequence script")
+    parser.add_argument("--seconds", default=1., type=float, help="window length")
+    parser.add_argument("--start", default=0, type=int, help="beginning timeslot")
+    parser.add_argument("--mode" , default='CW', help="timeslot mode [CW,AC]")
+    args = parser.parse_args()
+
+    config = load(args.seq)
+    sim    = Simulator(config['instrset'], acmode=(args.mode=='AC'))
+    rates  = sim.rates(args.seconds, args.start)
+    descset = config['descset'] or []
+    print(config['title'])
+    for i,r in enumerate(rates):
+        desc = descset[i] if i < len(descset) else ''
+        print('{:2d} {:>12.1f} Hz  {:}'.format(i,r,desc))
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
 #include "Json2Xtc.hh"
+#include <string.h>
 
 using namespace XtcData;
 using namespace rapidjson;
@@ -72,6 +73,50 @@ std::string JsonIterator::curname() {
     return result;
 }
 
+//
+// Decode a binary array value ("base64:" followed by the base64 encoding of
+// the little-endian data, see typed_json.py) into out, which holds size
+// bytes.  Returns false if the value is not valid or has the wrong size.
+//
+static const char binaryPrefix[] = "base64:";
+
+static bool decodeBinary(const char *in, unsigned len, uint8_t *out, unsigned size)
+{
+    static int8_t lut[256];
+    static bool init = false;
+    if (!init) {
+        const char *chars = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/";
+        for (unsigned i = 0; i < 256; i++)
+            lut[i] = -1;
+        for (unsigned i = 0; i < 64; i++)
+            lut[(uint8_t)chars[i]] = i;
+        init = true;
+    }
+    unsigned plen = sizeof(binaryPrefix) - 1;
+    if (len < plen || strncmp(in, binaryPrefix, plen) != 0)
+        return false;
+    in += plen;
+    len -= plen;
+    while (len > 0 && in[len-1] == '=')
+        len--;
+    if ((len * 6) / 8 != size)
+        return false;
+    uint32_t acc = 0;
+    unsigned bits = 0, n = 0;
+    for (unsigned i = 0; i < len; i++) {
+        int8_t c = lut[(uint8_t)in[i]];
+        if (c < 0)
+            return false;
+        acc = (acc << 6) | c;
+        bits += 6;
+        if (bits >= 8) {
+            bits -= 8;
+            out[n++] = (acc >> bits) & 0xff;
+        }
+    }
+    return n == size;
+}
+
 Value *JsonIterator::findJsonType() {
     Value *typ = &_types;
     for (unsigned i = 0; i < _names.size(); i++) {
@@ -155,6 +200,15 @@ public:
                                           unsigned size, Name::DataType typ) {
         Array<T> arrayT = _cd.allocate<T>(_cnt, shape);
         T *data = arrayT.data();
+        if (val.IsString()) {
+            // Binary encoding (little-endian, like this host)
+            if (!decodeBinary(val.GetString(), val.GetStringLength(),
+                              (uint8_t*)data, size * sizeof(T))) {
+                printf("Invalid binary array %s\n", curname().c_str());
+                memset(data, 0, size * sizeof(T));
+            }
+            return;
+        }
         for (unsigned i = 0; i < size; i++)
             data[i] = getVal<T>(val[i], typ);
     }
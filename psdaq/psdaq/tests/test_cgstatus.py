@@ -0,0 +1,57 @@
+import json
+import time
+from psdaq.control_gui.CGStatusReceiver import StatusSnapshot, StatusReplay, synthetic_stream, write_stream
+
+def msg(key, **body):
+    return {'header': {'key': key, 'msg_id': None, 'sender_id': None}, 'body': body}
+
+def test_snapshot():
+    s = StatusSnapshot(maxevents=3)
+    assert s.take() is None
+
+    s.merge(msg('progress', transition='configure', elapsed=1, total=10))
+    s.merge(msg('progress', transition='configure', elapsed=5, total=10))
+    d = s.take()
+    assert d['progress']['elapsed'] == 5
+    assert d['status'] is None and not d['hide_progress'] and d['events'] == []
+    assert s.take() is None
+
+    # a message other than progress hides the progress bar
+    s.merge(msg('progress', transition='configure', elapsed=9, total=10))
+    s.merge(msg('status', transition='configure', state='configured'))
+    d = s.take()
+    assert d['progress'] is None and d['hide_progress']
+    assert d['status']['state'] == 'configured'
+    assert d['events'] == [('status', {'transition': 'configure', 'state': 'configured'})]
+
+    for i in range(5):
+        s.merge(msg('fileReport', path='f%d' % i))
+    s.merge_multipart([json.dumps(msg('progress', transition='enable', elapsed=1, total=2)).encode(), b'not json'])
+    d = s.take()
+    assert [e[1]['path'] for e in d['events']] == ['f2', 'f3', 'f4']
+    assert d['dropped'] == 2
+    assert d['progress']['transition'] == 'enable'
+    assert s.nmessages == 10
+
+def test_replay(tmp_path):
+    fname = str(tmp_path / 'stream.jsonl')
+    stream = list(synthetic_stream(nprocs=200, nprogress=5, nfiles=2))
+    write_stream(fname, stream)
+
+    s = StatusSnapshot()
+    replay = StatusReplay(s, fname, speed=0)
+    replay.start()
+    assert replay.done.wait(10)
+    assert s.nmessages == len(stream) == 2*(200*5 + 200*2 + 1)
+    d = s.take()
+    assert d['status']['transition'] == 'enable'
+    assert d['progress'] is None and d['hide_progress']
+    assert len(d['events']) == 2*(200*2 + 1) and d['dropped'] == 0
+
+    # recorded intervals are kept, scaled by speed
+    s = StatusSnapshot()
+    replay = StatusReplay(s, fname, speed=stream[-1][0]/0.5)
+    t0 = time.time()
+    replay.start()
+    assert replay.done.wait(10)
+    assert time.time() - t0 >= 0.45
@@ -0,0 +1,71 @@
+import time
+import threading
+import pytest
+from psdaq.configdb.config_util import wait_pv, configure_all, ConfigureError, durations
+
+# Minimal stand-in for a p4p client Context: monitor() delivers the current
+# value on subscription and every later put.
+class FakeContext(object):
+    def __init__(self, **values):
+        self._values = values
+        self._subs = {}
+        self._lock = threading.Lock()
+
+    def monitor(self, name, cb, notify_disconnect=False):
+        ctxt = self
+        class Sub(object):
+            def close(self):
+                with ctxt._lock:
+                    ctxt._subs[name].remove(cb)
+        with self._lock:
+            self._subs.setdefault(name, []).append(cb)
+        if name in self._values:
+            cb(self._values[name])
+        elif notify_disconnect:
+            cb(Exception('disconnected'))
+        return Sub()
+
+    def put(self, name, value):
+        with self._lock:
+            self._values[name] = value
+            cbs = list(self._subs.get(name, []))
+        for cb in cbs:
+            cb(value)
+
+    def put_later(self, name, value, delay):
+        threading.Timer(delay, self.put, (name, value)).start()
+
+def test_wait_pv():
+    ctxt = FakeContext(READY=1)
+    assert wait_pv(ctxt, 'READY', lambda v: v!=0, 1.) == 1
+
+    ctxt = FakeContext(READY=0)
+    ctxt.put_later('READY', 1, 0.2)
+    st = time.time()
+    assert wait_pv(ctxt, 'READY', lambda v: v!=0, 5.) == 1
+    assert time.time() - st < 1.
+    assert ctxt._subs['READY'] == []
+
+    with pytest.raises(TimeoutError):
+        wait_pv(FakeContext(), 'READY', lambda v: v!=0, 0.2)
+
+def test_configure_all():
+    def configure(name, delay):
+        time.sleep(delay)
+        if name.startswith('bad'):
+            raise ValueError(name + ' misconfigured')
+        return name.upper()
+
+    devices = {'hsd_%d' % i: ('hsd_%d' % i, 0.2) for i in range(5)}
+    st = time.time()
+    assert configure_all(configure, devices) == {d: d.upper() for d in devices}
+    assert time.time() - st < 0.6
+    for d in devices:
+        assert durations[d] == pytest.approx(0.2, abs=0.1)
+
+    devices['bad_0'] = ('bad_0', 0)
+    devices['bad_1'] = ('bad_1', 0.1)
+    with pytest.raises(ConfigureError) as e:
+        configure_all(configure, devices, parallel=2)
+    assert sorted(e.value.errors) == ['bad_0', 'bad_1']
+    assert 'bad_1: bad_1 misconfigured' in str(e.value)
@@ -0,0 +1,105 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlparse, parse_qs
+import pytest
+import psdaq.configdb.configdb as cdb
+
+# Stand-in for the configdb web service (no authentication), serving the
+# get_key, get_configuration and get_configurations commands of one hutch.
+class ConfigdbServer(object):
+    def __init__(self, bulk=True):
+        self.bulk = bulk
+        self.key = {'BEAM': 1}
+        self.configs = {'BEAM': {'tst_0': {'detName:RO': 'tst_0', 'x': 1},
+                                 'tst_1': {'detName:RO': 'tst_1', 'x': 2}}}
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                cmd = url.path.strip('/').split('/')[2:] # strip ws/root
+                server.requests.append(cmd[0])
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if cmd[0] == 'get_key':
+                    alias = parse_qs(url.query)['alias'][0]
+                    self.reply({'success': True, 'value': server.key[alias]})
+                elif cmd[0] == 'get_configuration':
+                    self.reply({'success': True, 'value': server.configs[cmd[2]][cmd[3]]})
+                elif cmd[0] == 'get_configurations' and server.bulk:
+                    devices = json.loads(body)['devices']
+                    value = {d: server.configs[cmd[2]][d] for d in devices}
+                    self.reply({'success': True, 'value': value, 'key': server.key[cmd[2]]})
+                else:
+                    self.send_error(404)
+
+            def reply(self, value):
+                data = json.dumps(value).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = HTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:%d/ws/' % self.httpd.server_address[1]
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def modify(self, alias, device, cfg):
+        self.configs[alias][device] = cfg
+        self.key[alias] += 1
+
+@pytest.mark.parametrize('bulk', [True, False])
+def test_get_configurations(tmp_path, bulk):
+    with ConfigdbServer(bulk=bulk) as server:
+        mycdb = cdb.configdb(server.url, 'tst', root='configDB', cache_dir=str(tmp_path))
+        devices = ['tst_0', 'tst_1']
+        cfgs = mycdb.get_configurations('BEAM', devices)
+        assert cfgs == server.configs['BEAM']
+        if bulk:
+            assert server.requests == ['get_key', 'get_configurations']
+        else:
+            assert server.requests == ['get_key', 'get_configurations',
+                                       'get_configuration', 'get_configuration']
+            assert not mycdb.bulk
+
+        # unchanged alias: only the key is read, also by a new client
+        del server.requests[:]
+        mycdb = cdb.configdb(server.url, 'tst', root='configDB', cache_dir=str(tmp_path))
+        assert mycdb.get_configurations('BEAM', devices) == cfgs
+        assert server.requests == ['get_key']
+
+        # a new key invalidates the cached configurations
+        del server.requests[:]
+        server.modify('BEAM', 'tst_1', {'detName:RO': 'tst_1', 'x': 3})
+        cfgs = mycdb.get_configurations('BEAM', devices)
+        assert cfgs['tst_1']['x'] == 3
+        assert server.requests[0] == 'get_key'
+        assert 'get_key' not in server.requests[1:]
+
+def test_key_ttl(tmp_path):
+    with ConfigdbServer() as server:
+        mycdb = cdb.configdb(server.url, 'tst', root='configDB', cache_dir=str(tmp_path), key_ttl=60)
+        cfgs = mycdb.get_configurations('BEAM', ['tst_0'])
+        del server.requests[:]
+        assert mycdb.get_configurations('BEAM', ['tst_0']) == cfgs
+        assert server.requests == []
+
+def test_no_cache(tmp_path):
+    with ConfigdbServer() as server:
+        mycdb = cdb.configdb(server.url, 'tst', root='configDB', cache_dir=None)
+        for i in range(2):
+            mycdb.get_configurations('BEAM', ['tst_0'])
+        assert server.requests == ['get_configurations'] * 2
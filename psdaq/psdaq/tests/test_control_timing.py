@@ -0,0 +1,118 @@
+import time
+import pytest
+for module in ('zmq', 'transitions', 'requests', 'p4p', 'psalg.utils.syslog'):
+    pytest.importorskip(module)
+import zmq
+from psdaq.control.control import ReplyCollector, TransitionTiming, create_msg, fileReport_msg, error_msg
+
+@pytest.fixture
+def sockets():
+    context = zmq.Context(1)
+    pull = context.socket(zmq.PAIR)
+    pull.bind('inproc://replies')
+    push = context.socket(zmq.PAIR)
+    push.connect('inproc://replies')
+    yield push, pull
+    push.close(linger=0)
+    pull.close(linger=0)
+    context.term()
+
+def reply(key, msg_id, sender_id, body={}):
+    return create_msg(key, msg_id=msg_id, sender_id=sender_id, body=body)
+
+def test_timeout(sockets):
+    push, pull = sockets
+    push.send_json(reply('configure', 7, 'a'))
+    push.send_json(reply('configure', 7, 'c'))
+    collector = ReplyCollector(pull, 7, ['a', 'b', 'c'], 200)
+    missing, msgs, reports = collector.collect()
+    assert missing == {'b'}
+    assert [msg['header']['sender_id'] for msg in msgs] == ['a', 'c']
+    assert reports == [] and not collector.error
+    assert set(collector.latency) == {'a', 'c'}
+    assert collector.elapsed_ms() >= 200
+
+def test_all_replied(sockets):
+    push, pull = sockets
+    for xid in ['c', 'b', 'a', 'x']:
+        push.send_json(reply('configure', 7, xid))
+    collector = ReplyCollector(pull, 7, ['a', 'b', 'c'], 10000)
+    missing, msgs, reports = collector.collect()
+    # the reply of an unexpected id is dropped
+    assert missing == set() and len(msgs) == 3
+    assert collector.elapsed_ms() < 5000
+
+def test_error_stops_early(sockets):
+    push, pull = sockets
+    push.send_json(reply('configure', 7, 'a'))
+    push.send_json(reply('configure', 7, 'b', {'err_info': 'b failed'}))
+    push.send_json(reply('configure', 7, 'c'))
+    collector = ReplyCollector(pull, 7, ['a', 'b', 'c'], 10000)
+    missing, msgs, reports = collector.collect()
+    assert collector.error and collector.elapsed_ms() < 5000
+    assert [msg['header']['sender_id'] for msg in msgs] == ['a', 'b']
+    assert msgs[-1]['body']['err_info'] == 'b failed'
+    assert missing == set()
+    # collection stopped before the reply of c
+    assert pull.recv_json(flags=zmq.NOBLOCK)['header']['sender_id'] == 'c'
+
+def test_msg_id_mismatch(sockets):
+    push, pull = sockets
+    push.send_json(reply('configure', 6, 'a'))
+    push.send_json(reply('configure', 7, 'b'))
+    push.send_json(reply('configure', 6, 'b'))
+    collector = ReplyCollector(pull, 7, ['a', 'b'], 200)
+    missing, msgs, reports = collector.collect()
+    assert missing == {'a'}
+    assert [(msg['header']['sender_id'], msg['header']['msg_id']) for msg in msgs] == [('b', 7)]
+
+    # msg_id None: the msg_id of the first reply is expected
+    push.send_json(reply('configure', 8, 'a'))
+    push.send_json(reply('configure', 9, 'b'))
+    collector = ReplyCollector(pull, None, ['a', 'b'], 200)
+    missing, msgs, reports = collector.collect()
+    assert missing == {'b'} and collector.msg_id == 8
+
+def test_reports(sockets):
+    push, pull = sockets
+    # reports are passed through whatever their msg_id or sender
+    push.send_json(fileReport_msg('/tmp/x.xtc2'))
+    push.send_json(reply('configure', 7, 'a'))
+    push.send_json(fileReport_msg('/tmp/y.xtc2'))
+    push.send_json(reply('configure', 7, 'b'))
+    collector = ReplyCollector(pull, None, ['a', 'b'], 10000)
+    missing, msgs, reports = collector.collect()
+    assert missing == set() and collector.msg_id == 7
+    assert len(msgs) == 2 and collector.elapsed_ms() < 5000
+    assert [msg['body']['path'] for msg in reports] == ['/tmp/x.xtc2', '/tmp/y.xtc2']
+
+    # an error report stops the collection
+    push.send_json(error_msg('disk full'))
+    push.send_json(reply('configure', 7, 'a'))
+    collector = ReplyCollector(pull, 7, ['a', 'b'], 10000)
+    missing, msgs, reports = collector.collect()
+    assert collector.error and msgs == []
+    assert [msg['body']['err_info'] for msg in reports] == ['disk full']
+
+def test_report_order():
+    timing = TransitionTiming()
+    timing.record('configure', {'a': 5., 'b': 50., 'c': 20.}, 60., ['d'])
+    timing.record('configure', {'a': 500., 'b': 1., 'd': 3.}, 510., ['c', 'e'])
+    timing.record('enable', {'a': 1.}, 2., [])
+
+    report = timing.report(aliases={'a': 'drp_a', 'c': 'drp_c'})
+    assert list(report) == ['configure', 'enable']
+    entry = report['configure']
+    assert entry['count'] == 2 and entry['last_ms'] == 510. and entry['max_ms'] == 510.
+    assert entry['mean_ms'] == 285. and sum(entry['hist']) == 2
+    assert entry['replies'] == 3 and entry['missing'] == ['c', 'e']
+    # the processes that did not reply first, then the slowest of the last transition
+    assert [item['id'] for item in entry['slowest']] == ['c', 'e', 'a', 'd', 'b']
+    assert [item['alias'] for item in entry['slowest']] == ['drp_c', 'e', 'drp_a', 'd', 'b']
+    assert entry['slowest'][0]['last_ms'] is None and entry['slowest'][0]['max_ms'] == 20.
+    assert entry['slowest'][2]['count'] == 2 and entry['slowest'][2]['mean_ms'] == 252.5
+
+    report = timing.report('configure', count=3)
+    assert list(report) == ['configure']
+    assert [item['id'] for item in report['configure']['slowest']] == ['c', 'e', 'a']
+    assert timing.report('disable') == {}
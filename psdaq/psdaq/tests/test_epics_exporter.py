@@ -0,0 +1,68 @@
+import time
+import pytest
+
+p4p = pytest.importorskip('p4p')
+from p4p.nt import NTScalar
+from p4p.server import Server
+from p4p.server.thread import SharedPV
+from p4p.client.thread import Context
+from psdaq.cas.epics_exporter import CustomCollector, read_pvlist
+
+def samples(collector):
+    result = {}
+    for metric in collector.collect():
+        for s in metric.samples:
+            result[(s.name, tuple(sorted(s.labels.items())))] = s.value
+    return result
+
+def wait_for(cond, timeout=5):
+    end = time.time() + timeout
+    while time.time() < end:
+        if cond():
+            return True
+        time.sleep(0.05)
+    return False
+
+@pytest.fixture
+def server():
+    pvs = {'TST:PART:%d:DeadFrac' % i: SharedPV(nt=NTScalar('d'), initial=0.1 * i) for i in range(3)}
+    pvs['TST:XPM:RxClkFreq'] = SharedPV(nt=NTScalar('d'), initial=185.7)
+    with Server(providers=[pvs], isolate=True) as S:
+        ctx = Context('pva', conf=S.conf(), useenv=False)
+        yield pvs, ctx
+        ctx.close()
+
+def test_collector(server, tmp_path):
+    pvs, ctx = server
+    pvlist = tmp_path / 'pvs.txt'
+    pvlist.write_text('# comment\n'
+                      'RxClkFreq TST:XPM:RxClkFreq xpm=2\n'
+                      'RxClkFreq TST:XPM:Missing xpm=3\n')
+    c = CustomCollector(ctx=ctx, window=10.)
+    # partition 3 has no PV
+    c.registerPV('DeadFrac', 'TST:PART:%d:DeadFrac', 'tst', range(4))
+    for name, (labelnames, entries) in read_pvlist(str(pvlist), 'tst').items():
+        c.addPVs(name, labelnames, entries)
+
+    dead = lambda p: ('DeadFrac', (('instrument', 'tst'), ('partition', str(p))))
+    assert wait_for(lambda: all(dead(p) in samples(c) for p in range(3)))
+    s = samples(c)
+    for p in range(3):
+        assert s[dead(p)] == pytest.approx(0.1 * p)
+    assert dead(3) not in s
+    assert s[('RxClkFreq', (('instrument', 'tst'), ('xpm', '2')))] == pytest.approx(185.7)
+    assert ('RxClkFreq', (('instrument', 'tst'), ('xpm', '3'))) not in s
+    assert s[('epics_pv_connected', (('pv', 'TST:XPM:Missing'),))] == 0
+    assert s[('epics_pv_connected', (('pv', 'TST:PART:0:DeadFrac'),))] == 1
+    assert ('epics_pv_age_seconds', (('pv', 'TST:XPM:Missing'),)) not in s
+
+    # scrapes are served from the cache, updates come from the monitors
+    for i in range(4):
+        pvs['TST:PART:1:DeadFrac'].post(0.5 + i)
+    key = ('epics_pv_updates_total', (('pv', 'TST:PART:1:DeadFrac'),))
+    assert wait_for(lambda: samples(c)[key] == 5)
+    s = samples(c)
+    assert s[dead(1)] == pytest.approx(3.5)
+    assert s[('epics_pv_update_rate', (('pv', 'TST:PART:1:DeadFrac'),))] == pytest.approx(0.5)
+    assert s[('epics_pv_age_seconds', (('pv', 'TST:PART:1:DeadFrac'),))] < 5
+    c.close()
@@ -2,6 +2,7 @@ from psdaq.configdb.typed_json import *
 from psana import DataSource, container
 import numpy as np
 import subprocess
+import pytest
 import os, re
 
 class Test_JSON2XTC:
@@ -51,7 +52,8 @@ class Test_JSON2XTC:
                         result = False
         return result
 
-    def test_one(self, tmp_path):
+    @pytest.mark.parametrize('binary', [False, True])
+    def test_one(self, tmp_path, binary):
         c = cdict()
         c.setInfo("test", "test1", None, "serial1234", "No comment")
         c.setAlg("raw", [1,2,3])
@@ -102,7 +104,7 @@ class Test_JSON2XTC:
         # Write it out!!
         json_file = os.path.join(tmp_path, "json2xtc_test.json")
         xtc_file = os.path.join(tmp_path, "json2xtc_test.xtc2")
-        assert c.writeFile(json_file)
+        assert c.writeFile(json_file, binary=binary)
         # Convert it to xtc2!
 
         # this test should really run in psdaq where json2xtc
@@ -129,7 +131,7 @@ class Test_JSON2XTC:
 def run():
     test = Test_JSON2XTC()
     import pathlib
-    test.test_one(pathlib.Path('.'))
+    test.test_one(pathlib.Path('.'), False)
 
 if __name__ == "__main__":
     run()
@@ -0,0 +1,81 @@
+import time
+import numpy as np
+import pytest
+from psdaq.eb.monReceiver import RingBuffer, MonData, MonReceiver, synthetic_metrics, publish, EB_METRICS
+
+def test_ring_buffer():
+    ring = RingBuffer(4, 2)
+    rows, cursor = ring.since(0)
+    assert rows.shape == (0, 2) and cursor == 0
+    for i in range(3):
+        ring.append([i, 10*i])
+    rows, cursor = ring.since(0)
+    assert rows[:,0].tolist() == [0, 1, 2] and cursor == 3
+    for i in range(3, 10):
+        ring.append([i, 10*i])
+    # a reader that fell behind gets the last size rows
+    rows, cursor = ring.since(cursor)
+    assert rows[:,0].tolist() == [6, 7, 8, 9] and cursor == 10
+    ring.append([10, 100])
+    rows, cursor = ring.since(cursor)
+    assert rows.tolist() == [[10, 100]] and cursor == 11
+
+def test_decimation():
+    data = MonData(periods=(1, 10, 60), size=5)
+    # 2 samples per second for 2 minutes, a = seconds since start
+    t0 = 6000.
+    for i in range(240):
+        t = t0 + i/2
+        data.add('host', {'time': [t], 'a': [t-t0], 'b': [1.]})
+    assert data.hosts() == ['host']
+    assert data.names('host') == ['a', 'b']
+
+    new, cursor = data.since('host', 10)
+    assert new['time'].tolist() == [t0+60, t0+70, t0+80, t0+90, t0+100]
+    assert new['a'].tolist() == [64.75, 74.75, 84.75, 94.75, 104.75]
+    assert new['b'].tolist() == [1.]*5
+
+    new, cursor = data.since('host', 60)
+    assert new['time'].tolist() == [t0] and new['a'].tolist() == [29.75]
+    data.add('host', {'time': [t0+125], 'a': [125.]})
+    new, cursor = data.since('host', 60, cursor)
+    assert new['time'].tolist() == [t0+60] and new['a'].tolist() == [89.75]
+    # b was missing from the last message
+    new, cursor = data.since('host', 1, data.since('host', 1)[1] - 1)
+    assert new['time'].tolist() == [t0+119] and new['b'].tolist() == [1.]
+
+def test_messages():
+    data = MonData(periods=(1,), size=100)
+    for i in range(3):
+        for msg in [['h0', synthetic_metrics(EB_METRICS, 100.+3*i, nsamples=3)],
+                    ['h1', {'time': [100.+i], 'x': [i]}]]:
+            data.add_message(msg)
+    data.add_message(['h2', {'x': [1]}])
+    data.add_message(['h1'])
+    data.add_message(['h1', {'time': [110., 111.], 'x': [1]}])
+    assert data.nmessages == 8 and data.nerrors == 3
+    assert data.hosts() == ['h0', 'h1']
+    assert data.names('h0') == EB_METRICS
+    new, cursor = data.since('h0', 1)
+    assert new['time'].tolist() == list(range(98, 106))
+    assert np.all((new['EventCount'] >= 0) & (new['EventCount'] < 1000))
+
+def test_receiver():
+    zmq = pytest.importorskip('zmq')
+    context = zmq.Context(1)
+    socket = context.socket(zmq.PUB)
+    port = socket.bind_to_random_port('tcp://127.0.0.1')
+    data = MonData(periods=(1,), size=10)
+    receiver = MonReceiver(data, 'tcp://127.0.0.1:%d' % port, poll_ms=10)
+    receiver.start()
+    time.sleep(0.3)     # let the subscription through
+    publish(socket, 5, EB_METRICS, interval=0.01, nsamples=2, count=3)
+    for i in range(100):
+        if data.nmessages == 15: break
+        time.sleep(0.01)
+    receiver.stop()
+    receiver.join()
+    socket.close()
+    context.term()
+    assert data.nmessages == 15
+    assert len(data.hosts()) == 5
@@ -0,0 +1,148 @@
+import socket
+import socketserver
+import threading
+import time
+import pytest
+from psdaq.procmgr.ProcMgr import ProcMgr
+
+BANNER = (b'\xff\xfd\x01'   # telnet option negotiation (DO ECHO)
+          b'@@@ Welcome to procServ (procServ Version 2.7.0)\r\n'
+          b'@@@ Use ^X to kill the child, auto restart is OFF, use ^T to toggle auto restart\r\n'
+          b'@@@ procServ server PID: 1%03d\r\n'
+          b'@@@ Server startup directory: /tmp\r\n'
+          b'@@@ Child startup directory: /tmp\r\n'
+          b'@@@ Child "%s" PID: 2%03d\r\n'
+          b'@@@ procServ server started at: Mon Jan  1 00:00:00 2024\r\n'
+          b'@@@ Child "%s" started at: Mon Jan  1 00:00:00 2024\r\n'
+          b'@@@ 0 user(s) and 0 logger(s) connected (plus you)\r\n')
+
+# Stand-in for the procServ control port of one process: sends the banner
+# (or response, if given) after 'delay' seconds, kills the child on ^X and
+# exits on ^Q.
+class FakeProcServ(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, uniqueid, index, delay, response=None):
+        self.uniqueid = uniqueid
+        self.index = index
+        self.delay = delay
+        self.response = response
+        self.received = b''
+        self.exited = threading.Event()
+        super().__init__(('', 0), FakeProcServHandler)
+        self.port = self.server_address[1]
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def exit(self):
+        self.shutdown()
+        self.server_close()
+        self.exited.set()
+
+class FakeProcServHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        srv = self.server
+        time.sleep(srv.delay)
+        uid = srv.uniqueid.encode()
+        if srv.response is None:
+            self.request.sendall(BANNER % (srv.index, uid, srv.index, uid))
+        else:
+            self.request.sendall(srv.response)
+        while True:
+            try:
+                data = self.request.recv(1024)
+            except OSError:
+                return
+            if not data:
+                return
+            if b'\x18' in data:
+                self.request.sendall(b'@@@ Received a sigChild for process 2%03d. '
+                                     b'The process was killed by signal 9\r\n' % srv.index)
+            if b'\x11' in data:
+                # procServ exits
+                self.request.close()
+                threading.Thread(target=srv.exit, daemon=True).start()
+                srv.received += data
+                return
+            srv.received += data
+
+@pytest.fixture
+def partition(tmp_path):
+    servers = [FakeProcServ('proc%d' % i, i, 0.2) for i in range(8)]
+    # a free port without procServ
+    s = socket.socket()
+    s.bind(('', 0))
+    noport = s.getsockname()[1]
+    s.close()
+    cnf = tmp_path / 'test.cnf'
+    with open(cnf, 'w') as f:
+        f.write('procmgr_config = [\n')
+        for srv in servers:
+            f.write("  {id:'%s', port:'%d', cmd:'sleep 1000'},\n" % (srv.uniqueid, srv.port))
+        f.write("  {id:'absent', port:'%d', cmd:'sleep 1000'},\n" % noport)
+        f.write(']\n')
+    yield str(cnf), servers
+    for srv in servers:
+        if not srv.exited.is_set():
+            srv.exit()
+
+def test_status(partition, capsys):
+    cnf, servers = partition
+    results = []
+    for parallel in [1, 16]:
+        st = time.time()
+        procMgr = ProcMgr(cnf, 0, parallel=parallel)
+        elapsed = time.time() - st
+        procMgr.status([])
+        results.append((procMgr.d, procMgr.getStatus(), capsys.readouterr().out, elapsed))
+    (d1, status1, out1, t1), (d2, status2, out2, t2) = results
+    assert d1 == d2
+    assert status1 == status2
+    assert out1 == out2
+    assert t2 < t1 / 2
+
+    statuses = {s['showId']: s['status'] for s in status2}
+    assert statuses.pop('absent') == ProcMgr.STATUS_NOCONNECT
+    assert statuses == {b'proc%d' % i: ProcMgr.STATUS_RUNNING for i in range(8)}
+    for srv in servers:
+        key = 'localhost:%s' % srv.uniqueid
+        assert d2[key][ProcMgr.DICT_PID] == b'2%03d' % srv.index
+        assert d2[key][ProcMgr.DICT_PPID] == b'1%03d' % srv.index
+
+def test_banner_not_found(tmp_path, capsys):
+    # entries with a static port are handled last to first: the first one
+    # handled answers last, messages are still in the order of handling
+    servers = [FakeProcServ('bad%d' % i, i, delay, response=b'no banner %d\r\n' % i)
+               for i, delay in enumerate([0., 0.5])]
+    cnf = tmp_path / 'test.cnf'
+    with open(cnf, 'w') as f:
+        f.write('procmgr_config = [\n')
+        for srv in servers:
+            f.write("  {id:'%s', port:'%d', cmd:'sleep 1000'},\n" % (srv.uniqueid, srv.port))
+        f.write(']\n')
+    outs = []
+    for parallel in [1, 16]:
+        procMgr = ProcMgr(str(cnf), 0, parallel=parallel)
+        outs.append(capsys.readouterr().out)
+        for srv in servers:
+            assert procMgr.d['localhost:%s' % srv.uniqueid][ProcMgr.DICT_STATUS] == ProcMgr.STATUS_ERROR
+    for srv in servers:
+        srv.exit()
+    assert outs[0] == outs[1]
+    lines = [line for line in outs[1].splitlines() if 'bad' in line or 'no banner' in line]
+    assert lines == ["readLogPortBanner: banner not found in response: b'no banner 1\\r\\n'",
+                     "*** ERR: failed to read procServ banner for 'bad1' on host localhost",
+                     "readLogPortBanner: banner not found in response: b'no banner 0\\r\\n'",
+                     "*** ERR: failed to read procServ banner for 'bad0' on host localhost"]
+
+def test_stop(partition):
+    cnf, servers = partition
+    procMgr = ProcMgr(cnf, 0)
+    ids = [srv.uniqueid for srv in servers]
+    assert procMgr.stop(ids, sigdelay=0) == 0
+    for srv in servers:
+        assert procMgr.d['localhost:%s' % srv.uniqueid][ProcMgr.DICT_STATUS] == ProcMgr.STATUS_NOCONNECT
+        assert b'\x18' in srv.received and b'\x11' in srv.received
+        assert srv.exited.wait(5)
+    procMgr = ProcMgr(cnf, 0)
+    assert procMgr.getProcessCounts() == (0, 0)
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+import psdaq.pyxpm.pvhandler as pvhandler
+
+def test_link_counts():
+    pvstats = pytest.importorskip('psdaq.pyxpm.pvstats')
+    def reg(counts):
+        return sum(int(c) << (32*i) for i, c in enumerate(counts))
+    prev = [7, 0xfffffff0, 0xffffffff, 100] + [0]*28
+    cur  = [9, 0x10,       0x0,        100] + [5]*28
+    prevCounts = pvstats.linkCounts(reg(prev))
+    curCounts  = pvstats.linkCounts(reg(cur))
+    assert curCounts.dtype == np.uint32 and curCounts.size == 32
+    assert curCounts.tolist() == cur
+    # differences wrap with the 32-bit counters
+    assert (curCounts - prevCounts).tolist() == [2, 0x20, 1, 0] + [5]*28
+    assert pvstats.linkCounts(reg([1, 2]), nlinks=2).tolist() == [1, 2]
+
+class FakePV:
+    def __init__(self):
+        self.posted = []
+    def current(self):
+        return {'value': None, 'timeStamp.secondsPastEpoch': 0, 'timeStamp.nanoseconds': 0}
+    def post(self, value):
+        self.posted.append(value)
+
+def test_update_changed(monkeypatch):
+    now = [1000.]
+    monkeypatch.setattr(pvhandler.time, 'monotonic', lambda: now[0])
+    monkeypatch.setattr(pvhandler, '_posted', {})
+    pv, apv = FakePV(), FakePV()
+
+    def post(pv, val, dt=1.):
+        pvhandler.pvUpdateChanged(pv, val, timev=(now[0], 0))
+        now[0] += dt
+
+    post(pv, 1.)
+    post(pv, 1.)
+    post(pv, None)
+    post(pv, 2.)
+    post(pv, 2.)
+    assert [v['value'] for v in pv.posted] == [1., 2.]
+    assert pv.posted[-1]['timeStamp.secondsPastEpoch'] == 1003.
+
+    # the posted array is a copy: changing it in place is a new value
+    arr = np.array([1, 2, 3], dtype=np.uint32)
+    post(apv, arr)
+    post(apv, arr.copy())
+    arr[0] = 4
+    post(apv, arr)
+    assert len(apv.posted) == 2 and apv.posted[-1]['value'][0] == 4
+
+    # unchanged values are posted again after the heartbeat
+    for i in range(int(pvhandler.heartbeat)):
+        post(pv, 2.)
+    assert len(pv.posted) == 3
+    assert pv.posted[-1]['timeStamp.secondsPastEpoch'] - pv.posted[-2]['timeStamp.secondsPastEpoch'] >= pvhandler.heartbeat
@@ -0,0 +1,95 @@
+import os
+import numpy as np
+import pytest
+from psdaq.seq.seq import *
+from psdaq.seq.seqsim import Simulator, step, load
+
+SEQDIR = os.path.join(os.path.dirname(__file__), '..', 'seq')
+
+@pytest.mark.parametrize('script,acmode,stop', [('10k.py'   , False, 200000),
+                                                ('40k.py'   , False, 200000),
+                                                ('burst.py' , False,  20000),
+                                                ('finite.py', False,  20000),
+                                                ('ac90.py'  , True ,   2000),
+                                                ('ac180.py' , True ,   2000),
+                                                ('acdiv.py' , True ,   2000)])
+def test_engine(script, acmode, stop, capsys):
+    config = load(os.path.join(SEQDIR, script))
+    frames, requests, modes = step(config['instrset'], stop, acmode)
+    sim = Simulator(config['instrset'], acmode)
+    f, r = sim.run(stop)
+    assert np.array_equal(f, frames)
+    assert np.array_equal(r, requests)
+    assert sim.modes == modes
+
+    bits = sim.trigger_bits(1000, stop)
+    keep = frames >= 1000
+    assert np.array_equal(np.nonzero(bits)[0]+1000, frames[keep])
+    assert np.array_equal(bits[frames[keep]-1000], requests[keep]&0xffff)
+
+def test_mixed_loops():
+    # nested loops, a loop with an AC sync and beam requests, and a loop
+    # whose body starts out of phase with its sync interval
+    instrset = [FixedRateSync(marker=6, occ=1),
+                BeamRequest(3),
+                FixedRateSync(marker=1, occ=1),
+                ControlRequest(0x5),
+                FixedRateSync(marker=0, occ=3),
+                Branch.conditional(line=3, counter=0, value=4),
+                Branch.conditional(line=1, counter=1, value=20),
+                ControlRequest(0x80),
+                ACRateSync(timeslotm=0x3f, marker=0, occ=1),
+                Branch.conditional(line=7, counter=2, value=2),
+                Branch.unconditional(line=0)]
+    for acmode in [False, True]:
+        stop = 2000 if acmode else 3000000
+        frames, requests, modes = step(instrset, stop, acmode)
+        f, r = Simulator(instrset, acmode).run(stop)
+        assert len(frames) > 0
+        assert np.array_equal(f, frames)
+        assert np.array_equal(r, requests)
+
+def test_rates(capsys):
+    config = load(os.path.join(SEQDIR, '10k.py'))
+    sim = Simulator(config['instrset'])
+    # bit j is requested 10000*(j+1) times per 1Hz (910000 timeslot) marker
+    assert list(sim.counts(0, 910000*5)) == [50000*(j+1) for j in range(16)]
+
+    config = load(os.path.join(SEQDIR, 'acdiv.py'))
+    rates = Simulator(config['instrset'], acmode=True).rates(seconds=10.)
+    assert list(rates) == [360, 180, 120, 90, 72, 60, 45, 40, 36, 30, 24, 20, 18, 15, 12, 10]
+
+def test_validation():
+    with pytest.raises(ValueError):
+        Simulator([ControlRequest(1), Branch.unconditional(line=2)])
+    with pytest.raises(ValueError):
+        Simulator([Branch.conditional(line=0, counter=4, value=1)])
+    # never advances the timeslot
+    with pytest.raises(ValueError):
+        Simulator([ControlRequest(1), CheckPoint(), Branch.unconditional(line=0)]).run(100)
+    # branch to self ends the sequence
+    instrset = [ControlRequest(1), FixedRateSync(marker=0, occ=1),
+                Branch.conditional(line=0, counter=0, value=9),
+                Branch.unconditional(line=3)]
+    f, r = Simulator(instrset).run(100)
+    assert list(f) == list(range(-1,9))
+    assert np.array_equal(f, step(instrset, 100)[0])
+
+def test_shared_counter():
+    # the counter of the inner loop is also tested by the branch after it,
+    # so its iterations cannot be replayed
+    for first in [CheckPoint(), ControlRequest(1)]:
+        instrset = [first,
+                    FixedRateSync(marker=1, occ=1),
+                    Branch.conditional(line=1, counter=1, value=0),
+                    Branch.conditional(line=2, counter=1, value=4),
+                    FixedRateSync(marker=0, occ=1),
+                    Branch.unconditional(line=0)]
+        stop = 2000000
+        frames, requests, modes = step(instrset, stop)
+        sim = Simulator(instrset)
+        assert sim._loops == {}
+        f, r = sim.run(stop)
+        assert np.array_equal(f, frames)
+        assert np.array_equal(r, requests)
+        assert sim.modes == modes
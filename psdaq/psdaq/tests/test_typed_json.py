@@ -0,0 +1,64 @@
+from psdaq.configdb.typed_json import *
+import numpy as np
+import json
+import io
+import pytest
+
+def make_cdict():
+    c = cdict()
+    c.setInfo("test", "test1", None, "serial1234", "No comment")
+    c.setAlg("raw", [1,2,3])
+    c.set("a", 5, "UINT16")
+    c.set("b", [[1, 2, 3], [4, 5, 6]], "INT16")
+    c.set("c", np.arange(7, dtype='float32') / 4)
+    c.set("d.e", np.arange(1000, dtype='uint32').reshape(10, 100))
+    c.set("d.f", [1.5, -2.25], "DOUBLE")
+    c.define_enum("q", {"Off": 0, "On": 1})
+    c.set("g", [0, 1, 1], "q")
+    return c
+
+def check_equal(c1, c2):
+    for name in ["b", "c", "d.e", "d.f"]:
+        v1, v2 = c1.get(name), c2.get(name)
+        assert v1.dtype == v2.dtype and v1.shape == v2.shape
+        assert (v1 == v2).all()
+    assert c2.get("a") == 5
+
+@pytest.mark.parametrize('binary', [False, True])
+def test_typed_json_roundtrip(binary):
+    c = make_cdict()
+    d = json.loads(json.dumps(c.typed_json(binary=binary)))
+    assert is_binary(d["d"]["e"]) == binary
+    assert d[":types:"]["d"]["e"] == ["UINT32", 10, 100]
+    assert d[":types:"]["g"] == ["q", 3]
+    check_equal(c, cdict(d))
+    assert getValue(d, "d.e") == list(range(1000))
+    assert getValue(d, "g") == [0, 1, 1]
+
+@pytest.mark.parametrize('binary', [False, True])
+def test_write_typed_json(binary):
+    c = make_cdict()
+    f = io.StringIO()
+    assert c.writeFile(f, binary=binary)
+    d = json.loads(f.getvalue())
+    assert is_binary(d["c"]) == binary
+    check_equal(c, cdict(d))
+
+def test_set_validation():
+    c = cdict()
+    with pytest.raises(ValueError):
+        c.set("a", [1, 256], "UINT8")
+    with pytest.raises(ValueError):
+        c.set("a", [1.5], "INT32")
+    c.set("a", [1, 255], "UINT8")
+    assert c.get("a").dtype == np.uint8
+
+def test_update_value():
+    d = make_cdict().typed_json(binary=True)
+    assert updateValue(d, "b", "6 5 4 3 2 1") == 0
+    assert d["b"] == [6, 5, 4, 3, 2, 1]
+    assert updateValue(d, "b", "6 5 4 3 2 100000") == 2
+    assert updateValue(d, "b", "6 5 4 3 2") == 2
+    assert updateValue(d, "d.f", "0.5 1e3") == 0
+    assert d["d"]["f"] == [0.5, 1000.]
+    assert (cdict(d).get("b") == np.array([[6, 5, 4], [3, 2, 1]])).all()
@@ -50,6 +50,7 @@ setup(
                 'epics_exporter = psdaq.cas.epics_exporter:main',
                 'seqplot = psdaq.seq.seqplot:main',
                 'seqprogram = psdaq.seq.seqprogram:main',
+                'seqsim = psdaq.seq.seqsim:main',
               ]
        },
 )